@@ -13,6 +13,8 @@
 from pypyr.config import config
 from pypyr.errors import ContextError, MultiError
 from pypyr.subproc import SimpleCommandTypes, SubprocessResult
+from pypyr.hooks import get_run_hooks
+from pypyr.trace import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -355,6 +357,13 @@ async def _run(self, cmd,
         return await self._spawn(cmd, stdout=stdout, stderr=stderr)
 
     async def _spawn(self, cmd, stdout, stderr) -> SubprocessResult:
+        with tracer.async_span(cmd, 'subprocess', cwd=self.cwd):
+            result = await self._spawn_process(cmd, stdout, stderr)
+
+        get_run_hooks().subprocess(cmd, result.returncode)
+        return result
+
+    async def _spawn_process(self, cmd, stdout, stderr) -> SubprocessResult:
         if self.cwd:
             logger.debug("Processing command string in dir %s: %s",
                          self.cwd, self.cmd)
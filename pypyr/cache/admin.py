@@ -1,11 +1,19 @@
 """Administrate pypyr caches."""
+from contextlib import contextmanager
+import json
 import logging
+import os
+from pathlib import Path
+import tempfile
 
 from pypyr.cache.backoffcache import backoff_cache
+from pypyr.cache.codecache import pystring_code_cache
 from pypyr.cache.filecache import file_cache
 from pypyr.cache.loadercache import loader_cache
 from pypyr.cache.namespacecache import pystring_namespace_cache
 from pypyr.cache.parsercache import contextparser_cache
+from pypyr.cache.pipelinecache import pipeline_cache
+from pypyr.cache.resultcache import step_result_cache
 from pypyr.cache.stepcache import step_cache
 
 logger = logging.getLogger(__name__)
@@ -16,6 +24,7 @@ def clear_all() -> None:
     logger.debug("clearing all cache...")
 
     backoff_cache.clear()
+    pystring_code_cache.clear()
     file_cache.clear()
     loader_cache.clear()
     pystring_namespace_cache.clear()
@@ -23,3 +32,67 @@ def clear_all() -> None:
     step_cache.clear()
 
     logger.debug("all cache cleared.")
+
+
+def stats() -> dict:
+    """Get usage statistics for all pypyr caches.
+
+    Stats are cumulative for the life of the process. Clearing a cache
+    empties it, but keeps its counters.
+
+    Returns:
+        dict where key is the cache name and value is the dict from that
+        cache's get_stats().
+    """
+    return {
+        'backoff_cache': backoff_cache.get_stats(),
+        'contextparser_cache': contextparser_cache.get_stats(),
+        'file_cache': file_cache.get_stats(),
+        'loader_cache': loader_cache.get_stats(),
+        'pipeline_cache': pipeline_cache.get_stats(),
+        'pystring_code_cache': pystring_code_cache.get_stats(),
+        'pystring_namespace_cache': pystring_namespace_cache.get_stats(),
+        'step_cache': step_cache.get_stats(),
+        'step_result_cache': step_result_cache.get_stats(),
+    }
+
+
+def dump_stats(path) -> None:
+    """Save usage statistics for all pypyr caches to path as json.
+
+    Writes to a temp file that then renames over path, so a reader never
+    sees a partially written file.
+
+    Args:
+        path (Path-like): Write the stats here. Creates parent dirs if they
+            don't exist.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    text = json.dumps(stats(), indent=2)
+
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(text)
+
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+    logger.debug("saved cache stats to %s", path)
+
+
+@contextmanager
+def saving_stats(path):
+    """Save usage statistics for all pypyr caches to path on exit.
+
+    Args:
+        path (Path-like): Save the stats here.
+    """
+    try:
+        yield
+    finally:
+        dump_stats(path)
+        logger.notify("saved cache stats to %s", path)
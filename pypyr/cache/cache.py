@@ -1,40 +1,179 @@
 """pypyr caching base class and functions."""
+from concurrent.futures import Future
 import logging
+from sys import getsizeof
 import threading
+import time
 
 from pypyr.config import config
+from pypyr.errors import ConfigError
+from pypyr.utils.memory import get_deep_size
 
 # use pypyr logger to ensure loglevel is set correctly
 logger = logging.getLogger(__name__)
 
+# eviction orders for max_size & max_bytes.
+POLICIES = ('lru', 'fifo')
+
+# sentinel for not in cache, since None is a valid cached item.
+_MISSING = object()
+
 
 class Cache():
     """Thread-safe general purpose cache for objects.
 
     Add things to the cache by calling get(key, creator). If the requested key
     doesn't exist, will add the item to the cache for you.
+
+    The cache is unbounded unless you set limits:
+        - max_size: evict once there are more than this many items.
+        - max_bytes: evict once the estimated size of the items is more than
+          this. Items bigger than max_bytes on their own don't cache.
+        - ttl: an item expires this many seconds after it was created.
+        - policy: which item to evict to get within max_size & max_bytes.
+          lru evicts the least recently used, fifo the oldest. lru is
+          approximate: so that hits don't lock, a hit only marks the item,
+          and eviction gives marked items another pass rather than evict
+          them.
+
+    A cache with a name gets its limits from config.cache_limits[name] if
+    that exists, otherwise from the arguments you pass to init. Config
+    limits apply from the next miss.
+
+    Estimating max_bytes walks each new item with
+    pypyr.utils.memory.get_deep_size, so it slows down misses of big items.
+
+    Attributes:
+        name (str): Name of the cache in config.cache_limits. None means the
+            cache only uses the limits you pass to init.
+        max_size (int): Maximum number of items in the cache. None means
+            unbounded.
+        max_bytes (int): Maximum estimated bytes of the items in the cache.
+            None means unbounded.
+        ttl (float): Seconds an item lives after it was created. None means
+            forever.
+        policy (str): lru or fifo.
+        hits (int): Count of get() calls found in cache. Hits don't lock, so
+            this can under-count slightly when threads hit at the same time.
+        misses (int): Count of get() calls that had to run creator.
+        evictions (int): Count of items removed to stay within max_size or
+            max_bytes.
+        expirations (int): Count of items removed because they outlived ttl.
+        create_seconds (float): Total wall-clock seconds spent in creator on
+            misses.
     """
 
-    def __init__(self):
-        """Instantiate the cache."""
+    def __init__(self, max_size=None, max_bytes=None, ttl=None, policy='lru',
+                 name=None):
+        """Instantiate the cache.
+
+        Args:
+            max_size (int): Maximum number of items in the cache. Default None
+                means unbounded.
+            max_bytes (int): Maximum estimated bytes of the items in the
+                cache. Default None means unbounded.
+            ttl (float): Seconds an item lives after it was created. Default
+                None means forever.
+            policy (str): lru or fifo. Default lru.
+            name (str): Get limits from config.cache_limits[name] if it
+                exists. Default None means only use the limits passed here.
+        """
         self._lock = threading.Lock()
         self._cache = {}
+        # key: time.monotonic() after which it expires. Only with ttl.
+        self._expires = {}
+        # key: estimated bytes. Only with max_bytes.
+        self._sizes = {}
+        self._bytes = 0
+        self._next_sweep = 0.0
+        # whether hits mark the item as used, so it evicts later.
+        self._lru = False
+        # keys with a hit since they were last at the front. Only with lru.
+        self._used = set()
+        # key: (Future, thread id) of creators that are running.
+        self._loading = {}
+
+        self.name = name
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.create_seconds = 0.0
 
     def clear(self):
         """Clear the cache of all objects."""
         with self._lock:
             self._cache.clear()
+            self._used.clear()
+            self._expires.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def remove(self, key):
+        """Remove key from the cache, if it's there.
+
+        Args:
+            key: key (unique id) of cached item
+        """
+        with self._lock:
+            self._drop(key)
+
+    def get_limits(self):
+        """Get the limits that apply to this cache right now.
+
+        Returns:
+            tuple: (max_size, max_bytes, ttl, policy). From
+                config.cache_limits[name] if it has this cache, otherwise from
+                the attributes.
+
+        Raises:
+            ConfigError: Limits in config aren't a mapping, or policy isn't
+                lru or fifo.
+        """
+        limits = config.cache_limits.get(self.name) if self.name else None
+
+        if limits is None:
+            max_size = self.max_size
+            max_bytes = self.max_bytes
+            ttl = self.ttl
+            policy = self.policy
+        else:
+            try:
+                max_size = limits.get('max_size', self.max_size)
+                max_bytes = limits.get('max_bytes', self.max_bytes)
+                ttl = limits.get('ttl', self.ttl)
+                policy = limits.get('policy', self.policy)
+            except AttributeError as err:
+                raise ConfigError(
+                    f"cache_limits for {self.name} should be a mapping with "
+                    "any of max_size, max_bytes, ttl & policy.") from err
+
+        if policy not in POLICIES:
+            raise ConfigError(
+                f"cache policy for {self.name} is {policy}. It should be one "
+                f"of {', '.join(POLICIES)}.")
+
+        return max_size, max_bytes, ttl, policy
 
     def get(self, key, creator):
         """Get key from cache. If key not exist, call creator and cache result.
 
-        Looks for key in cache and returns object for that key.
+        Looks for key in cache and returns object for that key. A hit doesn't
+        lock, so hits never wait on a slow creator.
 
-        If key is not found, call creator and save the result to cache for that
-        key.
+        If key is not found, or it expired, call creator and save the result
+        to cache for that key. creator runs outside of the lock, so threads
+        that get different keys create them in parallel. Threads that get
+        the same key while its creator runs wait for that creator & get its
+        result, or its error, rather than running creator again.
 
-        Be warned that get happens under the context of a Lock. . . so if
-        creator takes a long time you might well be blocking.
+        If creator gets the same key from the same cache on the same thread,
+        the inner get runs creator without caching, rather than wait on
+        itself.
 
         If config no_cache is True, bypasses cache entirely - will call
         creator each time and also not save the result to cache.
@@ -51,13 +190,221 @@ def get(self, key, creator):
                          key)
             return creator()
 
+        obj = self._cache.get(key, _MISSING)
+        if obj is not _MISSING and not (self._expires
+                                        and self._is_expired(key)):
+            logger.debug("`%s` loading from cache", key)
+            # not under the lock, so concurrent hits can under-count.
+            self.hits += 1
+            if self._lru:
+                self._used.add(key)
+            return obj
+
+        return self._create(key, creator)
+
+    def _create(self, key, creator):
+        """Run creator for key once, no matter how many threads want it.
+
+        Args:
+            key: key (unique id) of cached item
+            creator: callable that will create cached object
+
+        Returns:
+            The cached item at key or the result of creator()
+        """
+        thread_id = threading.get_ident()
         with self._lock:
-            if key in self._cache:
+            # another thread might have added it since the lock-free look.
+            cache = self._cache
+            if key in cache and not (self._expires and self._expired(key)):
                 logger.debug("`%s` loading from cache", key)
-                obj = self._cache[key]
-            else:
-                logger.debug("`%s` not found in cache. . . creating", key)
-                obj = creator()
-                self._cache[key] = obj
+                self.hits += 1
+                if self._lru:
+                    self._used.add(key)
+                return cache[key]
+
+            loading = self._loading.get(key)
+            if loading is None:
+                future = Future()
+                self._loading[key] = (future, thread_id)
+                self.misses += 1
+
+        if loading is not None:
+            future, owner = loading
+            if owner == thread_id:
+                logger.debug("`%s` already creating on this thread. . . "
+                             "creating sans cache", key)
+                return creator()
+
+            logger.debug("`%s` creating on another thread. . . waiting", key)
+            return future.result()
 
+        logger.debug("`%s` not found in cache. . . creating", key)
+        try:
+            start = time.perf_counter()
+            obj = creator()
+            create_seconds = time.perf_counter() - start
+
+            limits = self.get_limits()
+            # estimate outside of the lock, since it walks the whole item.
+            size = getsizeof(key) + get_deep_size(obj) if limits[1] else None
+        except BaseException as err:
+            with self._lock:
+                del self._loading[key]
+
+            future.set_exception(err)
+            raise
+
+        with self._lock:
+            self.create_seconds += create_seconds
+            self._add(key, obj, limits, size)
+            del self._loading[key]
+
+        future.set_result(obj)
         return obj
+
+    def _is_expired(self, key):
+        """Check whether key outlived its ttl, without the lock.
+
+        Args:
+            key: key (unique id) of cached item
+
+        Returns:
+            bool: True if key expired.
+        """
+        expires = self._expires.get(key)
+        return expires is not None and time.monotonic() >= expires
+
+    def _expired(self, key):
+        """Drop key if it outlived its ttl. Call under the lock.
+
+        Args:
+            key: key (unique id) of cached item
+
+        Returns:
+            bool: True if key expired.
+        """
+        if not self._is_expired(key):
+            return False
+
+        logger.debug("`%s` expired", key)
+        self._drop(key)
+        self.expirations += 1
+        return True
+
+    def _add(self, key, obj, limits, size):
+        """Add obj at key & evict to stay within limits. Call under the lock.
+
+        Args:
+            key: key (unique id) of cached item
+            obj: the item
+            limits (tuple): (max_size, max_bytes, ttl, policy) from
+                get_limits().
+            size (int): Estimated bytes of key & obj. None if no max_bytes.
+        """
+        max_size, max_bytes, ttl, policy = limits
+        self._lru = policy == 'lru' and bool(max_size or max_bytes)
+
+        if size is not None and size > max_bytes:
+            logger.debug("`%s` is %s bytes, which is over max_bytes %s, "
+                         "so not caching it.", key, size, max_bytes)
+            return
+
+        cache = self._cache
+        # re-adding a key moves it to the end.
+        self._drop(key)
+
+        if ttl is not None:
+            now = time.monotonic()
+            if now >= self._next_sweep:
+                self._sweep(now)
+                self._next_sweep = now + ttl
+
+            self._expires[key] = now + ttl
+
+        cache[key] = obj
+        if size is not None:
+            self._sizes[key] = size
+            self._bytes += size
+
+        used = self._used
+        while ((max_size and len(cache) > max_size)
+               or (max_bytes and self._bytes > max_bytes)):
+            # dicts keep insertion order, so 1st key is the oldest.
+            oldest = next(iter(cache))
+            if self._lru and oldest in used:
+                # used since it last came round, so move it to the back.
+                used.discard(oldest)
+                cache[oldest] = cache.pop(oldest)
+                continue
+
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _sweep(self, now):
+        """Drop every expired item. Call under the lock.
+
+        Args:
+            now (float): time.monotonic() to compare expiry to.
+        """
+        expired = [key for key, expires in self._expires.items()
+                   if now >= expires]
+        for key in expired:
+            self._drop(key)
+
+        self.expirations += len(expired)
+
+    def _drop(self, key):
+        """Remove key & what the cache tracks about it. Call under the lock.
+
+        Args:
+            key: key (unique id) of cached item
+        """
+        self._cache.pop(key, None)
+        self._used.discard(key)
+        self._expires.pop(key, None)
+        size = self._sizes.pop(key, None)
+        if size:
+            self._bytes -= size
+
+    def get_stats(self):
+        """Get the usage statistics for this cache.
+
+        Reads the counters & a shallow snapshot of the entries under the
+        lock, then estimates memory from the snapshot outside of the lock, so
+        that get() doesn't wait on the walk. The estimate walks every cached
+        object, up to a bound, so it's relatively slow for large caches.
+        Don't call this in a hot loop.
+
+        Returns:
+            dict with keys: hits, misses, evictions, expirations, size,
+            max_size, max_bytes, ttl, policy, create_seconds, memory_bytes.
+        """
+        max_size, max_bytes, ttl, policy = self.get_limits()
+
+        with self._lock:
+            stats = {'hits': self.hits,
+                     'misses': self.misses,
+                     'evictions': self.evictions,
+                     'expirations': self.expirations,
+                     'size': len(self._cache),
+                     'max_size': max_size,
+                     'max_bytes': max_bytes,
+                     'ttl': ttl,
+                     'policy': policy,
+                     'create_seconds': self.create_seconds}
+            entries = list(self._cache.items())
+
+        stats['memory_bytes'] = self.get_memory_estimate(entries)
+        return stats
+
+    def get_memory_estimate(self, entries):
+        """Estimate the bytes the cached entries use.
+
+        Args:
+            entries (list[tuple]): (key, value) snapshot of the cache.
+
+        Returns:
+            int: Estimated size in bytes.
+        """
+        return get_deep_size(entries)
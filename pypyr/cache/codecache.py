@@ -0,0 +1,73 @@
+"""Global cache for compiled python expressions.
+
+Attributes:
+    pystring_code_cache: global instance of the compiled code cache for
+        PyString expressions. Use this attribute to access the cache from
+        elsewhere.
+"""
+import logging
+from sys import intern
+from pypyr.cache.cache import Cache
+
+logger = logging.getLogger(__name__)
+
+# pipelines have a finite number of distinct expressions, but the expression
+# source could be generated dynamically at run-time, so keep a cap on it.
+DEFAULT_MAX_SIZE = 2048
+
+
+class CodeCache(Cache):
+    """Cache of compiled code objects for python eval expressions.
+
+    Compiling the expression source once means that evaluating the same
+    expression repeatedly, like a !py in a while stop condition or in a
+    switch case inside a foreach, doesn't have to parse the source every
+    time.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, **kwargs):
+        """Initialize the code cache.
+
+        Args:
+            max_size (int): Maximum number of compiled expressions to keep.
+            kwargs: Other limits. See pypyr.cache.cache.Cache.
+        """
+        super().__init__(max_size=max_size, **kwargs)
+
+    def get_code(self, source):
+        """Get cached code object for source. Adds to cache if not exist.
+
+        A SyntaxError from compiling source does not go into the cache, and
+        reports the original source in its text attribute exactly as eval()
+        would.
+
+        Args:
+            source (str): Python expression to compile for eval().
+
+        Returns:
+            Code object for source, compiled in eval mode.
+        """
+        # source can be relatively long.
+        # interning means cache dict compare obj id rather than full str parse
+        interned_source = intern(source)
+        return self.get(interned_source,
+                        lambda: compile_expression(interned_source))
+
+
+# global instance of the cache. use this to access the cache from elsewhere.
+pystring_code_cache = CodeCache(name='pystring_code_cache')
+
+
+def compile_expression(source):
+    """Compile python expression source to a code object for eval().
+
+    Like eval() does for a str, strips leading spaces & tabs from source.
+
+    Args:
+        source (str): Python expression.
+
+    Returns:
+        Code object compiled in eval mode.
+    """
+    logger.debug("compiling expression: %s", source)
+    return compile(source.lstrip(' \t'), '<string>', 'eval')
@@ -2,11 +2,191 @@
 
 Map file path to file contents.
 
+By default a pipeline file loads once per process & never again, even if the
+file changes on disk. For long-lived processes that run the same pipelines
+over & over, set config.file_cache_revalidate_interval to a number of
+seconds. The cache then stats the file at most once per interval when you
+get it, and reloads it if its modified time, size or inode changed since it
+loaded. In between checks, get is a lock-free dict lookup.
+
+Each reload runs the on_reload hooks of the current run, see pypyr.hooks,
+& counts in get_stats.
+
 Attributes:
     file_cache: Global instance of the file loader cache.
                 Use this attribute to access the cache from elsewhere.
 """
+import logging
+import os
+import time
 
 from pypyr.cache.cache import Cache
+from pypyr.config import config
+from pypyr.hooks import get_run_hooks
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+
+def get_file_stamp(path):
+    """Get what identifies the current version of the file at path.
+
+    Args:
+        path (Path-like): The file.
+
+    Returns:
+        tuple: (mtime_ns, size, inode). None if the file doesn't stat.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class FileCache(Cache):
+    """Cache of objects loaded from files, keyed on file path.
+
+    With config.file_cache_revalidate_interval set, revalidates each entry
+    against its file at most once per interval. Otherwise works exactly like
+    Cache.
+
+    Attributes:
+        revalidations (int): Count of times the cache stat-ed a file to check
+            whether it changed.
+        reloads (int): Count of entries dropped because their file changed,
+            so that the next get loads the file again.
+    """
+
+    def __init__(self, **kwargs):
+        """Instantiate the cache.
+
+        Args:
+            kwargs: Limits. See pypyr.cache.cache.Cache.
+        """
+        super().__init__(**kwargs)
+        # key: (file stamp when loaded, time.monotonic() of next check)
+        self._checks = {}
+        self.revalidations = 0
+        self.reloads = 0
+
+    def clear(self):
+        """Clear the cache of all objects."""
+        super().clear()
+        with self._lock:
+            self._checks.clear()
+
+    def get(self, key, creator):
+        """Get key from cache. If key not exist, call creator and cache result.
+
+        If revalidation is on, first checks whether the file at key changed
+        since it loaded, if the interval since the last check is up. If it
+        changed, creator runs again.
+
+        Args:
+            key (str): Path of the file the cached item loads from.
+            creator: callable that will create cached object if key not found
+
+        Returns:
+            Cached item at key or the result of creator()
+        """
+        interval = config.file_cache_revalidate_interval
+        if interval is None or config.no_cache:
+            return super().get(key, creator)
+
+        self.revalidate(key, interval)
+
+        if key in self._cache:
+            return super().get(key, creator)
+
+        # stamp before creator reads the file, so that if the file changes
+        # while it loads, the next check sees the change.
+        stamp = get_file_stamp(key)
+        obj = super().get(key, creator)
+        self._checks[key] = (stamp, time.monotonic() + interval)
+        return obj
+
+    def is_current(self, key, obj):
+        """Check that obj is still the cached item for the file at key.
+
+        Revalidates key first if revalidation is on & the interval is up.
+
+        Args:
+            key (str): Path of the file the cached item loads from.
+            obj (Any): An item that get(key) returned earlier.
+
+        Returns:
+            bool: False if the file changed since obj loaded, so obj is out
+                of date. Always True if revalidation is off.
+        """
+        interval = config.file_cache_revalidate_interval
+        if interval is None or config.no_cache:
+            return True
+
+        self.revalidate(key, interval)
+        return self._cache.get(key) is obj
+
+    def revalidate(self, key, interval):
+        """Drop key if its file changed, if interval is up since last check.
+
+        Doesn't lock until it's time to check, so between checks this is
+        only a dict lookup.
+
+        Args:
+            key (str): Path of the file the cached item loads from.
+            interval (float): Seconds between checks.
+        """
+        check = self._checks.get(key)
+        if check is None:
+            return
+
+        now = time.monotonic()
+        if now < check[1]:
+            return
+
+        # stat outside of the lock, so a slow filesystem doesn't block gets
+        # of other files.
+        stamp = get_file_stamp(key)
+
+        with self._lock:
+            if self._checks.get(key) is not check:
+                # another thread checked or reloaded in the meantime.
+                return
+
+            self.revalidations += 1
+            if stamp is not None and stamp == check[0]:
+                self._checks[key] = (stamp, now + interval)
+                return
+
+            self._drop(key)
+            self.reloads += 1
+
+        reason = 'missing' if stamp is None else 'changed'
+        logger.info("%s %s on disk, so it will reload.", key, reason)
+        get_run_hooks().reload(key, reason)
+
+    def _drop(self, key):
+        """Remove key & its check. Call under the lock.
+
+        Args:
+            key (str): Path of the file the cached item loads from.
+        """
+        super()._drop(key)
+        self._checks.pop(key, None)
+
+    def get_stats(self):
+        """Get the usage statistics for this cache.
+
+        Returns:
+            dict. See pypyr.cache.cache.Cache.get_stats. Also has keys
+            revalidations & reloads.
+        """
+        stats = super().get_stats()
+        stats['revalidations'] = self.revalidations
+        stats['reloads'] = self.reloads
+        return stats
+
 
-file_cache = Cache()
+# global instance of the cache. use this to access the cache from elsewhere.
+file_cache = FileCache(name='file_cache')
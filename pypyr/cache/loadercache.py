@@ -6,12 +6,14 @@
 """
 from collections.abc import Mapping
 import logging
+from sys import getsizeof
 
 from pypyr.cache.cache import Cache
 from pypyr.config import config
 from pypyr.errors import PipelineDefinitionError
 import pypyr.moduleloader
 from pypyr.pipedef import PipelineDefinition, PipelineInfo
+from pypyr.stepgraph import validate_pipeline
 
 logger = logging.getLogger(__name__)
 
@@ -26,28 +28,44 @@ class Loader():
         name (str): Absolute module name of loader.
     """
 
-    __slots__ = ['name', '_get_pipeline_definition', '_pipeline_cache']
+    __slots__ = ['name', '_get_pipeline_definition', '_is_pipeline_current',
+                 '_pipeline_cache']
 
-    def __init__(self, name, get_pipeline_definition):
+    def __init__(self, name, get_pipeline_definition,
+                 is_pipeline_current=None):
         """Initialize the loader and its pipeline cache.
 
-        The expected function signature is:
+        The expected function signatures are:
         get_pipeline_definition(name: str,
                                 parent: any) -> PipelineDefinition | Mapping
+        is_pipeline_current(pipeline_definition: PipelineDefinition) -> bool
 
         Args:
             name: Absolute name of loader
             get_pipeline_definition: Reference to the function to call when
                 loading a pipeline with this Loader.
+            is_pipeline_current: Reference to the function to call on each
+                cache hit to check whether the cached pipeline is still up to
+                date. If it returns False, the pipeline loads again. Default
+                None means cached pipelines never go out of date.
         """
         self.name = name
         self._get_pipeline_definition = get_pipeline_definition
-        self._pipeline_cache = Cache()
+        self._is_pipeline_current = is_pipeline_current
+        self._pipeline_cache = Cache(name='loader_pipelines')
 
     def clear(self):
         """Clear all the pipelines in this Loader's cache."""
         self._pipeline_cache.clear()
 
+    def get_stats(self):
+        """Get the usage statistics of this Loader's pipeline cache.
+
+        Returns:
+            dict. See pypyr.cache.cache.Cache.get_stats.
+        """
+        return self._pipeline_cache.get_stats()
+
     def get_pipeline(self, name, parent):
         """Get cached PipelineDefinition. Adds it to cache if it doesn't exist.
 
@@ -67,10 +85,22 @@ def get_pipeline(self, name, parent):
         """
         # str keys perform better than tuples in dicts
         normalized_name = f'{parent}+{name}' if parent else name
-        return self._pipeline_cache.get(
+        pipeline_definition = self._pipeline_cache.get(
             normalized_name,
             lambda: self._load_pipeline(name, parent))
 
+        is_pipeline_current = self._is_pipeline_current
+        if is_pipeline_current and not is_pipeline_current(
+                pipeline_definition):
+            logger.debug("%s out of date, so loading it again.",
+                         normalized_name)
+            self._pipeline_cache.remove(normalized_name)
+            pipeline_definition = self._pipeline_cache.get(
+                normalized_name,
+                lambda: self._load_pipeline(name, parent))
+
+        return pipeline_definition
+
     def _load_pipeline(self, name, parent):
         """Execute get_pipeline_definition(name, parent) for this loader.
 
@@ -116,6 +146,9 @@ def _load_pipeline(self, name, parent):
                 "    in:\n"
                 "      echoMe: this is a bare bones pipeline example.\n")
 
+        # fail on a broken needs before the pipeline starts running.
+        validate_pipeline(pipeline_definition.pipeline)
+
         logger.debug("done")
         return pipeline_definition
 
@@ -173,9 +206,41 @@ def clear_pipes(self, loader_name=None):
             for _, loader in self._cache.items():
                 loader.clear()
 
+    def get_stats(self):
+        """Get the usage statistics for this cache & each loader's pipelines.
+
+        memory_bytes only counts the loaders themselves. Each loader's
+        pipelines count once, in its own pipelines stats.
+
+        Returns:
+            dict. See pypyr.cache.cache.Cache.get_stats. Also has key
+            pipelines, where the value is a dict of loader name: the usage
+            statistics of that loader's pipeline cache.
+        """
+        stats = super().get_stats()
+
+        with self._lock:
+            loaders = list(self._cache.items())
+
+        stats['pipelines'] = {name: loader.get_stats()
+                              for name, loader in loaders}
+        return stats
+
+    def get_memory_estimate(self, entries):
+        """Estimate the bytes of the loaders, without their pipelines.
+
+        Args:
+            entries (list[tuple]): (loader name, Loader) snapshot.
+
+        Returns:
+            int: Estimated size in bytes.
+        """
+        return getsizeof(entries) + sum(getsizeof(name) + getsizeof(loader)
+                                        for name, loader in entries)
+
 
 # global instance of the cache. use this to access the cache from elsewhere.
-loader_cache = LoaderCache()
+loader_cache = LoaderCache(name='loader_cache')
 
 
 def load_the_loader(loader_name):
@@ -184,8 +249,11 @@ def load_the_loader(loader_name):
     Args:
         loader_name: string: name of module to load
 
+    Also gets the optional is_pipeline_current function of the module, if
+    it has one.
+
     Returns:
-        function: the get_pipeline_definition function in the module
+        Loader: Wraps the get_pipeline_definition function in the module.
     """
     logger.debug("starting")
 
@@ -203,6 +271,8 @@ def load_the_loader(loader_name):
         )
         raise
 
-    loader = Loader(loader_name, get_pipeline_definition)
+    loader = Loader(loader_name,
+                    get_pipeline_definition,
+                    getattr(loader_module, 'is_pipeline_current', None))
     logger.debug("%s done", loader_module)
     return loader
@@ -44,4 +44,5 @@ def get_namespace(self, source):
 
 
 # global instance of the cache. use this to access the cache from elsewhere.
-pystring_namespace_cache = NamespaceCache()
+pystring_namespace_cache = NamespaceCache(
+    name='pystring_namespace_cache')
@@ -37,7 +37,7 @@ def get_context_parser(self, parser_module_name):
 
 
 # global instance of the cache. use this to access the cache from elsewhere.
-contextparser_cache = ContextParserCache()
+contextparser_cache = ContextParserCache(name='contextparser_cache')
 
 
 def load_the_parser(parser_module_name):
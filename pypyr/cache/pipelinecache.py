@@ -0,0 +1,290 @@
+"""Global on-disk cache of parsed pipelines for the file loader.
+
+Parsing a big pipeline with the pure-python round-trip yaml loader takes a
+while, and every new pypyr process parses its pipelines from scratch. With
+config.pipeline_cache on, the file loader saves each PipelineDefinition it
+parses to disk, so the next process that loads the same, unchanged file
+unpickles it instead.
+
+The pickle keeps everything the yaml loader made: the line numbers of the
+steps, the custom tags like !py, !sic & !jsonify and the flags that say
+which parts of the pipeline have nothing to format.
+
+Each pipeline file has one entry, named for a hash of its resolved path. The
+entry is only valid for the exact file it came from & the software that
+made it, so it starts with a stamp of:
+    - the file's modified time in nanoseconds, size & inode.
+    - the pypyr, ruamel.yaml & python versions.
+
+If any of these differ, the entry is stale & the loader parses the file
+again, which overwrites the entry.
+
+A file that changed within the last couple of seconds doesn't save, because
+an edit that fast might not change the modified time or size. It saves the
+next time it loads.
+
+Attributes:
+    pipeline_cache: Global instance of the pipeline cache.
+                    Use this attribute to access the cache from elsewhere.
+"""
+import hashlib
+import logging
+import os
+from pathlib import Path
+import pickle
+import sys
+import tempfile
+import threading
+import time
+
+import ruamel.yaml
+
+from pypyr import __version__
+from pypyr.config import config
+import pypyr.platform
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# files modified more recently than this many seconds ago don't save.
+MIN_AGE_SECONDS = 2
+
+# bump when what the entries hold changes.
+_FORMAT = 1
+
+
+def get_version_stamp():
+    """Get the versions an entry depends on.
+
+    Returns:
+        tuple: (entry format, pypyr version, ruamel.yaml version, python
+            major.minor).
+    """
+    return (_FORMAT,
+            __version__,
+            ruamel.yaml.__version__,
+            tuple(sys.version_info[:2]))
+
+
+class PipelineCache():
+    """Thread-safe on-disk store of parsed pipelines.
+
+    If config.pipeline_cache is False or config.no_cache is True, get_stamp
+    returns None, so get finds nothing & set saves nothing.
+
+    Attributes:
+        hits (int): Count of get() calls that found a current pipeline.
+        misses (int): Count of get() calls that found nothing, or only a
+            stale pipeline.
+    """
+
+    suffix = '.pickle'
+
+    def __init__(self, path=None):
+        """Instantiate the cache.
+
+        Args:
+            path (Path-like): Directory in which to save pipelines. Default
+                None means 'pipelinecache' in the pypyr user data dir.
+        """
+        self._lock = threading.Lock()
+        self._path = Path(path) if path else None
+        self._version_stamp = get_version_stamp()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def path(self):
+        """Get the directory that holds the cached pipelines.
+
+        Uses the user data dir from config.platform_paths. If config.init()
+        did not run, calculates the platform's user data dir.
+
+        Returns:
+            Path: The directory. It might not exist yet.
+        """
+        if self._path is None:
+            platform_paths = config.platform_paths
+            if platform_paths is None:
+                platform_paths = pypyr.platform.get_platform_paths(
+                    'pypyr', 'config.yaml')
+
+            self._path = platform_paths.data_dir_user.joinpath(
+                'pipelinecache')
+
+        return self._path
+
+    def clear(self):
+        """Remove all pipelines from the cache."""
+        with self._lock:
+            for path in self._get_entries():
+                path.unlink(missing_ok=True)
+
+    def get_stamp(self, pipeline_path):
+        """Get what identifies the current version of the pipeline file.
+
+        Get this before reading the file, so that if the file changes while
+        it loads, the stamp is already stale.
+
+        Args:
+            pipeline_path (Path): Resolved path to the pipeline yaml.
+
+        Returns:
+            tuple: (mtime_ns, size, inode, version stamp). None if the cache
+                is off or the file can't stat.
+        """
+        if config.no_cache or not config.pipeline_cache:
+            return None
+
+        try:
+            stat = os.stat(pipeline_path)
+        except OSError:
+            return None
+
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino,
+                self._version_stamp)
+
+    def get(self, pipeline_path, stamp):
+        """Get the cached PipelineDefinition for pipeline_path.
+
+        Args:
+            pipeline_path (Path): Resolved path to the pipeline yaml.
+            stamp (tuple): From get_stamp(). None means don't look.
+
+        Returns:
+            PipelineDefinition, or None if there is no current one.
+        """
+        if stamp is None:
+            return None
+
+        path = self._get_entry_path(pipeline_path)
+        with self._lock:
+            try:
+                with open(path, 'rb') as file:
+                    # stamp loads on its own, so a stale entry doesn't have
+                    # to unpickle the pipeline.
+                    if pickle.load(file) != stamp:
+                        logger.debug("%s stale in pipeline cache.",
+                                     pipeline_path)
+                        self.misses += 1
+                        return None
+
+                    pipeline_definition = pickle.load(file)
+            except FileNotFoundError:
+                logger.debug("%s not found in pipeline cache.", pipeline_path)
+                self.misses += 1
+                return None
+            except Exception as err:
+                # corrupt or from an incompatible install - ditch it.
+                logger.debug("%s unreadable in pipeline cache: %s",
+                             pipeline_path, err)
+                path.unlink(missing_ok=True)
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+        logger.debug("%s loading from pipeline cache.", pipeline_path)
+        return pipeline_definition
+
+    def set(self, pipeline_path, stamp, pipeline_definition):
+        """Save pipeline_definition for pipeline_path.
+
+        Args:
+            pipeline_path (Path): Resolved path to the pipeline yaml.
+            stamp (tuple): From get_stamp() before the file loaded. None
+                means don't save.
+            pipeline_definition (PipelineDefinition): Parsed pipeline.
+
+        Returns:
+            bool: True if saved.
+        """
+        if stamp is None:
+            return False
+
+        # stamp[0] is mtime_ns.
+        if time.time_ns() - stamp[0] < MIN_AGE_SECONDS * 1_000_000_000:
+            logger.debug("%s changed too recently for the pipeline cache.",
+                         pipeline_path)
+            return False
+
+        try:
+            stamp_pickle = pickle.dumps(stamp, pickle.HIGHEST_PROTOCOL)
+            body_pickle = pickle.dumps(pipeline_definition,
+                                       pickle.HIGHEST_PROTOCOL)
+        except Exception as err:
+            logger.debug("%s doesn't pickle, so not caching it: %s",
+                         pipeline_path, err)
+            return False
+
+        path = self._get_entry_path(pipeline_path)
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+            # write to temp & rename, so a reader never sees a partial file.
+            fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as file:
+                    file.write(stamp_pickle)
+                    file.write(body_pickle)
+
+                os.replace(temp_path, path)
+            except BaseException:
+                Path(temp_path).unlink(missing_ok=True)
+                raise
+
+        logger.debug("%s saved to pipeline cache.", pipeline_path)
+        return True
+
+    def get_stats(self):
+        """Get the usage statistics for this cache.
+
+        The pipelines are on disk, so memory_bytes is their total size on
+        disk.
+
+        Returns:
+            dict with keys: hits, misses, size, memory_bytes.
+        """
+        with self._lock:
+            entries = self._get_entries()
+            stats = {'hits': self.hits,
+                     'misses': self.misses,
+                     'size': len(entries)}
+
+        total = 0
+        for path in entries:
+            try:
+                total += path.stat().st_size
+            except FileNotFoundError:
+                pass
+
+        stats['memory_bytes'] = total
+        return stats
+
+    def _get_entry_path(self, pipeline_path):
+        """Get the path of the entry for pipeline_path.
+
+        Args:
+            pipeline_path (Path): Resolved path to the pipeline yaml.
+
+        Returns:
+            Path: The entry in the cache dir.
+        """
+        name = hashlib.sha256(os.fsencode(pipeline_path)).hexdigest()
+        return self.path.joinpath(name + self.suffix)
+
+    def _get_entries(self):
+        """Get the paths to all the pipelines in the cache.
+
+        Returns:
+            list[Path]: Entry files. Empty if the cache dir doesn't exist.
+        """
+        try:
+            return [path for path in self.path.iterdir()
+                    if path.suffix == self.suffix]
+        except FileNotFoundError:
+            return []
+
+
+# global instance of the cache. use this to access the cache from elsewhere.
+pipeline_cache = PipelineCache()
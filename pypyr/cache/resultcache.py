@@ -0,0 +1,303 @@
+"""Global on-disk cache of step results for the cache step decorator.
+
+Attributes:
+    step_result_cache: Global instance of the step result cache.
+                       Use this attribute to access the cache from elsewhere.
+"""
+import logging
+import os
+from pathlib import Path
+import pickle
+import tempfile
+import threading
+import time
+
+from pypyr.config import config
+import pypyr.platform
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+
+class StepResultCache():
+    """Thread-safe on-disk store of step results.
+
+    Each result is a pickle file named for its key in path. The file's
+    modified time is when the result was last written or read, so that size
+    eviction removes the least recently used results first.
+
+    The cache keeps a running total of the size of the results, so that set
+    only has to list the directory when the total goes over max_bytes. The
+    total starts from one scan of the directory the first time it's needed.
+    Other processes that share the directory don't update the total, so it
+    only catches up with them when it goes over max_bytes & evicts.
+
+    If config no_cache is True, get never finds anything & set saves nothing.
+
+    Attributes:
+        hits (int): Count of get() calls that found a current result.
+        misses (int): Count of get() calls that found nothing, or only an
+            expired result.
+        evictions (int): Count of results removed for ttl or max_bytes.
+        create_seconds (float): Total wall-clock seconds the steps took to
+            make the results saved with set().
+    """
+
+    suffix = '.pickle'
+
+    def __init__(self, path=None):
+        """Instantiate the cache.
+
+        Args:
+            path (Path-like): Directory in which to save results. Default None
+                means 'stepcache' in the pypyr user data dir.
+        """
+        self._lock = threading.Lock()
+        self._path = Path(path) if path else None
+        # key: size in bytes of its file. None until the 1st scan.
+        self._sizes = None
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.create_seconds = 0.0
+
+    @property
+    def path(self):
+        """Get the directory that holds the cached results.
+
+        Uses the user data dir from config.platform_paths. If config.init()
+        did not run, calculates the platform's user data dir.
+
+        Returns:
+            Path: The directory. It might not exist yet.
+        """
+        if self._path is None:
+            platform_paths = config.platform_paths
+            if platform_paths is None:
+                platform_paths = pypyr.platform.get_platform_paths(
+                    'pypyr', 'config.yaml')
+
+            self._path = platform_paths.data_dir_user.joinpath('stepcache')
+
+        return self._path
+
+    def clear(self):
+        """Remove all results from the cache."""
+        with self._lock:
+            for path in self._get_entries():
+                path.unlink(missing_ok=True)
+
+            self._sizes = None
+            self._bytes = 0
+
+    def get(self, key, ttl=None):
+        """Get the cached result for key.
+
+        Args:
+            key (str): Unique id of the result. Must be valid as a file name.
+            ttl (float): Results older than this many seconds are expired.
+                None means results never expire.
+
+        Returns:
+            The cached result, or None if there is no current result for key.
+        """
+        if config.no_cache:
+            logger.debug("no cache mode enabled. not getting `%s`", key)
+            return None
+
+        path = self.path.joinpath(key + self.suffix)
+        with self._lock:
+            try:
+                with open(path, 'rb') as file:
+                    created, result = pickle.load(file)
+            except FileNotFoundError:
+                logger.debug("`%s` not found in step result cache.", key)
+                self.misses += 1
+                return None
+            except Exception as err:
+                # corrupt or from an incompatible python - ditch it.
+                logger.debug("`%s` unreadable in step result cache: %s",
+                             key, err)
+                path.unlink(missing_ok=True)
+                self._forget(key)
+                self.misses += 1
+                return None
+
+            if ttl is not None and time.time() - created > ttl:
+                logger.debug("`%s` expired in step result cache.", key)
+                path.unlink(missing_ok=True)
+                self._forget(key)
+                self.misses += 1
+                self.evictions += 1
+                return None
+
+            # mark as recently used for size eviction.
+            os.utime(path)
+            self.hits += 1
+
+        logger.debug("`%s` loading from step result cache.", key)
+        return result
+
+    def set(self, key, result, create_seconds=0.0):
+        """Save result for key, then evict down to config.step_cache_max_bytes.
+
+        Args:
+            key (str): Unique id of the result. Must be valid as a file name.
+            result (any): Picklable result to save.
+            create_seconds (float): How long it took to make result, for the
+                usage statistics.
+
+        Returns:
+            bool: True if saved. False if result doesn't pickle.
+        """
+        if config.no_cache:
+            logger.debug("no cache mode enabled. not saving `%s`", key)
+            return False
+
+        try:
+            payload = pickle.dumps((time.time(), result))
+        except Exception as err:
+            logger.warning("can't save step result to cache, because it "
+                           "doesn't pickle: %s", err)
+            return False
+
+        cache_dir = self.path
+        with self._lock:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            # write to temp & rename, so a reader never sees a partial file.
+            fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as file:
+                    file.write(payload)
+
+                os.replace(temp_path, cache_dir.joinpath(key + self.suffix))
+            except BaseException:
+                Path(temp_path).unlink(missing_ok=True)
+                raise
+
+            self.create_seconds += create_seconds
+
+            max_bytes = config.step_cache_max_bytes
+            if max_bytes:
+                sizes = self._get_sizes()
+                self._bytes += len(payload) - sizes.get(key, 0)
+                sizes[key] = len(payload)
+
+                if self._bytes > max_bytes:
+                    self._evict(max_bytes)
+
+        logger.debug("`%s` saved to step result cache.", key)
+        return True
+
+    def get_stats(self):
+        """Get the usage statistics for this cache.
+
+        The results are on disk, so memory_bytes is their total size on disk.
+
+        Returns:
+            dict with keys: hits, misses, evictions, size, max_bytes,
+            create_seconds, memory_bytes.
+        """
+        with self._lock:
+            entries = self._get_entries()
+            stats = {'hits': self.hits,
+                     'misses': self.misses,
+                     'evictions': self.evictions,
+                     'size': len(entries),
+                     'max_bytes': config.step_cache_max_bytes,
+                     'create_seconds': self.create_seconds}
+
+        total = 0
+        for path in entries:
+            try:
+                total += path.stat().st_size
+            except FileNotFoundError:
+                pass
+
+        stats['memory_bytes'] = total
+        return stats
+
+    def _evict(self, max_bytes):
+        """Remove least recently used results until under max_bytes.
+
+        Lists & stats every result, since the files' modified times say
+        which to remove first, then resets the running total from what's
+        left. Call this while holding the lock.
+
+        Args:
+            max_bytes (int): Maximum total size of all results.
+        """
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        sizes = {path.stem: size for _, size, path in entries}
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+
+            path.unlink(missing_ok=True)
+            del sizes[path.stem]
+            total -= size
+            self.evictions += 1
+            logger.debug("evicted %s from step result cache.", path.name)
+
+        self._sizes = sizes
+        self._bytes = total
+
+    def _forget(self, key):
+        """Take key's result out of the running total. Call under the lock.
+
+        Args:
+            key (str): Unique id of the result.
+        """
+        if self._sizes is not None:
+            self._bytes -= self._sizes.pop(key, 0)
+
+    def _get_sizes(self):
+        """Get the size of each result, scanning the dir the 1st time.
+
+        Call this while holding the lock.
+
+        Returns:
+            dict: key: size in bytes of its file.
+        """
+        if self._sizes is None:
+            self._sizes = {path.stem: size for _, size, path in self._scan()}
+            self._bytes = sum(self._sizes.values())
+
+        return self._sizes
+
+    def _scan(self):
+        """Stat all the results in the cache.
+
+        Returns:
+            list[tuple]: (mtime, size, path) of each result file.
+        """
+        entries = []
+        for path in self._get_entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        return entries
+
+    def _get_entries(self):
+        """Get the paths to all the results in the cache.
+
+        Returns:
+            list[Path]: Result files. Empty if the cache dir doesn't exist.
+        """
+        try:
+            return [path for path in self.path.iterdir()
+                    if path.suffix == self.suffix]
+        except FileNotFoundError:
+            return []
+
+
+# global instance of the cache. use this to access the cache from elsewhere.
+step_result_cache = StepResultCache()
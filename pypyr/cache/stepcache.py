@@ -35,7 +35,7 @@ def get_step(self, step_name):
 
 
 # global instance of the cache. use this to access the cache from elsewhere.
-step_cache = StepCache()
+step_cache = StepCache(name='step_cache')
 
 
 def load_the_step(step_name):
@@ -11,6 +11,7 @@
 from pypyr.config import config
 import pypyr.log.logger
 import pypyr.pipelinerunner
+import pypyr.sampler
 import pypyr.version
 
 
@@ -38,7 +39,16 @@ def main(args=None):
             groups=parsed_args.groups,
             success_group=parsed_args.success_group,
             failure_group=parsed_args.failure_group,
-            py_dir=parsed_args.py_dir)
+            py_dir=parsed_args.py_dir,
+            parallel_groups=parsed_args.parallel_groups,
+            trace_path=parsed_args.trace_path,
+            profile=parsed_args.profile,
+            profile_path=parsed_args.profile_path,
+            metrics_path=parsed_args.metrics_path,
+            cache_stats_path=parsed_args.cache_stats_path,
+            memory_report_path=parsed_args.memory_report_path,
+            sample_path=parsed_args.sample_path,
+            sample_rate=parsed_args.sample_rate)
 
     except KeyboardInterrupt:
         # Shell standard is 128 + signum = 130 (SIGINT = 2)
@@ -92,6 +102,13 @@ def get_parser():
                             'separate groups from the pipeline name, e.g\n'
                             'pypyr --groups group1 group2 -- pipename context')
                         )
+    parser.add_argument('--parallel', dest='parallel_groups',
+                        action='store_true',
+                        help=wrap(
+                            'Run --groups at the same time rather than one '
+                            'after the other.\n'
+                            '--success or --failure runs once all groups '
+                            'are done.'))
     parser.add_argument('--success', dest='success_group', default=None,
                         help=wrap(
                             'Step-Group to run on successful completion of '
@@ -121,6 +138,49 @@ def get_parser():
     parser.add_argument('--logpath', dest='log_path',
                         help=wrap(
                             'Log-file path. Append log output to this path.'))
+    parser.add_argument('--trace', dest='trace_path',
+                        help=wrap(
+                            'Save how long each pipeline, step-group, step, '
+                            'loop iteration & subprocess took to this path.\n'
+                            'Open the file in chrome://tracing or '
+                            'https://ui.perfetto.dev'))
+    parser.add_argument('--profile', dest='profile',
+                        action='store_true',
+                        help=wrap(
+                            'Profile the pipeline & show the steps that '
+                            'spend the most cpu time.'))
+    parser.add_argument('--profile-out', dest='profile_path',
+                        help=wrap(
+                            'Profile the pipeline, also under cProfile, & '
+                            'save the raw cProfile stats to this path.'))
+    parser.add_argument('--sample-out', dest='sample_path',
+                        help=wrap(
+                            'Sample the call stacks of the running steps & '
+                            'save them to this path in collapsed stack '
+                            'format, for flamegraph.pl. Lower overhead than '
+                            '--profile.'))
+    parser.add_argument('--sample-rate', dest='sample_rate',
+                        type=float,
+                        default=pypyr.sampler.DEFAULT_RATE,
+                        help=wrap(
+                            'Samples per second for --sample-out. Defaults '
+                            f'to {pypyr.sampler.DEFAULT_RATE}.'))
+    parser.add_argument('--metrics-file', dest='metrics_path',
+                        help=wrap(
+                            'Save Prometheus metrics of the run to this '
+                            'path, for the node_exporter textfile '
+                            'collector.'))
+    parser.add_argument('--cache-stats', dest='cache_stats_path',
+                        help=wrap(
+                            'Save hits, misses, creation time, size & '
+                            'estimated memory of the pypyr caches to this '
+                            'path as json once the run is done.'))
+    parser.add_argument('--memory-report', dest='memory_report_path',
+                        help=wrap(
+                            'Measure the size of each context key after '
+                            'every step. Save the largest keys & the steps '
+                            'that grew them to this path as json. Slows '
+                            'down the run.'))
     parser.add_argument('--version', action='version',
                         help='Echo version number.',
                         version=f'{pypyr.version.get_version()}')
@@ -60,11 +60,49 @@ class Config():
                                'on_success'.
         default_failure_group: str. Name of step group to run on failure -
                                'on_failure'.
+        default_group_conflict: str. How to merge context keys that more than
+            one group sets when groups run in parallel - 'last'. 'last' means
+            the group later in groups wins, 'first' means the group earlier
+            in groups wins, 'error' raises an error.
+        default_needs_max: int. Maximum number of steps to run at the same
+            time in a step-group that uses needs. None means the
+            ThreadPoolExecutor default.
+        loop_progress_interval: float. Seconds between throughput & ETA
+            reports of long foreach & while loops - 10. 0 or None means
+            don't report. See pypyr.progress.
+        hooks: list[str]. Lifecycle hooks to load by name, as
+            'package.module.attribute'. See pypyr.hooks.
+        metrics_path: str. Save Prometheus metrics of every run to this path.
+            None means don't save. See pypyr.metrics.
         shortcuts: dict. Pipeline run instructions with their inputs.
             Set by init().
         vars: dict. User provided variables to write into the pypyr context.
             Set by init().
         no_cache: bool. Default False. Bypass all pypyr caches entirely.
+        fast_yaml: bool. Default False. Load pipelines with the fast yaml
+            parser, which uses the libyaml C parser if available. Quicker &
+            uses less memory than the round-trip parser, but drops comments.
+            See pypyr.yaml.get_yaml_parser_fast.
+        pipeline_cache: bool. Default False. Save parsed pipelines on disk, so
+            that later runs don't have to parse unchanged pipeline files
+            again. See pypyr.cache.pipelinecache.
+        cache_limits: dict. Limits of the in-memory caches, by cache name, as
+            {name: {max_size: int, max_bytes: int, ttl: float,
+                    policy: lru | fifo}}.
+            Any limit you leave out uses the cache's own default. The names
+            are the keys of pypyr.cache.admin.stats(), plus loader_pipelines
+            for each loader's cache of pipelines. Bounds file_cache,
+            loader_cache, loader_pipelines & pystring_namespace_cache by
+            default. Setting a cache here replaces its default limits. See
+            pypyr.cache.cache.Cache.
+        file_cache_revalidate_interval: float. Seconds between checks of
+            whether a cached pipeline file changed on disk, so that it
+            reloads. 0 means check every time. None means never check, so a
+            pipeline file loads once per process. Default None. See
+            pypyr.cache.filecache.
+        step_cache_max_bytes: int. Maximum total size of the step results the
+            cache step decorator saves on disk. Evicts the least recently used
+            results once over. None means unbounded. Default 100MB.
         platform_paths: pypyr.platform.PlatformPaths: O/S specific paths to
             config files & data dirs. Set by init().
         pyproject_toml: dict. The pyproject.toml file as a dict in a full.
@@ -91,12 +129,24 @@ class Config():
         'default_group',
         'default_success_group',
         'default_failure_group',
+        'default_group_conflict',
+        'default_needs_max',
         # flags
         'no_cache',
+        'fast_yaml',
+        # caches
+        'cache_limits',
+        'file_cache_revalidate_interval',
+        'pipeline_cache',
+        'step_cache_max_bytes',
+        # reporting
+        'loop_progress_interval',
         # functional
+        'hooks',
+        'metrics_path',
         'shortcuts',
         'vars'}
-    dict_props = {'shortcuts', 'vars'}
+    dict_props = {'cache_limits', 'shortcuts', 'vars'}
     scalar_props = all_writable_props - dict_props
 
     def __init__(self) -> None:
@@ -127,12 +177,32 @@ def __init__(self) -> None:
         self.default_group = 'steps'
         self.default_success_group = 'on_success'
         self.default_failure_group = 'on_failure'
+        self.default_group_conflict = 'last'
+        self.default_needs_max: int | None = None
 
         # flags
         self.no_cache: bool = cast_str_to_bool(os.getenv('PYPYR_NO_CACHE',
                                                          '0'))
+        self.fast_yaml: bool = cast_str_to_bool(os.getenv('PYPYR_FAST_YAML',
+                                                          '0'))
+
+        # caches
+        self.cache_limits: dict = {
+            'file_cache': {'max_size': 1024},
+            'loader_cache': {'max_size': 128},
+            'loader_pipelines': {'max_size': 1024},
+            'pystring_namespace_cache': {'max_size': 4096}}
+        self.file_cache_revalidate_interval: float | None = None
+        self.pipeline_cache: bool = cast_str_to_bool(
+            os.getenv('PYPYR_PIPELINE_CACHE', '0'))
+        self.step_cache_max_bytes: int | None = 100 * 1024 * 1024
+
+        # reporting
+        self.loop_progress_interval: float | None = 10.0
 
         # functional
+        self.hooks: list[str] = []
+        self.metrics_path: str | None = None
         self.shortcuts: dict = {}
         self.vars: dict = {}
 
@@ -4,6 +4,7 @@
 from contextlib import contextmanager
 import logging
 
+from pypyr.cache.codecache import pystring_code_cache
 from pypyr.dsl import SpecialTagDirective
 from pypyr.errors import (ContextError,
                           KeyInContextHasNoValueError,
@@ -279,13 +280,17 @@ def get_eval_string(self, input_string):
 
         Both __builtins__ and context are available to the eval expression.
 
+        The compiled expression caches in pystring_code_cache, so repeat
+        evaluations of the same expression only compile once.
+
         Args: input_string: expression to evaluate.
 
         Returns: Whatever object results from the string expression valuation.
 
         """
         if input_string:
-            return eval(input_string, self._pystring_namespace)
+            return eval(pystring_code_cache.get_code(input_string),
+                        self._pystring_namespace)
         else:
             # Empty input raises cryptic EOF syntax err, this more human
             # friendly
@@ -646,6 +651,96 @@ def is_in_pipeline_scope(self):
 
     # endregion pipeline_scope
 
+    def get_scoped_copy(self):
+        """Get a shallow copy of context to run steps in isolation.
+
+        The copy has its own top-level keys, so setting or removing a key on
+        the copy does not touch this context. Values are the same objects as
+        in this context, so mutating a value in place does show up in both.
+
+        The exception is runErrors, where the copy gets its own list, so that
+        errors in the copy don't append to this context's runErrors.
+
+        The copy shares the pipeline call-chain & a copy of the pystring
+        globals with this context. Use this for something like an iteration of
+        a parallel loop, where each iteration needs its own view of context.
+
+        Use get_scoped_changes & merge_scoped_changes to get the results from
+        the copy back into context.
+
+        Returns:
+            pypyr.context.Context: New context instance.
+        """
+        scoped = self.__class__(self)
+        if 'runErrors' in self:
+            scoped['runErrors'] = list(self['runErrors'])
+
+        scoped._pystring_globals.update(self._pystring_globals)
+        scoped._stack = self._stack.copy()
+        scoped.current_pipeline = self.current_pipeline
+        return scoped
+
+    def get_scoped_changes(self, scoped, keys=None, ignore=()):
+        """Get the top-level changes in scoped since it copied from this.
+
+        Call this on the context instance that scoped copied from with
+        get_scoped_copy, as it was when it made the copy.
+
+        Args:
+            scoped (pypyr.context.Context): The scoped copy.
+            keys (list): Only get these keys. Always gets them if they exist
+                in scoped, even if unchanged, since the value might have
+                mutated in place. None means get all changed keys.
+            ignore (Iterable): Never get these keys.
+
+        Returns:
+            tuple (updates, removed, run_errors). updates is a dict of keys
+            set or changed in scoped, or of all the keys if keys is set.
+            removed is a list of keys removed from scoped. run_errors is a
+            list of the runErrors added to scoped.
+        """
+        start = len(self.get('runErrors', ()))
+        run_errors = scoped.get('runErrors', [])[start:]
+
+        updates = {}
+        if keys is None:
+            for key, value in scoped.items():
+                if key == 'runErrors' or key in ignore:
+                    continue
+
+                if key not in self or self[key] is not value:
+                    updates[key] = value
+        else:
+            for key in keys:
+                if (key != 'runErrors' and key not in ignore
+                        and key in scoped):
+                    updates[key] = scoped[key]
+
+        removed = [key for key in (self if keys is None else keys)
+                   if key in self and key not in scoped
+                   and key != 'runErrors' and key not in ignore]
+
+        return updates, removed, run_errors
+
+    def merge_scoped_changes(self, changes):
+        """Apply changes from get_scoped_changes to this context.
+
+        Updates & removes the changed keys. Appends the new run errors to
+        runErrors.
+
+        Args:
+            changes (tuple): (updates, removed, run_errors) from
+                get_scoped_changes.
+        """
+        updates, removed, run_errors = changes
+        self.update(updates)
+
+        for key in removed:
+            self.pop(key, None)
+
+        if run_errors:
+            self.setdefault('runErrors', []).extend(run_errors)
+
     # region pystring global namespace
     def pystring_globals_clear(self):
         """Clear the pystring globals namespace."""
@@ -1,12 +1,27 @@
 """pypyr pipeline yaml definition classes - domain specific language."""
+import atexit
+from concurrent.futures import (FIRST_COMPLETED,
+                                ProcessPoolExecutor,
+                                ThreadPoolExecutor,
+                                wait)
+from concurrent.futures.process import BrokenProcessPool
+from contextvars import copy_context
+import hashlib
 import json
 import logging
+import multiprocessing
+import os
+import pickle
+import sys
+import threading
+import time
 
 from ruamel.yaml.comments import CommentedMap, CommentedSeq
 from ruamel.yaml.nodes import ScalarNode
 
 from pypyr.cache.stepcache import step_cache
 from pypyr.cache.backoffcache import backoff_cache
+from pypyr.cache.resultcache import step_result_cache
 from pypyr.config import config
 from pypyr.errors import (Call,
                           ControlOfFlowInstruction,
@@ -15,6 +30,11 @@
                           LoopMaxExhaustedError,
                           PipelineDefinitionError,
                           Stop)
+from pypyr.formatting import unmark_constants
+from pypyr.hooks import get_run_hooks
+from pypyr.profiler import profiler
+from pypyr.progress import get_loop_progress, get_total
+from pypyr.trace import tracer
 from pypyr.utils import poll
 
 # use pypyr logger to ensure loglevel is set correctly
@@ -255,17 +275,30 @@ class Step:
         name: (string) this is the step-name. equivalent to the module name of
               of the step. this module is the one dynamically loaded to
               the module attribute.
+        cache_decorator: (CacheDecorator) defaults None. re-use the step's
+                         results from an earlier run with the same inputs.
         module: (importlib module) the dynamically loaded module that the
                 step will execute. this module will have the run_step
                 function that implements the actual step execution.
         foreach_items: (list) defaults None. Execute step once for each item in
                     list, using iterator i.
+        id: (str) defaults None. Identifies the step in its step-group, so
+            that other steps can refer to it with needs.
         in_parameters: (dict) defaults None. The in step decorator - i.e dict
                        to add to context before step execution.
+        needs: (list) defaults None. ids of the steps in the same step-group
+               that must finish before this step runs. If None in a
+               step-group that uses needs, the step needs the step before it
+               in the list. See pypyr.stepgraph.
+        parallel_decorator: (ParallelDecorator) defaults None. run foreach
+                            iterations in parallel.
         run_me: (bool) defaults True. step runs if this is true.
         skip_me: (bool) defaults False. step does not run if this is true.
         swallow_me: (bool) defaults False. swallow any errors during step run
                     and continue processing if true.
+        up_to_date_decorator: (UpToDateDecorator) defaults None. skip the
+                              step when its outputs are up to date with its
+                              inputs.
         while_decorator: (WhileDecorator) defaults None. execute step in while
                          loop.
 
@@ -287,6 +320,7 @@ def __init__(self, step):
         # defaults for decorators
         self.description = None
         self.foreach_items = None
+        self.id = None
         self.in_parameters = None
         self.retry_decorator = None
         self.line_no = None
@@ -297,6 +331,10 @@ def __init__(self, step):
         self.name = None
         self.while_decorator = None
         self.on_error = None
+        self.parallel_decorator = None
+        self.needs = None
+        self.cache_decorator = None
+        self.up_to_date_decorator = None
 
         try:
             if isinstance(step, dict):
@@ -352,7 +390,17 @@ def _init_from_dict(self, step):
 
         logger.debug("%s is complex.", self.name)
 
+        # id & needs: optional. StepsRunner schedules on these. No
+        # substitution, since the step graph validates at load time.
+        self.id = step.get('id', None)
+        needs = step.get('needs', None)
+        self.needs = [needs] if isinstance(needs, str) else needs
+
         self.in_parameters = step.get('in', None)
+        if self.in_parameters:
+            # in values go into context as is, where any step can change
+            # them, so formatting must not skip them as constant.
+            unmark_constants(self.in_parameters)
 
         # description: optional. Write to stdout if exists and flagged.
         self.description = step.get('description', None)
@@ -385,8 +433,68 @@ def _init_from_dict(self, step):
         if while_definition:
             self.while_decorator = WhileDecorator(while_definition)
 
+        # parallel: optional, defaults none. Only applies to foreach.
+        parallel_definition = step.get('parallel', None)
+        if parallel_definition:
+            if self.foreach_items is None:
+                logger.error("parallel decorator without foreach.")
+                raise PipelineDefinitionError(
+                    "parallel decorator only works with foreach.")
+
+            self.parallel_decorator = ParallelDecorator(parallel_definition)
+
+        # cache: optional, defaults none.
+        cache_definition = step.get('cache', None)
+        if cache_definition:
+            self.cache_decorator = CacheDecorator(cache_definition)
+
+        # inputs & outputs: optional, defaults none. inputs needs outputs.
+        outputs = step.get('outputs', None)
+        inputs = step.get('inputs', None)
+        if outputs:
+            self.up_to_date_decorator = UpToDateDecorator(inputs, outputs)
+        elif inputs:
+            logger.error("inputs decorator without outputs.")
+            raise PipelineDefinitionError(
+                "inputs decorator only works with outputs.")
+
         logger.debug("step name: %s", self.name)
 
+    def get_run_instance(self):
+        """Get a copy of this step that has its own run-time state.
+
+        Parsing the step yaml & loading the step module only needs to happen
+        once per step definition. The parsed Step is the template, and each
+        run of the step should happen on a run instance from this method.
+
+        The run instance is a shallow copy, so it shares the parsed decorator
+        inputs with the template. It gets its own loop decorator instances,
+        so that the loop counters (for_counter, retry_counter &
+        while_counter) belong to this run only. This keeps recursive or
+        concurrent runs of the same step from clobbering each other's
+        counters.
+
+        The loop counters are the only state that changes while a step runs,
+        so a step without foreach, retry or while is its own run instance.
+
+        Returns:
+            pypyr.dsl.Step: Step instance ready to run.
+        """
+        if not (self.foreach_items
+                or self.retry_decorator
+                or self.while_decorator):
+            return self
+
+        run_instance = _shallow_copy(self)
+
+        if self.retry_decorator:
+            run_instance.retry_decorator = _shallow_copy(self.retry_decorator)
+
+        if self.while_decorator:
+            run_instance.while_decorator = _shallow_copy(self.while_decorator)
+
+        return run_instance
+
     def save_error(self, context, exception, swallowed):
         """Append step's exception information to the context.
 
@@ -433,23 +541,48 @@ def foreach_loop(self, context):
         # execution.
         foreach = context.get_formatted_value(self.foreach_items)
 
+        if self.parallel_decorator:
+            self.parallel_decorator.parallel_loop(context, foreach, self)
+            logger.debug("done")
+            return
+
         iteration_count = 0
+        progress = get_loop_progress('foreach', self.name, get_total(foreach))
 
         for i in foreach:
-            logger.info("foreach: running step %s", i)
             iteration_count = iteration_count + 1
-            # the iterator must be available to the step when it executes
-            context['i'] = i
-            self.for_counter = i
-
-            # conditional operators apply to each iteration, so might be an
-            # iteration run, skips or swallows.
-            self.run_conditional_decorators(context)
-            logger.debug("foreach: done step %s", i)
+            progress.begin()
+            self.run_foreach_iteration(context, i)
+            progress.end(i)
 
+        progress.finish()
         logger.info("foreach decorator looped %s times.", iteration_count)
         logger.debug("done")
 
+    def run_foreach_iteration(self, context, i):
+        """Run a single iteration of the foreach loop.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context. This arg will
+                     mutate.
+            i: The current item in the foreach loop.
+        """
+        logger.info("foreach: running step %s", i)
+        # the iterator must be available to the step when it executes
+        context['i'] = i
+        self.for_counter = i
+
+        # conditional operators apply to each iteration, so might be an
+        # iteration run, skips or swallows.
+        run_hooks = get_run_hooks()
+        if run_hooks.observed:
+            with tracer.span('foreach', 'foreach', i=i):
+                with run_hooks.iteration('foreach', i, context, self):
+                    self.run_conditional_decorators(context)
+        else:
+            self.run_conditional_decorators(context)
+        logger.debug("foreach: done step %s", i)
+
     def invoke_step(self, context):
         """Invoke 'run_step' in the dynamically loaded step module.
 
@@ -469,10 +602,18 @@ def invoke_step(self, context):
         logger.debug("running step %s", self.name)
 
         try:
-            self.run_step_function(context)
+            if profiler.enabled:
+                with profiler.module():
+                    self.run_step_function(context)
+            else:
+                self.run_step_function(context)
         except Call as call:
             logger.debug("call: calling %s", call.groups)
             steps_runner = context.current_pipeline.steps_runner
+            if steps_runner.context is not context:
+                # context is a scoped copy, like in a parallel foreach, so
+                # the called groups should run against the copy.
+                steps_runner = steps_runner.get_scoped_copy(context)
             try:
                 steps_runner.run_step_groups(
                     groups=call.groups,
@@ -589,6 +730,8 @@ def run_conditional_decorators(self, context):
                             exception=exc_info,
                             swallowed=swallow_me
                         )
+                        get_run_hooks().error(self, context, exc_info,
+                                              swallow_me)
                     if swallow_me:
                         logger.error(
                             "%s Ignoring error because swallow "
@@ -643,35 +786,103 @@ def run_step(self, context):
         """
         logger.debug("starting")
 
+        # 1 check per step, so that a run nothing observes has no wrappers.
+        run_hooks = get_run_hooks()
+        if run_hooks.observed:
+            with tracer.span(self.name, 'step'), profiler.step(self, context):
+                with run_hooks.step(self, context):
+                    self._run_step(context)
+        else:
+            self._run_step(context)
+
+        logger.debug("done")
+
+    def _run_step(self, context):
+        """Run a single pipeline step, with its in parameters.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context. This arg will
+                     mutate.
+        """
         # the in params should be added to context before step execution.
         self.set_step_input_context(context)
 
+        is_running = None
+
         # give user helpful output if step will actually run or not.
         if self.description:
             description = context.get_formatted_value(self.description)
-            run_me = context.get_formatted_as_type(self.run_me, out_type=bool)
+            is_running = self.is_running(context)
 
-            skip_me = False
-
-            if run_me:
-                skip_me = context.get_formatted_as_type(self.skip_me,
-                                                        out_type=bool)
-
-            if run_me and not skip_me:
+            if is_running:
                 logger.notify(description)
             else:
                 logger.notify("(skipping): %s", description)
 
-        if self.while_decorator:
+        if self.up_to_date_decorator or self.cache_decorator:
+            if is_running is None:
+                is_running = self.is_running(context)
+
+            if not is_running:
+                # nothing to check or cache for a step that won't run, so go
+                # straight to where run & skip say why.
+                self.run_while_or_foreach(context)
+            elif self.up_to_date_decorator:
+                self.up_to_date_decorator.run_if_changed(context,
+                                                         self,
+                                                         self.run_cached)
+            else:
+                self.run_cached(context)
+        elif self.while_decorator:
             self.while_decorator.while_loop(context,
-                                            self.run_foreach_or_conditional)
+                                            self.run_foreach_or_conditional,
+                                            name=self.name)
         else:
             self.run_foreach_or_conditional(context)
 
         # the in params should be removed from context after step execution.
         self.unset_step_input_context(context)
 
-        logger.debug("done")
+    def is_running(self, context):
+        """Evaluate run & skip to see whether the step will run.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context.
+
+        Returns:
+            bool: True if run is True & skip is False.
+        """
+        return (context.get_formatted_as_type(self.run_me, out_type=bool)
+                and not context.get_formatted_as_type(self.skip_me,
+                                                      out_type=bool))
+
+    def run_cached(self, context):
+        """Run the step, or restore its results with the cache decorator.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context. This arg will
+                     mutate.
+        """
+        if self.cache_decorator:
+            self.cache_decorator.cached_run(context,
+                                            self,
+                                            self.run_while_or_foreach)
+        else:
+            self.run_while_or_foreach(context)
+
+    def run_while_or_foreach(self, context):
+        """Run the while loop, or the foreach sequence & conditionals.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context. This arg will
+                     mutate.
+        """
+        if self.while_decorator:
+            self.while_decorator.while_loop(context,
+                                            self.run_foreach_or_conditional,
+                                            name=self.name)
+        else:
+            self.run_foreach_or_conditional(context)
 
     def set_step_input_context(self, context):
         """Append step's 'in' parameters to context, if they exist.
@@ -839,7 +1050,13 @@ def exec_iteration(self, counter, context, step_method, max):
 
         logger.info("retry: running step with counter %s", counter)
         try:
-            step_method(context)
+            run_hooks = get_run_hooks()
+            if run_hooks.observed:
+                with tracer.span('retry', 'retry', counter=counter):
+                    with run_hooks.iteration('retry', counter, context):
+                        step_method(context)
+            else:
+                step_method(context)
             result = True
         except (ControlOfFlowInstruction, Stop):
             # Control-of-Flow/Stop are instructions to go somewhere
@@ -1015,7 +1232,7 @@ def __init__(self, while_definition):
 
         logger.debug("done")
 
-    def exec_iteration(self, counter, context, step_method):
+    def exec_iteration(self, counter, context, step_method, progress=None):
         """Run a single loop iteration.
 
         This method abides by the signature invoked by poll.while_until_true,
@@ -1031,6 +1248,8 @@ def exec_iteration(self, counter, context, step_method):
             step_method: (method/function) This is the method/function that
                          will execute on every loop iteration. Signature is:
                          function(context)
+            progress: (pypyr.progress.LoopProgress) Tally the iteration in
+                      this. Default None means don't tally.
 
          Returns:
             bool. True if self.stop evaluates to True after step execution,
@@ -1042,7 +1261,20 @@ def exec_iteration(self, counter, context, step_method):
         self.while_counter = counter
 
         logger.info("while: running step with counter %s", counter)
-        step_method(context)
+        if progress is not None:
+            progress.begin()
+
+        run_hooks = get_run_hooks()
+        if run_hooks.observed:
+            with tracer.span('while', 'while', counter=counter):
+                with run_hooks.iteration('while', counter, context):
+                    step_method(context)
+        else:
+            step_method(context)
+
+        if progress is not None:
+            progress.end(counter)
+
         logger.debug("while: done step %s", counter)
 
         result = False
@@ -1055,7 +1287,7 @@ def exec_iteration(self, counter, context, step_method):
         logger.debug("done")
         return result
 
-    def while_loop(self, context, step_method):
+    def while_loop(self, context, step_method, name=None):
         """Run step inside a while loop.
 
         Args:
@@ -1065,6 +1297,7 @@ def while_loop(self, context, step_method):
             step_method: (method/function) This is the method/function that
                          will execute on every loop iteration. Signature is:
                          function(context)
+            name: (str) Name of the step that loops, for progress reports.
 
         """
         logger.debug("starting")
@@ -1106,10 +1339,15 @@ def while_loop(self, context, step_method):
                             "until %s evaluates to True at "
                             "%ss intervals.", max, self.stop, sleep)
 
-        if not poll.while_until_true(interval=sleep,
-                                     max_attempts=max)(
-                self.exec_iteration)(context=context,
-                                     step_method=step_method):
+        progress = get_loop_progress('while', name, max)
+        is_stopped = poll.while_until_true(interval=sleep,
+                                           max_attempts=max)(
+            self.exec_iteration)(context=context,
+                                 step_method=step_method,
+                                 progress=progress)
+        progress.finish()
+
+        if not is_stopped:
             # False means loop exhausted and stop never eval-ed True.
             if error_on_max:
                 logger.error("exhausted %s iterations of while loop, "
@@ -1132,3 +1370,809 @@ def while_loop(self, context, step_method):
                         "evaluated True.", self.stop)
 
         logger.debug("done")
+
+
+class ParallelDecorator:
+    """Parallel foreach decorator, as interpreted by the pipeline yaml.
+
+    Encapsulate the methods that run the iterations of a foreach loop at the
+    same time on a pool of workers. Each iteration runs in its own copy of
+    context, so it gets its own i & its own top-level keys, including the step
+    in parameters.
+
+    In thread mode, iterations run on a thread pool. Each iteration's context
+    is a shallow copy, so nested values are the same objects as in the parent
+    context.
+
+    In process mode, iterations run on a pool of worker processes, to get
+    past the GIL for CPU-bound steps. Each iteration gets a pickled snapshot
+    of context & of the step. Workers start with forkserver, or spawn where
+    the platform has no forkserver, never fork. The worker processes stay
+    warm between loops, so a step's module only loads once per worker. They
+    shut down when the interpreter exits, or when you call
+    pypyr.dsl.shutdown_process_pools(). Everything in context, and
+    everything the step returns to the parent, must be picklable. The
+    iterations are fully isolated from the parent, so steps that need the
+    running pipeline, like call or pype, do not work in process mode.
+
+    When an iteration completes, the top-level keys it set, changed or removed
+    in its copy of context merge back into the parent context. If out is set,
+    only those keys merge back. In process mode, changing a value in place
+    is not a change to its top-level key, so list such keys in out. runErrors
+    from the iteration append to the parent's runErrors. Where more than one
+    iteration sets the same key, the last iteration to merge wins.
+
+    Run, skip, retry & swallow apply to each iteration individually, just
+    like in a sequential foreach.
+
+    In a normal world, Step invokes ParallelDecorator. If you run it directly,
+    you're responsible for the context and surrounding control-of-flow.
+
+    Attributes:
+        fail_fast (bool): default True. Stop starting new iterations after the
+            1st iteration error. The iterations already running complete. If
+            False, run all iterations regardless of errors. Either way raise
+            the 1st error once the running iterations are done.
+        max (int): default None. Maximum number of iterations to run at the
+            same time. None uses the Python thread pool default in thread
+            mode, and the number of CPUs in process mode.
+        mode (str): default 'thread'. Run iterations on a pool of 'thread' or
+            'process'.
+        ordered (bool): default True. Merge iteration results into context in
+            foreach order. If False, merge each iteration's results as soon as
+            it completes.
+        out (list[str]): default None. Only merge these keys from each
+            iteration's context back into the parent context, whether they
+            changed or not. None means merge all changed keys. Formats
+            against each iteration's context once the iteration is done, so
+            the key names can use i.
+    """
+
+    def __init__(self, parallel_definition):
+        """Initialize the class. No duh, huh.
+
+        You can happily expect the initializer to initialize all
+        member attributes.
+
+        Args:
+            parallel_definition: dict or int. This is the actual parallel
+                definition as it exists in the pipeline yaml. A scalar is the
+                short-hand for max. True means use default max.
+        """
+        logger.debug("starting")
+
+        if isinstance(parallel_definition, dict):
+            # failFast: optional. defaults True.
+            self.fail_fast = parallel_definition.get('failFast', True)
+
+            # max: optional. defaults None.
+            self.max = parallel_definition.get('max', None)
+
+            # mode: optional. defaults thread.
+            self.mode = parallel_definition.get('mode', 'thread')
+
+            # ordered: optional. defaults True.
+            self.ordered = parallel_definition.get('ordered', True)
+
+            # out: optional. defaults None.
+            self.out = parallel_definition.get('out', None)
+        else:
+            self.fail_fast = True
+            self.max = (None if parallel_definition is True
+                        else parallel_definition)
+            self.mode = 'thread'
+            self.ordered = True
+            self.out = None
+
+        logger.debug("done")
+
+    def parallel_loop(self, context, foreach, step):
+        """Run step once for each item in foreach on a pool of workers.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context. This arg will
+                     mutate - after method execution will contain the merged
+                     results of all iterations.
+            foreach: (iterable) Run an iteration for each item in this.
+            step: (pypyr.dsl.Step) Step to run in each iteration.
+        """
+        logger.debug("starting")
+
+        mode = context.get_formatted_value(self.mode)
+        if mode not in ('thread', 'process'):
+            raise ValueError(
+                f"parallel mode must be thread or process, not {mode}.")
+
+        is_process = mode == 'process'
+
+        max_workers = None
+        if self.max is not None:
+            max_workers = context.get_formatted_as_type(self.max,
+                                                        out_type=int)
+            if max_workers < 1:
+                raise ValueError(
+                    "parallel max must be 1 or more if you specify it.")
+        elif is_process:
+            # same default as the ProcessPoolExecutor.
+            max_workers = os.cpu_count() or 1
+        else:
+            # same default as the ThreadPoolExecutor.
+            max_workers = min(32, (os.cpu_count() or 1) + 4)
+
+        fail_fast = context.get_formatted_as_type(self.fail_fast,
+                                                  out_type=bool)
+        ordered = context.get_formatted_as_type(self.ordered, out_type=bool)
+
+        logger.debug("parallel foreach in %s mode with max %s, ordered %s, "
+                     "failFast %s.", mode, max_workers, ordered, fail_fast)
+
+        # all iterations copy from the same starting point, even as earlier
+        # iterations merge their results into context.
+        template = context.get_scoped_copy()
+
+        if is_process:
+            pool = _get_process_pool(max_workers)
+            # pickle once here, rather than once per iteration on submit.
+            step_pickle = pickle.dumps(step.get_run_instance())
+            context_pickle = pickle.dumps(template)
+            sys_path = list(sys.path)
+
+            def submit(i):
+                return pool.submit(_run_process_iteration,
+                                   sys_path,
+                                   step_pickle,
+                                   context_pickle,
+                                   i,
+                                   self.out)
+        else:
+            pool = ThreadPoolExecutor(max_workers=max_workers,
+                                      thread_name_prefix='pypyr-foreach')
+
+            def submit(i):
+                # each thread gets the current run's hooks.
+                return pool.submit(copy_context().run,
+                                   _run_thread_iteration,
+                                   step.get_run_instance(),
+                                   template,
+                                   i,
+                                   self.out)
+
+        try:
+            iteration_count, last_item, errors = self._run_iterations(
+                context, foreach, submit, max_workers, ordered, fail_fast)
+        except BrokenProcessPool:
+            _discard_process_pool(max_workers)
+            raise
+        finally:
+            if not is_process:
+                pool.shutdown(wait=True)
+
+        if is_process and any(isinstance(error, BrokenProcessPool)
+                              for _, error in errors):
+            # a worker died, so the next loop needs a fresh pool.
+            _discard_process_pool(max_workers)
+
+        if iteration_count:
+            # same as sequential foreach, i is the last item after the loop.
+            context['i'] = last_item
+            step.for_counter = last_item
+
+        logger.info("foreach decorator looped %s times in parallel.",
+                    iteration_count)
+
+        if errors:
+            if ordered:
+                errors.sort(key=lambda error: error[0])
+
+            if len(errors) > 1:
+                logger.error("%s foreach iterations failed. Raising the "
+                             "first error.", len(errors))
+
+            raise errors[0][1]
+
+        logger.debug("done")
+
+    def _run_iterations(self, context, foreach, submit, max_workers, ordered,
+                        fail_fast):
+        """Submit iterations as workers free up & merge their results.
+
+        Only submits a new iteration when a worker is free, rather than
+        submitting every item in foreach up-front.
+
+        Args:
+            context: (pypyr.context.Context) Merge iteration results into
+                this.
+            foreach: (iterable) Run an iteration for each item in this.
+            submit: (callable) submit(i) submits an iteration to the pool &
+                returns its Future. The Future's result is a tuple of
+                (changes, error).
+            max_workers: (int) Maximum number of iterations running at once.
+            ordered: (bool) Merge results in foreach order.
+            fail_fast: (bool) Stop submitting iterations after an error.
+
+        Returns:
+            tuple (iteration_count, last_item, errors). errors is a list of
+            (index, exception) for each failed iteration.
+        """
+        items = enumerate(foreach)
+        running = {}
+        # index: changes for completed iterations awaiting ordered merge.
+        completed = {}
+        next_merge = 0
+        errors = []
+        iteration_count = 0
+        last_item = None
+        is_submitting = True
+
+        while True:
+            while is_submitting and len(running) < max_workers:
+                try:
+                    index, i = next(items)
+                except StopIteration:
+                    is_submitting = False
+                    break
+
+                running[submit(i)] = index
+                iteration_count += 1
+                last_item = i
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index = running.pop(future)
+                changes = None
+                try:
+                    changes, error = future.result()
+                except Exception as err:
+                    # the pool itself failed, like a pickling error or a
+                    # worker process that died.
+                    error = err
+
+                if error:
+                    errors.append((index, error))
+                    # control-of-flow always stops the loop.
+                    if fail_fast or isinstance(
+                            error, (ControlOfFlowInstruction, Stop)):
+                        is_submitting = False
+
+                if ordered:
+                    completed[index] = changes
+                    while next_merge in completed:
+                        changes = completed.pop(next_merge)
+                        if changes:
+                            context.merge_scoped_changes(changes)
+                        next_merge += 1
+                elif changes:
+                    context.merge_scoped_changes(changes)
+
+        return iteration_count, last_item, errors
+
+
+class CacheDecorator:
+    """Cache decorator, as interpreted by the pypyr pipeline definition yaml.
+
+    Re-use a step's results from an earlier run with the same inputs, rather
+    than run the step again. The cache key is a hash of the pipeline name,
+    the step name, the formatted in parameters, the formatted foreach items,
+    and the values of the context keys listed in keys. An in parameter that
+    isn't a valid formatting expression, like py code with literal braces,
+    hashes as it is in the pipeline yaml.
+
+    On a miss, the step runs as usual. If it completes without any errors,
+    the top-level context keys it set, changed or removed save to
+    pypyr.cache.resultcache.step_result_cache, on disk in the pypyr user data
+    dir. A step that swallowed an error does not save its results.
+
+    On a hit, the step does not run at all. Instead the saved keys set &
+    remove in context, just like the step did the last time it ran.
+
+    The results save with pickle, so everything the step writes to context
+    must be picklable. Changing a value in place is not a change to its
+    top-level key, so the cache does not save it.
+
+    A step that does not run because of run or skip never uses the cache.
+
+    Attributes:
+        keys (list[str]): default None. Context keys the step reads, other
+            than its in parameters. A different value for any of these is a
+            different cache key.
+        ttl (float): default None. Seconds a saved result stays current.
+            None means forever.
+    """
+
+    def __init__(self, cache_definition):
+        """Initialize the class. No duh, huh.
+
+        You can happily expect the initializer to initialize all
+        member attributes.
+
+        Args:
+            cache_definition: dict or bool. This is the actual cache
+                definition as it exists in the pipeline yaml. True means
+                cache with defaults.
+        """
+        logger.debug("starting")
+
+        if isinstance(cache_definition, dict):
+            # keys: optional. defaults None.
+            self.keys = cache_definition.get('keys', None)
+
+            # ttl: optional. defaults None.
+            self.ttl = cache_definition.get('ttl', None)
+        else:
+            self.keys = None
+            self.ttl = None
+
+        logger.debug("done")
+
+    def cached_run(self, context, step, step_method):
+        """Restore step's results from cache, or run step_method & save them.
+
+        Only call this for a step that runs, i.e run is True & skip is False.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context. This arg will
+                     mutate.
+            step: (pypyr.dsl.Step) The step to cache.
+            step_method: (method/function) Run the step with
+                         step_method(context).
+        """
+        logger.debug("starting")
+
+        ttl = context.get_formatted_value(self.ttl)
+        cache_key = self.get_cache_key(context, step)
+
+        result = step_result_cache.get(cache_key, ttl)
+        if result is not None:
+            logger.info("%s using cached result instead of running.",
+                        step.name)
+            updates, removed = result
+            context.merge_scoped_changes((updates, removed, None))
+            logger.debug("done")
+            return
+
+        before = context.get_scoped_copy()
+        start = time.perf_counter()
+        step_method(context)
+        duration = time.perf_counter() - start
+        updates, removed, run_errors = before.get_scoped_changes(context)
+
+        if run_errors:
+            logger.debug("%s had errors, so not caching its result.",
+                         step.name)
+        else:
+            step_result_cache.set(cache_key, (updates, removed),
+                                  create_seconds=duration)
+
+        logger.debug("done")
+
+    def get_cache_key(self, context, step):
+        """Get the hash of step's inputs to use as its cache key.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context, with the
+                     step's in parameters already in it.
+            step: (pypyr.dsl.Step) The step to cache.
+
+        Returns:
+            str: sha256 hex digest of the step's inputs.
+        """
+        keys = context.get_formatted_value(self.keys)
+        if isinstance(keys, str):
+            keys = [keys]
+
+        pipeline = context.current_pipeline
+        in_parameters = step.in_parameters or {}
+        inputs = {
+            # same step with the same inputs in another pipeline can differ.
+            'pipeline': pipeline.name if pipeline else None,
+            'name': step.name,
+            'in': {key: _get_formatted_or_raw(context, value)
+                   for key, value in in_parameters.items()},
+            'foreach': _get_formatted_or_raw(context, step.foreach_items),
+            # [value] so that a key set to None differs from a missing key.
+            'keys': {key: [context[key]] if key in context else []
+                     for key in (keys or ())}
+        }
+
+        return _get_digest(inputs)
+
+
+class UpToDateDecorator:
+    """Inputs & outputs decorators, as interpreted by the pipeline yaml.
+
+    Skip a step when its outputs are up to date with its inputs, like Make
+    does. inputs & outputs are globs, resolved with
+    pypyr.utils.filesystem.get_glob. They format against context before
+    resolving.
+
+    The step only skips if every outputs glob matches at least one path, and
+    if inputs is set, it matches at least one path too. Missing inputs likely
+    mean a wrong glob, which is no reason to trust the outputs. Without
+    inputs, existing outputs are up to date.
+
+    In the default mtime mode, the step also only skips if the oldest output
+    is strictly newer than the newest input. An output with the same modified
+    time as an input runs the step, since on filesystems with coarse
+    timestamps the input might have changed after the output in the same
+    tick.
+
+    In hash mode, the step skips if the content of the inputs is the same as
+    the last time the step ran successfully with the same inputs & outputs.
+    The content hash of the last run saves to
+    pypyr.cache.resultcache.step_result_cache. A step that raises or swallows
+    an error does not save its hash.
+
+    A step that does not run because of run or skip never checks its inputs
+    or outputs.
+
+    Attributes:
+        inputs (str or list[str]): default None. Globs for the files the step
+            reads. In the yaml, this is either the glob(s), or a dict with
+            keys glob & hash.
+        outputs (str or list[str]): Globs for the files the step writes.
+        hash (bool): default False. Compare the content of inputs to the last
+            run rather than compare modified times.
+    """
+
+    def __init__(self, inputs_definition, outputs):
+        """Initialize the class. No duh, huh.
+
+        You can happily expect the initializer to initialize all
+        member attributes.
+
+        Args:
+            inputs_definition: str, list or dict. This is the actual inputs
+                definition as it exists in the pipeline yaml. A scalar or
+                list is the short-hand for glob.
+            outputs: str or list. The outputs globs from the pipeline yaml.
+        """
+        logger.debug("starting")
+
+        if isinstance(inputs_definition, dict):
+            # glob: optional. defaults None.
+            self.inputs = inputs_definition.get('glob', None)
+
+            # hash: optional. defaults False.
+            self.hash = inputs_definition.get('hash', False)
+        else:
+            self.inputs = inputs_definition
+            self.hash = False
+
+        self.outputs = outputs
+
+        logger.debug("done")
+
+    def run_if_changed(self, context, step, step_method):
+        """Run step_method, unless the step's outputs are up to date.
+
+        Only call this for a step that runs, i.e run is True & skip is False.
+
+        Args:
+            context: (pypyr.context.Context) The pypyr context. This arg will
+                     mutate.
+            step: (pypyr.dsl.Step) The step to check.
+            step_method: (method/function) Run the step with
+                         step_method(context).
+        """
+        logger.debug("starting")
+
+        # deferred: filesystem imports pypyr.yaml, which imports this module.
+        from pypyr.utils.filesystem import get_glob
+
+        inputs = context.get_formatted_value(self.inputs)
+        outputs = context.get_formatted_value(self.outputs)
+        use_hash = context.get_formatted_as_type(self.hash, out_type=bool)
+
+        output_paths = self._get_output_paths(outputs, get_glob)
+        input_paths = get_glob(inputs) if inputs else []
+
+        is_current = output_paths is not None
+        if is_current and inputs and not input_paths:
+            logger.debug("%s inputs match nothing, so its outputs aren't "
+                         "up to date.", step.name)
+            is_current = False
+
+        if use_hash:
+            state_key = _get_digest(
+                ['uptodate', step.name, inputs, outputs])
+            digest = _get_files_digest(input_paths)
+            if is_current and step_result_cache.get(state_key) == digest:
+                logger.notify("%s not running because its inputs haven't "
+                              "changed since it last ran.", step.name)
+                logger.debug("done")
+                return
+
+            before_errors = len(context.get('runErrors', ()))
+            step_method(context)
+            if len(context.get('runErrors', ())) == before_errors:
+                step_result_cache.set(state_key, digest)
+        else:
+            if is_current:
+                newest_input = max(
+                    (os.stat(path).st_mtime_ns for path in input_paths),
+                    default=None)
+                oldest_output = min(os.stat(path).st_mtime_ns
+                                    for path in output_paths)
+
+                # equal is not up to date. see class docstring.
+                if newest_input is None or oldest_output > newest_input:
+                    logger.notify("%s not running because its outputs are "
+                                  "newer than its inputs.", step.name)
+                    logger.debug("done")
+                    return
+
+            step_method(context)
+
+        logger.debug("done")
+
+    def _get_output_paths(self, outputs, get_glob):
+        """Get the paths matching each outputs glob.
+
+        Args:
+            outputs: (str or list) Formatted outputs globs.
+            get_glob: (function) pypyr.utils.filesystem.get_glob.
+
+        Returns:
+            list[str]: All paths matching outputs, or None if any glob in
+            outputs matches nothing.
+        """
+        globs = [outputs] if isinstance(outputs, (str, os.PathLike)) else (
+            outputs)
+
+        output_paths = []
+        for output in globs:
+            paths = get_glob(output)
+            if not paths:
+                logger.debug("output %s doesn't exist.", output)
+                return None
+
+            output_paths.extend(paths)
+
+        return output_paths
+
+
+# max_workers: ProcessPoolExecutor. Worker processes stay warm between loops.
+_process_pools = {}
+_process_pools_lock = threading.Lock()
+
+
+def _get_mp_context():
+    """Get the multiprocessing context that starts the pool workers.
+
+    Forking a process that runs other threads, like the pypyr thread pools,
+    can copy a held lock into the child, where it never releases. So workers
+    start from a clean process instead: forkserver where the platform has it,
+    otherwise spawn.
+
+    Returns:
+        multiprocessing.context.BaseContext
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+
+    return multiprocessing.get_context('spawn')
+
+
+def _get_process_pool(max_workers):
+    """Get the shared process pool with max_workers, creating it if need be.
+
+    Args:
+        max_workers: (int) Number of worker processes in the pool.
+
+    Returns:
+        concurrent.futures.ProcessPoolExecutor
+    """
+    with _process_pools_lock:
+        pool = _process_pools.get(max_workers, None)
+        if pool is None:
+            logger.debug("starting process pool with %s workers.",
+                         max_workers)
+            pool = ProcessPoolExecutor(max_workers=max_workers,
+                                       mp_context=_get_mp_context())
+            _process_pools[max_workers] = pool
+
+        return pool
+
+
+def _discard_process_pool(max_workers):
+    """Remove the shared process pool with max_workers & shut it down.
+
+    Args:
+        max_workers: (int) Number of worker processes in the pool.
+    """
+    with _process_pools_lock:
+        pool = _process_pools.pop(max_workers, None)
+
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def shutdown_process_pools():
+    """Shut down the warm worker processes of parallel foreach process mode.
+
+    Waits for the workers to finish what they're running. The next process
+    mode loop starts new pools. Runs at interpreter exit, so you only need to
+    call this yourself to free the workers sooner.
+    """
+    with _process_pools_lock:
+        pools = list(_process_pools.values())
+        _process_pools.clear()
+
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+
+atexit.register(shutdown_process_pools)
+
+
+def _run_thread_iteration(step, template, i, out):
+    """Run a foreach iteration in an isolated copy of template.
+
+    Args:
+        step: (pypyr.dsl.Step) Run instance of the step for this iteration.
+        template: (pypyr.context.Context) Context as it was when the loop
+            started. Does not mutate.
+        i: The current item in the foreach loop.
+        out: (list[str]) Only return changes to these keys. None means all.
+            Formats against the iteration's context.
+
+    Returns:
+        tuple (changes, error). changes is from Context.get_scoped_changes.
+        error is the exception the iteration raised, or None.
+    """
+    iteration_context = template.get_scoped_copy()
+
+    error = None
+    try:
+        step.run_foreach_iteration(iteration_context, i)
+    except Exception as err:
+        error = err
+
+    if out is not None:
+        out = iteration_context.get_formatted_value(out)
+        if isinstance(out, str):
+            out = [out]
+
+    # i is per iteration, the loop sets it on context once all done.
+    changes = template.get_scoped_changes(iteration_context,
+                                          keys=out,
+                                          ignore=('i',))
+    return changes, error
+
+
+def _run_process_iteration(sys_path, step_pickle, context_pickle, i, out):
+    """Run a foreach iteration in a worker process.
+
+    Args:
+        sys_path: (list[str]) sys.path of the parent process, so that custom
+            step modules import in the worker.
+        step_pickle: (bytes) Pickled pypyr.dsl.Step.
+        context_pickle: (bytes) Pickled pypyr.context.Context as it was when
+            the loop started.
+        i: The current item in the foreach loop.
+        out: (list[str]) Only return changes to these keys. None means all.
+            Formats against the iteration's context.
+
+    Returns:
+        tuple (changes, error). changes is from Context.get_scoped_changes.
+        error is the exception the iteration raised, or None.
+    """
+    for path in sys_path:
+        if path not in sys.path:
+            sys.path.append(path)
+
+    return _run_thread_iteration(pickle.loads(step_pickle),
+                                 pickle.loads(context_pickle),
+                                 i,
+                                 out)
+
+
+def _get_digest(obj):
+    """Get sha256 hex digest of obj's json representation.
+
+    Args:
+        obj: (any) Object to hash.
+
+    Returns:
+        str: sha256 hex digest.
+    """
+    try:
+        serialized = json.dumps(obj,
+                                sort_keys=True,
+                                default=_get_hashable_repr)
+    except (TypeError, ValueError):
+        # like dict keys of mixed types, which don't sort.
+        serialized = repr(obj)
+
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+def _get_files_digest(paths):
+    """Get sha256 hex digest of the names & contents of the files in paths.
+
+    Directories only count by name.
+
+    Args:
+        paths: (list[str]) Paths to hash.
+
+    Returns:
+        str: sha256 hex digest.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.fsencode(path))
+        digest.update(b'\0')
+        if os.path.isfile(path):
+            with open(path, 'rb') as file:
+                for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                    digest.update(chunk)
+
+        digest.update(b'\0')
+
+    return digest.hexdigest()
+
+
+# what formatting raises for text that isn't a formatting expression, like
+# braces in py code. KeyError includes pypyr.errors.KeyNotInContextError.
+_FORMAT_ERRORS = (AttributeError, IndexError, KeyError, TypeError, ValueError)
+
+
+def _get_formatted_or_raw(context, value):
+    """Get value formatted against context, or value as is if it can't format.
+
+    Only falls back to value for the errors formatting raises on text that
+    isn't a formatting expression. Anything else, like an error in a !py
+    expression, raises.
+
+    Args:
+        context: (pypyr.context.Context) Format against this context.
+        value: (any) Value to format.
+
+    Returns:
+        Formatted value, or value itself if it isn't a valid formatting
+        expression.
+    """
+    try:
+        return context.get_formatted_value(value)
+    except _FORMAT_ERRORS:
+        return value
+
+
+def _get_hashable_repr(obj):
+    """Get a stable representation of obj for the json serializer.
+
+    Sets have no stable order between processes, so these sort.
+
+    Args:
+        obj: (any) Object that json can't serialize natively.
+
+    Returns:
+        list or str: Sorted list of reprs for a set, otherwise repr(obj).
+    """
+    if isinstance(obj, (set, frozenset)):
+        return sorted(repr(item) for item in obj)
+
+    return repr(obj)
+
+
+def _shallow_copy(obj):
+    """Copy the instance attributes of obj into a new instance of its class.
+
+    This does the same as copy.copy for a plain object with a __dict__, without
+    the __reduce_ex__ round-trip that makes copy.copy slower than just
+    re-initializing the object from scratch.
+
+    Args:
+        obj (object): Copy this. Must have a __dict__.
+
+    Returns:
+        New instance of obj's class with the same attribute references as obj.
+    """
+    cls = obj.__class__
+    new = cls.__new__(cls)
+    new.__dict__.update(obj.__dict__)
+    return new
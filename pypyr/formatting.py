@@ -1,7 +1,11 @@
 """Substitution & interpolation formatting."""
 from collections.abc import Mapping, Set, Sequence
+from functools import lru_cache
 from string import Formatter
 
+# attribute set on containers that have nothing to format in them.
+CONSTANT_MARKER = '_pypyr_is_constant'
+
 
 class RecursionSpec():
     """Parse a string formatting spec.
@@ -16,6 +20,10 @@ class RecursionSpec():
     It makes no attempt to implement business logic around what to do with the
     formatting string.
 
+    The RecursiveFormatter shares RecursionSpec instances between all
+    formatting operations on the same format string, so it does not set
+    has_recursed itself.
+
     Attributes:
         format_spec: The original format_spec without the leading 'ff' or 'rf'.
                      If is_set is False, is identical to input format_spec.
@@ -89,6 +97,14 @@ class and implement the standard overloads like get_field() and get_value()
     You can still use all the usual format_spec functionality by adding the
     specifiers immediately after the 'ff' or 'rf'.
 
+    The parsed structure of each format string, i.e its literal text, field
+    names, conversions & recursion specs, caches in a LRU cache on the
+    formatter instance. Formatting the same string again only needs to look up
+    the field values.
+
+    Containers flagged by mark_constants() do not contain anything to format,
+    so formatting only copies their structure without visiting each value.
+
     Attributes:
         passthrough_types (tuple of type): Objects of this type do not format
                                            at all - pass through without
@@ -100,6 +116,9 @@ class and implement the standard overloads like get_field() and get_value()
 
     _FORMAT_SPEC_RECURSION_DEPTH = 2
 
+    # max number of distinct format strings to keep parsed templates for.
+    _TEMPLATE_CACHE_SIZE = 4096
+
     def __init__(self, passthrough_types=None, special_types=None):
         """Initialize me.
 
@@ -117,6 +136,10 @@ def __init__(self, passthrough_types=None, special_types=None):
         """
         self.passthrough_types = passthrough_types
         self.special_types = special_types
+        # lru_cache is thread-safe & per instance, since parse could be
+        # overridden in a derived class.
+        self._get_template = lru_cache(
+            maxsize=self._TEMPLATE_CACHE_SIZE)(self._parse_template)
 
     def format(self, format_string, *args, **kwargs):
         """Format the input with arbitrary positional & keyword args.
@@ -187,16 +210,21 @@ def _format_keep_type(self, format_string, args, kwargs, used_args,
         """
         if recursion_depth < 0:
             raise ValueError('Max string recursion exceeded')
-        result = []
-        for literal_text, field_name, format_spec, conversion in \
-                self.parse(format_string):
 
-            # output the literal text
-            if literal_text:
-                result.append((literal_text, True, None))
+        template = self._get_template(format_string)
+        if not template:
+            # nothing to format, the string is its own literal value.
+            return format_string
 
-            # if there's a field, output it
-            if field_name is not None:
+        result = []
+        for (literal_text, field_name, format_spec, conversion,
+             recursion_spec) in template:
+
+            if field_name is None:
+                # output the literal text
+                result.append((literal_text, True, None, False))
+            else:
+                # it's a field, output it
                 # handle arg indexing when empty field_names are given.
                 if field_name == '':
                     if auto_arg_index is False:
@@ -219,24 +247,29 @@ def _format_keep_type(self, format_string, args, kwargs, used_args,
                 obj, arg_used = self.get_field(field_name, args, kwargs)
                 used_args.add(arg_used)
 
-                # expand the format spec, if needed.
-                # format spec expansion uses standard formatting of base class.
-                format_spec, auto_arg_index = self._vformat(
-                    format_spec, args, kwargs,
-                    used_args, recursion_depth - 1,
-                    auto_arg_index=auto_arg_index)
-
-                # not doing this in format_field because need to know whether
-                # to recurse or not here already - format_field doesn't take
-                # the args/kwargs that get_formatted_iterable needs.
-                recursion_spec = RecursionSpec(format_spec)
+                if recursion_spec is None:
+                    # format spec has formatting expressions of its own, so
+                    # expand it & only then parse the recursion spec.
+                    # format spec expansion uses standard formatting of base
+                    # class.
+                    format_spec, auto_arg_index = self._vformat(
+                        format_spec, args, kwargs,
+                        used_args, recursion_depth - 1,
+                        auto_arg_index=auto_arg_index)
+
+                    # not doing this in format_field because need to know
+                    # whether to recurse or not here already - format_field
+                    # doesn't take the args/kwargs that get_formatted_iterable
+                    # needs.
+                    recursion_spec = RecursionSpec(format_spec)
 
                 # the resulting object could be formattable itself
+                has_recursed = False
                 if recursion_spec.is_recursive or (
                         is_recursive and not recursion_spec.is_flat):
                     obj = self._get_formatted_iterable(
                         obj, args, kwargs, used_args, None, True)
-                    recursion_spec.has_recursed = True
+                    has_recursed = True
 
                 # do any conversion on the resulting object
                 obj = self.convert_field(obj, conversion)
@@ -244,17 +277,17 @@ def _format_keep_type(self, format_string, args, kwargs, used_args,
                 # only decide whether to format once sure that this is a
                 # string and not a single object. thus, add to list, deal with
                 # that after this field iteration completes.
-                result.append((obj, False, recursion_spec))
+                result.append((obj, False, recursion_spec, has_recursed))
 
         # where input is '{expr}' - i.e comprised entirely of 1 expression,
         # return the result object WITHOUT casting to string.
         if len(result) == 1:
             # single object. don't format for literals.
-            obj, is_literal, recursion_spec = result[0]
+            obj, is_literal, recursion_spec, has_recursed = result[0]
             if is_literal:
                 return obj
             else:
-                if not (recursion_spec.has_recursed or recursion_spec.is_flat):
+                if not (has_recursed or recursion_spec.is_flat):
                     # default is go recursive on special case where there's a
                     # single formatting expression comprising the entire string
                     obj = self._get_formatted_iterable(
@@ -275,7 +308,49 @@ def _format_keep_type(self, format_string, args, kwargs, used_args,
                             if is_literal
                             else self.format_field(obj,
                                                    recursion_spec.format_spec)
-                            for obj, is_literal, recursion_spec in result])
+                            for obj, is_literal, recursion_spec, _ in result])
+
+    def _parse_template(self, format_string):
+        """Parse format_string into its literal text & field segments.
+
+        Don't call me directly - use the cached _get_template() instead.
+
+        Each segment is a tuple of
+        (literal_text, field_name, format_spec, conversion, recursion_spec).
+
+        A literal text segment has field_name None. A field segment has
+        literal_text None. Where the format_spec itself contains formatting
+        expressions, recursion_spec is None because the format_spec has to
+        expand on every formatting operation before it's possible to parse
+        the recursion spec from it.
+
+        Args:
+            format_string (str): Parse this string.
+
+        Returns:
+            tuple of segment tuples, in order. Empty tuple if format_string
+            is entirely literal text without any escaped braces, meaning
+            format_string formats to itself.
+        """
+        segments = []
+        for literal_text, field_name, format_spec, conversion in \
+                self.parse(format_string):
+
+            if literal_text:
+                segments.append((literal_text, None, None, None, None))
+
+            if field_name is not None:
+                recursion_spec = (
+                    None if '{' in format_spec or '}' in format_spec
+                    else RecursionSpec(format_spec))
+
+                segments.append((None, field_name, format_spec, conversion,
+                                 recursion_spec))
+
+        if len(segments) == 1 and segments[0][0] == format_string:
+            return ()
+
+        return tuple(segments)
 
     def _get_formatted_iterable(self, obj, args, kwargs, used_args, memo=None,
                                 is_recursive=False):
@@ -347,6 +422,9 @@ def _get_formatted_iterable(self, obj, args, kwargs, used_args, memo=None,
                 is_recursive=is_recursive)
         elif isinstance(obj, (bytes, bytearray)):
             new = obj
+        elif getattr(obj, CONSTANT_MARKER, False):
+            # nothing in here to format, only copy the containers.
+            new = self._copy_constant(obj, memo)
         elif isinstance(obj, Mapping):
             # dicts
             new = obj.__class__(
@@ -374,3 +452,158 @@ def _get_formatted_iterable(self, obj, args, kwargs, used_args, memo=None,
             memo[obj_id] = new
 
         return new
+
+    def _copy_constant(self, obj, memo):
+        """Copy the containers in obj without formatting anything.
+
+        Don't call me directly. Only for objects mark_constants() flagged as
+        constant, meaning there is nothing to format anywhere in obj.
+
+        Args:
+            obj (any type): Copy me.
+            memo (dict): Shared with _get_formatted_iterable to preserve
+                         references to the same object.
+
+        Returns:
+            New containers in the same structure as obj. Everything else
+            as is.
+        """
+        obj_id = id(obj)
+        already_done = memo.get(obj_id, None)
+        if already_done is not None:
+            return already_done
+
+        if ((self.passthrough_types
+             and isinstance(obj, self.passthrough_types))
+                or isinstance(obj, (str, bytes, bytearray))):
+            return obj
+        elif isinstance(obj, Mapping):
+            new = obj.__class__(
+                (k, self._copy_constant(v, memo)) for k, v in obj.items())
+        elif isinstance(obj, (Sequence, Set)):
+            new = obj.__class__(self._copy_constant(v, memo) for v in obj)
+        else:
+            return obj
+
+        memo[obj_id] = new
+        return new
+
+    def mark_constants(self, obj):
+        """Flag the containers in obj that contain nothing to format.
+
+        A container is constant when none of its keys & values, all the way
+        down, is a string containing a { or } or a special_type. Formatting a
+        constant container copies its structure as is without visiting each
+        value.
+
+        The flag is an attribute on the container, so this only flags types
+        that accept attributes, like the ruamel.yaml CommentedMap &
+        CommentedSeq. Built-in dict & list can't hold the flag, and format as
+        usual.
+
+        Only use this on objects that won't change after marking, such as a
+        freshly loaded pipeline definition. The flag does not update when the
+        container mutates, and copy.copy copies it. Use unmark_constants()
+        on anything that code outside of pypyr can get at & change, like the
+        values a step puts into context.
+
+        Args:
+            obj (any type): Walk through me & flag constant containers.
+
+        Returns:
+            bool: True if obj has nothing to format.
+        """
+        return self._mark_constants(obj, {})
+
+    def _mark_constants(self, obj, memo):
+        """Recursively flag constant containers in obj. Use mark_constants().
+
+        Args:
+            obj (any type): Walk through me & flag constant containers.
+            memo (dict): id: is_constant of containers already visited.
+
+        Returns:
+            bool: True if obj has nothing to format.
+        """
+        if self.passthrough_types and isinstance(obj, self.passthrough_types):
+            return True
+
+        if self.special_types and isinstance(obj, self.special_types):
+            return False
+
+        if isinstance(obj, str):
+            return '{' not in obj and '}' not in obj
+
+        if isinstance(obj, (bytes, bytearray)):
+            return True
+
+        if isinstance(obj, Mapping):
+            children = [c for kv in obj.items() for c in kv]
+        elif isinstance(obj, (Sequence, Set)):
+            children = obj
+        else:
+            # int, float, bool, None etc. format as is.
+            return True
+
+        obj_id = id(obj)
+        if obj_id in memo:
+            return memo[obj_id]
+
+        # recursive references stay unmarked.
+        memo[obj_id] = False
+
+        # visit every child so that nested constant containers get flagged
+        # even if a sibling is not constant.
+        is_constant = all([self._mark_constants(c, memo) for c in children])
+
+        if is_constant:
+            try:
+                setattr(obj, CONSTANT_MARKER, True)
+            except AttributeError:
+                # built-ins like dict & list don't take attributes.
+                pass
+
+        memo[obj_id] = is_constant
+        return is_constant
+
+
+def unmark_constants(obj):
+    """Remove the flags mark_constants() set on obj & everything in it.
+
+    Formatting then visits every value in obj again, so it's safe to change
+    obj after this.
+
+    Args:
+        obj (any type): Walk through me & remove the flags.
+    """
+    _unmark_constants(obj, set())
+
+
+def _unmark_constants(obj, memo):
+    """Recursively remove constant flags. Use unmark_constants().
+
+    Args:
+        obj (any type): Walk through me & remove the flags.
+        memo (set): ids of containers already visited.
+    """
+    if isinstance(obj, (str, bytes, bytearray)):
+        return
+
+    if isinstance(obj, Mapping):
+        children = [c for kv in obj.items() for c in kv]
+    elif isinstance(obj, (Sequence, Set)):
+        children = obj
+    else:
+        return
+
+    obj_id = id(obj)
+    if obj_id in memo:
+        return
+
+    memo.add(obj_id)
+
+    if getattr(obj, CONSTANT_MARKER, False):
+        setattr(obj, CONSTANT_MARKER, False)
+
+    for child in children:
+        _unmark_constants(child, memo)
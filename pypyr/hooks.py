@@ -0,0 +1,533 @@
+"""Lifecycle hooks that observe a pipeline run as it happens.
+
+A hook is any object with one or more of these methods. Each gets a single
+HookEvent argument:
+    - before_pipeline / after_pipeline: a pipeline, including every child
+      pipeline from pypyr.steps.pype.
+    - before_step_group / after_step_group: a step-group.
+    - before_step / after_step: a step.
+    - before_iteration / after_iteration: a foreach, while or retry
+      decorator iteration. event.kind says which.
+    - on_error: a step raised an error, whether or not it swallows it.
+    - on_subprocess: a subprocess from pypyr.subproc or pypyr.aio.subproc
+      finished. event.returncode is its exit code.
+    - on_reload: pypyr.cache.filecache dropped a pipeline file because it
+      changed on disk, so it reloads. event.name is the path & event.reason
+      is changed or missing.
+
+The after_ events always run, also when the scope raised, in which case
+event.exception is the error. This includes control-of-flow instructions
+like jump & stop. The before_ & after_ of the same scope get the same
+HookEvent instance.
+
+Register hooks for every run in the process with the API:
+    from pypyr.hooks import hooks
+    hooks.register(MyHooks())
+
+Or only for the runs that start in a with block on the current thread or
+asyncio task, so that runs on other threads at the same time don't see them:
+    with hooks.registered(MyHooks()):
+        pipeline.run(context)
+
+Or by name in config, as 'package.module.attribute'. If the attribute is a
+class, pypyr instantiates it once without arguments:
+    hooks:
+      - mypackage.metrics.MetricsHooks
+
+pypyr resolves the hooks once at the start of every run into a RunHooks that
+belongs to that run alone, so hooks you register during a run apply from the
+next run, and runs at the same time in one process don't mix their hooks.
+The run's RunHooks follows it into child pipelines & the threads of parallel
+step-groups, needs & parallel foreach. When there are no hooks & neither
+pypyr.trace nor pypyr.profiler is on, RunHooks.observed is False & the
+instrumented points run the plain code without any wrappers.
+
+An error in a hook logs & does not stop the pipeline. Hooks run on the
+thread that runs the step, so parallel step-groups, needs & parallel
+foreach call hooks from more than one thread at the same time. Iterations
+that run in a worker process for parallel foreach process mode don't call
+the hooks of the main process.
+
+Attributes:
+    hooks: Global instance of the Hooks registry. Use this attribute to
+           access the hooks from elsewhere.
+"""
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+import logging
+import threading
+import time
+
+from pypyr.config import config
+from pypyr.errors import ConfigError
+import pypyr.moduleloader
+from pypyr.profiler import profiler
+from pypyr.trace import tracer
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# shared & re-entrant, so no hooks costs nothing per scope.
+_NULL_SCOPE = nullcontext()
+
+# hooks from Hooks.registered() for runs that start on this thread or task.
+_scoped_hooks = ContextVar('pypyr_scoped_hooks', default=())
+
+# kind: (before method name, after method name)
+_SCOPE_EVENTS = {
+    'pipeline': ('before_pipeline', 'after_pipeline'),
+    'step-group': ('before_step_group', 'after_step_group'),
+    'step': ('before_step', 'after_step'),
+    'foreach': ('before_iteration', 'after_iteration'),
+    'while': ('before_iteration', 'after_iteration'),
+    'retry': ('before_iteration', 'after_iteration'),
+}
+
+EVENTS = ('before_pipeline', 'after_pipeline',
+          'before_step_group', 'after_step_group',
+          'before_step', 'after_step',
+          'before_iteration', 'after_iteration',
+          'on_error',
+          'on_subprocess',
+          'on_reload')
+
+
+class HookEvent():
+    """What happened, passed to each hook method.
+
+    Attributes:
+        kind (str): pipeline, step-group, step, foreach, while, retry,
+            subprocess or reload.
+        name (str): Name of the pipeline, step-group or step. For an
+            iteration, the name of the step that loops. For a subprocess,
+            the cmd. For a reload, the path of the file.
+        line_no (int): Line number of the step in the pipeline yaml. None
+            for pipelines & step-groups.
+        context (pypyr.context.Context): The context the scope runs with.
+        iteration (Any): The foreach item, or the while or retry counter.
+            None if not an iteration.
+        duration (float): Wall-clock seconds the scope took. None in
+            before_ events.
+        exception (Exception): The error the scope raised, or the error of
+            on_error. None if no error.
+        swallowed (bool): For on_error, whether the step swallows the error.
+            Otherwise None.
+        returncode (int): For on_subprocess, the exit code. Otherwise None.
+        reason (str): For on_reload, changed or missing. Otherwise None.
+    """
+
+    __slots__ = ['kind', 'name', 'line_no', 'context', 'iteration',
+                 'duration', 'exception', 'swallowed', 'returncode',
+                 'reason']
+
+    def __init__(self, kind, name, line_no=None, context=None,
+                 iteration=None, exception=None, swallowed=None,
+                 returncode=None, reason=None):
+        """Initialize the event."""
+        self.kind = kind
+        self.name = name
+        self.line_no = line_no
+        self.context = context
+        self.iteration = iteration
+        self.duration = None
+        self.exception = exception
+        self.swallowed = swallowed
+        self.returncode = returncode
+        self.reason = reason
+
+
+class Hooks():
+    """Registry of lifecycle hooks.
+
+    resolve() turns the registered hooks into a RunHooks for a run.
+    """
+
+    def __init__(self):
+        """Initialize the registry with no hooks."""
+        self._registered = []
+        # name in config: loaded hook object
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def register(self, hook):
+        """Add hook for all runs. It applies from the next run.
+
+        Args:
+            hook (Any): Object with 1 or more hook methods.
+        """
+        with self._lock:
+            self._registered.append(hook)
+
+    def unregister(self, hook):
+        """Remove hook. It applies from the next run.
+
+        Args:
+            hook (Any): Hook added earlier with register().
+        """
+        with self._lock:
+            self._registered.remove(hook)
+
+    @contextmanager
+    def registered(self, hook):
+        """Add hook for the runs that start in the with block.
+
+        Only applies to runs on the current thread or asyncio task, so runs
+        that other threads start at the same time don't call hook.
+
+        Args:
+            hook (Any): Object with 1 or more hook methods.
+        """
+        token = _scoped_hooks.set(_scoped_hooks.get() + (hook,))
+        try:
+            yield hook
+        finally:
+            _scoped_hooks.reset(token)
+
+    def clear(self):
+        """Remove all hooks & loaded config hooks."""
+        with self._lock:
+            self._registered = []
+            self._loaded = {}
+
+    def resolve(self):
+        """Find the hook methods of config.hooks & the registered hooks.
+
+        Call this once at the start of a run, so that the instrumented
+        points don't have to look up anything.
+
+        Returns:
+            RunHooks: The hook methods for the run.
+        """
+        hook_objects = [self.get_config_hook(name)
+                        for name in config.hooks or ()]
+
+        with self._lock:
+            hook_objects.extend(self._registered)
+
+        hook_objects.extend(_scoped_hooks.get())
+
+        methods = {}
+        for event in EVENTS:
+            bound = tuple(method for method in
+                          (getattr(hook, event, None)
+                           for hook in hook_objects)
+                          if callable(method))
+            if bound:
+                methods[event] = bound
+
+        if methods:
+            logger.debug("resolved hooks for %s", list(methods))
+
+        return RunHooks(methods)
+
+    @contextmanager
+    def running(self):
+        """Resolve the hooks & make them the current run's in the with block.
+
+        Returns:
+            Context manager that gives the RunHooks.
+        """
+        run_hooks = self.resolve()
+        token = _run_hooks.set(run_hooks)
+        try:
+            yield run_hooks
+        finally:
+            _run_hooks.reset(token)
+
+    def get_config_hook(self, name):
+        """Load the hook object from config by name.
+
+        Loads once per name & keeps the object for later runs.
+
+        Args:
+            name (str): 'package.module.attribute'. If attribute is a class,
+                instantiate it without arguments.
+
+        Returns:
+            The hook object.
+        """
+        hook = self._loaded.get(name)
+        if hook is not None:
+            return hook
+
+        module_name, dot, attr_name = name.rpartition('.')
+        if not dot:
+            raise ConfigError(
+                f"hook '{name}' should be in format "
+                "'package.module.attribute'.")
+
+        module = pypyr.moduleloader.get_module(module_name)
+        try:
+            hook = getattr(module, attr_name)
+        except AttributeError as err:
+            raise ConfigError(
+                f"hook '{name}' not found: module '{module_name}' has no "
+                f"attribute '{attr_name}'.") from err
+
+        if isinstance(hook, type):
+            hook = hook()
+
+        self._loaded[name] = hook
+        return hook
+
+
+class RunHooks():
+    """The hook methods of one run.
+
+    Hooks.resolve() makes one at the start of a run. It doesn't change
+    after that, so runs at the same time only ever call their own hooks.
+
+    Attributes:
+        enabled (bool): True if the run has at least 1 hook method.
+        observed (bool): True if the run has hooks, or the tracer or the
+            profiler was on when the run started. If False, the
+            instrumented points skip all of them.
+    """
+
+    def __init__(self, methods=None):
+        """Initialize the run's hooks.
+
+        Args:
+            methods (dict): event name: tuple of bound hook methods. Default
+                None means no hooks.
+        """
+        # event name: tuple of bound hook methods
+        self._methods = methods or {}
+        self.enabled = bool(self._methods)
+        self.observed = self.enabled or tracer.enabled or profiler.enabled
+        self._local = threading.local()
+
+    def get_stack(self):
+        """Get the stack of running steps on the current thread.
+
+        Returns:
+            list[pypyr.dsl.Step]: The innermost running step is last.
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        return stack
+
+    def pipeline(self, pipeline, context):
+        """Get a context manager that runs the pipeline hooks.
+
+        Args:
+            pipeline (pypyr.pipeline.Pipeline): The pipeline about to run.
+            context (pypyr.context.Context): The pipeline's context.
+
+        Returns:
+            Context manager. Does nothing if there are no hooks.
+        """
+        if not self.enabled:
+            return _NULL_SCOPE
+
+        return self._get_scope(HookEvent('pipeline', pipeline.name,
+                                         context=context))
+
+    def step_group(self, name, context):
+        """Get a context manager that runs the step-group hooks.
+
+        Args:
+            name (str): The step-group about to run.
+            context (pypyr.context.Context): The step-group's context.
+
+        Returns:
+            Context manager. Does nothing if there are no hooks.
+        """
+        if not self.enabled:
+            return _NULL_SCOPE
+
+        return self._get_scope(HookEvent('step-group', name, context=context))
+
+    def step(self, step, context):
+        """Get a context manager that runs the step hooks.
+
+        Args:
+            step (pypyr.dsl.Step): The step about to run.
+            context (pypyr.context.Context): The step's context.
+
+        Returns:
+            Context manager. Does nothing if there are no hooks.
+        """
+        if not self.enabled:
+            return _NULL_SCOPE
+
+        return _StepScope(self,
+                          HookEvent('step', step.name, step.line_no, context),
+                          step)
+
+    def iteration(self, kind, iteration, context, step=None):
+        """Get a context manager that runs the iteration hooks.
+
+        Args:
+            kind (str): foreach, while or retry.
+            iteration (Any): The foreach item or the while or retry counter.
+            context (pypyr.context.Context): The iteration's context.
+            step (pypyr.dsl.Step): The step that loops. Default None means
+                the innermost running step on the current thread.
+
+        Returns:
+            Context manager. Does nothing if there are no hooks.
+        """
+        if not self.enabled:
+            return _NULL_SCOPE
+
+        if step is None:
+            stack = self.get_stack()
+            step = stack[-1] if stack else None
+
+        if step is None:
+            name = line_no = None
+        else:
+            name = step.name
+            line_no = step.line_no
+
+        return self._get_scope(HookEvent(kind, name, line_no, context,
+                                         iteration))
+
+    def error(self, step, context, exception, swallowed):
+        """Run the on_error hooks.
+
+        Args:
+            step (pypyr.dsl.Step): The step that raised.
+            context (pypyr.context.Context): The step's context.
+            exception (Exception): The error.
+            swallowed (bool): Whether the step swallows the error.
+        """
+        if not self.enabled:
+            return
+
+        methods = self._methods.get('on_error')
+        if methods:
+            self.call(methods, HookEvent('step', step.name, step.line_no,
+                                         context, exception=exception,
+                                         swallowed=swallowed))
+
+    def subprocess(self, cmd, returncode):
+        """Run the on_subprocess hooks.
+
+        Args:
+            cmd (str): The subprocess cmd as the user set it.
+            returncode (int): The subprocess exit code.
+        """
+        if not self.enabled:
+            return
+
+        methods = self._methods.get('on_subprocess')
+        if methods:
+            self.call(methods, HookEvent('subprocess', cmd,
+                                         returncode=returncode))
+
+    def reload(self, path, reason):
+        """Run the on_reload hooks.
+
+        Args:
+            path (str): The pipeline file that reloads.
+            reason (str): changed or missing.
+        """
+        if not self.enabled:
+            return
+
+        methods = self._methods.get('on_reload')
+        if methods:
+            self.call(methods, HookEvent('reload', path, reason=reason))
+
+    def call(self, methods, event):
+        """Call each hook method with event. Log & continue on error.
+
+        Args:
+            methods (tuple[callable]): Hook methods.
+            event (HookEvent): Pass this to each method.
+        """
+        for method in methods:
+            try:
+                method(event)
+            except Exception as err:
+                logger.error("hook %s failed on %s %s: %s",
+                             getattr(method, '__qualname__', method),
+                             event.kind, event.name, err)
+
+    def _get_scope(self, event):
+        """Get a scope that calls the before & after methods of event.kind.
+
+        Args:
+            event (HookEvent): The event of the scope.
+
+        Returns:
+            _HookScope.
+        """
+        before, after = _SCOPE_EVENTS[event.kind]
+        return _HookScope(self, event,
+                          self._methods.get(before),
+                          self._methods.get(after))
+
+
+# the RunHooks of the current run. Outside of a run, nothing observes.
+_run_hooks = ContextVar('pypyr_run_hooks', default=RunHooks())
+
+
+class _HookScope():
+    """Call the before & after hooks around the with block."""
+
+    __slots__ = ['hooks', 'event', 'before', 'after', 'start']
+
+    def __init__(self, hooks, event, before, after):
+        self.hooks = hooks
+        self.event = event
+        self.before = before
+        self.after = after
+        self.start = 0.0
+
+    def __enter__(self):
+        if self.before:
+            self.hooks.call(self.before, self.event)
+
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event = self.event
+        event.duration = time.perf_counter() - self.start
+        event.exception = exc_value
+
+        if self.after:
+            self.hooks.call(self.after, event)
+
+        return False
+
+
+class _StepScope(_HookScope):
+    """Step hooks that also track the running step for iterations."""
+
+    __slots__ = ['step']
+
+    def __init__(self, hooks, event, step):
+        super().__init__(hooks, event,
+                         hooks._methods.get('before_step'),
+                         hooks._methods.get('after_step'))
+        self.step = step
+
+    def __enter__(self):
+        self.hooks.get_stack().append(self.step)
+        return super().__enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            return super().__exit__(exc_type, exc_value, traceback)
+        finally:
+            self.hooks.get_stack().pop()
+
+
+def get_run_hooks():
+    """Get the hooks of the run on the current thread or asyncio task.
+
+    Returns:
+        RunHooks: The current run's. Outside of a run, RunHooks without any
+            hooks that isn't observed.
+    """
+    return _run_hooks.get()
+
+
+# global instance of the hooks. use this to access it from elsewhere.
+hooks = Hooks()
@@ -3,6 +3,7 @@
 from pathlib import Path
 
 from pypyr.cache.filecache import file_cache
+from pypyr.cache.pipelinecache import pipeline_cache
 from pypyr.config import config
 from pypyr.errors import PipelineNotFoundError
 from pypyr.moduleloader import add_sys_path
@@ -160,12 +161,39 @@ def get_pipeline_definition(pipeline_name, parent):
     return pipeline_definition
 
 
+def is_pipeline_current(pipeline_definition):
+    """Check whether the pipeline file changed since it loaded.
+
+    Only checks if config.file_cache_revalidate_interval is set. See
+    pypyr.cache.filecache.
+
+    Args:
+        pipeline_definition (PipelineDefinition): From an earlier call to
+            get_pipeline_definition.
+
+    Returns:
+        bool: False if the pipeline should load again.
+    """
+    if config.file_cache_revalidate_interval is None:
+        return True
+
+    path = getattr(pipeline_definition.info, 'path', None)
+    if path is None:
+        return True
+
+    return file_cache.is_current(str(path), pipeline_definition)
+
+
 def load_pipeline_from_file(path):
     """Load pipeline yaml from path on disk.
 
     Initialize a PipelineFileInfo for the pipeline with file loader specific
     properties.
 
+    If config.pipeline_cache is on, gets the parsed pipeline from the on-disk
+    pipeline cache if the file didn't change since it was saved, and saves
+    it there if not.
+
     Args:
         path (Path-like): path to pipeline
 
@@ -178,28 +206,36 @@ def load_pipeline_from_file(path):
     """
     logger.debug("starting")
 
-    try:
-        with open(path, encoding=config.default_encoding) as yaml_file:
-            pipeline_yaml = pypyr.yaml.get_pipeline_yaml(yaml_file)
-    except FileNotFoundError:
-        # this can only happen if file disappears between get_pipeline_path
-        # & here, so pretty edge
-        logger.error(
-            "Couldn't open the pipeline. Looking for a file here: %s", path)
-        raise
-
     # since path itself resolved, parent also already resolved.
     parent_dir = path.parent
 
-    add_sys_path(parent_dir)
+    # stamp before reading, so a change while reading makes it stale.
+    stamp = pipeline_cache.get_stamp(path)
+    pipeline_definition = pipeline_cache.get(path, stamp)
 
-    info = PipelineFileInfo(pipeline_name=path.name,
-                            parent=parent_dir,
-                            loader=__name__,
-                            path=path)
+    if pipeline_definition is None:
+        try:
+            with open(path, encoding=config.default_encoding) as yaml_file:
+                pipeline_yaml = pypyr.yaml.get_pipeline_yaml(yaml_file)
+        except FileNotFoundError:
+            # this can only happen if file disappears between
+            # get_pipeline_path & here, so pretty edge
+            logger.error(
+                "Couldn't open the pipeline. Looking for a file here: %s",
+                path)
+            raise
 
-    pipeline_definition = PipelineDefinition(pipeline=pipeline_yaml,
-                                             info=info)
+        info = PipelineFileInfo(pipeline_name=path.name,
+                                parent=parent_dir,
+                                loader=__name__,
+                                path=path)
+
+        pipeline_definition = PipelineDefinition(pipeline=pipeline_yaml,
+                                                 info=info)
+
+        pipeline_cache.set(path, stamp, pipeline_definition)
+
+    add_sys_path(parent_dir)
 
     logger.debug("done")
     return pipeline_definition
@@ -0,0 +1,289 @@
+"""Report which context keys use the most memory & which steps grew them.
+
+MemoryReport is a lifecycle hook that measures the deep size of every
+top-level key in the context after each step, and compares it to the sizes
+after the previous step on that same context. The report lists:
+    - keys: the top-level keys with the largest peak size, with the step
+      where each peaked & its size at the end of the run.
+    - steps: the steps that grew the context the most, with the keys that
+      grew.
+
+Steps are identified by pipeline, step name & yaml line number. A step that
+runs more than once, like in a loop, adds up across its runs.
+
+Sizes are estimates from pypyr.utils.memory.get_deep_size. Each key counts
+on its own, so an object that more than one key references counts in each.
+
+Measuring walks the entire context after every step, so this is for
+finding out where memory goes, not for everyday runs. To see the sizes at a
+chosen step only, use pypyr.steps.debug with memory: True.
+
+Measures with the lifecycle hooks in pypyr.hooks, so the same caveats
+apply: steps that run in a worker process for parallel foreach process mode
+don't count.
+"""
+from contextlib import contextmanager
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+import threading
+
+from pypyr.hooks import hooks
+from pypyr.utils.memory import get_deep_size
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# how many keys & steps the report logs.
+DEFAULT_TOP = 10
+
+
+class MemoryReport():
+    """Lifecycle hooks that measure context key sizes after each step.
+
+    Attributes:
+        top (int): How many keys & steps to log in the summary.
+    """
+
+    def __init__(self, top=DEFAULT_TOP):
+        """Initialize with nothing measured."""
+        self.top = top
+        # id(context): {key: size} after the last step on that context.
+        self._last = {}
+        # id(context): how many running pipelines use that context.
+        self._users = {}
+        # key: [peak size, step label at peak, last size]
+        self._keys = {}
+        # step label: [runs, growth, {key: growth}]
+        self._steps = {}
+        self._lock = threading.Lock()
+
+    def before_pipeline(self, event):
+        """Measure the context as the pipeline starts, as the baseline."""
+        context = event.context
+        if context is None:
+            return
+
+        context_id = id(context)
+        with self._lock:
+            users = self._users.get(context_id, 0)
+            self._users[context_id] = users + 1
+            if users:
+                # child pipeline that shares its parent's context.
+                return
+
+        sizes = get_key_sizes(context)
+        with self._lock:
+            self._last.setdefault(context_id, sizes)
+
+    def after_step(self, event):
+        """Measure the context & record how each key changed."""
+        context = event.context
+        if context is None:
+            return
+
+        label = get_step_label(event)
+        sizes = get_key_sizes(context)
+
+        with self._lock:
+            before = self._last.get(id(context), {})
+            self._last[id(context)] = sizes
+
+            step = self._steps.get(label)
+            if step is None:
+                step = self._steps[label] = [0, 0, {}]
+
+            step[0] += 1
+            step_keys = step[2]
+
+            for key in sizes.keys() | before.keys():
+                delta = sizes.get(key, 0) - before.get(key, 0)
+                if delta:
+                    step[1] += delta
+                    step_keys[key] = step_keys.get(key, 0) + delta
+
+            for key, size in sizes.items():
+                key_stats = self._keys.get(key)
+                if key_stats is None:
+                    self._keys[key] = [size, label, size]
+                else:
+                    key_stats[2] = size
+                    if size > key_stats[0]:
+                        key_stats[0] = size
+                        key_stats[1] = label
+
+            for key in before.keys() - sizes.keys():
+                key_stats = self._keys.get(key)
+                if key_stats is not None:
+                    key_stats[2] = 0
+
+    def after_pipeline(self, event):
+        """Forget the context once no running pipeline uses it."""
+        if event.context is None:
+            return
+
+        context_id = id(event.context)
+        with self._lock:
+            users = self._users.get(context_id, 0) - 1
+            if users > 0:
+                self._users[context_id] = users
+            else:
+                self._users.pop(context_id, None)
+                self._last.pop(context_id, None)
+
+    def get_report(self):
+        """Get everything measured so far, largest first.
+
+        Returns:
+            dict with keys:
+                keys: list of dict with key, peak_bytes, peak_step &
+                    last_bytes, largest peak first.
+                steps: list of dict with pipeline, step, line, runs,
+                    growth_bytes & keys, where keys is {key: growth_bytes},
+                    largest growth first.
+        """
+        with self._lock:
+            keys = [{'key': key,
+                     'peak_bytes': peak,
+                     'peak_step': format_step_label(label),
+                     'last_bytes': last}
+                    for key, (peak, label, last) in self._keys.items()]
+
+            steps = [{'pipeline': label[0],
+                      'step': label[1],
+                      'line': label[2],
+                      'runs': runs,
+                      'growth_bytes': growth,
+                      'keys': dict(sorted(step_keys.items(),
+                                          key=lambda item: -item[1]))}
+                     for label, (runs, growth, step_keys)
+                     in self._steps.items()]
+
+        keys.sort(key=lambda item: -item['peak_bytes'])
+        steps.sort(key=lambda item: -item['growth_bytes'])
+
+        return {'keys': keys, 'steps': steps}
+
+    def log_summary(self, report):
+        """Log the top keys & steps of report at NOTIFY.
+
+        Args:
+            report (dict): The dict from get_report().
+        """
+        lines = ['largest context keys:']
+        for item in report['keys'][:self.top]:
+            lines.append(f"  {item['key']}: peak {item['peak_bytes']} bytes "
+                         f"after {item['peak_step']}, "
+                         f"{item['last_bytes']} bytes at end.")
+
+        lines.append('steps that grew the context most:')
+        for item in report['steps'][:self.top]:
+            if item['growth_bytes'] <= 0:
+                break
+
+            label = format_step_label(
+                (item['pipeline'], item['step'], item['line']))
+            grew = ', '.join(f'{key} {delta:+}'
+                             for key, delta in item['keys'].items()
+                             if delta > 0)
+            lines.append(f"  {label}: {item['growth_bytes']:+} bytes over "
+                         f"{item['runs']} runs ({grew}).")
+
+        logger.notify('\n'.join(lines))
+
+    def save(self, path):
+        """Atomically save the report as json to path.
+
+        Args:
+            path (Path-like): Write the report here. Creates parent dirs if
+                they don't exist.
+
+        Returns:
+            dict: The saved report.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        report = self.get_report()
+        text = json.dumps(report, indent=2, default=str)
+
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                file.write(text)
+
+            os.replace(temp_path, path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+        logger.debug("saved memory report to %s", path)
+        return report
+
+
+def get_key_sizes(context, keys=None):
+    """Get the estimated deep size of each top-level key in context.
+
+    Args:
+        context (dict): Measure the keys of this.
+        keys (Iterable): Only measure these keys. Default None means all.
+
+    Returns:
+        dict: {key: size in bytes}, largest first.
+    """
+    if keys is None:
+        items = list(context.items())
+    else:
+        items = [(key, context[key]) for key in keys]
+
+    sizes = [(key, get_deep_size(value)) for key, value in items]
+    sizes.sort(key=lambda item: -item[1])
+    return dict(sizes)
+
+
+def get_step_label(event):
+    """Get the (pipeline, step, line) that identifies the step of event.
+
+    Args:
+        event (pypyr.hooks.HookEvent): Event of a step.
+
+    Returns:
+        tuple: (pipeline name, step name, line number).
+    """
+    pipeline = getattr(event.context, 'current_pipeline', None)
+    return (pipeline.name if pipeline else '', event.name, event.line_no)
+
+
+def format_step_label(label):
+    """Format a (pipeline, step, line) label for humans.
+
+    Args:
+        label (tuple): (pipeline name, step name, line number).
+
+    Returns:
+        str: Like 'pipe/pypyr.steps.set:3'.
+    """
+    pipeline, step, line = label
+    return f'{pipeline}/{step}:{line}'
+
+
+@contextmanager
+def reporting(path):
+    """Measure context memory for runs in the with block & save on exit.
+
+    Hooks resolve when a run starts, so start reporting before the run.
+    Only runs that start on the current thread or asyncio task measure, so
+    other runs in the process at the same time don't mix in.
+
+    Args:
+        path (Path-like): Save the report here as json.
+    """
+    memory_report = MemoryReport()
+    try:
+        with hooks.registered(memory_report):
+            yield memory_report
+    finally:
+        report = memory_report.save(path)
+        memory_report.log_summary(report)
+        logger.notify("saved memory report to %s", path)
@@ -0,0 +1,281 @@
+"""Save pipeline metrics in Prometheus text exposition format.
+
+The metrics file suits the node_exporter textfile collector, so that
+cron-driven & batch runs can report how they did without parsing logs. The
+metrics are:
+    - pypyr_pipeline_duration_seconds: histogram of wall-clock seconds per
+      pipeline, including every child pipeline from pypyr.steps.pype.
+    - pypyr_step_duration_seconds: histogram of wall-clock seconds per step.
+    - pypyr_step_iterations_total: foreach & while iterations per step.
+    - pypyr_step_retries_total: retry decorator re-runs per step. The first
+      attempt does not count.
+    - pypyr_step_swallowed_errors_total: errors the swallow decorator
+      ignored per step.
+    - pypyr_subprocesses_total: subprocesses from pypyr.subproc &
+      pypyr.aio.subproc by exit code.
+
+Steps are identified by pipeline, step name & yaml line number.
+
+Metrics collect with the lifecycle hooks in pypyr.hooks, so the same caveats
+apply: iterations that run in a worker process for parallel foreach process
+mode don't count.
+
+The file saves once at the end of the run, to a temp file that then renames
+over path, so the collector never reads a partially written file.
+"""
+from contextlib import contextmanager
+import logging
+import os
+from pathlib import Path
+import tempfile
+import threading
+
+from pypyr.hooks import hooks
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# seconds. prometheus client defaults, stretched out for batch runs.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+# metric name: (type, help)
+_FAMILIES = {
+    'pypyr_pipeline_duration_seconds': (
+        'histogram', 'Wall-clock seconds each pipeline took.'),
+    'pypyr_step_duration_seconds': (
+        'histogram', 'Wall-clock seconds each step took.'),
+    'pypyr_step_iterations_total': (
+        'counter', 'Foreach & while iterations of each step.'),
+    'pypyr_step_retries_total': (
+        'counter', 'Retry decorator re-runs of each step.'),
+    'pypyr_step_swallowed_errors_total': (
+        'counter', 'Errors the swallow decorator ignored in each step.'),
+    'pypyr_subprocesses_total': (
+        'counter', 'Subprocesses that finished, by exit code.'),
+}
+
+
+class Metrics():
+    """Lifecycle hooks that tally durations & counts for a run.
+
+    Attributes:
+        buckets (tuple[float]): Upper bounds of the histogram buckets in
+            seconds, ascending.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Initialize with nothing collected."""
+        self.buckets = buckets
+        # metric name: {labels: [bucket counts..., sum, count]}
+        self._histograms = {}
+        # metric name: {labels: count}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def after_pipeline(self, event):
+        """Observe the pipeline duration."""
+        self.observe('pypyr_pipeline_duration_seconds',
+                     (('pipeline', event.name),),
+                     event.duration)
+
+    def after_step(self, event):
+        """Observe the step duration."""
+        self.observe('pypyr_step_duration_seconds',
+                     get_step_labels(event),
+                     event.duration)
+
+    def after_iteration(self, event):
+        """Count foreach & while iterations, and retries."""
+        if event.kind == 'retry':
+            # counter starts at 1, & the 1st attempt isn't a retry.
+            if event.iteration > 1:
+                self.increment('pypyr_step_retries_total',
+                               get_step_labels(event))
+        else:
+            self.increment('pypyr_step_iterations_total',
+                           get_step_labels(event) + (('kind', event.kind),))
+
+    def on_error(self, event):
+        """Count swallowed errors."""
+        if event.swallowed:
+            self.increment('pypyr_step_swallowed_errors_total',
+                           get_step_labels(event))
+
+    def on_subprocess(self, event):
+        """Count subprocesses by exit code."""
+        self.increment('pypyr_subprocesses_total',
+                       (('exit_code', event.returncode),))
+
+    def observe(self, name, labels, value):
+        """Add value to the histogram name with labels.
+
+        Args:
+            name (str): Metric name.
+            labels (tuple[tuple[str, Any]]): (label name, value) pairs.
+            value (float): The observed value.
+        """
+        with self._lock:
+            histogram = self._histograms.setdefault(name, {})
+            counts = histogram.get(labels)
+            if counts is None:
+                counts = histogram[labels] = [0] * (len(self.buckets) + 2)
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+
+            counts[-2] += value
+            counts[-1] += 1
+
+    def increment(self, name, labels):
+        """Add 1 to the counter name with labels.
+
+        Args:
+            name (str): Metric name.
+            labels (tuple[tuple[str, Any]]): (label name, value) pairs.
+        """
+        with self._lock:
+            counter = self._counters.setdefault(name, {})
+            counter[labels] = counter.get(labels, 0) + 1
+
+    def get_text(self):
+        """Get everything collected so far in Prometheus text format.
+
+        Returns:
+            str: Text exposition format. Empty if nothing collected.
+        """
+        lines = []
+        with self._lock:
+            for name, (metric_type, help_text) in _FAMILIES.items():
+                if metric_type == 'histogram':
+                    series = self._histograms.get(name)
+                else:
+                    series = self._counters.get(name)
+
+                if not series:
+                    continue
+
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {metric_type}')
+
+                for labels, value in series.items():
+                    if metric_type == 'histogram':
+                        self._add_histogram_lines(lines, name, labels, value)
+                    else:
+                        lines.append(
+                            f'{name}{format_labels(labels)} {value}')
+
+        return ''.join(f'{line}\n' for line in lines)
+
+    def _add_histogram_lines(self, lines, name, labels, counts):
+        """Append the bucket, sum & count lines of one histogram series."""
+        for bound, count in zip(self.buckets, counts):
+            bucket_labels = labels + (('le', float(bound)),)
+            lines.append(
+                f'{name}_bucket{format_labels(bucket_labels)} {count}')
+
+        lines.append(
+            f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} '
+            f'{counts[-1]}')
+        lines.append(f'{name}_sum{format_labels(labels)} {counts[-2]}')
+        lines.append(f'{name}_count{format_labels(labels)} {counts[-1]}')
+
+    def save(self, path):
+        """Atomically save everything collected so far to path.
+
+        Args:
+            path (Path-like): Write the metrics file here. Creates parent
+                dirs if they don't exist.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        text = self.get_text()
+
+        # write to temp & rename, so the collector never sees a partial file.
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                file.write(text)
+
+            # mkstemp is owner only, but the collector might be another user.
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+        logger.debug("saved metrics to %s", path)
+
+
+def get_step_labels(event):
+    """Get the pipeline, step & line labels of a step hook event.
+
+    Args:
+        event (pypyr.hooks.HookEvent): Event of a step or its iteration.
+
+    Returns:
+        tuple[tuple[str, Any]]: (label name, value) pairs.
+    """
+    context = event.context
+    pipeline = getattr(context, 'current_pipeline', None)
+
+    return (('pipeline', pipeline.name if pipeline else ''),
+            ('step', event.name),
+            ('line', event.line_no))
+
+
+def format_labels(labels):
+    """Format labels as {name="value",...}, escaped for the text format.
+
+    Args:
+        labels (tuple[tuple[str, Any]]): (label name, value) pairs. None
+            values format as empty.
+
+    Returns:
+        str: The label set. Empty if no labels.
+    """
+    if not labels:
+        return ''
+
+    pairs = ','.join(f'{name}="{escape_label_value(value)}"'
+                     for name, value in labels)
+    return f'{{{pairs}}}'
+
+
+def escape_label_value(value):
+    """Escape backslash, double-quote & line feed in a label value.
+
+    Args:
+        value (Any): Label value. None is empty.
+
+    Returns:
+        str: The escaped value.
+    """
+    if value is None:
+        return ''
+
+    return (str(value)
+            .replace('\\', r'\\')
+            .replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+@contextmanager
+def collecting(path):
+    """Collect metrics for runs in the with block & save to path on exit.
+
+    Hooks resolve when a run starts, so start collecting before the run.
+    Only runs that start on the current thread or asyncio task collect, so
+    other runs in the process at the same time don't mix in.
+
+    Args:
+        path (Path-like): Save the metrics file here.
+    """
+    metrics = Metrics()
+    try:
+        with hooks.registered(metrics):
+            yield metrics
+    finally:
+        metrics.save(path)
+        logger.notify("saved metrics to %s", path)
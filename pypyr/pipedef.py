@@ -23,9 +23,16 @@ class PipelineDefinition():
     Attributes:
         pipeline (dict-like): The pipeline yaml body.
         info (PipelineInfo): Meta-data set by the loader for the pipeline.
+        compiled_step_groups (dict): Step-group name to its
+            pypyr.stepsrunner.CompiledStepGroup. The StepsRunner compiles each
+            step-group the first time it runs, so this is empty until then.
     """
 
-    __slots__ = ['pipeline', 'info']
+    __slots__ = ['pipeline', 'info', 'compiled_step_groups']
+
+    # compiled_step_groups is a run-time cache derived from pipeline, so it
+    # does not take part in equality.
+    _eq_exclude = frozenset(['compiled_step_groups'])
 
     def __init__(self, pipeline, info):
         """Initialize a pipeline definition.
@@ -36,6 +43,7 @@ def __init__(self, pipeline, info):
         """
         self.pipeline = pipeline
         self.info = info
+        self.compiled_step_groups = {}
 
     def __eq__(self, other):
         """Equality comparison checks Pipeline and info objects are equal."""
@@ -43,7 +51,7 @@ def __eq__(self, other):
 
         if type_self is type(other):
             all_slots = [p for c in type_self.__mro__ for p in getattr(
-                c, '__slots__', [])]
+                c, '__slots__', []) if p not in self._eq_exclude]
             return all(
                 getattr(self, s, id(self)) == getattr(other, s, id(other))
                 for s in all_slots)
@@ -22,6 +22,8 @@
 from pypyr.errors import Stop, StopPipeline, StopStepGroup
 import pypyr.moduleloader
 from pypyr.stepsrunner import StepsRunner
+from pypyr.hooks import get_run_hooks, hooks
+from pypyr.trace import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -60,6 +62,7 @@ class Pipeline():
         failure_group (str: Step-group name to run on pipeline failure.
             Default if not set is on_failure.
         py_dir (Path-like): Custom python modules resolve from this dir.
+        parallel_groups (bool): Default False. Run groups at the same time.
         pipeline_definition (pypyr.pipedef.PipelineDefinition): The pipeline
             definition (its body/yaml payload) and loader information. Set by
             run(), not init.
@@ -69,7 +72,7 @@ class Pipeline():
     """
 
     __slots__ = ['name', 'context_args', 'parse_input', 'loader', 'groups',
-                 'success_group', 'failure_group', 'py_dir',
+                 'success_group', 'failure_group', 'py_dir', 'parallel_groups',
                  'pipeline_definition', 'steps_runner']
 
     # region constructors
@@ -81,7 +84,8 @@ def __init__(self,
                  groups: list[str] | None = None,
                  success_group: str | None = None,
                  failure_group: str | None = None,
-                 py_dir: str | bytes | PathLike | None = None) -> None:
+                 py_dir: str | bytes | PathLike | None = None,
+                 parallel_groups: bool = False) -> None:
         """Initialize a Pipeline.
 
         Args:
@@ -98,6 +102,9 @@ def __init__(self,
             failure_group (str: Step-group name to run on pipeline failure.
                                 Default if not set is on_failure.
             py_dir (Path-like): Custom python modules resolve from this dir.
+            parallel_groups (bool): Run groups at the same time, each in its
+                own copy of context. success_group or failure_group runs
+                once all groups are done.
 
         Returns:
             None
@@ -110,6 +117,7 @@ def __init__(self,
         self.success_group = success_group
         self.failure_group = failure_group
         self.py_dir = py_dir
+        self.parallel_groups = parallel_groups
 
         # initialize here, but use later
         # not using a classmethod fromLoader factory style thing coz PipeDef
@@ -129,8 +137,9 @@ def new_pipe_and_args(
         groups: list[str] | None = None,
         success_group: str | None = None,
         failure_group: str | None = None,
-        py_dir: str | bytes | PathLike | None = None) -> tuple[Pipeline,
-                                                               dict | None]:
+        py_dir: str | bytes | PathLike | None = None,
+        parallel_groups: bool = False
+    ) -> tuple[Pipeline, dict | None]:
         """Return new Pipeline instance and dict_in args.
 
         Will initialize from config.shortcuts if arg `name` matches a shortcut.
@@ -164,6 +173,7 @@ def new_pipe_and_args(
             failure_group (str: Step-group name to run on pipeline failure.
                                 Default if not set is on_failure.
             py_dir (Path-like): Custom python modules resolve from this dir.
+            parallel_groups (bool): Run groups at the same time.
 
         Returns:
             New Pipeline instance, intialized from shortcut if name matches.
@@ -222,6 +232,7 @@ def new_pipe_and_args(
 
                 success_group = shortcut.get('success', success_group)
                 failure_group = shortcut.get('failure', failure_group)
+                parallel_groups = shortcut.get('parallel', parallel_groups)
                 loader = shortcut.get('loader', loader)
                 dir_str = shortcut.get('py_dir')
                 if dir_str:
@@ -243,7 +254,8 @@ def new_pipe_and_args(
                        groups=groups,
                        success_group=success_group,
                        failure_group=failure_group,
-                       py_dir=py_dir)
+                       py_dir=py_dir,
+                       parallel_groups=parallel_groups)
 
         logger.debug("done")
         return pipeline, dict_in
@@ -273,10 +285,14 @@ def run(self, context: Context) -> None:
         """
         logger.debug("starting")
 
-        try:
-            self.load_and_run_pipeline(context)
-        except Stop:
-            logger.debug("Stop: stopped pypyr")
+        # resolve once per run, so steps don't look hooks up every time. The
+        # resolved hooks belong to this run only, also when other runs in
+        # the same process run at the same time.
+        with hooks.running():
+            try:
+                self.load_and_run_pipeline(context)
+            except Stop:
+                logger.debug("Stop: stopped pypyr")
 
         logger.debug("done")
 
@@ -333,7 +349,13 @@ def load_and_run_pipeline(self, context, parent=None):
         # add current pipeline's info to the callstack & remove when pipeline
         # done.
         with context.pipeline_scope(self):
-            self._run_pipeline(context)
+            run_hooks = get_run_hooks()
+            if run_hooks.observed:
+                with tracer.span(self.name, 'pipeline'):
+                    with run_hooks.pipeline(self, context):
+                        self._run_pipeline(context)
+            else:
+                self._run_pipeline(context)
 
     def _run_pipeline(self, context):
         """Execute the internal implementation of the logic to run a pipeline.
@@ -372,9 +394,11 @@ def _run_pipeline(self, context):
                 success_group = config.default_success_group
                 failure_group = config.default_failure_group
 
+        pipeline_definition = self.pipeline_definition
         steps_runner = StepsRunner(
-            pipeline_body=self.pipeline_definition.pipeline,
-            context=context)
+            pipeline_body=pipeline_definition.pipeline,
+            context=context,
+            compiled_step_groups=pipeline_definition.compiled_step_groups)
 
         self.steps_runner = steps_runner
 
@@ -398,7 +422,8 @@ def _run_pipeline(self, context):
         try:
             steps_runner.run_step_groups(groups=groups,
                                          success_group=success_group,
-                                         failure_group=failure_group)
+                                         failure_group=failure_group,
+                                         parallel=self.parallel_groups)
         except StopPipeline:
             logger.debug("StopPipeline: stopped %s", self.name)
 
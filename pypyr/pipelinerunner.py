@@ -6,11 +6,19 @@
 """
 # can remove __future__ once py 3.10 the lowest supported version
 from __future__ import annotations
+from contextlib import ExitStack
 import logging
 from os import PathLike
 
+import pypyr.cache.admin
+from pypyr.config import config
 from pypyr.context import Context
 from pypyr.pipeline import Pipeline
+import pypyr.memoryreport
+import pypyr.metrics
+import pypyr.profiler
+import pypyr.sampler
+import pypyr.trace
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +32,16 @@ def run(
     success_group: str | None = None,
     failure_group: str | None = None,
     loader: str | None = None,
-    py_dir: str | bytes | PathLike | None = None
+    py_dir: str | bytes | PathLike | None = None,
+    parallel_groups: bool = False,
+    trace_path: str | bytes | PathLike | None = None,
+    profile: bool = False,
+    profile_path: str | bytes | PathLike | None = None,
+    metrics_path: str | bytes | PathLike | None = None,
+    cache_stats_path: str | bytes | PathLike | None = None,
+    memory_report_path: str | bytes | PathLike | None = None,
+    sample_path: str | bytes | PathLike | None = None,
+    sample_rate: float = pypyr.sampler.DEFAULT_RATE
 ) -> Context:
     """Run a pipeline. pypyr's entrypoint.
 
@@ -94,6 +111,37 @@ def run(
         loader (str): optional. Absolute name of pipeline loader module.
             If not specified will use pypyr.loaders.file.
         py_dir (Path-like): Custom python modules resolve from this dir.
+        parallel_groups (bool): Run groups at the same time, each on its own
+            thread & in its own copy of context. Once all groups are done,
+            their context changes merge back in groups order, according to
+            config.default_group_conflict. success_group or failure_group
+            then runs once.
+        trace_path (Path-like): Record how long each pipeline, step-group,
+            step, loop iteration & subprocess takes and save it to this path
+            in Chrome trace-event format. Open it in chrome://tracing or
+            https://ui.perfetto.dev. Default None means don't trace.
+        profile (bool): Time the cpu each step spends & log a table of the
+            steps that spend the most at NOTIFY.
+        profile_path (Path-like): Profile, also run the pipeline under
+            cProfile & save the raw cProfile stats to this path. Default None
+            means no cProfile.
+        metrics_path (Path-like): Save Prometheus metrics of pipeline & step
+            durations, loop iterations, retries, swallowed errors &
+            subprocess exit codes to this path once the run is done. Default
+            None means use config.metrics_path, if set.
+        cache_stats_path (Path-like): Save the hits, misses, creation time,
+            size & estimated memory of every pypyr cache to this path as
+            json once the run is done. Default None means don't save.
+        memory_report_path (Path-like): Measure the size of every context
+            key after each step & save the largest keys & the steps that
+            grew them to this path as json once the run is done. This slows
+            down the run. Default None means don't measure. See
+            pypyr.memoryreport.
+        sample_path (Path-like): Sample the call stacks of the running steps
+            & save them to this path in collapsed stack format for
+            flamegraph.pl once the run is done. Default None means don't
+            sample. See pypyr.sampler.
+        sample_rate (float): Samples per second for sample_path.
 
     Returns:
         pypyr.context.Context(): The pypyr context as it is after the pipeline
@@ -101,19 +149,44 @@ def run(
     """
     logger.debug("starting pypyr")
 
-    pipeline, args = Pipeline.new_pipe_and_args(name=pipeline_name,
-                                                context_args=args_in,
-                                                parse_input=parse_args,
-                                                dict_in=dict_in,
-                                                loader=loader,
-                                                groups=groups,
-                                                success_group=success_group,
-                                                failure_group=failure_group,
-                                                py_dir=py_dir)
+    pipeline, args = Pipeline.new_pipe_and_args(
+        name=pipeline_name,
+        context_args=args_in,
+        parse_input=parse_args,
+        dict_in=dict_in,
+        loader=loader,
+        groups=groups,
+        success_group=success_group,
+        failure_group=failure_group,
+        py_dir=py_dir,
+        parallel_groups=parallel_groups)
 
     context = Context(args) if args else Context()
 
-    pipeline.run(context)
+    with ExitStack() as stack:
+        if cache_stats_path:
+            stack.enter_context(
+                pypyr.cache.admin.saving_stats(cache_stats_path))
+
+        if trace_path:
+            stack.enter_context(pypyr.trace.tracing(trace_path))
+
+        if profile or profile_path:
+            stack.enter_context(pypyr.profiler.profiling(profile_path))
+
+        if sample_path:
+            stack.enter_context(
+                pypyr.sampler.sampling(sample_path, sample_rate))
+
+        metrics_path = metrics_path or config.metrics_path
+        if metrics_path:
+            stack.enter_context(pypyr.metrics.collecting(metrics_path))
+
+        if memory_report_path:
+            stack.enter_context(
+                pypyr.memoryreport.reporting(memory_report_path))
+
+        pipeline.run(context)
 
     logger.debug("pypyr done")
 
@@ -0,0 +1,342 @@
+"""Profile a pipeline run & attribute cpu time to the steps that spent it.
+
+The profiler keeps a per-step tally so that you can see which steps spend
+the time without having to read a call graph. The tally only times the
+steps, so it's cheap. The report comes from the tally alone.
+
+For function level detail, pass a stats path to profiling(). Only then does
+the run also execute under cProfile, which slows down every function call,
+& saves the raw pstats to that path.
+
+For every step, identified by pipeline, yaml line number & step name:
+    - calls: how many times the step ran.
+    - cumulative: cpu time from start to end of the step, including any
+      steps it runs, like with call or pype.
+    - self: cumulative, less the cumulative time of the steps it runs.
+    - module: the part of self spent inside the step module's run_step
+      function. The difference between self & module is pypyr's own work on
+      the step - decorators, formatting, loading & dispatch.
+
+Times are cpu time of the thread that runs the step, from time.thread_time.
+Waiting on i/o, sleeps or subprocesses doesn't count. Use pypyr.trace for
+wall-clock time. Foreach iterations that run on other threads or processes
+with the parallel decorator don't attribute to their step.
+
+The profiler is off unless you start it. When it's off, step() & module()
+return a shared do-nothing context manager. Steps don't even call step()
+unless the run is observed, see pypyr.hooks.RunHooks. A run is only observed
+if the profiler was on when it started, so start it before the run.
+
+Attributes:
+    profiler: Global instance of the StepProfiler. Use this attribute to
+              access the profiler from elsewhere.
+"""
+import cProfile
+from contextlib import contextmanager, nullcontext
+import logging
+import threading
+import time
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# show this many steps in each report table
+DEFAULT_TOP = 20
+
+# shared & re-entrant, so disabled profiling costs nothing per step.
+_NULL_SCOPE = nullcontext()
+
+
+class StepStats():
+    """Accumulated cpu time for one step.
+
+    Attributes:
+        pipeline_name (str): Name of the pipeline the step is in.
+        line_no (int): Line number of the step in the pipeline yaml.
+        name (str): Step name.
+        calls (int): Number of times the step ran.
+        cumulative (float): Seconds including nested steps.
+        self_time (float): Seconds excluding nested steps.
+        module (float): Seconds inside the step module, excluding nested
+            steps.
+    """
+
+    __slots__ = ['pipeline_name', 'line_no', 'name', 'calls', 'cumulative',
+                 'self_time', 'module']
+
+    def __init__(self, pipeline_name, line_no, name):
+        """Initialize the step stats with zero counts.
+
+        Args:
+            pipeline_name (str): Name of the pipeline the step is in.
+            line_no (int): Line number of the step in the pipeline yaml.
+            name (str): Step name.
+        """
+        self.pipeline_name = pipeline_name
+        self.line_no = line_no
+        self.name = name
+        self.calls = 0
+        self.cumulative = 0.0
+        self.self_time = 0.0
+        self.module = 0.0
+
+    @property
+    def location(self):
+        """Get human friendly pipeline:line step-name for the step."""
+        if self.pipeline_name is None:
+            return self.name
+
+        if self.line_no is None:
+            return f"{self.pipeline_name} {self.name}"
+
+        return f"{self.pipeline_name}:{self.line_no} {self.name}"
+
+
+class StepProfiler():
+    """Thread-safe tally of the cpu time each step spends.
+
+    Attributes:
+        enabled (bool): True while tallying steps.
+    """
+
+    def __init__(self):
+        """Initialize the profiler. It starts disabled."""
+        self.enabled = False
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def start(self):
+        """Start tallying steps. Discards anything tallied before."""
+        with self._lock:
+            self._stats = {}
+            self.enabled = True
+
+        logger.debug("step profiler started.")
+
+    def stop(self):
+        """Stop tallying steps."""
+        self.enabled = False
+        logger.debug("step profiler stopped.")
+
+    def step(self, step, context):
+        """Get a context manager that tallies the cpu time of step.
+
+        Args:
+            step (pypyr.dsl.Step): The step that is about to run.
+            context (pypyr.context.Context): The step's context, to find the
+                current pipeline.
+
+        Returns:
+            Context manager. Does nothing if the profiler is not enabled.
+        """
+        if not self.enabled:
+            return _NULL_SCOPE
+
+        pipeline = context.current_pipeline
+        key = (pipeline.name if pipeline else None, step.line_no, step.name)
+        return _StepScope(self, key)
+
+    def module(self):
+        """Get a context manager that tallies time in the step module.
+
+        Use this inside step(), around the call to the step module's
+        run_step function.
+
+        Returns:
+            Context manager. Does nothing if the profiler is not enabled.
+        """
+        if not self.enabled:
+            return _NULL_SCOPE
+
+        return _ModuleScope(self)
+
+    def get_stack(self):
+        """Get the stack of running step scopes on the current thread.
+
+        Returns:
+            list[_StepScope]: The innermost running step is last.
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        return stack
+
+    def add(self, key, cumulative, self_time, module):
+        """Add a completed step run to the tally.
+
+        Args:
+            key (tuple): (pipeline_name, line_no, name) of the step.
+            cumulative (float): Seconds including nested steps.
+            self_time (float): Seconds excluding nested steps.
+            module (float): Seconds inside the step module.
+        """
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StepStats(*key)
+
+            stats.calls += 1
+            stats.cumulative += cumulative
+            stats.self_time += self_time
+            stats.module += module
+
+    def get_stats(self):
+        """Get the tally for every step that ran.
+
+        Returns:
+            list[StepStats]: In order of the first time each step ran.
+        """
+        with self._lock:
+            return list(self._stats.values())
+
+    def get_report(self, top=DEFAULT_TOP):
+        """Get tables of the top steps by cumulative & by self time.
+
+        Args:
+            top (int): Show this many steps in each table.
+
+        Returns:
+            str: The report.
+        """
+        stats = self.get_stats()
+        if not stats:
+            return "profile: no steps ran."
+
+        by_cumulative = sorted(stats,
+                               key=lambda s: s.cumulative,
+                               reverse=True)[:top]
+        by_self = sorted(stats,
+                         key=lambda s: s.self_time,
+                         reverse=True)[:top]
+
+        return '\n'.join([
+            f"profile: top {len(by_cumulative)} steps by cumulative cpu time",
+            _get_table(by_cumulative),
+            '',
+            f"profile: top {len(by_self)} steps by self cpu time",
+            _get_table(by_self)])
+
+
+class _StepScope():
+    """Time a step & subtract its time from the step that runs it."""
+
+    __slots__ = ['profiler', 'key', 'start', 'children', 'module']
+
+    def __init__(self, profiler, key):
+        self.profiler = profiler
+        self.key = key
+        self.start = 0.0
+        # cumulative of the steps this step runs.
+        self.children = 0.0
+        self.module = 0.0
+
+    def __enter__(self):
+        self.profiler.get_stack().append(self)
+        self.start = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        cumulative = time.thread_time() - self.start
+        stack = self.profiler.get_stack()
+        stack.pop()
+        if stack:
+            stack[-1].children += cumulative
+
+        self.profiler.add(self.key,
+                          cumulative,
+                          cumulative - self.children,
+                          self.module)
+        return False
+
+
+class _ModuleScope():
+    """Time the step module, less the steps it runs itself."""
+
+    __slots__ = ['profiler', 'step_scope', 'start', 'children']
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.step_scope = None
+        self.start = 0.0
+        self.children = 0.0
+
+    def __enter__(self):
+        stack = self.profiler.get_stack()
+        if stack:
+            self.step_scope = stack[-1]
+            self.children = self.step_scope.children
+            self.start = time.thread_time()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        step_scope = self.step_scope
+        if step_scope:
+            elapsed = time.thread_time() - self.start
+            step_scope.module += elapsed - (step_scope.children
+                                            - self.children)
+
+        return False
+
+
+def _get_table(stats):
+    """Format stats as a fixed width table.
+
+    Args:
+        stats (list[StepStats]): Rows of the table.
+
+    Returns:
+        str: The table.
+    """
+    lines = [f"{'cumulative':>11} {'self':>10} {'module':>10} "
+             f"{'calls':>7}  step"]
+    lines.extend(f"{s.cumulative:>10.3f}s {s.self_time:>9.3f}s "
+                 f"{s.module:>9.3f}s {s.calls:>7}  {s.location}"
+                 for s in stats)
+    return '\n'.join(lines)
+
+
+@contextmanager
+def profiling(stats_path=None, top=DEFAULT_TOP):
+    """Profile the with block, then log the step report at NOTIFY.
+
+    If profiling is already on, like when the API runs a pipeline with
+    profiling from inside a profiled pipeline, leaves the outer profile to
+    report.
+
+    Args:
+        stats_path (Path-like): Also run the with block under cProfile &
+            save the raw cProfile stats here. Load them with pstats or a
+            viewer like snakeviz. Default None means no cProfile, only the
+            per-step tally.
+        top (int): Show this many steps in each report table.
+    """
+    if profiler.enabled:
+        logger.debug("already profiling, so the outer profile reports.")
+        yield profiler
+        return
+
+    # cProfile slows down every call, so only when something uses its data.
+    profile = cProfile.Profile() if stats_path else None
+    profiler.start()
+    try:
+        if profile:
+            profile.enable()
+        try:
+            yield profiler
+        finally:
+            if profile:
+                profile.disable()
+    finally:
+        profiler.stop()
+        logger.notify("%s", profiler.get_report(top))
+
+        if profile:
+            profile.dump_stats(stats_path)
+            logger.notify("saved profile stats to %s", stats_path)
+
+
+# global instance of the profiler. use this to access it from elsewhere.
+profiler = StepProfiler()
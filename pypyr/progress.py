@@ -0,0 +1,199 @@
+"""Report throughput & ETA of long foreach & while loops.
+
+The per-iteration log lines of foreach & while don't say how fast a loop is
+going. LoopProgress tallies the iterations as they finish & logs a progress
+line at NOTIFY every config.loop_progress_interval seconds:
+    - done: iterations so far, out of the total if known.
+    - elapsed: time since the loop started.
+    - rate: iterations per second.
+    - eta: estimated time to finish, if the total is known.
+    - slowest: the slowest iteration so far.
+
+The total is the length of the foreach items, if they have a length, or the
+while max. A while with only stop has no total, so no ETA.
+
+Loops that finish inside the interval never report, so short loops stay
+quiet. A loop that did report logs a summary line when it is done.
+
+Set config.loop_progress_interval to 0 or None to switch reporting off.
+"""
+import logging
+import time
+
+from pypyr.config import config
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+
+class LoopProgress():
+    """Tally loop iterations & report progress at intervals.
+
+    Call begin() & end() around each iteration, then finish() after the
+    loop.
+
+    Attributes:
+        kind (str): foreach or while.
+        name (str): Name of the step that loops.
+        total (int): Number of iterations expected. None if unknown.
+        interval (float): Seconds between progress reports.
+        count (int): Iterations done so far.
+        slowest (float): Seconds the slowest iteration took.
+        slowest_item (Any): The foreach item or while counter of the slowest
+            iteration.
+        reported (bool): True once the loop reported progress.
+    """
+
+    __slots__ = ['kind', 'name', 'total', 'interval', 'count', 'slowest',
+                 'slowest_item', 'reported', '_start', '_begin',
+                 '_next_report']
+
+    def __init__(self, kind, name, total, interval):
+        """Start timing the loop."""
+        self.kind = kind
+        self.name = name
+        self.total = total
+        self.interval = interval
+        self.count = 0
+        self.slowest = 0.0
+        self.slowest_item = None
+        self.reported = False
+
+        now = time.perf_counter()
+        self._start = now
+        self._begin = now
+        self._next_report = now + interval
+
+    def begin(self):
+        """Mark the start of an iteration."""
+        self._begin = time.perf_counter()
+
+    def end(self, item):
+        """Mark the end of an iteration & report if the interval is up.
+
+        Args:
+            item (Any): The foreach item or while counter of the iteration.
+        """
+        now = time.perf_counter()
+        self.count += 1
+
+        duration = now - self._begin
+        if duration > self.slowest:
+            self.slowest = duration
+            self.slowest_item = item
+
+        if now >= self._next_report:
+            self._next_report = now + self.interval
+            self.reported = True
+            logger.notify(self.get_report(now))
+
+    def finish(self):
+        """Log a summary if the loop reported progress along the way."""
+        if self.reported:
+            logger.notify(self.get_report(time.perf_counter(), done=True))
+
+    def get_report(self, now, done=False):
+        """Get a line that describes the progress so far.
+
+        Args:
+            now (float): time.perf_counter() at the time of the report.
+            done (bool): True if the loop is finished.
+
+        Returns:
+            str: The progress line.
+        """
+        elapsed = now - self._start
+        count = self.count
+        rate = count / elapsed if elapsed > 0 else 0.0
+
+        if self.total is None:
+            done_text = f"{count}"
+        else:
+            percent = count / self.total * 100 if self.total else 100.0
+            done_text = f"{count}/{self.total} ({percent:.1f}%)"
+
+        parts = [f"{self.kind} {self.name}: "
+                 f"{'done' if done else 'at'} {done_text} iterations in "
+                 f"{format_duration(elapsed)}, {rate:.1f}/s"]
+
+        if not done and self.total is not None and rate > 0:
+            remaining = max(self.total - count, 0) / rate
+            parts.append(f"eta {format_duration(remaining)}")
+
+        parts.append(f"slowest {self.slowest_item!r} took "
+                     f"{format_duration(self.slowest)}")
+
+        return ', '.join(parts) + '.'
+
+
+class _NullProgress():
+    """Do-nothing stand-in when progress reporting is off."""
+
+    __slots__ = []
+
+    def begin(self):
+        """Do nothing."""
+
+    def end(self, item):
+        """Do nothing."""
+
+    def finish(self):
+        """Do nothing."""
+
+
+# shared, so loops without reporting allocate nothing.
+_NULL_PROGRESS = _NullProgress()
+
+
+def get_loop_progress(kind, name, total=None):
+    """Get a progress reporter for a loop, starting now.
+
+    Args:
+        kind (str): foreach or while.
+        name (str): Name of the step that loops.
+        total (int): Number of iterations expected. None if unknown.
+
+    Returns:
+        LoopProgress. A do-nothing stand-in if config.loop_progress_interval
+        is 0 or None.
+    """
+    interval = config.loop_progress_interval
+    if not interval:
+        return _NULL_PROGRESS
+
+    return LoopProgress(kind, name, total, interval)
+
+
+def get_total(items):
+    """Get the length of items, if it has one.
+
+    Args:
+        items (Iterable): The foreach items.
+
+    Returns:
+        int: Length of items. None if items has no length, like a generator.
+    """
+    try:
+        return len(items)
+    except TypeError:
+        return None
+
+
+def format_duration(seconds):
+    """Format seconds for humans, like 1h2m3s, 4m5s or 6.78s.
+
+    Args:
+        seconds (float): Duration in seconds.
+
+    Returns:
+        str: The formatted duration.
+    """
+    if seconds < 60:
+        return f"{seconds:.2f}s"
+
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h{minutes}m{seconds}s"
+
+    return f"{minutes}m{seconds}s"
@@ -0,0 +1,253 @@
+"""Sample the call stacks of a run & save them as collapsed stacks.
+
+cProfile in pypyr.profiler hooks every function call, which slows down long
+runs a lot. The sampling profiler instead wakes up on a background thread a
+fixed number of times a second, grabs the current frame of every thread
+that runs a step with sys._current_frames() & tallies the call stacks it
+sees. The run itself only pays for keeping track of which step runs on which
+thread.
+
+Each sample gets the pipelines & steps running on its thread as its roots,
+from the pipeline stack of the step's context, so a flame graph shows
+pipelines & steps first and the python frames underneath:
+    pipeline:root;step:pypyr.steps.pype;pipeline:child;step:my.step;
+    run_step (my/step.py:12);...
+
+The output is in the collapsed stack format of Brendan Gregg's
+flamegraph.pl, one stack per line with its sample count:
+    flamegraph.pl stacks.txt > flame.svg
+
+Samples are wall-clock, so a step that waits on i/o, a sleep or a
+subprocess shows up in proportion to how long it waits. Steps that run in a
+worker process for parallel foreach process mode aren't sampled.
+
+The sampler thread needs the GIL to take a sample, so very long pure python
+stretches without a thread switch sample less often than the rate.
+"""
+from contextlib import contextmanager
+import logging
+import os
+from pathlib import Path
+import sys
+import tempfile
+import threading
+
+from pypyr.hooks import hooks
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# samples per second.
+DEFAULT_RATE = 100
+
+
+class SamplingProfiler():
+    """Lifecycle hooks that track running steps, plus the sampler thread.
+
+    Attributes:
+        rate (float): Samples per second.
+        samples (int): How many times the sampler took a sample.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE):
+        """Initialize with nothing sampled."""
+        self.rate = rate
+        self.samples = 0
+        # thread id: list of (pipeline names, step name) of running steps.
+        self._running = {}
+        # collapsed stack: count
+        self._stacks = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def before_step(self, event):
+        """Note the step & its pipelines as running on this thread."""
+        context = event.context
+        stack = getattr(context, '_stack', None)
+        pipelines = tuple(pipeline.name for pipeline in stack or ())
+
+        thread_id = threading.get_ident()
+        running = self._running.get(thread_id)
+        if running is None:
+            running = self._running[thread_id] = []
+
+        running.append((pipelines, event.name))
+
+    def after_step(self, event):
+        """Note the innermost step on this thread as done."""
+        running = self._running.get(threading.get_ident())
+        if running:
+            running.pop()
+
+    def start(self):
+        """Start sampling on a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name='pypyr-sampler',
+                                        daemon=True)
+        self._thread.start()
+        logger.debug("sampler started at %s samples/s.", self.rate)
+
+    def stop(self):
+        """Stop sampling & wait for the sampler thread to finish."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+        logger.debug("sampler stopped after %s samples.", self.samples)
+
+    def _run(self):
+        """Take a sample every 1/rate seconds until stopped."""
+        interval = 1 / self.rate
+        while not self._stop.wait(interval):
+            self.sample()
+
+    def sample(self):
+        """Tally the call stack of every thread that runs a step."""
+        frames = sys._current_frames()
+        collapsed = []
+        for thread_id, running in list(self._running.items()):
+            # copy, because the step's thread changes it as it runs.
+            running = list(running)
+            frame = frames.get(thread_id)
+            if not running or frame is None:
+                continue
+
+            collapsed.append(';'.join(get_step_labels(running)
+                                      + get_frame_labels(frame)))
+
+        with self._lock:
+            self.samples += 1
+            stacks = self._stacks
+            for stack in collapsed:
+                stacks[stack] = stacks.get(stack, 0) + 1
+
+    def get_text(self):
+        """Get the tallied stacks in collapsed stack format.
+
+        Returns:
+            str: 1 line per stack, 'frame;frame;frame count'. Empty if
+                nothing sampled.
+        """
+        with self._lock:
+            stacks = sorted(self._stacks.items())
+
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks)
+
+    def save(self, path):
+        """Atomically save the collapsed stacks to path.
+
+        Args:
+            path (Path-like): Write the stacks here. Creates parent dirs if
+                they don't exist.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        text = self.get_text()
+
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                file.write(text)
+
+            os.replace(temp_path, path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+        logger.debug("saved collapsed stacks to %s", path)
+
+
+def get_step_labels(running):
+    """Get the pipeline & step roots of a sample.
+
+    A child pipeline that shares its parent's context has the parent's
+    pipelines on its stack too, so only add the pipelines that are new since
+    the outer step. A child pipeline with its own context only has itself on
+    its stack.
+
+    Args:
+        running (list[tuple]): (pipeline names, step name) of each running
+            step on the thread, outermost first.
+
+    Returns:
+        list[str]: Like ['pipeline:root', 'step:pypyr.steps.pype',
+            'pipeline:child', 'step:my.step'].
+    """
+    labels = []
+    outer = ()
+    for pipelines, step_name in running:
+        depth = len(outer)
+        if pipelines[:depth] == outer:
+            new = pipelines[depth:]
+        else:
+            new = pipelines[-1:]
+
+        labels.extend(f'pipeline:{escape(name)}' for name in new)
+        labels.append(f'step:{escape(step_name)}')
+        outer = pipelines
+
+    return labels
+
+
+def get_frame_labels(frame):
+    """Get the call stack of frame as labels, outermost first.
+
+    Args:
+        frame (frame): The innermost frame of a thread.
+
+    Returns:
+        list[str]: Like ['run_step (my/step.py:12)'], where the line is the
+            first line of the function, so that samples in different lines
+            of the same function merge.
+    """
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        labels.append(
+            f'{escape(code.co_name)} '
+            f'({escape(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+
+    labels.reverse()
+    return labels
+
+
+def escape(name):
+    """Make name safe as a frame of a collapsed stack.
+
+    Args:
+        name (Any): Pipeline, step or function name.
+
+    Returns:
+        str: name without the ; separator or line breaks.
+    """
+    return (str(name)
+            .replace(';', ':')
+            .replace('\n', ' ')
+            .replace('\r', ' '))
+
+
+@contextmanager
+def sampling(path, rate=DEFAULT_RATE):
+    """Sample the runs in the with block & save collapsed stacks on exit.
+
+    Hooks resolve when a run starts, so start sampling before the run.
+    Only runs that start on the current thread or asyncio task sample, so
+    other runs in the process at the same time don't mix in.
+
+    Args:
+        path (Path-like): Save the collapsed stacks here.
+        rate (float): Samples per second.
+    """
+    sampler = SamplingProfiler(rate)
+    sampler.start()
+    try:
+        with hooks.registered(sampler):
+            yield sampler
+    finally:
+        sampler.stop()
+        sampler.save(path)
+        logger.notify("saved %s samples to %s", sampler.samples, path)
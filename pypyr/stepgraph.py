@@ -0,0 +1,278 @@
+"""Dependency graph of the steps in a step-group.
+
+A step can name the steps it depends on with the needs decorator. needs refers
+to other steps in the same step-group by their id:
+
+steps:
+  - name: pypyr.steps.cmd
+    id: lint
+    needs: []
+    in:
+      cmd: make lint
+  - name: pypyr.steps.cmd
+    id: test
+    needs: []
+    in:
+      cmd: make test
+  - name: pypyr.steps.cmd
+    needs: [lint, test]
+    in:
+      cmd: make release
+  - name: pypyr.steps.echo
+    in:
+      echoMe: released
+
+As soon as a step-group has a step with needs, all of its steps run as soon as
+the steps they need are done, rather than strictly one after the other.
+
+A step without needs keeps its place in the list: it needs the step before
+it, so it runs once that step is done. This way adding needs to some steps
+in a step-group doesn't change when the other steps run relative to the
+steps around them. In the example, the echo step runs after the release step.
+Set needs to an empty list to make a step ready to run straight away, like
+lint & test in the example.
+"""
+from collections.abc import Mapping
+import logging
+
+from pypyr.errors import PipelineDefinitionError
+
+logger = logging.getLogger(__name__)
+
+
+class StepGraph():
+    """The dependencies between the steps of a step-group.
+
+    Refers to steps by their index in the step-group.
+
+    Attributes:
+        labels (list[str]): Human friendly name of each step - its id if it
+            has one, otherwise its step name.
+        needs (list[tuple[int]]): For each step, the steps it needs.
+        dependents (list[list[int]]): For each step, the steps that need it.
+    """
+
+    __slots__ = ['labels', 'needs', 'dependents']
+
+    def __init__(self, labels, needs):
+        """Initialize the step graph.
+
+        Args:
+            labels (list[str]): Human friendly name of each step.
+            needs (list[tuple[int]]): For each step, the indexes of the steps
+                it needs.
+        """
+        self.labels = labels
+        self.needs = needs
+        self.dependents = [[] for _ in needs]
+        for index, step_needs in enumerate(needs):
+            for need in step_needs:
+                self.dependents[need].append(index)
+
+    def get_critical_path(self, durations):
+        """Get the longest chain of dependent steps, by duration.
+
+        The critical path is the chain of steps that decides the shortest
+        possible wall-clock time for the step-group, no matter how many steps
+        run at the same time.
+
+        Args:
+            durations (list[float]): Duration of each step in seconds. None
+                for a step that did not run.
+
+        Returns:
+            tuple (total, path). total is the sum of the durations on the
+            critical path. path is the list of step indexes on the path, in
+            run order.
+        """
+        finish = [None] * len(durations)
+        previous = [None] * len(durations)
+
+        for index in self._get_run_order():
+            duration = durations[index]
+            if duration is None:
+                continue
+
+            start = 0
+            for need in self.needs[index]:
+                if finish[need] is not None and finish[need] > start:
+                    start = finish[need]
+                    previous[index] = need
+
+            finish[index] = start + duration
+
+        ran = [index for index, end in enumerate(finish) if end is not None]
+        if not ran:
+            return 0, []
+
+        last = max(ran, key=lambda index: finish[index])
+        path = []
+        index = last
+        while index is not None:
+            path.append(index)
+            index = previous[index]
+
+        path.reverse()
+        return finish[last], path
+
+    def _get_run_order(self):
+        """Get the step indexes so that every step comes after its needs.
+
+        Returns:
+            list[int]: Step indexes in topological order.
+        """
+        remaining = [len(step_needs) for step_needs in self.needs]
+        order = [index for index, count in enumerate(remaining) if not count]
+
+        for index in order:
+            for dependent in self.dependents[index]:
+                remaining[dependent] -= 1
+                if not remaining[dependent]:
+                    order.append(dependent)
+
+        return order
+
+
+def get_step_graph(steps, group_name=None):
+    """Get the dependency graph for steps, if any step uses needs.
+
+    Validates that step ids are unique, that needs only refers to step ids
+    that exist in steps, and that needs doesn't loop back on itself.
+
+    Args:
+        steps (list): Step definitions as they are in the pipeline yaml.
+        group_name (str): Name of the step-group, for error messages.
+
+    Returns:
+        StepGraph, or None if no step in steps has needs.
+
+    Raises:
+        pypyr.errors.PipelineDefinitionError: needs is invalid.
+    """
+    if not any(isinstance(step, Mapping) and 'needs' in step
+               for step in steps):
+        return None
+
+    where = f"step-group {group_name}" if group_name else "step-group"
+
+    ids = {}
+    labels = []
+    for index, step in enumerate(steps):
+        step_id = step.get('id', None) if isinstance(step, Mapping) else None
+        if step_id is None:
+            name = step.get('name') if isinstance(step, Mapping) else step
+            labels.append(str(name))
+            continue
+
+        if step_id in ids:
+            raise PipelineDefinitionError(
+                f"{where}: more than 1 step has id {step_id}. Step ids must "
+                "be unique in a step-group.")
+
+        ids[step_id] = index
+        labels.append(str(step_id))
+
+    needs = []
+    # steps that only need the step before them, because they have no needs.
+    in_order = set()
+    for index, step in enumerate(steps):
+        step_needs = step.get('needs', None) if isinstance(
+            step, Mapping) else None
+
+        if step_needs is None:
+            if index:
+                needs.append((index - 1,))
+                in_order.add(index)
+            else:
+                needs.append(())
+            continue
+
+        if isinstance(step_needs, str):
+            step_needs = [step_needs]
+        elif not isinstance(step_needs, list):
+            raise PipelineDefinitionError(
+                f"{where}: needs on step {labels[index]} must be a step id "
+                "or a list of step ids.")
+
+        need_indexes = []
+        for need in step_needs:
+            need_index = ids.get(need, None)
+            if need_index is None:
+                raise PipelineDefinitionError(
+                    f"{where}: step {labels[index]} needs {need}, but there "
+                    "is no step with that id.")
+
+            if need_index not in need_indexes:
+                need_indexes.append(need_index)
+
+        needs.append(tuple(need_indexes))
+
+    cycle = _find_cycle(needs)
+    if cycle:
+        hint = ''
+        if in_order.intersection(cycle):
+            hint = (" A step without needs needs the step before it. Set its "
+                    "needs to [] to run it straight away instead.")
+
+        raise PipelineDefinitionError(
+            f"{where}: needs is circular: "
+            f"{' -> '.join(labels[index] for index in cycle)}.{hint}")
+
+    return StepGraph(labels, needs)
+
+
+def validate_pipeline(pipeline):
+    """Check needs in all the step-groups in pipeline.
+
+    Call this when loading the pipeline, so that an invalid needs fails before
+    the pipeline starts running rather than once it reaches the step-group.
+
+    Args:
+        pipeline (Mapping): The pipeline yaml body.
+
+    Raises:
+        pypyr.errors.PipelineDefinitionError: needs is invalid.
+    """
+    for group_name, steps in pipeline.items():
+        if isinstance(steps, list):
+            get_step_graph(steps, group_name)
+
+
+def _find_cycle(needs):
+    """Find the 1st loop in needs, if there is one.
+
+    Args:
+        needs (list[tuple[int]]): For each step, the steps it needs.
+
+    Returns:
+        list[int]: Step indexes making up the loop, starting & ending with
+        the same index. None if there is no loop.
+    """
+    # 0 not visited, 1 on current path, 2 done.
+    state = [0] * len(needs)
+
+    for root in range(len(needs)):
+        if state[root]:
+            continue
+
+        path = [root]
+        state[root] = 1
+        iterators = [iter(needs[root])]
+
+        while iterators:
+            need = next(iterators[-1], None)
+            if need is None:
+                state[path.pop()] = 2
+                iterators.pop()
+            elif state[need] == 1:
+                cycle = path[path.index(need):]
+                cycle.append(need)
+                # needs point backwards - reverse to read in run order.
+                cycle.reverse()
+                return cycle
+            elif not state[need]:
+                state[need] = 1
+                path.append(need)
+                iterators.append(iter(needs[need]))
+
+    return None
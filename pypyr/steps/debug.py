@@ -11,11 +11,16 @@
 debug:
     keys: str for a single key name to dump. Or a list of key names to dump.
     format: Boolean, defaults False. Applies formatting expressions on output.
+    memory: Boolean, defaults False. Instead of the values, writes the
+        estimated deep size in bytes of each key, largest first. Use this to
+        find out which keys to clear to save memory.
 
 """
 import pprint
 import logging
 
+from pypyr.memoryreport import get_key_sizes
+
 # logger means the log level will be set correctly
 logger = logging.getLogger(__name__)
 
@@ -34,14 +39,18 @@ def run_step(context):
                   specified keys.
             format: bool. Defaults False. Applies formatting expressions on
                     dump.
+            memory: bool. Defaults False. Dump the estimated size in bytes
+                    of each key, largest first, instead of its value.
     """
     logger.debug("started")
 
     debug = context.get('debug', None)
+    memory = False
 
     if debug:
         keys = debug.get('keys', None)
         format = debug.get('format', False)
+        memory = debug.get('memory', False)
 
         if keys:
             logger.debug("Writing to output: %s", keys)
@@ -59,8 +68,16 @@ def run_step(context):
     else:
         payload = context
 
+    if memory:
+        payload = get_key_sizes(payload)
+        payload['(total)'] = sum(payload.values())
+
     if logger.isEnabledFor(logging.INFO):
         # call pformat only if logging is enabled
-        logger.info('\n%s', pprint.pformat(payload))
+        if memory:
+            # sizes are largest first, so keep that order.
+            logger.info('\n%s', pprint.pformat(payload, sort_dicts=False))
+        else:
+            logger.info('\n%s', pprint.pformat(payload))
 
     logger.debug("done")
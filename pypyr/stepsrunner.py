@@ -3,16 +3,93 @@
 Pipeline uses this to parse and run step-groups and steps.
 """
 
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
 import logging
+import time
+from pypyr.config import config
 from pypyr.dsl import Step
-from pypyr.errors import (ControlOfFlowInstruction,
+from pypyr.errors import (ContextError,
+                          ControlOfFlowInstruction,
                           Jump,
                           Stop,
                           StopStepGroup)
+from pypyr.stepgraph import get_step_graph
+from pypyr.hooks import get_run_hooks
+from pypyr.trace import tracer
 
 # use pypyr logger to ensure loglevel is set correctly
 logger = logging.getLogger(__name__)
 
+# marks a key a parallel step-group removed from context.
+_removed = object()
+
+
+class CompiledStepGroup():
+    """The parsed steps of a single step-group, ready to run repeatedly.
+
+    Parses each step definition into a pypyr.dsl.Step the first time that
+    step runs and keeps the parsed Step as a template for every subsequent run
+    of the step-group. This way the decorator parsing & step module look-up
+    only happen once per step, rather than every time the group runs via call,
+    jump, switch or a loop.
+
+    Compiling lazily, rather than the whole group up-front, keeps the existing
+    behavior where a malformed step only raises once the pipeline reaches it.
+
+    The template Steps do not run themselves. Iterating yields a fresh run
+    instance of each step, which holds the mutable run-time state like loop
+    counters. See pypyr.dsl.Step.get_run_instance.
+
+    Attributes:
+        steps (list): The step definitions as they are in the pipeline yaml.
+        name (str): Name of the step-group.
+        graph (pypyr.stepgraph.StepGraph): Dependencies between the steps
+            from the needs decorator. None if no step in the group has needs.
+    """
+
+    __slots__ = ['steps', 'name', 'graph', '_templates']
+
+    def __init__(self, steps, name=None):
+        """Initialize the compiled step-group.
+
+        Args:
+            steps (list): Sequence of step definitions from the pipeline yaml.
+            name (str): Name of the step-group.
+        """
+        self.steps = steps
+        self.name = name
+        self.graph = get_step_graph(steps, name)
+        self._templates = [None] * len(steps)
+
+    def __len__(self):
+        """Get the number of steps in the step-group."""
+        return len(self.steps)
+
+    def __iter__(self):
+        """Yield a run instance of each Step in the step-group, in order."""
+        for index in range(len(self.steps)):
+            yield self.get_step(index)
+
+    def get_step(self, index):
+        """Get a run instance of the Step at index in the step-group.
+
+        Args:
+            index (int): Index of the step in the step-group.
+
+        Returns:
+            pypyr.dsl.Step: Step instance ready to run.
+        """
+        template = self._templates[index]
+        if template is None:
+            # 2 threads compiling the same step at the same time is
+            # harmless - both templates are equivalent & last one wins.
+            template = Step(self.steps[index])
+            self._templates[index] = template
+
+        return template.get_run_instance()
+
 
 class StepsRunner():
     """Run step-groups and steps.
@@ -21,15 +98,39 @@ class StepsRunner():
     run_step_groups() is a sensible entrypoint.
     """
 
-    def __init__(self, pipeline_body, context):
+    def __init__(self, pipeline_body, context, compiled_step_groups=None):
         """Initialize the Step Runner with the pipeline to maintain state.
 
         Args:
             pipeline_body: the pipeline yaml body.
             context: pypyr.context.Context. The pypyr context. Will mutate.
+            compiled_step_groups (dict): Cache of step-group name to its
+                CompiledStepGroup. Pass the pipeline definition's
+                compiled_step_groups to share compiled steps between all runs
+                of the same pipeline. If None, compiled steps only last for
+                the lifetime of this StepsRunner instance.
         """
         self.context = context
         self.pipeline_body = pipeline_body
+        self.compiled_step_groups = (
+            {} if compiled_step_groups is None else compiled_step_groups)
+
+    def get_scoped_copy(self, context):
+        """Get a StepsRunner for the same pipeline that runs against context.
+
+        Use this where steps run in an isolated copy of the pipeline's
+        context, like in an iteration of a parallel loop. The copy shares the
+        compiled step-groups with this StepsRunner.
+
+        Args:
+            context: pypyr.context.Context. Run steps against this context.
+
+        Returns:
+            pypyr.stepsrunner.StepsRunner: New StepsRunner instance.
+        """
+        return self.__class__(self.pipeline_body,
+                              context,
+                              self.compiled_step_groups)
 
     def get_pipeline_steps(self, step_group):
         """Get the specified step-group's step from the pipeline.
@@ -77,6 +178,35 @@ def get_pipeline_steps(self, step_group):
             logger.debug("done")
             return None
 
+    def get_compiled_step_group(self, step_group):
+        """Get the specified step-group's compiled steps.
+
+        Compiles the step-group & adds it to compiled_step_groups the first
+        time it's requested. If config no_cache is True, compiles afresh each
+        time without caching the result.
+
+        Args:
+            step_group: (str) Name of step-group
+
+        Returns:
+            CompiledStepGroup for the step-group, or None if the step-group
+            doesn't exist or has no steps.
+        """
+        compiled_step_group = self.compiled_step_groups.get(step_group)
+        if compiled_step_group is None:
+            steps = self.get_pipeline_steps(step_group=step_group)
+            if steps is None:
+                return None
+
+            compiled_step_group = CompiledStepGroup(steps, step_group)
+
+            if not config.no_cache:
+                # setdefault so concurrent runs converge on the same instance
+                compiled_step_group = self.compiled_step_groups.setdefault(
+                    step_group, compiled_step_group)
+
+        return compiled_step_group
+
     def run_failure_step_group(self, group_name):
         """Run the group_name if it exists, as a failure handler..
 
@@ -100,8 +230,14 @@ def run_failure_step_group(self, group_name):
     def run_pipeline_steps(self, steps):
         """Run the run_step(context) method of each step in steps.
 
+        If steps is a CompiledStepGroup, runs the already parsed steps.
+        Otherwise parses each step definition in steps as it goes.
+
+        If any of the steps use needs, runs the steps in dependency order with
+        run_step_graph instead.
+
         Args:
-            steps: list. Sequence of Steps to execute
+            steps: CompiledStepGroup or list. Sequence of Steps to execute
         """
         logger.debug("starting")
         assert isinstance(self.context, dict), (
@@ -110,10 +246,23 @@ def run_pipeline_steps(self, steps):
         if steps is None:
             logger.debug("No steps found to execute.")
         else:
+            if not isinstance(steps, CompiledStepGroup):
+                if get_step_graph(steps):
+                    steps = CompiledStepGroup(steps)
+
+            if isinstance(steps, CompiledStepGroup) and steps.graph:
+                self.run_step_graph(steps)
+                logger.debug("done")
+                return
+
             step_count = 0
 
-            for step in steps:
-                step_instance = Step(step)
+            if isinstance(steps, CompiledStepGroup):
+                step_instances = iter(steps)
+            else:
+                step_instances = (Step(step) for step in steps)
+
+            for step_instance in step_instances:
                 step_instance.run_step(self.context)
                 step_count += 1
 
@@ -121,15 +270,136 @@ def run_pipeline_steps(self, steps):
 
         logger.debug("done")
 
+    def run_step_graph(self, steps):
+        """Run steps as soon as the steps they need are done.
+
+        Steps that are ready at the same time run at the same time, each on
+        its own thread, up to config.default_needs_max threads. None means the
+        ThreadPoolExecutor default.
+
+        Each step runs in its own scoped copy of context, as it was when the
+        step became ready. Once the step is done, its top-level context
+        changes merge back into context. This means a step sees the context
+        changes of all the steps it needs. Steps running at the same time
+        should not set the same context keys, because the last one to finish
+        wins.
+
+        If a step raises an error, or a control of flow instruction like
+        Stop or Jump, no new steps start. The steps already running finish &
+        merge their changes into context, and then the 1st error raises.
+
+        Once all the steps are done, logs the critical path - the chain of
+        dependent steps that took the longest.
+
+        Args:
+            steps: (CompiledStepGroup) Steps to execute, with a graph.
+        """
+        graph = steps.graph
+        name = steps.name or 'steps'
+        logger.debug("starting %s with needs", name)
+
+        remaining = [len(step_needs) for step_needs in graph.needs]
+        ready = deque(index for index, count in enumerate(remaining)
+                      if not count)
+        durations = [None] * len(remaining)
+        running = {}
+        errors = []
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=config.default_needs_max,
+                                thread_name_prefix='pypyr-step') as pool:
+            while ready or running:
+                while ready and not errors:
+                    index = ready.popleft()
+                    template = self.context.get_scoped_copy()
+                    # each thread gets the current run's hooks.
+                    future = pool.submit(copy_context().run,
+                                         self._run_scoped_step,
+                                         steps,
+                                         index,
+                                         template)
+                    running[future] = index
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                # merge in step order so that runs are repeatable.
+                for index, future in sorted(
+                        (running.pop(future), future) for future in done):
+                    changes, duration, error = future.result()
+                    self.context.merge_scoped_changes(changes)
+                    durations[index] = duration
+
+                    if error:
+                        errors.append(error)
+                        continue
+
+                    for dependent in graph.dependents[index]:
+                        remaining[dependent] -= 1
+                        if not remaining[dependent]:
+                            ready.append(dependent)
+
+        if errors:
+            if len(errors) > 1:
+                logger.error("%s steps failed in %s. Raising the first error.",
+                             len(errors), name)
+            raise errors[0]
+
+        total, path = graph.get_critical_path(durations)
+        logger.info(
+            "step-group %s ran %s steps in %.3fs. critical path %.3fs: %s",
+            name,
+            sum(duration is not None for duration in durations),
+            time.perf_counter() - start,
+            total,
+            ' -> '.join(f"{graph.labels[index]} ({durations[index]:.3f}s)"
+                        for index in path))
+
+        logger.debug("done %s", name)
+
+    def _run_scoped_step(self, steps, index, template):
+        """Run a step in a scoped copy of template.
+
+        Args:
+            steps: (CompiledStepGroup) The step-group the step belongs to.
+            index: (int) Index of the step to run in steps.
+            template: (pypyr.context.Context) Context as it was when the step
+                became ready. Does not mutate.
+
+        Returns:
+            tuple (changes, duration, error). changes is from
+            Context.get_scoped_changes. duration is how long the step took in
+            seconds. error is the exception the step raised, or None.
+        """
+        scoped_context = template.get_scoped_copy()
+
+        error = None
+        start = time.perf_counter()
+        try:
+            steps.get_step(index).run_step(scoped_context)
+        except Exception as err:
+            error = err
+
+        duration = time.perf_counter() - start
+        return template.get_scoped_changes(scoped_context), duration, error
+
     def run_step_group(self, step_group_name, raise_stop=False):
         """Get the specified step group from the pipeline and run its steps."""
         logger.debug("starting %s", step_group_name)
         assert step_group_name
 
-        steps = self.get_pipeline_steps(step_group=step_group_name)
+        steps = self.get_compiled_step_group(step_group=step_group_name)
 
         try:
-            self.run_pipeline_steps(steps=steps)
+            run_hooks = get_run_hooks()
+            if steps is None or not run_hooks.observed:
+                self.run_pipeline_steps(steps=steps)
+            else:
+                with tracer.span(step_group_name, 'step-group'):
+                    with run_hooks.step_group(step_group_name, self.context):
+                        self.run_pipeline_steps(steps=steps)
         except Jump as jump:
             logger.debug("jump: jumping to %s", jump.groups)
             self.run_step_groups(groups=jump.groups,
@@ -143,7 +413,124 @@ def run_step_group(self, step_group_name, raise_stop=False):
 
         logger.debug("done %s", step_group_name)
 
-    def run_step_groups(self, groups, success_group, failure_group):
+    def run_parallel_step_groups(self, groups):
+        """Run step-groups at the same time, each on its own thread.
+
+        Each group runs in its own scoped copy of context, as it was before
+        any of the groups started. Once all the groups are done, each group's
+        top-level context changes merge back into context in groups order.
+        runErrors from all groups append to context's runErrors.
+
+        config.default_group_conflict decides what happens when more than 1
+        group sets or removes the same key, with different values:
+        - last: the group later in groups wins.
+        - first: the group earlier in groups wins.
+        - error: raise ContextError.
+
+        If any group raised an error, raise the 1st group's error after the
+        merge.
+
+        Args:
+            groups: (list) list of step-group names to run.
+
+        Returns:
+            None
+        """
+        logger.debug("starting %s", groups)
+
+        conflict = config.default_group_conflict
+        if conflict not in ('last', 'first', 'error'):
+            raise ValueError("default_group_conflict must be last, first or "
+                             f"error, not {conflict}.")
+
+        template = self.context.get_scoped_copy()
+
+        with ThreadPoolExecutor(max_workers=len(groups),
+                                thread_name_prefix='pypyr-group') as pool:
+            # each thread gets the current run's hooks.
+            futures = [pool.submit(copy_context().run,
+                                   self._run_scoped_step_group,
+                                   template,
+                                   group)
+                       for group in groups]
+
+        results = [future.result() for future in futures]
+
+        # key: (group, value) of the 1st group to change the key.
+        claimed = {}
+        conflicts = []
+        for group, (changes, _) in zip(groups, results):
+            updates, removed, run_errors = changes
+            changed = dict(updates)
+            changed.update(dict.fromkeys(removed, _removed))
+
+            for key, value in list(changed.items()):
+                if key not in claimed:
+                    claimed[key] = (group, value)
+                    continue
+
+                first_group, first_value = claimed[key]
+                if _is_same_change(value, first_value):
+                    continue
+
+                conflicts.append((key, first_group, group))
+                if conflict != 'last':
+                    del changed[key]
+
+            self.context.merge_scoped_changes((
+                {k: v for k, v in changed.items() if v is not _removed},
+                [k for k, v in changed.items() if v is _removed],
+                run_errors))
+
+        errors = [error for _, error in results if error]
+
+        if conflicts:
+            conflict_info = ', '.join(
+                f"{key} in {first} & {later}"
+                for key, first, later in conflicts)
+            if conflict == 'error':
+                errors.append(ContextError(
+                    "parallel step-groups set the same context keys to "
+                    f"different values: {conflict_info}. "
+                    "default_group_conflict is error."))
+            else:
+                logger.debug("parallel step-groups changed the same keys: "
+                             "%s. %s wins.", conflict_info, conflict)
+
+        if errors:
+            if len(errors) > 1:
+                logger.error("%s parallel step-groups failed. Raising the "
+                             "first error.", len(errors))
+
+            raise errors[0]
+
+        logger.debug("done %s", groups)
+
+    def _run_scoped_step_group(self, template, group):
+        """Run step-group in a scoped copy of template.
+
+        Args:
+            template: (pypyr.context.Context) Context as it was before the
+                groups started. Does not mutate.
+            group: (str) Name of step-group to run.
+
+        Returns:
+            tuple (changes, error). changes is from Context.get_scoped_changes.
+            error is the exception the group raised, or None.
+        """
+        scoped_context = template.get_scoped_copy()
+        steps_runner = self.get_scoped_copy(scoped_context)
+
+        error = None
+        try:
+            steps_runner.run_step_group(group)
+        except Exception as err:
+            error = err
+
+        return template.get_scoped_changes(scoped_context), error
+
+    def run_step_groups(self, groups, success_group, failure_group,
+                        parallel=False):
         """Run stepgroups specified, with the success and failure handlers.
 
         Args:
@@ -151,6 +538,9 @@ def run_step_groups(self, groups, success_group, failure_group):
             success_group: (str) name of group to run on successful completion
                            of groups.
             failure_group: (str) name of group to run on error
+            parallel: (bool) run groups at the same time with
+                      run_parallel_step_groups. success_group or
+                      failure_group runs once all groups are done.
 
         Returns:
             None
@@ -162,8 +552,11 @@ def run_step_groups(self, groups, success_group, failure_group):
                              "run. groups is None.")
         try:
             # run main steps
-            for step_group in groups:
-                self.run_step_group(step_group)
+            if parallel and len(groups) > 1:
+                self.run_parallel_step_groups(groups)
+            else:
+                for step_group in groups:
+                    self.run_step_group(step_group)
 
             # if nothing went wrong, run on_success
             if success_group:
@@ -203,3 +596,26 @@ def run_step_groups(self, groups, success_group, failure_group):
                 raise
 
         logger.debug("done")
+
+
+def _is_same_change(value, other):
+    """Return True if value & other are the same change to a context key.
+
+    Args:
+        value: New value for the key, or _removed.
+        other: New value for the key, or _removed.
+
+    Returns:
+        bool: True if both values are the same or equal.
+    """
+    if value is other:
+        return True
+
+    if value is _removed or other is _removed:
+        return False
+
+    try:
+        return bool(value == other)
+    except Exception:
+        # not everything compares, like numpy arrays.
+        return False
@@ -11,6 +11,8 @@
 
 from pypyr.config import config
 from pypyr.errors import ContextError, SubprocessError
+from pypyr.hooks import get_run_hooks
+from pypyr.trace import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -218,6 +220,18 @@ def _run(self, cmd, stdout=None, stderr=None):
         args = cmd if (
             self.is_shell or config.is_windows) else shlex.split(cmd)
 
+        with tracer.span(cmd, 'subprocess', cwd=self.cwd):
+            self._run_args(cmd, args, stdout, stderr)
+
+    def _run_args(self, cmd, args, stdout, stderr):
+        """Spawn subprocess for args & wait for it to complete.
+
+        Args:
+            cmd (str): The executable + args as the user set it.
+            args (str or list[str]): cmd, split into args if not shell.
+            stdout: Write stdout here.
+            stderr: Write stderr here.
+        """
         if self.is_save:
             # errs from _inside_ the subprocess will go to stderr and raise
             # via check_returncode. errs finding the executable will raise
@@ -229,6 +243,8 @@ def _run(self, cmd, stdout=None, stderr=None):
                                                shell=self.is_shell,
                                                text=self.is_text)
 
+            get_run_hooks().subprocess(cmd, completed_process.returncode)
+
             stdout = completed_process.stdout
             stderr = completed_process.stderr
 
@@ -255,12 +271,18 @@ def _run(self, cmd, stdout=None, stderr=None):
             completed_process.check_returncode()
         else:
             # check=True throws CalledProcessError if exit code != 0
-            subprocess.run(args,
-                           check=True,
-                           cwd=self.cwd,
-                           shell=self.is_shell,
-                           stdout=stdout,
-                           stderr=stderr)
+            try:
+                subprocess.run(args,
+                               check=True,
+                               cwd=self.cwd,
+                               shell=self.is_shell,
+                               stdout=stdout,
+                               stderr=stderr)
+            except subprocess.CalledProcessError as err:
+                get_run_hooks().subprocess(cmd, err.returncode)
+                raise
+
+            get_run_hooks().subprocess(cmd, 0)
 
     def __eq__(self, other):
         """Check equality for all attributes."""
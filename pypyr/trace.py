@@ -0,0 +1,267 @@
+"""Record timed spans of a pipeline run in Chrome trace-event format.
+
+Open the saved trace file in chrome://tracing or https://ui.perfetto.dev to
+see where a run spends its time. A span is the duration of one of:
+    - pipeline, including every child pipeline from pypyr.steps.pype
+    - step-group
+    - step
+    - foreach, while & retry decorator iteration
+    - subprocess from pypyr.subproc & pypyr.aio.subproc
+
+Spans nest by thread, so parallel step-groups, needs & parallel foreach show
+as separate tracks. Iterations that run in a worker process for parallel
+foreach process mode don't record spans.
+
+Tracing is off unless you start it. When it's off, span() returns a shared
+do-nothing context manager, so the instrumented code does not allocate or
+time anything. Pipelines, step-groups, steps & iterations don't even call
+span() unless the run is observed, see pypyr.hooks.RunHooks. A run is only
+observed if tracing was on when it started, so start tracing before the run.
+
+Attributes:
+    tracer: Global instance of the Tracer. Use this attribute to access the
+            tracer from elsewhere.
+"""
+from contextlib import contextmanager, nullcontext
+import itertools
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+
+# use pypyr logger to ensure loglevel is set correctly
+logger = logging.getLogger(__name__)
+
+# shared & re-entrant, so disabled tracing costs nothing per span.
+_NULL_SPAN = nullcontext()
+
+
+class Tracer():
+    """Thread-safe recorder of trace-event spans.
+
+    Attributes:
+        enabled (bool): True while recording spans.
+    """
+
+    def __init__(self):
+        """Initialize the tracer. It starts disabled."""
+        self.enabled = False
+        self._events = []
+        self._thread_names = {}
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self._ids = itertools.count(1)
+
+    def start(self):
+        """Start recording spans. Discards anything recorded before."""
+        with self._lock:
+            self._events = []
+            self._thread_names = {}
+            self._epoch = time.perf_counter_ns()
+            self.enabled = True
+
+        logger.debug("tracing started.")
+
+    def stop(self):
+        """Stop recording spans."""
+        self.enabled = False
+        logger.debug("tracing stopped.")
+
+    def span(self, name, category, **kwargs):
+        """Get a context manager that records its duration as a span.
+
+        Args:
+            name (str): Name of the span, like the step name.
+            category (str): Kind of span, like step or step-group.
+            kwargs: Extra details to show on the span. Values that aren't
+                json serializable save as str.
+
+        Returns:
+            Context manager. Does nothing if tracing is not enabled.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+
+        return _Span(self, name, category, kwargs)
+
+    def async_span(self, name, category, **kwargs):
+        """Get a context manager that records an overlapping async span.
+
+        Use this for coroutines that interleave on the same thread, which
+        would not nest properly as span().
+
+        Args:
+            name (str): Name of the span, like the subprocess cmd.
+            category (str): Kind of span, like subprocess.
+            kwargs: Extra details to show on the span.
+
+        Returns:
+            Context manager. Does nothing if tracing is not enabled.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+
+        return _AsyncSpan(self, name, category, kwargs)
+
+    def add_event(self, event):
+        """Add a trace event, stamped with the pid & current thread.
+
+        Args:
+            event (dict): Trace event without pid & tid.
+        """
+        thread = threading.current_thread()
+        event['pid'] = os.getpid()
+        event['tid'] = thread.ident
+        with self._lock:
+            self._thread_names[thread.ident] = thread.name
+            self._events.append(event)
+
+    def get_timestamp(self):
+        """Get microseconds since tracing started.
+
+        Returns:
+            float: Trace-event timestamp.
+        """
+        return (time.perf_counter_ns() - self._epoch) / 1000
+
+    def get_trace(self):
+        """Get everything recorded so far as a trace-event document.
+
+        Returns:
+            dict: Chrome trace-event json object format.
+        """
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid,
+                     'tid': 0, 'args': {'name': 'pypyr'}}]
+        metadata.extend({'name': 'thread_name', 'ph': 'M', 'pid': pid,
+                         'tid': tid, 'args': {'name': thread_name}}
+                        for tid, thread_name in thread_names.items())
+
+        return {'traceEvents': metadata + events,
+                'displayTimeUnit': 'ms'}
+
+    def save(self, path):
+        """Save everything recorded so far to path as json.
+
+        Args:
+            path (Path-like): Write the trace file here. Creates parent dirs
+                if they don't exist.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.get_trace(), file, default=str)
+
+        logger.debug("saved trace to %s", path)
+
+    def get_id(self):
+        """Get a unique id to pair the begin & end of an async span.
+
+        Returns:
+            int: The id.
+        """
+        return next(self._ids)
+
+
+class _Span():
+    """Record a complete (X) event around a block of code."""
+
+    __slots__ = ['tracer', 'name', 'category', 'args', 'start']
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = self.tracer.get_timestamp()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = self.tracer.get_timestamp()
+        event = {'name': str(self.name),
+                 'cat': self.category,
+                 'ph': 'X',
+                 'ts': self.start,
+                 'dur': end - self.start}
+
+        if exc_type:
+            self.args['error'] = exc_type.__name__
+
+        if self.args:
+            event['args'] = self.args
+
+        self.tracer.add_event(event)
+        return False
+
+
+class _AsyncSpan(_Span):
+    """Record begin (b) & end (e) events around an awaitable."""
+
+    __slots__ = ['id']
+
+    def __enter__(self):
+        self.id = self.tracer.get_id()
+        event = {'name': str(self.name),
+                 'cat': self.category,
+                 'ph': 'b',
+                 'id': self.id,
+                 'ts': self.tracer.get_timestamp()}
+
+        if self.args:
+            event['args'] = self.args
+
+        self.tracer.add_event(event)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event = {'name': str(self.name),
+                 'cat': self.category,
+                 'ph': 'e',
+                 'id': self.id,
+                 'ts': self.tracer.get_timestamp()}
+
+        if exc_type:
+            event['args'] = {'error': exc_type.__name__}
+
+        self.tracer.add_event(event)
+        return False
+
+
+@contextmanager
+def tracing(path):
+    """Record spans for the duration of the with block & save to path.
+
+    If tracing is already on, like when the API runs a pipeline with tracing
+    from inside a traced pipeline, keeps the outer trace going & saves
+    everything recorded so far to path on exit.
+
+    Args:
+        path (Path-like): Save the trace file here.
+    """
+    if tracer.enabled:
+        try:
+            yield tracer
+        finally:
+            tracer.save(path)
+        return
+
+    tracer.start()
+    try:
+        yield tracer
+    finally:
+        tracer.stop()
+        tracer.save(path)
+        logger.notify("saved trace to %s", path)
+
+
+# global instance of the tracer. use this to access the tracer from elsewhere.
+tracer = Tracer()
@@ -0,0 +1,92 @@
+"""Utility functions for estimating memory use of objects."""
+from sys import getsizeof
+from types import (FunctionType,
+                   MemberDescriptorType,
+                   MethodType,
+                   ModuleType)
+
+# shared rather than owned, so count only the reference to these.
+_SHALLOW_TYPES = (type, ModuleType, FunctionType, MethodType)
+
+# stop walking after this many objects, so a huge or self-generating graph
+# can't stall the caller.
+DEFAULT_MAX_OBJECTS = 100_000
+
+
+def get_deep_size(obj, seen=None, max_objects=DEFAULT_MAX_OBJECTS):
+    """Estimate the bytes obj uses, including everything it references.
+
+    Walks containers, instance __dict__ & __slots__. Counts each object only
+    once, even if obj references it more than once. Classes, modules &
+    functions only count their own size, not what they reference, because
+    they're shared with the rest of the process.
+
+    This is an estimate: it doesn't see memory that C extensions allocate
+    outside of what getsizeof reports. It stops counting after max_objects,
+    so the result is a lower bound for very large graphs.
+
+    Reads __slots__ through their descriptors rather than getattr, so that
+    objects with a __getattr__ that makes up values, like a Mock, don't grow
+    the graph as it walks.
+
+    Args:
+        obj (Any): Estimate the size of this.
+        seen (set[int]): ids of objects already counted. Pass the same set
+            to more than one call to not count shared objects twice.
+        max_objects (int): Stop after counting this many objects.
+
+    Returns:
+        int: Estimated size in bytes.
+    """
+    if seen is None:
+        seen = set()
+
+    size = 0
+    count = 0
+    stack = [obj]
+    while stack and count < max_objects:
+        current = stack.pop()
+        current_id = id(current)
+        if current_id in seen:
+            continue
+
+        seen.add(current_id)
+        count += 1
+
+        try:
+            size += getsizeof(current)
+        except TypeError:
+            continue
+
+        if isinstance(current, (str, bytes, bytearray, int, float, bool,
+                                _SHALLOW_TYPES)) or current is None:
+            continue
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+
+        try:
+            instance_dict = object.__getattribute__(current, '__dict__')
+        except AttributeError:
+            instance_dict = None
+
+        if isinstance(instance_dict, dict):
+            stack.append(instance_dict)
+
+        for slot_owner in type(current).__mro__:
+            slots = vars(slot_owner).get('__slots__', ())
+            if isinstance(slots, str):
+                slots = (slots,)
+
+            for slot in slots:
+                descriptor = vars(slot_owner).get(slot)
+                if isinstance(descriptor, MemberDescriptorType):
+                    try:
+                        stack.append(descriptor.__get__(current))
+                    except AttributeError:
+                        pass
+
+    return size
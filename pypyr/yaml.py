@@ -1,7 +1,14 @@
 """yaml handling functions."""
+import copy
+
 import ruamel.yaml as yamler  # type: ignore
+from ruamel.yaml.constructor import SafeConstructor
+from ruamel.yaml.nodes import MappingNode, ScalarNode, SequenceNode
+
+from pypyr.config import config
 from pypyr.context import Context
 from pypyr.dsl import Jsonify, PyString, SicString
+from pypyr.formatting import CONSTANT_MARKER
 
 
 def get_pipeline_yaml(file):
@@ -13,6 +20,12 @@ def get_pipeline_yaml(file):
     If looking to extend the pypyr pipeline syntax with special types, add
     these to the tag_representers list.
 
+    Flags the containers that have no formatting expressions & no special
+    types in them, so formatting them at run-time only copies them.
+
+    If config.fast_yaml is True, loads with get_yaml_parser_fast instead of
+    the round-trip parser.
+
     Args:
         file: open file-like object.
 
@@ -22,15 +35,130 @@ def get_pipeline_yaml(file):
     """
     tag_representers = [Jsonify, PyString, SicString]
 
-    yaml_loader = get_yaml_parser_roundtrip()
+    if config.fast_yaml:
+        yaml_loader = get_yaml_parser_fast()
+    else:
+        yaml_loader = get_yaml_parser_roundtrip()
 
-    for representer in tag_representers:
-        yaml_loader.register_class(representer)
+        for representer in tag_representers:
+            yaml_loader.register_class(representer)
 
     pipeline_definition = yaml_loader.load(file)
+
+    # flag the parts of the pipeline that don't need formatting at run-time.
+    Context.formatter.mark_constants(pipeline_definition)
     return pipeline_definition
 
 
+# region fast
+
+
+class LineCol():
+    """Where a mapping or sequence starts in the yaml, 0-based.
+
+    Has the same line & col attributes as the round-trip parser's .lc, so
+    code that reads .lc.line & .lc.col works with either parser.
+    """
+
+    __slots__ = ['line', 'col']
+
+    def __init__(self, line, col):
+        """Initialize the position."""
+        self.line = line
+        self.col = col
+
+
+class PipelineMap(dict):
+    """dict with its yaml position in .lc, from the fast parser.
+
+    Much lighter than the round-trip parser's CommentedMap, which also keeps
+    the comments & formatting of the yaml. Has room for the formatter's
+    constant flag.
+    """
+
+    __slots__ = ['lc', CONSTANT_MARKER]
+
+
+class PipelineSeq(list):
+    """list with its yaml position in .lc, from the fast parser.
+
+    Much lighter than the round-trip parser's CommentedSeq. Has room for the
+    formatter's constant flag.
+    """
+
+    __slots__ = ['lc', CONSTANT_MARKER]
+
+
+class FastConstructor(SafeConstructor):
+    """Safe constructor that makes PipelineMap & PipelineSeq containers."""
+
+    def construct_yaml_map(self, node):
+        """Construct a PipelineMap with its position."""
+        data = PipelineMap()
+        mark = node.start_mark
+        data.lc = LineCol(mark.line, mark.column)
+        yield data
+        data.update(self.construct_mapping(node))
+
+    def construct_yaml_seq(self, node):
+        """Construct a PipelineSeq with its position."""
+        data = PipelineSeq()
+        mark = node.start_mark
+        data.lc = LineCol(mark.line, mark.column)
+        yield data
+        data.extend(self.construct_sequence(node))
+
+    def construct_jsonify(self, node):
+        """Construct a Jsonify from its mapping, sequence or scalar."""
+        if isinstance(node, MappingNode):
+            tag = 'tag:yaml.org,2002:map'
+        elif isinstance(node, SequenceNode):
+            tag = 'tag:yaml.org,2002:seq'
+        elif node.style:
+            # quoted, so always a str.
+            tag = 'tag:yaml.org,2002:str'
+        else:
+            tag = self.resolver.resolve(ScalarNode, node.value, (True, False))
+
+        # construct an untagged copy, since this node is mid-construction.
+        untagged = copy.copy(node)
+        untagged.tag = tag
+        return Jsonify(self.construct_object(untagged, deep=True))
+
+
+FastConstructor.add_constructor('tag:yaml.org,2002:map',
+                                FastConstructor.construct_yaml_map)
+FastConstructor.add_constructor('tag:yaml.org,2002:seq',
+                                FastConstructor.construct_yaml_seq)
+FastConstructor.add_constructor(Jsonify.yaml_tag,
+                                FastConstructor.construct_jsonify)
+FastConstructor.add_constructor(PyString.yaml_tag, PyString.from_yaml)
+FastConstructor.add_constructor(SicString.yaml_tag, SicString.from_yaml)
+
+
+def get_yaml_parser_fast():
+    """Create the fast yaml parser object with this factory method.
+
+    Uses the libyaml C parser if ruamel.yaml.clib is installed, otherwise
+    the pure python safe parser. Either is much quicker than the round-trip
+    parser & the containers it makes use less memory, but it drops the
+    comments & formatting of the yaml. Use it to load pipelines only, not to
+    write yaml back out.
+
+    The mappings & sequences it makes keep their line & col in .lc, like
+    the round-trip parser's, so step error messages still have their yaml
+    line numbers. Loads the pypyr custom tags !jsonify, !py & !sic.
+
+    Returns:
+        ruamel.yaml.YAML object with the fast loader.
+    """
+    yaml_loader = yamler.YAML(typ='safe', pure=False)
+    yaml_loader.Constructor = FastConstructor
+    return yaml_loader
+
+# endregion fast
+
+
 def get_yaml_parser_safe():
     """Create the safe yaml parser object with this factory method.
 
@@ -62,6 +190,15 @@ def get_yaml_parser_roundtrip():
     yaml_writer = yamler.YAML(typ='rt', pure=True)
     # if this isn't here the yaml doesn't format nicely indented for humans
     yaml_writer.indent(mapping=2, sequence=4, offset=2)
+
+    # values from a pipeline the fast parser loaded write as dict & list.
+    representer = yaml_writer.Representer
+    representer.add_representer(
+        PipelineMap,
+        yamler.representer.RoundTripRepresenter.represent_dict)
+    representer.add_representer(
+        PipelineSeq,
+        yamler.representer.RoundTripRepresenter.represent_list)
     return yaml_writer
 
 
@@ -0,0 +1,64 @@
+"""Arbitrary lifecycle hooks for testing."""
+
+
+class RecordingHooks():
+    """Record every hook event it gets."""
+
+    def __init__(self):
+        """Start with no events."""
+        self.events = []
+
+    def record(self, event_name, event):
+        """Save the event as a tuple of its interesting parts."""
+        self.events.append((event_name, event.kind, event.name,
+                            event.line_no, event.iteration,
+                            type(event.exception).__name__
+                            if event.exception else None))
+
+    def before_pipeline(self, event):
+        """Record before_pipeline."""
+        self.record('before_pipeline', event)
+
+    def after_pipeline(self, event):
+        """Record after_pipeline."""
+        self.record('after_pipeline', event)
+
+    def before_step_group(self, event):
+        """Record before_step_group."""
+        self.record('before_step_group', event)
+
+    def after_step_group(self, event):
+        """Record after_step_group."""
+        self.record('after_step_group', event)
+
+    def before_step(self, event):
+        """Record before_step."""
+        self.record('before_step', event)
+
+    def after_step(self, event):
+        """Record after_step."""
+        self.record('after_step', event)
+
+    def before_iteration(self, event):
+        """Record before_iteration."""
+        self.record('before_iteration', event)
+
+    def after_iteration(self, event):
+        """Record after_iteration."""
+        self.record('after_iteration', event)
+
+    def on_error(self, event):
+        """Record on_error."""
+        self.record('on_error', event)
+
+
+class AfterStepOnly():
+    """Only hooks after_step."""
+
+    def __init__(self):
+        """Start with no events."""
+        self.events = []
+
+    def after_step(self, event):
+        """Save the step name & duration."""
+        self.events.append((event.name, event.duration))
@@ -0,0 +1 @@
+"""pypyr performance benchmarks."""
@@ -0,0 +1,11 @@
+"""Run the pypyr micro-benchmark suite.
+
+Run from the repo root:
+    python -m tests.benchmarks --help
+"""
+import tests.benchmarks.engine_bench  # noqa: F401 registers benchmarks
+import tests.benchmarks.formatting_bench  # noqa: F401 registers benchmarks
+import tests.benchmarks.stepsrunner_bench  # noqa: F401 registers benchmarks
+from tests.benchmarks.suite import main
+
+main()
@@ -0,0 +1,227 @@
+"""Micro-benchmarks for the pypyr engine internals.
+
+Run the whole suite from the repo root:
+    python -m tests.benchmarks --out results.json
+
+Or only some of the benchmarks:
+    python -m tests.benchmarks formatting loader --compare results.json
+"""
+from io import StringIO
+import sys
+
+from pypyr.aio.subproc import Command, Commands
+from pypyr.cache.filecache import file_cache
+from pypyr.cache.loadercache import Loader
+from pypyr.context import Context
+from pypyr.dsl import PyString, Step
+import pypyr.loaders.file
+from pypyr.yaml import get_pipeline_yaml
+from tests.benchmarks.suite import benchmark
+
+PIPELINE_STEP_COUNT = 500
+COMMAND_COUNT = 100
+
+
+def get_context():
+    """Get context with the kind of values a pipeline formats."""
+    return Context({
+        'dir': 'out/reports',
+        'name': 'quarterly',
+        'env': 'prod',
+        'i': 'item-42',
+        'region': 'eu-west-1',
+        'retries': 3,
+        'tags': ['a', 'b', 'c'],
+    })
+
+
+def get_pipeline_text(step_count=PIPELINE_STEP_COUNT):
+    """Get yaml for a pipeline with a mix of typical steps."""
+    steps = []
+    for i in range(step_count):
+        kind = i % 4
+        if kind == 0:
+            steps.append(f"""  - name: pypyr.steps.set
+    in:
+      set:
+        out{i}: '{{dir}}/{{env}}/{i}.json'
+        static{i}: no formatting here
+""")
+        elif kind == 1:
+            steps.append(f"""  - name: pypyr.steps.echo
+    description: step {i}
+    foreach: ['{{env}}', b, c]
+    in:
+      echoMe: '{{i}} of {i}'
+""")
+        elif kind == 2:
+            steps.append(f"""  - name: pypyr.steps.py
+    retry:
+      max: 3
+      sleep: 0.1
+    swallow: True
+    in:
+      py: x = {i}
+""")
+        else:
+            steps.append(f"""  - name: pypyr.steps.cmd
+    run: !py len(tags) > {i}
+    in:
+      cmd: echo {i}
+""")
+
+    return 'steps:\n' + ''.join(steps)
+
+# region formatting
+
+
+@benchmark('formatting.string')
+def bench_format_string(tmp_dir):
+    """Format a string with several expressions."""
+    context = get_context()
+    formatter = context.formatter
+    value = 's3://bucket/{env}/{name}/{i}-{region}.json'
+
+    return lambda: formatter.vformat(value, None, context)
+
+
+@benchmark('formatting.nested')
+def bench_format_nested(tmp_dir):
+    """Format nested dicts & lists, part expressions & part literals."""
+    context = get_context()
+    value = {
+        'path': '{dir}/{env}/{name}-{i}.json',
+        'payload': {
+            'id': '{i}',
+            'region': '{region}',
+            'retries': '{retries}',
+            'tags': ['{env}', 'static tag', '{region}'],
+            'description': 'report for {name} in {region}',
+            'static': {'a': 'b', 'c': [1, 2, 3]},
+        }
+    }
+
+    return lambda: context.get_formatted_value(value)
+
+
+@benchmark('formatting.py')
+def bench_format_py(tmp_dir):
+    """Evaluate a !py expression."""
+    context = get_context()
+    value = PyString('retries * 2 if env == "prod" else 0')
+
+    return lambda: context.get_formatted_value(value)
+
+# endregion formatting
+
+# region dsl
+
+
+def get_step_definition():
+    """Get a step definition with a few decorators."""
+    return {'name': 'tests.arbpack.arbstep',
+            'description': 'arb {env}',
+            'in': {'k1': '{i}', 'k2': 'v2'},
+            'retry': {'max': 3},
+            'swallow': False,
+            'run': True}
+
+
+@benchmark('dsl.step_init')
+def bench_step_init(tmp_dir):
+    """Parse a step definition into a Step."""
+    definition = get_step_definition()
+    # warm the step module cache, like after the 1st run of a step.
+    Step(definition)
+
+    return lambda: Step(definition)
+
+
+@benchmark('dsl.run_step')
+def bench_run_step(tmp_dir):
+    """Run a no-op step through the decorators & dispatch."""
+    context = get_context()
+    step = Step(get_step_definition())
+
+    return lambda: step.run_step(context)
+
+# endregion dsl
+
+# region context
+
+
+@benchmark('context.merge')
+def bench_context_merge(tmp_dir):
+    """Merge nested dicts with expressions into context."""
+    context = get_context()
+    context['nested'] = {'a': {'b': 'c', 'd': 'e'}, 'f': 'g'}
+    add_me = {'nested': {'a': {'b': '{env}', 'x': 'y'}, 'h': '{region}'},
+              'new': '{dir}/{name}',
+              'retries': 4}
+
+    return lambda: context.merge(add_me)
+
+# endregion context
+
+# region yaml & loader
+
+
+@benchmark('yaml.get_pipeline_yaml')
+def bench_get_pipeline_yaml(tmp_dir):
+    """Parse a big pipeline's yaml."""
+    text = get_pipeline_text()
+
+    return lambda: get_pipeline_yaml(StringIO(text))
+
+
+def get_loader(tmp_dir):
+    """Get a fresh file loader & the name of a big pipeline on disk."""
+    path = tmp_dir.joinpath('bench-pipeline.yaml')
+    path.write_text(get_pipeline_text(), encoding='utf-8')
+
+    loader = Loader('pypyr.loaders.file',
+                    pypyr.loaders.file.get_pipeline_definition)
+    return loader, str(path.with_suffix(''))
+
+
+@benchmark('loader.get_pipeline.hit')
+def bench_loader_hit(tmp_dir):
+    """Get an already loaded pipeline."""
+    loader, name = get_loader(tmp_dir)
+    loader.get_pipeline(name, None)
+
+    return lambda: loader.get_pipeline(name, None)
+
+
+@benchmark('loader.get_pipeline.miss')
+def bench_loader_miss(tmp_dir):
+    """Find, read & parse a big pipeline from disk, with no cache."""
+    loader, name = get_loader(tmp_dir)
+
+    def get_pipeline():
+        loader.clear()
+        file_cache.clear()
+        return loader.get_pipeline(name, None)
+
+    return get_pipeline
+
+# endregion yaml & loader
+
+# region aio
+
+
+@benchmark('aio.commands.run')
+def bench_aio_commands(tmp_dir):
+    """Spawn trivial subprocesses at the same time & wait for all."""
+    cmd = f'"{sys.executable}" -c pass'
+
+    def run_commands():
+        commands = Commands()
+        for _ in range(COMMAND_COUNT):
+            commands.append(Command(cmd, is_shell=True))
+
+        commands.run()
+
+    return run_commands
+
+# endregion aio
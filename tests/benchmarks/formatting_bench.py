@@ -0,0 +1,55 @@
+"""Benchmark RecursiveFormatter on typical pipeline step inputs.
+
+Formats the kind of step input a foreach loop formats on every iteration,
+once with the parsed template cache warm and once with it cleared before each
+format operation, which is the same work as parsing every string each time.
+
+Run from the repo root:
+    python -m tests.benchmarks formatting.step_input
+"""
+from pypyr.context import Context
+from tests.benchmarks.suite import benchmark
+
+
+def get_context():
+    """Get context with the step input of a typical file processing step."""
+    return Context({
+        'dir': 'out/reports',
+        'name': 'quarterly',
+        'env': 'prod',
+        'i': 'item-42',
+        'region': 'eu-west-1',
+        'retries': 3,
+        'fileWriteJson': {
+            'path': '{dir}/{env}/{name}-{i}.json',
+            'payload': {
+                'id': '{i}',
+                'region': '{region}',
+                'retries': '{retries}',
+                'source': 's3://bucket/{env}/{name}/{i}',
+                'tags': ['{env}', 'static tag', '{region}'],
+                'description': 'report for {name} in {region}',
+            }
+        }
+    })
+
+
+@benchmark('formatting.step_input.cached')
+def bench_step_input_cached(tmp_dir):
+    """Format a step input with the parsed template cache warm."""
+    context = get_context()
+    context.get_formatted('fileWriteJson')
+    return lambda: context.get_formatted('fileWriteJson')
+
+
+@benchmark('formatting.step_input.parse_every_time')
+def bench_step_input_parse_every_time(tmp_dir):
+    """Format a step input, clearing the parsed template cache each time."""
+    context = get_context()
+    clear_templates = context.formatter._get_template.cache_clear
+
+    def format_step_input():
+        clear_templates()
+        return context.get_formatted('fileWriteJson')
+
+    return format_step_input
@@ -0,0 +1,382 @@
+"""Macro benchmark how pipeline run time & memory scale with size.
+
+Each case generates a pipeline parametrised by n, then runs it at several n
+to plot a curve of time & peak memory against n. It fits the curve as
+value ~ n^exponent on a log-log scale. An exponent around 1 is linear. The
+tail exponent is the growth between the 2 biggest n, which is where a
+scaling cliff shows first. A tail exponent above --threshold flags the case
+as super-linear.
+
+A case that raises, like a RecursionError, stops at that n & flags as
+failed.
+
+Run from the repo root:
+    python -m tests.benchmarks.scaling_bench [cases...] [--out scaling.json]
+"""
+import argparse
+import gc
+import json
+import logging
+from math import log
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pypyr import pipelinerunner
+from pypyr.cache.filecache import file_cache
+from pypyr.cache.loadercache import loader_cache
+from tests.benchmarks.suite import get_environment
+
+# name: (get_pipeline, ns), in order of registration.
+cases = {}
+
+
+def case(name, ns):
+    """Register the decorated function as a scaling case.
+
+    The decorated function has signature get_pipeline(n, name) -> str. It
+    returns the pipeline yaml for size n. name is what the pipeline is
+    called, in case it needs to pype itself.
+
+    Args:
+        name (str): Unique name of the case.
+        ns (tuple[int]): Run the case at each of these sizes, smallest first.
+
+    Returns:
+        Decorator that registers the function & returns it unchanged.
+    """
+    def decorator(get_pipeline):
+        cases[name] = (get_pipeline, ns)
+        return get_pipeline
+
+    return decorator
+
+# region cases
+
+
+@case('steps', ns=(100, 200, 400, 800, 1600))
+def get_steps_pipeline(n, name):
+    """Run n sequential steps."""
+    step = """  - name: pypyr.steps.set
+    in:
+      set:
+        out: '{python}'
+"""
+    return 'steps:\n' + step * n
+
+
+@case('foreach', ns=(500, 1000, 2000, 4000, 8000))
+def get_foreach_pipeline(n, name):
+    """Run a step for each of n items."""
+    return f"""steps:
+  - name: pypyr.steps.echo
+    foreach: !py range({n})
+    in:
+      echoMe: '{{i}}'
+"""
+
+
+@case('pype', ns=(10, 20, 40, 80))
+def get_pype_pipeline(n, name):
+    """Pype nested n deep."""
+    return f"""steps:
+  - name: pypyr.steps.set
+    in:
+      set:
+        depth: !py globals().get('depth', 0) + 1
+  - name: pypyr.steps.pype
+    run: !py depth < {n}
+    in:
+      pype:
+        name: {name}
+        useParentContext: True
+"""
+
+
+@case('call', ns=(250, 500, 1000, 2000, 4000))
+def get_call_pipeline(n, name):
+    """Call a step-group in a loop n times."""
+    return f"""steps:
+  - name: pypyr.steps.call
+    while:
+      max: {n}
+    in:
+      call: called
+called:
+  - name: pypyr.steps.set
+    in:
+      set:
+        out: '{{whileCounter}}'
+"""
+
+
+@case('cmds', ns=(5, 10, 20, 40))
+def get_cmds_pipeline(n, name):
+    """Run n commands at the same time."""
+    return """steps:
+  - name: pypyr.steps.cmds
+    in:
+      cmds:
+""" + "        - '{python} -c pass'\n" * n
+
+
+@case('swallow', ns=(250, 500, 1000, 2000, 4000))
+def get_swallow_pipeline(n, name):
+    """Swallow n errors, so runErrors grows to n."""
+    return f"""steps:
+  - name: pypyr.steps.py
+    foreach: !py range({n})
+    swallow: True
+    in:
+      py: raise ValueError(i)
+"""
+
+
+@case('jump', ns=(10, 20, 40, 80, 160))
+def get_jump_pipeline(n, name):
+    """Chain jump to the same step-group n times."""
+    return f"""steps:
+  - name: pypyr.steps.set
+    in:
+      set:
+        count: 0
+  - name: pypyr.steps.jump
+    in:
+      jump: again
+again:
+  - name: pypyr.steps.set
+    in:
+      set:
+        count: !py count + 1
+  - name: pypyr.steps.jump
+    run: !py count < {n}
+    in:
+      jump: again
+"""
+
+# endregion cases
+
+
+def run_pipeline(path):
+    """Run the pipeline at path.
+
+    Args:
+        path (Path): Pipeline yaml file.
+    """
+    pipelinerunner.run(str(path.with_suffix('')),
+                       dict_in={'python': sys.executable})
+
+
+def measure(path, repeat):
+    """Measure best run time & peak memory of the pipeline at path.
+
+    Runs once to warm up & load the pipeline, so that the measurements are
+    of the run itself rather than of parsing the yaml.
+
+    Args:
+        path (Path): Pipeline yaml file.
+        repeat (int): Take the best time of this many runs.
+
+    Returns:
+        tuple (seconds, peak_bytes).
+    """
+    run_pipeline(path)
+
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run_pipeline(path)
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run_pipeline(path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return min(timings), peak
+
+
+def get_exponent(ns, values):
+    """Get the least squares slope of log(values) against log(ns).
+
+    Args:
+        ns (list[int]): Sizes.
+        values (list[float]): Measurement at each size.
+
+    Returns:
+        float: The exponent k in value ~ n^k. None if less than 2 points.
+    """
+    points = [(log(n), log(value)) for n, value in zip(ns, values)
+              if value > 0]
+    if len(points) < 2:
+        return None
+
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    return covariance / variance
+
+
+def get_curve(ns, values):
+    """Get the overall & tail exponents of values against ns.
+
+    Args:
+        ns (list[int]): Sizes.
+        values (list[float]): Measurement at each size.
+
+    Returns:
+        dict: exponent & tail_exponent. None when not enough points.
+    """
+    return {'exponent': get_exponent(ns, values),
+            'tail_exponent': get_exponent(ns[-2:], values[-2:])}
+
+
+def run_case(name, tmp_dir, repeat, threshold, max_n=None):
+    """Run a scaling case at each of its sizes.
+
+    Args:
+        name (str): Name of a registered case.
+        tmp_dir (Path): Write the generated pipelines here.
+        repeat (int): Take the best time of this many runs.
+        threshold (float): Flag as super-linear above this tail exponent.
+        max_n (int): Skip sizes bigger than this.
+
+    Returns:
+        dict: The result of the case.
+    """
+    get_pipeline, ns = cases[name]
+    points = []
+    error = None
+
+    for n in ns:
+        if max_n and n > max_n:
+            break
+
+        pipeline_name = f'{name}-{n}'
+        path = tmp_dir.joinpath(f'{pipeline_name}.yaml')
+        path.write_text(get_pipeline(n, pipeline_name), encoding='utf-8')
+
+        try:
+            seconds, peak = measure(path, repeat)
+        except Exception as err:
+            error = {'n': n, 'error': f'{type(err).__name__}: {err}'}
+            break
+        finally:
+            loader_cache.clear()
+            file_cache.clear()
+
+        points.append({'n': n, 'seconds': seconds, 'peak_bytes': peak})
+
+    measured_ns = [point['n'] for point in points]
+    time_curve = get_curve(measured_ns,
+                           [point['seconds'] for point in points])
+    memory_curve = get_curve(measured_ns,
+                             [point['peak_bytes'] for point in points])
+
+    flags = []
+    if error:
+        flags.append('failed')
+
+    for label, curve in (('time', time_curve), ('memory', memory_curve)):
+        tail = curve['tail_exponent']
+        if tail is not None and tail > threshold:
+            flags.append(f'super-linear {label}')
+
+    return {'points': points,
+            'time': time_curve,
+            'memory': memory_curve,
+            'error': error,
+            'flags': flags}
+
+
+def print_case(name, result):
+    """Print the measurements & curves of a case.
+
+    Args:
+        name (str): Name of the case.
+        result (dict): Result of run_case.
+    """
+    for point in result['points']:
+        print(f"{name:<10} n={point['n']:<7} "
+              f"{point['seconds'] * 1000:>10.2f} ms "
+              f"{point['peak_bytes'] / 1024:>12.1f} KiB peak")
+
+    if result['error']:
+        print(f"{name:<10} n={result['error']['n']:<7} "
+              f"{result['error']['error']}")
+
+    def describe(curve):
+        if curve['exponent'] is None:
+            return 'n/a'
+
+        return (f"n^{curve['exponent']:.2f} "
+                f"(tail n^{curve['tail_exponent']:.2f})")
+
+    print(f"{name:<10} time ~ {describe(result['time'])}, "
+          f"memory ~ {describe(result['memory'])}")
+
+    if result['flags']:
+        print(f"{name:<10} !! {', '.join(result['flags'])}")
+
+    print(flush=True)
+
+
+def main(args=None):
+    """Run the scaling cases from the command line.
+
+    Args:
+        args (list[str]): Command line arguments. Default sys.argv[1:].
+    """
+    parser = argparse.ArgumentParser(description='pypyr scaling benchmarks')
+    parser.add_argument('names', nargs='*',
+                        help=f"Only run these cases: {', '.join(cases)}.")
+    parser.add_argument('--out', help='Save results as json to this path.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Take the best time of this many runs.')
+    parser.add_argument('--threshold', type=float, default=1.3,
+                        help='Flag tail exponents above this.')
+    parser.add_argument('--max-n', type=int, default=None,
+                        help='Skip sizes bigger than this.')
+    parsed = parser.parse_args(sys.argv[1:] if args is None else args)
+
+    unknown = [name for name in parsed.names if name not in cases]
+    if unknown:
+        parser.error(f"unknown case: {', '.join(unknown)}")
+
+    results = {}
+    # swallowed errors & notify would drown out the results.
+    logging.disable(logging.CRITICAL)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name in parsed.names or cases:
+                results[name] = result = run_case(name,
+                                                  Path(tmp_dir),
+                                                  parsed.repeat,
+                                                  parsed.threshold,
+                                                  parsed.max_n)
+                print_case(name, result)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    flagged = [name for name, result in results.items() if result['flags']]
+    print(f"flagged: {', '.join(flagged)}" if flagged else "flagged: none")
+
+    if parsed.out:
+        document = get_environment()
+        document['threshold'] = parsed.threshold
+        document['cases'] = results
+        with open(parsed.out, 'w', encoding='utf-8') as file:
+            json.dump(document, file, indent=2)
+
+        print(f"saved results to {parsed.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Benchmark per-step dispatch overhead of the StepsRunner.
+
+Compares running a step-group by parsing every step on each run, which is how
+StepsRunner used to run all step-groups, with running the step-group from its
+CompiledStepGroup. Each operation runs a step-group of STEP_COUNT no-op steps,
+so divide by STEP_COUNT for the time per step.
+
+Run from the repo root:
+    python -m tests.benchmarks stepsrunner
+"""
+from pypyr.context import Context
+from pypyr.stepsrunner import StepsRunner
+from tests.benchmarks.suite import benchmark
+
+STEP_COUNT = 100
+
+
+def get_pipeline():
+    """Get a step-group with a mix of simple & complex no-op steps."""
+    steps = []
+    for i in range(STEP_COUNT):
+        if i % 2:
+            steps.append('tests.arbpack.arbstep')
+        else:
+            steps.append({'name': 'tests.arbpack.arbstep',
+                          'in': {'k1': 'v1'},
+                          'run': True,
+                          'swallow': False})
+
+    return {'steps': steps}
+
+
+@benchmark('stepsrunner.parse_every_run')
+def bench_parse_every_run(tmp_dir):
+    """Run 100 steps, parsing every step on each run."""
+    pipeline = get_pipeline()
+    runner = StepsRunner(pipeline, Context())
+    steps = pipeline['steps']
+    return lambda: runner.run_pipeline_steps(steps)
+
+
+@benchmark('stepsrunner.compiled')
+def bench_compiled(tmp_dir):
+    """Run 100 steps from the compiled step-group."""
+    runner = StepsRunner(get_pipeline(), Context())
+    return lambda: runner.run_step_group('steps')
@@ -0,0 +1,158 @@
+"""Run the registered micro-benchmarks & save the results as json.
+
+Register a benchmark by decorating a setup function with @benchmark(name).
+The setup function gets a temp dir for any files it needs & returns the
+no-argument callable to time, so that setup cost doesn't count.
+
+Each benchmark runs as many times as it takes to fill about 0.2s, then
+repeats that to take the best & the median time per operation.
+
+Save results with --out, then compare a later run against them with
+--compare to see the ratio of current time to baseline time per benchmark.
+"""
+import argparse
+from datetime import datetime, timezone
+import json
+from pathlib import Path
+import platform
+from statistics import median
+import sys
+import tempfile
+import timeit
+
+import pypyr.version
+
+# name: setup function, in order of registration.
+benchmarks = {}
+
+
+def benchmark(name):
+    """Register the decorated setup function as benchmark name.
+
+    Args:
+        name (str): Unique name of the benchmark. Use dots to group related
+            benchmarks, like formatting.string.
+
+    Returns:
+        Decorator that registers the setup function & returns it unchanged.
+    """
+    def decorator(setup):
+        if name in benchmarks:
+            raise ValueError(f"benchmark {name} already exists.")
+
+        benchmarks[name] = setup
+        return setup
+
+    return decorator
+
+
+def time_benchmark(func, repeat):
+    """Time func.
+
+    Args:
+        func (callable): No-argument callable to time.
+        repeat (int): Take the best & median of this many timings.
+
+    Returns:
+        dict: number of operations per timing, repeat, best & median usec
+        per operation.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    timings = [elapsed / number * 1_000_000
+               for elapsed in timer.repeat(repeat=repeat, number=number)]
+
+    return {'number': number,
+            'repeat': repeat,
+            'best_usec': min(timings),
+            'median_usec': median(timings)}
+
+
+def run_suite(names=None, repeat=5):
+    """Run the benchmarks in names.
+
+    Args:
+        names (list[str]): Run benchmarks whose name starts with any of these.
+            None means run all.
+        repeat (int): Repeat each timing this many times.
+
+    Returns:
+        dict: Results document with environment details & the result of each
+        benchmark by name.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, setup in benchmarks.items():
+            if names and not any(name.startswith(n) for n in names):
+                continue
+
+            func = setup(Path(tmp_dir))
+            results[name] = result = time_benchmark(func, repeat)
+            print(f"{name:<40} {result['best_usec']:>14.2f} usec/op",
+                  flush=True)
+
+    environment = get_environment()
+    environment['benchmarks'] = results
+    return environment
+
+
+def get_environment():
+    """Get details of the environment the benchmarks run in.
+
+    Returns:
+        dict: pypyr & python versions, platform & when created.
+    """
+    return {'version': pypyr.version.get_version(),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'created': datetime.now(timezone.utc).isoformat()}
+
+
+def compare(baseline, current):
+    """Print current benchmark times relative to baseline.
+
+    Args:
+        baseline (dict): Earlier results document from run_suite.
+        current (dict): Results document from run_suite.
+    """
+    print(f"\ncompared to {baseline['version']} ({baseline['created']})")
+    print(f"{'benchmark':<40} {'baseline':>14} {'current':>14} {'ratio':>8}")
+    for name, result in current['benchmarks'].items():
+        before = baseline['benchmarks'].get(name)
+        if not before:
+            print(f"{name:<40} {'-':>14} {result['best_usec']:>14.2f}")
+            continue
+
+        ratio = result['best_usec'] / before['best_usec']
+        print(f"{name:<40} {before['best_usec']:>14.2f} "
+              f"{result['best_usec']:>14.2f} {ratio:>7.2f}x")
+
+
+def main(args=None):
+    """Run the benchmark suite from the command line.
+
+    Args:
+        args (list[str]): Command line arguments. Default sys.argv[1:].
+    """
+    parser = argparse.ArgumentParser(description='pypyr micro-benchmarks')
+    parser.add_argument('names', nargs='*',
+                        help='Only run benchmarks starting with these names.')
+    parser.add_argument('--out', help='Save results as json to this path.')
+    parser.add_argument('--compare',
+                        help='Compare results to json saved earlier.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Repeat each timing this many times.')
+    parsed = parser.parse_args(sys.argv[1:] if args is None else args)
+
+    results = run_suite(parsed.names, parsed.repeat)
+
+    if parsed.out:
+        with open(parsed.out, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+        print(f"\nsaved results to {parsed.out}")
+
+    if parsed.compare:
+        with open(parsed.compare, encoding='utf-8') as file:
+            compare(json.load(file), results)
@@ -12,3 +12,38 @@ def test_foreach_enumerables():
     assert context['generator_out'] == [4, 5, 6]
     assert context['product_out'] == [('A', 0), ('A', 1),
                                       ('B', 0), ('B', 1)]
+
+
+def test_foreach_parallel():
+    """Parallel foreach merges iteration results back into context."""
+    context = pipelinerunner.run('tests/pipelines/loops/foreachparallel')
+
+    assert context['last'] == 'd'
+    assert context['out_a'] == 'a'
+    assert context['out_d'] == 'd'
+    assert sorted(context['called_out']) == [10, 20, 30]
+    assert context['i'] == 3
+    assert 'called_i' in context
+
+    run_errors = context['runErrors']
+    assert sorted(e['description'] for e in run_errors) == ['arb 1', 'arb 3']
+    assert all(e['swallowed'] for e in run_errors)
+
+
+def test_foreach_parallel_process():
+    """Process foreach only returns out keys from worker processes."""
+    context = pipelinerunner.run('tests/pipelines/loops/foreachprocess')
+
+    assert context['i'] == 2
+    assert context['sq_1'] == 1
+    assert context['sq_2'] == 4
+    assert context['sq_3'] == 9
+    assert 'pid' not in context
+    assert 'not_out' not in context
+    # each worker appends to its own copy of shared, last merge wins.
+    assert context['shared'] == [1, 2, 3]
+
+    run_errors = context['runErrors']
+    assert len(run_errors) == 1
+    assert run_errors[0]['description'] == 'arb 2'
+    assert run_errors[0]['swallowed']
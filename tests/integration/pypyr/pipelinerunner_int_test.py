@@ -1,14 +1,26 @@
 """pipelinerunner.py integration tests."""
+from concurrent.futures import ThreadPoolExecutor
+import json
 import logging
+import os
 from pathlib import Path
-from unittest.mock import call
+import pstats
+import sys
+import threading
+from unittest.mock import call, Mock
 
 import pytest
 
+from pypyr.cache.filecache import file_cache
 from pypyr.cache.loadercache import loader_cache
 from pypyr.errors import KeyNotInContextError
 from pypyr import pipelinerunner
+from pypyr.config import config
+from pypyr.hooks import hooks
+from pypyr.profiler import profiler
+from pypyr.trace import tracer
 
+from tests.arbpack.arbhooks import RecordingHooks
 from tests.common.utils import patch_logger
 
 working_dir_tests = Path.cwd().joinpath('tests')
@@ -288,3 +300,400 @@ def test_pipeline_runner_main_with_context_with_failure_handled():
                               "exist for arbcaller.")
 
 # endregion main_with_context
+
+# region parallel groups
+
+
+def test_pipeline_runner_parallel_groups():
+    """Parallel groups merge into context in groups order, then success."""
+    out = pipelinerunner.run(
+        pipeline_name='tests/pipelines/api/parallelgroups',
+        groups=['steps', 'sg1', 'sg2'],
+        success_group='on_success',
+        parallel_groups=True)
+
+    assert out['from_steps'] == 'steps'
+    assert out['from_sg1'] == 'sg1'
+    assert out['from_sg2'] == 'sg2'
+    assert out['shared'] == 'sg2'
+    assert out['success'] == 'sg1 sg2 sg2'
+
+    assert len(out['runErrors']) == 1
+    assert out['runErrors'][0]['description'] == 'err from sg2'
+    assert out['runErrors'][0]['swallowed']
+
+# endregion parallel groups
+
+# region needs
+
+
+def test_pipeline_runner_needs():
+    """Steps with needs run once the steps they need are done."""
+    out = pipelinerunner.run('tests/pipelines/needs/needs')
+
+    assert out['a'] == 'A'
+    assert out['b'] == 'AB'
+    assert out['report'] == 'A AB'
+    assert out['no_needs'] is True
+    assert out['in_order'] is True
+
+    assert len(out['runErrors']) == 1
+    assert out['runErrors'][0]['description'] == 'err after slow'
+    assert out['runErrors'][0]['swallowed']
+
+# endregion needs
+
+# region trace
+
+
+def test_pipeline_runner_trace(tmp_path):
+    """Trace saves nested spans for every pipeline, group, step & loop."""
+    trace_path = tmp_path.joinpath('out', 'trace.json')
+    out = pipelinerunner.run('tests/pipelines/trace/trace',
+                             dict_in={'python': sys.executable},
+                             trace_path=trace_path)
+
+    assert out['child'] == 'done'
+    assert not tracer.enabled
+
+    with open(trace_path) as file:
+        trace = json.load(file)
+
+    spans = [(event['cat'], event['name'])
+             for event in trace['traceEvents'] if event['ph'] == 'X']
+
+    # spans save as they end, so inner before outer.
+    assert spans == [
+        ('foreach', 'foreach'),
+        ('foreach', 'foreach'),
+        ('step', 'pypyr.steps.py'),
+        ('while', 'while'),
+        ('while', 'while'),
+        ('step', 'pypyr.steps.py'),
+        ('retry', 'retry'),
+        ('retry', 'retry'),
+        ('step', 'pypyr.steps.py'),
+        ('subprocess', f'{sys.executable} -c "pass"'),
+        ('step', 'pypyr.steps.cmd'),
+        ('step', 'pypyr.steps.set'),
+        ('step-group', 'steps'),
+        ('pipeline', 'trace-child'),
+        ('step', 'pypyr.steps.pype'),
+        ('step-group', 'steps'),
+        ('pipeline', 'tests/pipelines/trace/trace')]
+
+    retry = [event for event in trace['traceEvents']
+             if event['ph'] == 'X' and event['cat'] == 'retry']
+    assert retry[0]['args'] == {'counter': 1, 'error': 'ValueError'}
+    assert retry[1]['args'] == {'counter': 2}
+
+# endregion trace
+
+# region profile
+
+
+def test_pipeline_runner_profile(tmp_path):
+    """Profile reports step cpu time & saves raw stats."""
+    stats_path = tmp_path.joinpath('out.pstats')
+    with patch_logger('pypyr.profiler', logging.NOTIFY) as mock_notify:
+        out = pipelinerunner.run('tests/pipelines/trace/trace',
+                                 dict_in={'python': sys.executable},
+                                 profile_path=stats_path)
+
+    assert out['child'] == 'done'
+    assert not profiler.enabled
+
+    report = mock_notify.call_args_list[0].args[0]
+    lines = report.splitlines()
+    assert lines[0] == "profile: top 6 steps by cumulative cpu time"
+    steps = sorted(line.split(maxsplit=4)[3:] for line in lines[2:8])
+    assert steps == [['1', 'tests/pipelines/trace/trace:12 pypyr.steps.py'],
+                     ['1', 'tests/pipelines/trace/trace:19 pypyr.steps.cmd'],
+                     ['1', 'tests/pipelines/trace/trace:22 pypyr.steps.pype'],
+                     ['1', 'tests/pipelines/trace/trace:3 pypyr.steps.py'],
+                     ['1', 'tests/pipelines/trace/trace:7 pypyr.steps.py'],
+                     ['1', 'trace-child:3 pypyr.steps.set']]
+
+    mock_notify.assert_called_with(f"saved profile stats to {stats_path}")
+    assert pstats.Stats(str(stats_path)).total_calls > 0
+
+# endregion profile
+
+# region hooks
+
+
+def test_pipeline_runner_hooks():
+    """Hooks see every pipeline, group, step, iteration & error."""
+    hook = RecordingHooks()
+    hooks.register(hook)
+    try:
+        out = pipelinerunner.run('tests/pipelines/trace/trace',
+                                 dict_in={'python': sys.executable})
+    finally:
+        hooks.clear()
+
+    assert out['child'] == 'done'
+
+    trace = 'tests/pipelines/trace/trace'
+    py = 'pypyr.steps.py'
+    assert hook.events == [
+        ('before_pipeline', 'pipeline', trace, None, None, None),
+        ('before_step_group', 'step-group', 'steps', None, None, None),
+        ('before_step', 'step', py, 3, None, None),
+        ('before_iteration', 'foreach', py, 3, 'a', None),
+        ('after_iteration', 'foreach', py, 3, 'a', None),
+        ('before_iteration', 'foreach', py, 3, 'b', None),
+        ('after_iteration', 'foreach', py, 3, 'b', None),
+        ('after_step', 'step', py, 3, None, None),
+        ('before_step', 'step', py, 7, None, None),
+        ('before_iteration', 'while', py, 7, 1, None),
+        ('after_iteration', 'while', py, 7, 1, None),
+        ('before_iteration', 'while', py, 7, 2, None),
+        ('after_iteration', 'while', py, 7, 2, None),
+        ('after_step', 'step', py, 7, None, None),
+        ('before_step', 'step', py, 12, None, None),
+        ('before_iteration', 'retry', py, 12, 1, None),
+        ('after_iteration', 'retry', py, 12, 1, 'ValueError'),
+        ('before_iteration', 'retry', py, 12, 2, None),
+        ('after_iteration', 'retry', py, 12, 2, None),
+        ('after_step', 'step', py, 12, None, None),
+        ('before_step', 'step', 'pypyr.steps.cmd', 19, None, None),
+        ('after_step', 'step', 'pypyr.steps.cmd', 19, None, None),
+        ('before_step', 'step', 'pypyr.steps.pype', 22, None, None),
+        ('before_pipeline', 'pipeline', 'trace-child', None, None, None),
+        ('before_step_group', 'step-group', 'steps', None, None, None),
+        ('before_step', 'step', 'pypyr.steps.set', 3, None, None),
+        ('after_step', 'step', 'pypyr.steps.set', 3, None, None),
+        ('after_step_group', 'step-group', 'steps', None, None, None),
+        ('after_pipeline', 'pipeline', 'trace-child', None, None, None),
+        ('after_step', 'step', 'pypyr.steps.pype', 22, None, None),
+        ('after_step_group', 'step-group', 'steps', None, None, None),
+        ('after_pipeline', 'pipeline', trace, None, None, None)]
+
+
+def test_pipeline_runner_hooks_on_error():
+    """Hooks get on_error & after_ events with the exception."""
+    hook = RecordingHooks()
+    hooks.register(hook)
+    try:
+        with pytest.raises(ValueError):
+            pipelinerunner.run('tests/pipelines/errors/fail-no-handler')
+    finally:
+        hooks.clear()
+
+    pipeline = 'tests/pipelines/errors/fail-no-handler'
+    assert hook.events[4:] == [
+        ('before_step', 'step', 'pypyr.steps.py', 5, None, None),
+        ('on_error', 'step', 'pypyr.steps.py', 5, None, 'ValueError'),
+        ('after_step', 'step', 'pypyr.steps.py', 5, None, 'ValueError'),
+        ('after_step_group', 'step-group', 'steps', None, None, 'ValueError'),
+        ('after_pipeline', 'pipeline', pipeline, None, None, 'ValueError')]
+
+# endregion hooks
+
+# region metrics
+
+
+def test_pipeline_runner_metrics(tmp_path):
+    """Metrics save durations & counts of the run."""
+    metrics_path = tmp_path.joinpath('out', 'pypyr.prom')
+    out = pipelinerunner.run('tests/pipelines/trace/trace',
+                             dict_in={'python': sys.executable},
+                             metrics_path=metrics_path)
+
+    assert out['child'] == 'done'
+
+    lines = metrics_path.read_text().splitlines()
+    pipe = 'pipeline="tests/pipelines/trace/trace"'
+
+    assert f'pypyr_pipeline_duration_seconds_count{{{pipe}}} 1' in lines
+    assert ('pypyr_pipeline_duration_seconds_count{pipeline="trace-child"} 1'
+            in lines)
+    assert ('pypyr_step_duration_seconds_count{pipeline="trace-child",'
+            'step="pypyr.steps.set",line="3"} 1') in lines
+    assert (f'pypyr_step_iterations_total{{{pipe},step="pypyr.steps.py",'
+            'line="3",kind="foreach"} 2') in lines
+    assert (f'pypyr_step_iterations_total{{{pipe},step="pypyr.steps.py",'
+            'line="7",kind="while"} 2') in lines
+    assert (f'pypyr_step_retries_total{{{pipe},step="pypyr.steps.py",'
+            'line="12"} 1') in lines
+    assert 'pypyr_subprocesses_total{exit_code="0"} 1' in lines
+
+
+def test_pipeline_runner_metrics_from_config(tmp_path, monkeypatch):
+    """Config metrics_path saves metrics, also when the run fails."""
+    metrics_path = tmp_path.joinpath('pypyr.prom')
+    monkeypatch.setattr(config, 'metrics_path', str(metrics_path))
+
+    with pytest.raises(ValueError):
+        pipelinerunner.run('tests/pipelines/errors/fail-no-handler')
+
+    lines = metrics_path.read_text().splitlines()
+    assert ('pypyr_pipeline_duration_seconds_count{'
+            'pipeline="tests/pipelines/errors/fail-no-handler"} 1') in lines
+
+
+def test_pipeline_runner_metrics_runs_at_same_time(tmp_path):
+    """Runs at the same time in one process each save only their metrics."""
+    barrier = threading.Barrier(2, timeout=10)
+
+    def run(step_name, metrics_path):
+        pipeline = ("steps:\n"
+                    "  - name: pypyr.steps.py\n"
+                    "    in:\n"
+                    "      py: barrier.wait()\n"
+                    f"  - name: {step_name}\n"
+                    "    in:\n"
+                    "      set:\n"
+                    "        a: b\n"
+                    "      echoMe: arb\n")
+        pipelinerunner.run(pipeline,
+                           dict_in={'barrier': barrier},
+                           loader='pypyr.loaders.string',
+                           metrics_path=metrics_path)
+
+    set_path = tmp_path.joinpath('set.prom')
+    echo_path = tmp_path.joinpath('echo.prom')
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(run, 'pypyr.steps.set', set_path),
+                   pool.submit(run, 'pypyr.steps.echo', echo_path)]
+
+    for future in futures:
+        future.result()
+
+    set_metrics = set_path.read_text()
+    echo_metrics = echo_path.read_text()
+    assert 'step="pypyr.steps.set"' in set_metrics
+    assert 'step="pypyr.steps.echo"' not in set_metrics
+    assert 'step="pypyr.steps.echo"' in echo_metrics
+    assert 'step="pypyr.steps.set"' not in echo_metrics
+
+# endregion metrics
+
+# region memory report
+
+
+def test_pipeline_runner_memory_report(tmp_path):
+    """Memory report saves the largest keys & the steps that grew them."""
+    report_path = tmp_path.joinpath('out', 'mem.json')
+    out = pipelinerunner.run('tests/pipelines/memory/grow',
+                             memory_report_path=report_path)
+
+    assert 'big' not in out
+
+    report = json.loads(report_path.read_text())
+    pipe = 'tests/pipelines/memory/grow'
+
+    big = report['keys'][0]
+    assert big['key'] == 'big'
+    assert big['peak_bytes'] > 80000
+    assert big['peak_step'] == f'{pipe}/pypyr.steps.py:7'
+    assert big['last_bytes'] == 0
+
+    grew = report['steps'][0]
+    assert grew['pipeline'] == pipe
+    assert grew['step'] == 'pypyr.steps.py'
+    assert grew['line'] == 7
+    assert grew['runs'] == 1
+    assert grew['growth_bytes'] >= big['peak_bytes']
+    assert grew['keys']['big'] == big['peak_bytes']
+
+    cleared = report['steps'][-1]
+    assert cleared['step'] == 'pypyr.steps.contextclear'
+    assert cleared['keys']['big'] == -big['peak_bytes']
+
+# endregion memory report
+
+# region sampler
+
+
+def test_pipeline_runner_sample(tmp_path):
+    """Sampler saves collapsed stacks rooted in pipelines & steps."""
+    sample_path = tmp_path.joinpath('out', 'stacks.txt')
+    pipelinerunner.run('tests/pipelines/sleep',
+                       sample_path=sample_path,
+                       sample_rate=200)
+
+    lines = sample_path.read_text().splitlines()
+    assert lines
+
+    total = 0
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert stack.startswith(
+            'pipeline:tests/pipelines/sleep;step:pypyr.steps.py;')
+        total += int(count)
+
+    # sleeps 0.2s at 200/s, but be lenient for slow ci.
+    assert total > 5
+    assert any(';run_step (' in line for line in lines)
+
+# endregion sampler
+
+# region file cache revalidate
+
+
+def test_pipeline_runner_file_cache_revalidate(tmp_path, monkeypatch,
+                                               pipeline_cache_reset):
+    """A pipeline file edited between runs reloads on the next run."""
+    monkeypatch.setattr(config, 'file_cache_revalidate_interval', 0)
+    path = tmp_path.joinpath('pipe.yaml')
+    path.write_text("steps:\n"
+                    "  - name: pypyr.steps.set\n"
+                    "    in:\n"
+                    "      set:\n"
+                    "        a: one\n")
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+
+    pipeline_name = tmp_path.joinpath('pipe')
+
+    on_reload = Mock()
+    hooks.register(Mock(spec=['on_reload'], on_reload=on_reload))
+    try:
+        assert pipelinerunner.run(str(pipeline_name))['a'] == 'one'
+        assert pipelinerunner.run(str(pipeline_name))['a'] == 'one'
+        on_reload.assert_not_called()
+
+        path.write_text("steps:\n"
+                        "  - name: pypyr.steps.set\n"
+                        "    in:\n"
+                        "      set:\n"
+                        "        a: two\n")
+        os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+
+        assert pipelinerunner.run(str(pipeline_name))['a'] == 'two'
+    finally:
+        hooks.clear()
+        file_cache.clear()
+
+    event = on_reload.call_args.args[0]
+    assert event.name == str(path)
+    assert event.reason == 'changed'
+    assert file_cache.reloads == 1
+
+# endregion file cache revalidate
+
+# region constant containers
+
+
+@pytest.mark.parametrize('fast_yaml', [False, True])
+def test_pipeline_runner_mutated_in_formats(fast_yaml, monkeypatch):
+    """A step that changes an in value from the yaml formats the change."""
+    monkeypatch.setattr(config, 'fast_yaml', fast_yaml)
+    pipeline = ("steps:\n"
+                "  - name: pypyr.steps.py\n"
+                "    in:\n"
+                "      cfg:\n"
+                "        k: v\n"
+                "      py: \"cfg['t'] = '{x}'; save(holder=cfg)\"\n"
+                "  - name: pypyr.steps.set\n"
+                "    in:\n"
+                "      x: hello\n"
+                "      set:\n"
+                "        out: '{holder}'\n")
+
+    context = pipelinerunner.run(pipeline, loader='pypyr.loaders.string')
+
+    assert context['out'] == {'k': 'v', 't': 'hello'}
+
+# endregion constant containers
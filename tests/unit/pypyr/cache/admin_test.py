@@ -1,13 +1,21 @@
 """pypyr/cache/admin.py unit tests."""
+import json
+import logging
+from unittest.mock import patch
+
+import pytest
+
 import pypyr.cache.admin as cache_admin
 
 from pypyr.cache.backoffcache import backoff_cache
+from pypyr.cache.codecache import pystring_code_cache
 from pypyr.cache.filecache import file_cache
 from pypyr.cache.loadercache import loader_cache
 from pypyr.cache.namespacecache import pystring_namespace_cache
 from pypyr.cache.parsercache import contextparser_cache
 from pypyr.cache.stepcache import step_cache
 from pypyr.retries import builtin_backoffs
+from tests.common.utils import patch_logger
 
 # region load_backoff_callable
 
@@ -17,6 +25,7 @@ def test_cache_clear_all():
     cache_admin.clear_all()
 
     assert backoff_cache._cache == builtin_backoffs
+    assert pystring_code_cache._cache == {}
     assert file_cache._cache == {}
     assert loader_cache._cache == {}
     assert pystring_namespace_cache._cache == {}
@@ -26,6 +35,9 @@ def test_cache_clear_all():
     backoff_cache.get_backoff('tests.arbpack.arbcallables.ArbCallable')
     assert len(backoff_cache._cache) == len(builtin_backoffs) + 1
 
+    pystring_code_cache.get_code('1 + 1')
+    assert len(pystring_code_cache._cache) == 1
+
     # testing full file cache clear in pypyr/loaders/file_test.py in:
     # test_get_pipeline_definition_clear_all_cache
     file_cache._cache['arb'] = 'delete me'
@@ -46,8 +58,76 @@ def test_cache_clear_all():
     cache_admin.clear_all()
 
     assert backoff_cache._cache == builtin_backoffs
+    assert pystring_code_cache._cache == {}
     assert file_cache._cache == {}
     assert loader_cache._cache == {}
     assert pystring_namespace_cache._cache == {}
     assert contextparser_cache._cache == {}
     assert step_cache._cache == {}
+
+
+def test_cache_stats():
+    """Get stats for all caches."""
+    cache_admin.clear_all()
+    hits = pystring_code_cache.hits
+    misses = pystring_code_cache.misses
+
+    pystring_code_cache.get_code('2 + 2')
+    pystring_code_cache.get_code('2 + 2')
+
+    stats = cache_admin.stats()
+
+    assert list(stats) == ['backoff_cache',
+                           'contextparser_cache',
+                           'file_cache',
+                           'loader_cache',
+                           'pipeline_cache',
+                           'pystring_code_cache',
+                           'pystring_namespace_cache',
+                           'step_cache',
+                           'step_result_cache']
+
+    code_stats = stats['pystring_code_cache']
+    assert code_stats['hits'] == hits + 1
+    assert code_stats['misses'] == misses + 1
+    assert code_stats['size'] == 1
+    assert code_stats['max_size'] == 2048
+
+    assert stats['step_cache'] == step_cache.get_stats()
+    cache_admin.clear_all()
+
+
+def test_cache_dump_stats(tmp_path):
+    """Dump stats writes json & creates parent dirs."""
+    path = tmp_path.joinpath('sub', 'stats.json')
+    with patch('pypyr.cache.admin.stats', return_value={'arb': {'hits': 1}}):
+        cache_admin.dump_stats(path)
+
+    assert json.loads(path.read_text()) == {'arb': {'hits': 1}}
+    assert list(path.parent.iterdir()) == [path]
+
+
+def test_cache_dump_stats_err_keeps_existing(tmp_path):
+    """Dump stats that fails mid-write keeps the old file & no temp file."""
+    path = tmp_path.joinpath('stats.json')
+    path.write_text('old')
+
+    with patch('pypyr.cache.admin.os.replace', side_effect=OSError('arb')):
+        with pytest.raises(OSError):
+            cache_admin.dump_stats(path)
+
+    assert path.read_text() == 'old'
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_cache_saving_stats(tmp_path):
+    """Saving stats dumps on exit, even on error."""
+    path = tmp_path.joinpath('stats.json')
+    with patch_logger('pypyr.cache.admin', logging.NOTIFY) as mock_notify:
+        with pytest.raises(ValueError):
+            with cache_admin.saving_stats(path):
+                assert not path.exists()
+                raise ValueError('arb')
+
+    assert 'step_cache' in json.loads(path.read_text())
+    mock_notify.assert_called_once_with(f"saved cache stats to {path}")
@@ -1,10 +1,12 @@
 """cache.py unit tests."""
 import logging
-from unittest.mock import call, MagicMock
+import threading
+from unittest.mock import call, MagicMock, patch
 
 import pytest
 
 from pypyr.cache.cache import Cache
+from pypyr.errors import ConfigError
 from tests.common.utils import patch_logger
 
 
@@ -146,3 +148,422 @@ def inner():
     assert obj1 == 5
     assert obj2 == 9
     assert obj3 == 5
+
+
+def test_cache_remove():
+    """Remove drops the key so the next get creates it again."""
+    cache = Cache()
+    cache.get('one', lambda: 1)
+    cache.get('two', lambda: 2)
+
+    cache.remove('one')
+    cache.remove('arb not there')
+
+    assert cache._cache == {'two': 2}
+    assert cache.get('one', lambda: 3) == 3
+
+
+@patch('pypyr.cache.cache.get_deep_size', return_value=123)
+def test_cache_stats(mock_size):
+    """Cache counts hits, misses & creator time."""
+    cache = Cache()
+    assert cache.get_stats() == {'hits': 0,
+                                 'misses': 0,
+                                 'evictions': 0,
+                                 'expirations': 0,
+                                 'size': 0,
+                                 'max_size': None,
+                                 'max_bytes': None,
+                                 'ttl': None,
+                                 'policy': 'lru',
+                                 'create_seconds': 0.0,
+                                 'memory_bytes': 123}
+
+    with patch('pypyr.cache.cache.time.perf_counter',
+               side_effect=[1.0, 2.0, 3.0, 5.5]):
+        cache.get('one', lambda: 1)
+        cache.get('one', lambda: 2)
+        cache.get('two', lambda: 3)
+        cache.get('one', lambda: 4)
+
+    assert cache.get_stats() == {'hits': 2,
+                                 'misses': 2,
+                                 'evictions': 0,
+                                 'expirations': 0,
+                                 'size': 2,
+                                 'max_size': None,
+                                 'max_bytes': None,
+                                 'ttl': None,
+                                 'policy': 'lru',
+                                 'create_seconds': 3.5,
+                                 'memory_bytes': 123}
+    mock_size.assert_called_with([('one', 1), ('two', 3)])
+
+
+def test_cache_stats_memory():
+    """Cache estimates memory of everything it holds."""
+    cache = Cache()
+    empty = cache.get_stats()['memory_bytes']
+
+    cache.get('one', lambda: 'x' * 10000)
+
+    assert cache.get_stats()['memory_bytes'] > empty + 10000
+
+
+@patch('pypyr.cache.cache.get_deep_size', return_value=64)
+def test_cache_stats_no_cache(mock_size, no_cache):
+    """Cache with no_cache doesn't count hits or misses."""
+    cache = Cache()
+    cache.get('one', lambda: 1)
+    cache.get('one', lambda: 1)
+
+    assert cache.get_stats() == {'hits': 0,
+                                 'misses': 0,
+                                 'evictions': 0,
+                                 'expirations': 0,
+                                 'size': 0,
+                                 'max_size': None,
+                                 'max_bytes': None,
+                                 'ttl': None,
+                                 'policy': 'lru',
+                                 'create_seconds': 0.0,
+                                 'memory_bytes': 64}
+
+
+def test_cache_max_size_evicts_oldest():
+    """Cache with max_size & fifo evicts oldest item when full."""
+    cache = Cache(max_size=2, policy='fifo')
+    assert cache.get('one', lambda: 1) == 1
+    assert cache.get('two', lambda: 2) == 2
+    assert cache.get('one', lambda: 'x') == 1
+    assert cache.get('three', lambda: 3) == 3
+
+    assert list(cache._cache) == ['two', 'three']
+    assert cache.get('one', lambda: 'new one') == 'new one'
+    assert list(cache._cache) == ['three', 'one']
+
+    stats = cache.get_stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 4
+    assert stats['evictions'] == 2
+    assert stats['size'] == 2
+    assert stats['max_size'] == 2
+
+
+def test_cache_max_size_evicts_least_recently_used():
+    """Cache with max_size evicts least recently used item when full."""
+    cache = Cache(max_size=2)
+    assert cache.get('one', lambda: 1) == 1
+    assert cache.get('two', lambda: 2) == 2
+    assert cache.get('one', lambda: 'x') == 1
+    assert cache.get('three', lambda: 3) == 3
+
+    # one had a hit, so it goes to the back & two evicts instead.
+    assert list(cache._cache) == ['three', 'one']
+    assert cache._used == set()
+    assert cache.get('two', lambda: 'new two') == 'new two'
+    assert list(cache._cache) == ['one', 'two']
+    assert cache.evictions == 2
+
+
+def test_cache_unbounded_lru_hit_keeps_order():
+    """Hits don't reorder an unbounded cache, since nothing evicts."""
+    cache = Cache()
+    cache.get('one', lambda: 1)
+    cache.get('two', lambda: 2)
+    cache.get('one', lambda: 'x')
+
+    assert list(cache._cache) == ['one', 'two']
+
+
+@patch('pypyr.cache.cache.get_deep_size', side_effect=lambda obj: obj)
+@patch('pypyr.cache.cache.getsizeof', return_value=0)
+def test_cache_max_bytes(mock_getsizeof, mock_size):
+    """Cache with max_bytes evicts lru items until the new item fits."""
+    cache = Cache(max_bytes=100)
+    cache.get('a', lambda: 40)
+    cache.get('b', lambda: 40)
+    cache.get('a', lambda: 'x')
+    assert cache._bytes == 80
+
+    cache.get('c', lambda: 30)
+    assert list(cache._cache) == ['c', 'a']
+    assert cache._bytes == 70
+    assert cache.evictions == 1
+
+    cache.get('d', lambda: 100)
+    assert list(cache._cache) == ['d']
+    assert cache._bytes == 100
+    assert cache.evictions == 3
+
+    cache.remove('d')
+    assert cache._bytes == 0
+    assert cache._sizes == {}
+
+
+@patch('pypyr.cache.cache.get_deep_size', return_value=101)
+def test_cache_max_bytes_item_too_big(mock_size):
+    """Item bigger than max_bytes on its own doesn't cache."""
+    cache = Cache(max_bytes=100)
+    cache.get('a', lambda: 1)
+
+    assert cache._cache == {}
+    assert cache._bytes == 0
+    assert cache.get('a', lambda: 2) == 2
+    assert cache.misses == 2
+
+
+@patch('pypyr.cache.cache.time.monotonic')
+def test_cache_ttl(mock_time):
+    """Item expires ttl seconds after it was created."""
+    cache = Cache(ttl=10)
+
+    mock_time.return_value = 100
+    assert cache.get('one', lambda: 1) == 1
+
+    mock_time.return_value = 109.9
+    assert cache.get('one', lambda: 2) == 1
+
+    mock_time.return_value = 110
+    assert cache.get('one', lambda: 3) == 3
+    assert cache._expires == {'one': 120}
+
+    assert cache.hits == 1
+    assert cache.misses == 2
+    assert cache.expirations == 1
+    assert cache.evictions == 0
+
+
+@patch('pypyr.cache.cache.time.monotonic')
+def test_cache_ttl_sweeps_expired(mock_time):
+    """Adding an item drops every expired item once per ttl."""
+    cache = Cache(ttl=10)
+
+    mock_time.return_value = 100
+    cache.get('one', lambda: 1)
+    mock_time.return_value = 105
+    cache.get('two', lambda: 2)
+
+    mock_time.return_value = 112
+    cache.get('three', lambda: 3)
+
+    assert list(cache._cache) == ['two', 'three']
+    assert cache._expires == {'two': 115, 'three': 122}
+    assert cache.expirations == 1
+
+    # next sweep only from 122.
+    mock_time.return_value = 116
+    cache.get('four', lambda: 4)
+    assert list(cache._cache) == ['two', 'three', 'four']
+
+    cache.clear()
+    assert cache._expires == {}
+
+
+def test_cache_limits_from_config(monkeypatch):
+    """Config limits for the cache's name win over init args."""
+    monkeypatch.setattr('pypyr.cache.cache.config.cache_limits',
+                        {'arb': {'max_size': 1, 'policy': 'fifo'}})
+
+    cache = Cache(max_size=5, ttl=3, name='arb')
+    assert cache.get_limits() == (1, None, 3, 'fifo')
+
+    cache.get('one', lambda: 1)
+    cache.get('two', lambda: 2)
+    assert cache._cache == {'two': 2}
+    assert cache.get_stats()['max_size'] == 1
+
+    assert (Cache(max_size=5, name='other').get_limits()
+            == (5, None, None, 'lru'))
+    assert Cache(max_size=5).get_limits() == (5, None, None, 'lru')
+
+
+def test_cache_limits_bad_policy(monkeypatch):
+    """Policy other than lru or fifo raises."""
+    monkeypatch.setattr('pypyr.cache.cache.config.cache_limits',
+                        {'arb': {'policy': 'random'}})
+
+    with pytest.raises(ConfigError) as err:
+        Cache(name='arb').get_limits()
+
+    assert str(err.value) == ("cache policy for arb is random. It should be "
+                              "one of lru, fifo.")
+
+
+def test_cache_limits_not_mapping(monkeypatch):
+    """Limits in config that aren't a mapping raise."""
+    monkeypatch.setattr('pypyr.cache.cache.config.cache_limits',
+                        {'arb': 3})
+
+    with pytest.raises(ConfigError) as err:
+        Cache(name='arb').get_limits()
+
+    assert str(err.value) == ("cache_limits for arb should be a mapping with "
+                              "any of max_size, max_bytes, ttl & policy.")
+
+
+def test_cache_max_size_creator_error_not_cached():
+    """Cache doesn't evict or add when creator raises."""
+    cache = Cache(max_size=1)
+    cache.get('one', lambda: 1)
+
+    def creator():
+        raise ValueError('arb')
+
+    with pytest.raises(ValueError):
+        cache.get('two', creator)
+
+    assert cache._cache == {'one': 1}
+    assert cache.evictions == 0
+
+# region concurrency
+
+
+def run_in_thread(target):
+    """Start target on a daemon thread & return the thread."""
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+class WaitCounter():
+    """Count the gets that wait on another thread's creator."""
+
+    def __init__(self, expected):
+        """Initialize to expect this many waiters."""
+        self.count = 0
+        self.expected = expected
+        self.all_waiting = threading.Event()
+        self._lock = threading.Lock()
+
+    def debug(self, msg, *args):
+        """Stand-in for logger.debug."""
+        if msg.endswith('. . . waiting'):
+            with self._lock:
+                self.count += 1
+                if self.count == self.expected:
+                    self.all_waiting.set()
+
+
+def test_cache_hit_does_not_lock():
+    """A hit returns while another thread holds the lock."""
+    cache = Cache()
+    cache.get('one', lambda: 1)
+    out = []
+
+    with cache._lock:
+        thread = run_in_thread(lambda: out.append(cache.get('one', None)))
+        thread.join(5)
+
+    assert out == [1]
+
+
+def test_cache_same_key_creates_once():
+    """Threads that get the same key wait for the one creator."""
+    cache = Cache()
+    started = threading.Event()
+    release = threading.Event()
+    waits = WaitCounter(3)
+    calls = []
+
+    def creator():
+        calls.append(1)
+        started.set()
+        assert release.wait(5)
+        return object()
+
+    out = []
+    with patch('pypyr.cache.cache.logger.debug', side_effect=waits.debug):
+        first = run_in_thread(lambda: out.append(cache.get('k', creator)))
+        assert started.wait(5)
+        waiters = [run_in_thread(lambda: out.append(cache.get('k', creator)))
+                   for _ in range(3)]
+
+        assert waits.all_waiting.wait(5)
+        release.set()
+        for thread in [first, *waiters]:
+            thread.join(5)
+
+    assert len(calls) == 1
+    assert len(out) == 4
+    assert all(obj is out[0] for obj in out)
+    assert cache._loading == {}
+    assert cache.misses == 1
+
+
+def test_cache_different_keys_create_in_parallel():
+    """A slow creator doesn't block the creator of another key."""
+    cache = Cache()
+    b_done = threading.Event()
+
+    def slow():
+        # only finishes if b can create while a is still creating.
+        assert b_done.wait(5)
+        return 'a'
+
+    out = []
+    thread = run_in_thread(lambda: out.append(cache.get('a', slow)))
+    assert cache.get('b', lambda: 'b') == 'b'
+    b_done.set()
+    thread.join(5)
+
+    assert out == ['a']
+    assert cache._cache == {'b': 'b', 'a': 'a'}
+
+
+def test_cache_creator_error_raises_in_waiters():
+    """Waiters get the creator's error & the next get creates again."""
+    cache = Cache()
+    started = threading.Event()
+    release = threading.Event()
+
+    def creator():
+        started.set()
+        assert release.wait(5)
+        raise ValueError('arb')
+
+    errors = []
+
+    def get():
+        try:
+            cache.get('k', creator)
+        except ValueError as err:
+            errors.append(err)
+
+    waits = WaitCounter(1)
+    with patch('pypyr.cache.cache.logger.debug', side_effect=waits.debug):
+        first = run_in_thread(get)
+        assert started.wait(5)
+        waiter = run_in_thread(get)
+
+        assert waits.all_waiting.wait(5)
+        release.set()
+        first.join(5)
+        waiter.join(5)
+
+    assert len(errors) == 2
+    assert all(str(err) == 'arb' for err in errors)
+    assert cache._loading == {}
+    assert cache._cache == {}
+    assert cache.get('k', lambda: 1) == 1
+
+
+def test_cache_same_key_in_own_creator():
+    """Getting the same key inside its own creator creates sans cache."""
+    cache = Cache()
+
+    def outer():
+        return ('outer', cache.get('k', lambda: 'inner'))
+
+    assert cache.get('k', outer) == ('outer', 'inner')
+    assert cache._cache == {'k': ('outer', 'inner')}
+    assert cache.misses == 1
+
+
+def test_cache_other_key_in_own_creator():
+    """A creator can get another key from the same cache."""
+    cache = Cache()
+    assert cache.get('a', lambda: cache.get('b', lambda: 'b') + 'a') == 'ba'
+    assert cache._cache == {'b': 'b', 'a': 'ba'}
+
+# endregion concurrency
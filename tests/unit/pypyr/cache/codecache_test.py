@@ -0,0 +1,87 @@
+"""codecache.py unit tests."""
+from sys import intern
+from unittest.mock import patch
+
+import pytest
+
+import pypyr.cache.codecache as codecache
+
+# region compile_expression
+
+
+def test_compile_expression():
+    """Compile expression to code object for eval."""
+    code = codecache.compile_expression('1 + 2')
+    assert eval(code) == 3
+
+
+def test_compile_expression_leading_whitespace():
+    """Compile strips leading whitespace like eval does for a str."""
+    code = codecache.compile_expression(' \t len("abc")')
+    assert eval(code) == 3
+
+
+def test_compile_expression_syntax_error():
+    """Compile error reports the original expression."""
+    with pytest.raises(SyntaxError) as err:
+        codecache.compile_expression('1 +* 2')
+
+    assert err.value.text == '1 +* 2'
+    assert err.value.filename == '<string>'
+
+# endregion compile_expression
+
+# region CodeCache
+
+
+def test_code_cache_default_max_size():
+    """Code cache is bounded by default."""
+    assert codecache.CodeCache().max_size == codecache.DEFAULT_MAX_SIZE
+    assert codecache.pystring_code_cache.max_size == 2048
+
+
+def test_code_cache_get_code_hit():
+    """Get code compiles once & hits cache after."""
+    cache = codecache.CodeCache()
+    source = ''.join(['a', ' + 1'])
+    with patch('pypyr.cache.codecache.compile_expression',
+               return_value='code') as mock_compile:
+        code1 = cache.get_code(source)
+        code2 = cache.get_code('a + 1')
+
+    mock_compile.assert_called_once_with('a + 1')
+    assert code1 == code2 == 'code'
+    assert list(cache._cache)[0] is intern('a + 1')
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_code_cache_get_code_eval():
+    """Get code returns code object that evals."""
+    cache = codecache.CodeCache()
+    code = cache.get_code('x * 2')
+    assert eval(code, {'x': 3}) == 6
+    assert cache.get_code('x * 2') is code
+
+
+def test_code_cache_bounded():
+    """Code cache evicts oldest expression when full."""
+    cache = codecache.CodeCache(max_size=2)
+    cache.get_code('1')
+    cache.get_code('2')
+    cache.get_code('3')
+
+    assert list(cache._cache) == ['2', '3']
+    assert cache.evictions == 1
+
+
+def test_code_cache_syntax_error_not_cached():
+    """Syntax error raises with original expression & doesn't cache."""
+    cache = codecache.CodeCache()
+    with pytest.raises(SyntaxError) as err:
+        cache.get_code('a b')
+
+    assert err.value.text == 'a b'
+    assert not cache._cache
+
+# endregion CodeCache
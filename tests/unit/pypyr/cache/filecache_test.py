@@ -0,0 +1,302 @@
+"""filecache.py unit tests."""
+import logging
+import os
+from unittest.mock import Mock, patch
+
+import pytest
+
+from pypyr.cache.filecache import FileCache, get_file_stamp
+from tests.common.utils import patch_logger
+
+
+@pytest.fixture
+def revalidate(monkeypatch):
+    """Revalidate every 10s."""
+    monkeypatch.setattr('pypyr.cache.filecache.config.'
+                        'file_cache_revalidate_interval', 10)
+
+
+@pytest.fixture
+def no_cache(monkeypatch):
+    """Set no cache."""
+    monkeypatch.setattr('pypyr.cache.filecache.config.no_cache', True)
+
+
+def write(path, text, mtime_ns):
+    """Write text to path with a fixed mtime."""
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def read(path):
+    """Get a creator that reads path."""
+    return lambda: path.read_text()
+
+
+# region get_file_stamp
+
+
+def test_get_file_stamp(tmp_path):
+    """Stamp is mtime_ns, size & inode."""
+    path = tmp_path / 'arb.yaml'
+    write(path, 'abc', 1_000_000_000)
+    stat = os.stat(path)
+
+    assert get_file_stamp(path) == (1_000_000_000, 3, stat.st_ino)
+
+
+def test_get_file_stamp_missing(tmp_path):
+    """Stamp of a file that doesn't exist is None."""
+    assert get_file_stamp(tmp_path / 'arb.yaml') is None
+
+# endregion get_file_stamp
+
+# region get
+
+
+def test_file_cache_revalidate_off(tmp_path):
+    """Without an interval a changed file doesn't reload."""
+    path = tmp_path / 'arb.yaml'
+    write(path, 'one', 1_000_000_000)
+    cache = FileCache()
+
+    assert cache.get(str(path), read(path)) == 'one'
+    write(path, 'two', 2_000_000_000)
+    assert cache.get(str(path), read(path)) == 'one'
+
+    assert cache._checks == {}
+    assert cache.revalidations == 0
+
+
+def test_file_cache_revalidate_no_cache(revalidate, no_cache, tmp_path):
+    """With no_cache every get creates, & nothing tracks."""
+    path = tmp_path / 'arb.yaml'
+    write(path, 'one', 1_000_000_000)
+    cache = FileCache()
+
+    assert cache.get(str(path), read(path)) == 'one'
+    write(path, 'two', 2_000_000_000)
+    assert cache.get(str(path), read(path)) == 'two'
+
+    assert cache._cache == {}
+    assert cache._checks == {}
+
+
+@patch('pypyr.cache.filecache.time.monotonic')
+def test_file_cache_revalidate_within_interval(mock_time, revalidate,
+                                               tmp_path):
+    """Inside the interval get doesn't stat, even if the file changed."""
+    path = tmp_path / 'arb.yaml'
+    write(path, 'one', 1_000_000_000)
+    cache = FileCache()
+
+    mock_time.return_value = 100
+    assert cache.get(str(path), read(path)) == 'one'
+    assert cache._checks[str(path)][1] == 110
+
+    write(path, 'two', 2_000_000_000)
+    mock_time.return_value = 109.9
+    with patch('pypyr.cache.filecache.get_file_stamp') as mock_stamp:
+        assert cache.get(str(path), read(path)) == 'one'
+
+    mock_stamp.assert_not_called()
+    assert cache.revalidations == 0
+    assert cache.hits == 1
+
+
+@patch('pypyr.cache.filecache.time.monotonic')
+def test_file_cache_revalidate_unchanged(mock_time, revalidate, tmp_path):
+    """After the interval an unchanged file stays & checks again later."""
+    path = tmp_path / 'arb.yaml'
+    write(path, 'one', 1_000_000_000)
+    cache = FileCache()
+    creator = Mock(side_effect=read(path))
+
+    mock_time.return_value = 100
+    assert cache.get(str(path), creator) == 'one'
+
+    mock_time.return_value = 111
+    assert cache.get(str(path), creator) == 'one'
+
+    creator.assert_called_once()
+    assert cache.revalidations == 1
+    assert cache.reloads == 0
+    assert cache._checks[str(path)][1] == 121
+
+
+@patch('pypyr.cache.filecache.time.monotonic')
+def test_file_cache_revalidate_changed(mock_time, revalidate, tmp_path):
+    """After the interval a changed file reloads & runs on_reload."""
+    path = tmp_path / 'arb.yaml'
+    write(path, 'one', 1_000_000_000)
+    cache = FileCache()
+
+    mock_time.return_value = 100
+    assert cache.get(str(path), read(path)) == 'one'
+
+    write(path, 'two', 2_000_000_000)
+    mock_time.return_value = 110
+    with patch('pypyr.cache.filecache.get_run_hooks') as mock_hooks:
+        with patch_logger('pypyr.cache.filecache',
+                          logging.INFO) as mock_logger_info:
+            assert cache.get(str(path), read(path)) == 'two'
+
+    mock_hooks.return_value.reload.assert_called_once_with(str(path),
+                                                           'changed')
+    mock_logger_info.assert_called_once_with(
+        f"{path} changed on disk, so it will reload.")
+
+    assert cache.revalidations == 1
+    assert cache.reloads == 1
+    assert cache.misses == 2
+    assert cache._checks[str(path)] == (get_file_stamp(path), 120)
+
+
+@patch('pypyr.cache.filecache.time.monotonic')
+def test_file_cache_revalidate_same_size_new_inode(mock_time, revalidate,
+                                                   tmp_path):
+    """A file replaced by another with the same mtime & size reloads."""
+    path = tmp_path / 'arb.yaml'
+    write(path, 'one', 1_000_000_000)
+    cache = FileCache()
+
+    mock_time.return_value = 100
+    assert cache.get(str(path), read(path)) == 'one'
+
+    # hold on to the old file, so the new one can't reuse its inode.
+    os.rename(path, tmp_path / 'old.yaml')
+    write(path, 'two', 1_000_000_000)
+    mock_time.return_value = 110
+    assert cache.get(str(path), read(path)) == 'two'
+    assert cache.reloads == 1
+
+
+@patch('pypyr.cache.filecache.time.monotonic')
+def test_file_cache_revalidate_missing(mock_time, revalidate, tmp_path):
+    """A file that's gone drops, so the creator's error surfaces."""
+    path = tmp_path / 'arb.yaml'
+    write(path, 'one', 1_000_000_000)
+    cache = FileCache()
+
+    mock_time.return_value = 100
+    assert cache.get(str(path), read(path)) == 'one'
+
+    path.unlink()
+    mock_time.return_value = 110
+    with patch('pypyr.cache.filecache.get_run_hooks') as mock_hooks:
+        with pytest.raises(FileNotFoundError):
+            cache.get(str(path), read(path))
+
+    mock_hooks.return_value.reload.assert_called_once_with(str(path),
+                                                           'missing')
+    assert cache._cache == {}
+    assert cache.reloads == 1
+
+
+def test_file_cache_revalidate_zero(monkeypatch, tmp_path):
+    """Interval 0 checks on every get."""
+    monkeypatch.setattr('pypyr.cache.filecache.config.'
+                        'file_cache_revalidate_interval', 0)
+    path = tmp_path / 'arb.yaml'
+    write(path, 'one', 1_000_000_000)
+    cache = FileCache()
+
+    assert cache.get(str(path), read(path)) == 'one'
+    assert cache.get(str(path), read(path)) == 'one'
+    write(path, 'two', 2_000_000_000)
+    assert cache.get(str(path), read(path)) == 'two'
+
+    assert cache.revalidations == 2
+    assert cache.reloads == 1
+
+
+@patch('pypyr.cache.filecache.time.monotonic')
+def test_file_cache_stamp_before_creator(mock_time, revalidate, tmp_path):
+    """A file that changes while it loads reloads on the next check."""
+    path = tmp_path / 'arb.yaml'
+    write(path, 'one', 1_000_000_000)
+    cache = FileCache()
+
+    def creator():
+        text = path.read_text()
+        write(path, 'two', 2_000_000_000)
+        return text
+
+    mock_time.return_value = 100
+    assert cache.get(str(path), creator) == 'one'
+
+    mock_time.return_value = 110
+    assert cache.get(str(path), read(path)) == 'two'
+
+# endregion get
+
+# region is_current
+
+
+def test_file_cache_is_current_revalidate_off(tmp_path):
+    """Without an interval everything is current."""
+    cache = FileCache()
+    assert cache.is_current('arb', object())
+
+
+@patch('pypyr.cache.filecache.time.monotonic')
+def test_file_cache_is_current(mock_time, revalidate, tmp_path):
+    """Is current until the file changes & the interval is up."""
+    path = tmp_path / 'arb.yaml'
+    write(path, 'one', 1_000_000_000)
+    cache = FileCache()
+    obj = Mock()
+
+    mock_time.return_value = 100
+    assert cache.get(str(path), lambda: obj) is obj
+    assert cache.is_current(str(path), obj)
+    assert not cache.is_current(str(path), Mock())
+
+    write(path, 'two', 2_000_000_000)
+    assert cache.is_current(str(path), obj)
+
+    mock_time.return_value = 110
+    assert not cache.is_current(str(path), obj)
+    assert cache.reloads == 1
+
+# endregion is_current
+
+# region clear & stats
+
+
+@patch('pypyr.cache.filecache.time.monotonic', return_value=100)
+def test_file_cache_clear(mock_time, revalidate, tmp_path):
+    """Clear drops entries & their checks."""
+    path = tmp_path / 'arb.yaml'
+    write(path, 'one', 1_000_000_000)
+    cache = FileCache()
+    cache.get(str(path), read(path))
+
+    cache.clear()
+
+    assert cache._cache == {}
+    assert cache._checks == {}
+
+
+@patch('pypyr.cache.cache.get_deep_size', return_value=123)
+def test_file_cache_stats(mock_size):
+    """Stats add revalidations & reloads."""
+    cache = FileCache()
+    cache.revalidations = 3
+    cache.reloads = 2
+
+    assert cache.get_stats() == {'hits': 0,
+                                 'misses': 0,
+                                 'evictions': 0,
+                                 'expirations': 0,
+                                 'size': 0,
+                                 'max_size': None,
+                                 'max_bytes': None,
+                                 'ttl': None,
+                                 'policy': 'lru',
+                                 'create_seconds': 0.0,
+                                 'memory_bytes': 123,
+                                 'revalidations': 3,
+                                 'reloads': 2}
+
+# endregion clear & stats
@@ -62,6 +62,55 @@ def test_load_the_loader_ok():
     assert len(loader._pipeline_cache._cache) == 4
 
 
+def test_load_the_loader_is_pipeline_current():
+    """Loader gets the optional is_pipeline_current of the module."""
+    loader = loadercache.load_the_loader('pypyr.loaders.file')
+    from pypyr.loaders.file import is_pipeline_current
+    assert loader._is_pipeline_current is is_pipeline_current
+
+    loader = loadercache.load_the_loader('pypyr.loaders.string')
+    assert loader._is_pipeline_current is None
+
+
+def test_loader_get_pipeline_not_current_loads_again():
+    """Cached pipeline that isn't current anymore loads again."""
+    get_def = Mock(side_effect=[{'a': 'b'}, {'c': 'd'}])
+    is_current = Mock(side_effect=[True, True, False, True])
+    loader = loadercache.Loader('arbloader', get_def, is_current)
+
+    pipeline1 = loader.get_pipeline('arb', None)
+    pipeline2 = loader.get_pipeline('arb', None)
+    assert pipeline1 is pipeline2
+    assert pipeline1.pipeline == {'a': 'b'}
+
+    pipeline3 = loader.get_pipeline('arb', None)
+    assert pipeline3.pipeline == {'c': 'd'}
+    assert loader.get_pipeline('arb', None) is pipeline3
+
+    assert get_def.call_count == 2
+    assert is_current.call_args_list == [call(pipeline1),
+                                         call(pipeline1),
+                                         call(pipeline1),
+                                         call(pipeline3)]
+    assert loader._pipeline_cache._cache == {'arb': pipeline3}
+
+
+def test_loader_pipelines_bounded_by_config(monkeypatch):
+    """Loader's pipeline cache uses the loader_pipelines limits."""
+    monkeypatch.setattr('pypyr.cache.cache.config.cache_limits',
+                        {'loader_pipelines': {'max_size': 2}})
+    get_def = Mock(side_effect=lambda pipeline_name, parent: {})
+    loader = loadercache.Loader('arbloader', get_def)
+
+    loader.get_pipeline('one', None)
+    loader.get_pipeline('two', None)
+    loader.get_pipeline('one', None)
+    loader.get_pipeline('three', None)
+
+    assert list(loader._pipeline_cache._cache) == ['three', 'one']
+    assert loader.get_stats()['evictions'] == 1
+
+
 def test_pipeline_not_found_by_loader():
     """Pipeline not found raises."""
     with pytest.raises(PipelineNotFoundError):
@@ -80,7 +129,7 @@ def test_get_pype_loader_default():
     """Loader defaults to fileloader."""
     with patch('pypyr.moduleloader.get_module') as mock_get_module:
         mock_get_def = Mock()
-        mock_get_def.return_value = Mock(spec=dict())
+        mock_get_def.return_value = {}
         mock_get_module.return_value.get_pipeline_definition = mock_get_def
         loader = loadercache.LoaderCache().get_pype_loader()
 
@@ -149,6 +198,25 @@ def test_get_pype_loader_specified_raises_error_on_bad_yaml():
         loader.get_pipeline('arb', 'parent')
 
     mock_get_def.assert_called_once_with(pipeline_name='arb', parent='parent')
+
+
+def test_get_pype_loader_raises_error_on_bad_needs():
+    """Raise error on get_pipeline where needs is circular."""
+    with patch('pypyr.moduleloader.get_module') as mock_get_module:
+        mock_get_def = Mock()
+        mock_get_def.return_value = {'steps': [
+            {'name': 'arb.a', 'id': 'a', 'needs': 'b'},
+            {'name': 'arb.b', 'id': 'b', 'needs': 'a'}]}
+
+        mock_get_module.return_value.get_pipeline_definition = mock_get_def
+        loader = loadercache.LoaderCache().get_pype_loader('arbloader')
+
+    with pytest.raises(PipelineDefinitionError) as err:
+        loader.get_pipeline('arb', None)
+
+    assert str(err.value) == (
+        "step-group steps: needs is circular: a -> b -> a.")
+    assert not loader._pipeline_cache._cache
 # endregion LoaderCache: get_pype_loader
 
 # region LoaderCache: clear_pipes
@@ -158,7 +226,7 @@ def test_loader_clear():
     """Clear pipeline cache in Loader."""
     with patch('pypyr.moduleloader.get_module') as mock_get_module:
         mock_get_def = Mock()
-        mock_get_def.return_value = Mock(spec=dict())
+        mock_get_def.return_value = {}
 
         mock_get_module.return_value.get_pipeline_definition = mock_get_def
         loader = loadercache.LoaderCache().get_pype_loader('arbloader')
@@ -182,7 +250,7 @@ def test_loadercache_clear_pipes():
     lc = loadercache.LoaderCache()
     with patch('pypyr.moduleloader.get_module') as mock_get_module:
         mock_get_def = Mock()
-        mock_get_def.return_value = Mock(spec=dict())
+        mock_get_def.return_value = {}
         mock_get_module.return_value.get_pipeline_definition = mock_get_def
 
         arb_loader = lc.get_pype_loader('arbloader')
@@ -220,7 +288,7 @@ def test_loadercache_clear_pipes_all():
     lc = loadercache.LoaderCache()
     with patch('pypyr.moduleloader.get_module') as mock_get_module:
         mock_get_def = Mock()
-        mock_get_def.return_value = Mock(spec=dict())
+        mock_get_def.return_value = {}
         mock_get_module.return_value.get_pipeline_definition = mock_get_def
         arb_loader = lc.get_pype_loader('arbloader')
         arb_loader2 = lc.get_pype_loader('arbloader2')
@@ -245,3 +313,38 @@ def test_loadercache_clear_pipes_all():
     assert len(arb_loader2._pipeline_cache._cache) == 0
 # endregion LoaderCache: clear_pipes
 # endregion LoaderCache
+
+
+def test_loadercache_stats():
+    """LoaderCache stats include each loader's pipeline cache stats."""
+    lc = loadercache.LoaderCache()
+    with patch('pypyr.moduleloader.get_module') as mock_get_module:
+        mock_get_def = Mock()
+        mock_get_def.return_value = {}
+        mock_get_module.return_value.get_pipeline_definition = mock_get_def
+        arb_loader = lc.get_pype_loader('arbloader')
+        arb_loader2 = lc.get_pype_loader('arbloader2')
+        lc.get_pype_loader('arbloader')
+
+    arb_loader.get_pipeline('arb', None)
+    arb_loader.get_pipeline('arb', None)
+    arb_loader2.get_pipeline('arb2', None)
+
+    # don't walk the mocks the loaders cache.
+    with patch('pypyr.cache.cache.get_deep_size', return_value=10):
+        stats = lc.get_stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+    assert stats['size'] == 2
+    assert list(stats['pipelines']) == ['arbloader', 'arbloader2']
+
+    # loaders count without their pipelines.
+    assert stats['memory_bytes'] < 10000
+
+    pipe_stats = stats['pipelines']['arbloader']
+    assert pipe_stats['memory_bytes'] == 10
+    assert pipe_stats['hits'] == 1
+    assert pipe_stats['misses'] == 1
+    assert pipe_stats['size'] == 1
+
+    assert stats['pipelines']['arbloader2']['misses'] == 1
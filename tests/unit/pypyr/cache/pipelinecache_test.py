@@ -0,0 +1,236 @@
+"""pipelinecache.py unit tests."""
+import os
+import pickle
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+import ruamel.yaml
+
+from pypyr import __version__
+from pypyr.cache.pipelinecache import (get_version_stamp,
+                                       PipelineCache)
+from pypyr.pipedef import PipelineDefinition, PipelineFileInfo
+from pypyr.platform import PlatformPaths
+
+
+@pytest.fixture
+def cache_on():
+    """Switch the pipeline cache on for the test."""
+    with patch('pypyr.config.config.pipeline_cache', True):
+        with patch('pypyr.config.config.no_cache', False):
+            yield
+
+
+def get_pipeline_file(tmp_path, text='steps: []\n', age=60):
+    """Write a pipeline file, modified age seconds ago."""
+    path = tmp_path.joinpath('pipe.yaml')
+    path.write_text(text)
+    past = path.stat().st_mtime - age
+    os.utime(path, (past, past))
+    return path
+
+
+def get_definition(path, body='arb'):
+    """Get a PipelineDefinition for the pipeline at path."""
+    return PipelineDefinition(body,
+                              PipelineFileInfo(pipeline_name=path.name,
+                                               loader='arb',
+                                               parent=path.parent,
+                                               path=path))
+
+# region path
+
+
+def test_pipeline_cache_path_explicit(tmp_path):
+    """Path set on init."""
+    assert PipelineCache(tmp_path).path == tmp_path
+
+
+def test_pipeline_cache_path_from_config(tmp_path):
+    """Path defaults to pipelinecache in the user data dir."""
+    platform_paths = PlatformPaths(config_user=None,
+                                   config_common=[],
+                                   data_dir_user=tmp_path,
+                                   data_dir_common=[])
+
+    with patch('pypyr.config.config._platform_paths', platform_paths):
+        assert PipelineCache().path == tmp_path.joinpath('pipelinecache')
+
+# endregion path
+
+# region stamp
+
+
+def test_get_version_stamp():
+    """Version stamp has the format, pypyr, ruamel & python versions."""
+    assert get_version_stamp() == (1,
+                                   __version__,
+                                   ruamel.yaml.__version__,
+                                   tuple(sys.version_info[:2]))
+
+
+def test_pipeline_cache_stamp_off(tmp_path):
+    """Stamp is None when the pipeline cache is off."""
+    path = get_pipeline_file(tmp_path)
+    cache = PipelineCache(tmp_path.joinpath('cache'))
+
+    with patch('pypyr.config.config.pipeline_cache', False):
+        assert cache.get_stamp(path) is None
+
+    with patch('pypyr.config.config.pipeline_cache', True):
+        with patch('pypyr.config.config.no_cache', True):
+            assert cache.get_stamp(path) is None
+
+
+def test_pipeline_cache_stamp(tmp_path, cache_on):
+    """Stamp is mtime, size, inode & versions."""
+    path = get_pipeline_file(tmp_path)
+    stat = path.stat()
+    cache = PipelineCache(tmp_path.joinpath('cache'))
+
+    assert cache.get_stamp(path) == (stat.st_mtime_ns,
+                                     stat.st_size,
+                                     stat.st_ino,
+                                     get_version_stamp())
+    assert cache.get_stamp(tmp_path.joinpath('arb.yaml')) is None
+
+# endregion stamp
+
+# region get & set
+
+
+def test_pipeline_cache_set_get(tmp_path, cache_on):
+    """Set saves & get loads the definition for the same stamp."""
+    path = get_pipeline_file(tmp_path)
+    cache = PipelineCache(tmp_path.joinpath('cache'))
+    stamp = cache.get_stamp(path)
+
+    assert cache.get(path, stamp) is None
+    assert cache.set(path, stamp, get_definition(path))
+
+    out = cache.get(path, stamp)
+    assert out == get_definition(path)
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+    stats = cache.get_stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['size'] == 1
+    assert stats['memory_bytes'] > 0
+
+    # no temp files left behind.
+    assert len(list(cache.path.iterdir())) == 1
+
+
+def test_pipeline_cache_stamp_none(tmp_path):
+    """None stamp doesn't get or set."""
+    path = get_pipeline_file(tmp_path)
+    cache = PipelineCache(tmp_path.joinpath('cache'))
+
+    assert not cache.set(path, None, get_definition(path))
+    assert cache.get(path, None) is None
+    assert not cache.path.exists()
+    assert cache.misses == 0
+
+
+def test_pipeline_cache_file_changed(tmp_path, cache_on):
+    """A changed file makes the entry stale, & set overwrites it."""
+    path = get_pipeline_file(tmp_path)
+    cache = PipelineCache(tmp_path.joinpath('cache'))
+    stamp = cache.get_stamp(path)
+    cache.set(path, stamp, get_definition(path, 'one'))
+
+    path = get_pipeline_file(tmp_path, 'steps: [a]\n', age=30)
+    new_stamp = cache.get_stamp(path)
+    assert new_stamp != stamp
+
+    assert cache.get(path, new_stamp) is None
+    assert cache.misses == 1
+
+    cache.set(path, new_stamp, get_definition(path, 'two'))
+    assert cache.get(path, new_stamp).pipeline == 'two'
+    assert cache.get_stats()['size'] == 1
+
+
+def test_pipeline_cache_version_changed(tmp_path, cache_on):
+    """An entry from another pypyr version is stale."""
+    path = get_pipeline_file(tmp_path)
+    old = PipelineCache(tmp_path.joinpath('cache'))
+    old.set(path, old.get_stamp(path), get_definition(path))
+
+    with patch('pypyr.cache.pipelinecache.__version__', '0.0.0'):
+        cache = PipelineCache(tmp_path.joinpath('cache'))
+
+    assert cache.get(path, cache.get_stamp(path)) is None
+    assert cache.misses == 1
+
+
+def test_pipeline_cache_too_recent(tmp_path, cache_on):
+    """A file modified just now doesn't save."""
+    path = get_pipeline_file(tmp_path, age=0)
+    cache = PipelineCache(tmp_path.joinpath('cache'))
+
+    assert not cache.set(path, cache.get_stamp(path), get_definition(path))
+    assert not cache.path.exists()
+
+
+def test_pipeline_cache_corrupt(tmp_path, cache_on):
+    """A corrupt entry is a miss & gets removed."""
+    path = get_pipeline_file(tmp_path)
+    cache = PipelineCache(tmp_path.joinpath('cache'))
+    stamp = cache.get_stamp(path)
+    cache.set(path, stamp, get_definition(path))
+
+    (entry,) = cache.path.iterdir()
+    entry.write_bytes(pickle.dumps(stamp) + b'garbage')
+
+    assert cache.get(path, stamp) is None
+    assert cache.misses == 1
+    assert not entry.exists()
+
+
+def test_pipeline_cache_unpicklable(tmp_path, cache_on):
+    """A definition that doesn't pickle doesn't save."""
+    path = get_pipeline_file(tmp_path)
+    cache = PipelineCache(tmp_path.joinpath('cache'))
+
+    assert not cache.set(path, cache.get_stamp(path),
+                         get_definition(path, lambda: None))
+    assert not cache.path.exists()
+
+
+def test_pipeline_cache_write_err_no_temp(tmp_path, cache_on):
+    """A failed write removes its temp file."""
+    path = get_pipeline_file(tmp_path)
+    cache = PipelineCache(tmp_path.joinpath('cache'))
+
+    with patch('pypyr.cache.pipelinecache.os.replace',
+               side_effect=OSError('arb')):
+        with pytest.raises(OSError):
+            cache.set(path, cache.get_stamp(path), get_definition(path))
+
+    assert list(cache.path.iterdir()) == []
+
+
+def test_pipeline_cache_clear(tmp_path, cache_on):
+    """Clear removes all entries."""
+    path = get_pipeline_file(tmp_path)
+    cache = PipelineCache(tmp_path.joinpath('cache'))
+    cache.set(path, cache.get_stamp(path), get_definition(path))
+
+    cache.clear()
+    assert cache.get_stats() == {'hits': 0,
+                                 'misses': 0,
+                                 'size': 0,
+                                 'memory_bytes': 0}
+
+
+def test_pipeline_cache_no_dir_stats():
+    """Stats with no cache dir are empty."""
+    cache = PipelineCache(Path('/arb/does/not/exist'))
+    assert cache.get_stats()['size'] == 0
+
+# endregion get & set
@@ -0,0 +1,246 @@
+"""resultcache.py unit tests."""
+import logging
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+from pypyr.cache.resultcache import StepResultCache
+from pypyr.platform import PlatformPaths
+from tests.common.utils import patch_logger
+
+# region path
+
+
+def test_result_cache_path_explicit(tmp_path):
+    """Path set on init."""
+    assert StepResultCache(tmp_path).path == tmp_path
+
+
+def test_result_cache_path_from_config(tmp_path):
+    """Path defaults to stepcache in the user data dir."""
+    platform_paths = PlatformPaths(config_user=None,
+                                   config_common=[],
+                                   data_dir_user=tmp_path,
+                                   data_dir_common=[])
+
+    with patch('pypyr.config.config._platform_paths', platform_paths):
+        assert StepResultCache().path == tmp_path.joinpath('stepcache')
+
+
+def test_result_cache_path_no_config_init(tmp_path):
+    """Path calculates platform paths when config.init didn't run."""
+    platform_paths = PlatformPaths(config_user=None,
+                                   config_common=[],
+                                   data_dir_user=tmp_path,
+                                   data_dir_common=[])
+
+    with patch('pypyr.config.config._platform_paths', None):
+        with patch('pypyr.platform.get_platform_paths',
+                   return_value=platform_paths) as mock_get_paths:
+            assert StepResultCache().path == tmp_path.joinpath('stepcache')
+
+    mock_get_paths.assert_called_once_with('pypyr', 'config.yaml')
+
+# endregion path
+
+# region get & set
+
+
+def test_result_cache_get_set(tmp_path):
+    """Set saves result to disk & get loads it."""
+    cache = StepResultCache(tmp_path.joinpath('sub'))
+
+    assert cache.get('k1') is None
+    assert cache.set('k1', ({'a': 'b'}, ['c']), create_seconds=1.5)
+    assert cache.get('k1') == ({'a': 'b'}, ['c'])
+
+    # survives a new instance.
+    assert StepResultCache(tmp_path.joinpath('sub')).get('k1') == (
+        {'a': 'b'}, ['c'])
+
+    size = next(tmp_path.joinpath('sub').iterdir()).stat().st_size
+    assert cache.get_stats() == {'hits': 1,
+                                 'misses': 1,
+                                 'evictions': 0,
+                                 'size': 1,
+                                 'max_bytes': 100 * 1024 * 1024,
+                                 'create_seconds': 1.5,
+                                 'memory_bytes': size}
+
+
+def test_result_cache_ttl(tmp_path):
+    """Expired result is a miss & deletes."""
+    cache = StepResultCache(tmp_path)
+    with patch('pypyr.cache.resultcache.time.time', return_value=100):
+        cache.set('k1', 'v1')
+
+    with patch('pypyr.cache.resultcache.time.time', return_value=105):
+        assert cache.get('k1', ttl=10) == 'v1'
+        assert cache.get('k1', ttl=5) == 'v1'
+        assert cache.get('k1', ttl=4.9) is None
+
+    assert not tmp_path.joinpath('k1.pickle').exists()
+    assert cache.hits == 2
+    assert cache.misses == 1
+    assert cache.evictions == 1
+
+
+def test_result_cache_corrupt(tmp_path):
+    """Unreadable result is a miss & deletes."""
+    cache = StepResultCache(tmp_path)
+    tmp_path.joinpath('k1.pickle').write_bytes(b'not a pickle')
+
+    assert cache.get('k1') is None
+    assert not tmp_path.joinpath('k1.pickle').exists()
+
+
+def test_result_cache_set_unpicklable(tmp_path):
+    """Result that doesn't pickle doesn't save."""
+    cache = StepResultCache(tmp_path)
+    with patch_logger('pypyr.cache.resultcache',
+                      logging.WARNING) as mock_warning:
+        assert not cache.set('k1', lambda: 'arb')
+
+    assert mock_warning.call_count == 1
+    assert mock_warning.call_args.args[0].startswith(
+        "can't save step result to cache, because it doesn't pickle: ")
+    assert not list(tmp_path.iterdir())
+
+
+@patch('pypyr.config.config.no_cache', True)
+def test_result_cache_no_cache(tmp_path):
+    """No cache mode neither saves nor loads."""
+    cache = StepResultCache(tmp_path)
+    assert not cache.set('k1', 'v1')
+    assert cache.get('k1') is None
+    assert not list(tmp_path.iterdir())
+
+
+def test_result_cache_clear(tmp_path):
+    """Clear removes all results."""
+    cache = StepResultCache(tmp_path)
+    cache.set('k1', 'v1')
+    cache.set('k2', 'v2')
+    tmp_path.joinpath('other.txt').write_text('keep me')
+
+    cache.clear()
+
+    assert cache.get('k1') is None
+    assert list(tmp_path.iterdir()) == [tmp_path.joinpath('other.txt')]
+
+
+def test_result_cache_clear_no_dir(tmp_path):
+    """Clear doesn't need the cache dir to exist."""
+    cache = StepResultCache(tmp_path.joinpath('nope'))
+    cache.clear()
+    assert cache.get_stats()['size'] == 0
+
+# endregion get & set
+
+# region eviction
+
+
+def set_mtime(path, mtime):
+    """Set modified time on path."""
+    os.utime(path, (mtime, mtime))
+
+
+def test_result_cache_evict_lru(tmp_path):
+    """Evict least recently used once over max_bytes."""
+    cache = StepResultCache(tmp_path)
+    cache.set('k1', 'x' * 100)
+    size = tmp_path.joinpath('k1.pickle').stat().st_size
+    cache.set('k2', 'x' * 100)
+    cache.set('k3', 'x' * 100)
+    set_mtime(tmp_path.joinpath('k1.pickle'), 1000)
+    set_mtime(tmp_path.joinpath('k2.pickle'), 3000)
+    set_mtime(tmp_path.joinpath('k3.pickle'), 2000)
+
+    with patch('pypyr.config.config.step_cache_max_bytes', size * 3):
+        cache.set('k4', 'x' * 100)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['k2.pickle',
+                                                          'k3.pickle',
+                                                          'k4.pickle']
+    assert cache.evictions == 1
+
+
+def test_result_cache_get_marks_used(tmp_path):
+    """Get refreshes modified time so the result evicts later."""
+    cache = StepResultCache(tmp_path)
+    cache.set('k1', 'v1')
+    path = tmp_path.joinpath('k1.pickle')
+    set_mtime(path, 1000)
+
+    cache.get('k1')
+    assert path.stat().st_mtime > 1000
+
+
+def test_result_cache_evict_unbounded(tmp_path):
+    """No max_bytes never evicts."""
+    cache = StepResultCache(tmp_path)
+    with patch('pypyr.config.config.step_cache_max_bytes', None):
+        for i in range(5):
+            cache.set(f'k{i}', 'x' * 100)
+
+    assert len(list(tmp_path.iterdir())) == 5
+    assert cache.evictions == 0
+    assert isinstance(cache.path, Path)
+
+
+def test_result_cache_running_total(tmp_path):
+    """Set keeps a running total & only scans the dir once while under."""
+    StepResultCache(tmp_path).set('existing', 'x' * 100)
+    existing = tmp_path.joinpath('existing.pickle').stat().st_size
+
+    cache = StepResultCache(tmp_path)
+    with patch('pypyr.config.config.step_cache_max_bytes', 1_000_000):
+        with patch.object(cache, '_scan', wraps=cache._scan) as mock_scan:
+            cache.set('k1', 'x' * 100)
+            cache.set('k2', 'x' * 100)
+            # overwrite replaces the old size, rather than add to it.
+            cache.set('k1', 'x' * 100)
+
+    mock_scan.assert_called_once()
+    assert cache._bytes == existing * 3
+    assert cache._bytes == sum(p.stat().st_size for p in tmp_path.iterdir())
+
+
+def test_result_cache_running_total_expired(tmp_path):
+    """An expired result comes off the running total."""
+    cache = StepResultCache(tmp_path)
+    with patch('pypyr.config.config.step_cache_max_bytes', 1_000_000):
+        with patch('pypyr.cache.resultcache.time.time', return_value=100):
+            cache.set('k1', 'v1')
+            cache.set('k2', 'v2')
+
+    with patch('pypyr.cache.resultcache.time.time', return_value=200):
+        assert cache.get('k1', ttl=10) is None
+
+    assert cache._sizes.keys() == {'k2'}
+    assert cache._bytes == tmp_path.joinpath('k2.pickle').stat().st_size
+
+
+def test_result_cache_evict_resets_total(tmp_path):
+    """Evict resets the total from the dir, incl. other processes' files."""
+    cache = StepResultCache(tmp_path)
+    cache.set('k1', 'x' * 100)
+    size = tmp_path.joinpath('k1.pickle').stat().st_size
+    set_mtime(tmp_path.joinpath('k1.pickle'), 1000)
+
+    # another process adds a result the running total doesn't know about.
+    StepResultCache(tmp_path).set('other', 'x' * 100)
+    set_mtime(tmp_path.joinpath('other.pickle'), 2000)
+
+    with patch('pypyr.config.config.step_cache_max_bytes', size * 2):
+        cache.set('k2', 'x' * 100)
+        assert cache.evictions == 0
+        cache.set('k3', 'x' * 100)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['k2.pickle',
+                                                          'k3.pickle']
+    assert cache.evictions == 2
+    assert cache._sizes == {'k2': size, 'k3': size}
+    assert cache._bytes == size * 2
+
+# endregion eviction
@@ -42,7 +42,16 @@ def test_main_pass_with_sysargv_context_positional(mock_config_init):
         py_dir='dir here',
         groups=['group1', 'group 2', 'group3'],
         success_group='sg',
-        failure_group='f g'
+        failure_group='f g',
+        parallel_groups=False,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
     )
 
 
@@ -80,7 +89,16 @@ def test_main_pass_with_sysargv_single_group(mock_config_init):
         py_dir='dir here',
         groups=['group1'],
         success_group='sg',
-        failure_group='f g'
+        failure_group='f g',
+        parallel_groups=False,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
     )
 
 
@@ -123,7 +141,16 @@ def test_main_pass_with_sysargv_context_multiple_positional(mock_config_init):
         py_dir='dir here',
         groups=['group1', 'group 2', 'group3'],
         success_group='sg',
-        failure_group='f g'
+        failure_group='f g',
+        parallel_groups=False,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
     )
 
 
@@ -155,7 +182,16 @@ def test_main_pass_with_sysargv_context_positional_log_alias(mock_config_init):
         py_dir='dir here',
         groups=None,
         success_group=None,
-        failure_group=None
+        failure_group=None,
+        parallel_groups=False,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
     )
 
 
@@ -190,7 +226,16 @@ def test_main_pass_with_sysargv_context_positional_abbreviations(
         py_dir='dir here',
         groups=None,
         success_group=None,
-        failure_group=None
+        failure_group=None,
+        parallel_groups=False,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
     )
 
 
@@ -223,7 +268,16 @@ def test_main_pass_with_sysargv_context_positional_flags_last(
         py_dir='dir here',
         groups=None,
         success_group=None,
-        failure_group=None
+        failure_group=None,
+        parallel_groups=False,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
     )
 
 
@@ -258,7 +312,16 @@ def test_main_pass_with_sysargv_context_multiple_positional_flags_last(
         py_dir='dir here',
         groups=None,
         success_group=None,
-        failure_group=None
+        failure_group=None,
+        parallel_groups=False,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
     )
 
 
@@ -284,7 +347,16 @@ def test_main_pass_with_defaults_context_positional(mock_config_init):
         py_dir=Path.cwd(),
         groups=None,
         success_group=None,
-        failure_group=None
+        failure_group=None,
+        parallel_groups=False,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
     )
 
 
@@ -307,7 +379,16 @@ def test_main_pass_with_no_context(mock_config_init):
         py_dir=Path.cwd(),
         groups=None,
         success_group=None,
-        failure_group=None
+        failure_group=None,
+        parallel_groups=False,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
     )
 
 
@@ -334,7 +415,16 @@ def test_main_pass_with_no_context_other_flags_set(mock_config_init):
         py_dir=Path.cwd(),
         groups=None,
         success_group=None,
-        failure_group=None
+        failure_group=None,
+        parallel_groups=False,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
     )
 
 
@@ -454,5 +544,250 @@ def test_main_pass_with_logpath(mock_config_init):
         py_dir=Path.cwd(),
         groups=None,
         success_group=None,
-        failure_group=None
+        failure_group=None,
+        parallel_groups=False,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
+    )
+
+
+@patch('pypyr.config.config.init')
+def test_main_pass_with_parallel(mock_config_init):
+    """The --parallel flag runs groups in parallel."""
+    arg_list = ['blah',
+                '--groups',
+                'g1',
+                'g2',
+                '--parallel']
+
+    with patch('pypyr.pipelinerunner.run') as mock_pipeline_run:
+        with patch('pypyr.log.logger.set_root_logger'):
+            pypyr.cli.main(arg_list)
+
+    mock_config_init.assert_called_once()
+
+    mock_pipeline_run.assert_called_once_with(
+        pipeline_name='blah',
+        args_in=[],
+        parse_args=True,
+        py_dir=Path.cwd(),
+        groups=['g1', 'g2'],
+        success_group=None,
+        failure_group=None,
+        parallel_groups=True,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
+    )
+
+
+@patch('pypyr.config.config.init')
+def test_main_pass_with_trace(mock_config_init):
+    """The --trace flag saves a trace to path."""
+    arg_list = ['blah',
+                '--trace',
+                'out/trace.json']
+
+    with patch('pypyr.pipelinerunner.run') as mock_pipeline_run:
+        with patch('pypyr.log.logger.set_root_logger'):
+            pypyr.cli.main(arg_list)
+
+    mock_config_init.assert_called_once()
+
+    mock_pipeline_run.assert_called_once_with(
+        pipeline_name='blah',
+        args_in=[],
+        parse_args=True,
+        py_dir=Path.cwd(),
+        groups=None,
+        success_group=None,
+        failure_group=None,
+        parallel_groups=False,
+        trace_path='out/trace.json',
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
+    )
+
+
+@patch('pypyr.config.config.init')
+def test_main_pass_with_profile(mock_config_init):
+    """The --profile & --profile-out flags profile the run."""
+    arg_list = ['blah',
+                '--profile',
+                '--profile-out',
+                'out.pstats']
+
+    with patch('pypyr.pipelinerunner.run') as mock_pipeline_run:
+        with patch('pypyr.log.logger.set_root_logger'):
+            pypyr.cli.main(arg_list)
+
+    mock_config_init.assert_called_once()
+
+    mock_pipeline_run.assert_called_once_with(
+        pipeline_name='blah',
+        args_in=[],
+        parse_args=True,
+        py_dir=Path.cwd(),
+        groups=None,
+        success_group=None,
+        failure_group=None,
+        parallel_groups=False,
+        trace_path=None,
+        profile=True,
+        profile_path='out.pstats',
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
+    )
+
+
+@patch('pypyr.config.config.init')
+def test_main_pass_with_metrics_file(mock_config_init):
+    """The --metrics-file flag saves metrics."""
+    arg_list = ['blah',
+                '--metrics-file',
+                'out.prom']
+
+    with patch('pypyr.pipelinerunner.run') as mock_pipeline_run:
+        with patch('pypyr.log.logger.set_root_logger'):
+            pypyr.cli.main(arg_list)
+
+    mock_config_init.assert_called_once()
+
+    mock_pipeline_run.assert_called_once_with(
+        pipeline_name='blah',
+        args_in=[],
+        parse_args=True,
+        py_dir=Path.cwd(),
+        groups=None,
+        success_group=None,
+        failure_group=None,
+        parallel_groups=False,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path='out.prom',
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
+    )
+
+
+@patch('pypyr.config.config.init')
+def test_main_pass_with_cache_stats(mock_config_init):
+    """The --cache-stats flag saves cache stats."""
+    arg_list = ['blah',
+                '--cache-stats',
+                'stats.json']
+
+    with patch('pypyr.pipelinerunner.run') as mock_pipeline_run:
+        with patch('pypyr.log.logger.set_root_logger'):
+            pypyr.cli.main(arg_list)
+
+    mock_config_init.assert_called_once()
+
+    mock_pipeline_run.assert_called_once_with(
+        pipeline_name='blah',
+        args_in=[],
+        parse_args=True,
+        py_dir=Path.cwd(),
+        groups=None,
+        success_group=None,
+        failure_group=None,
+        parallel_groups=False,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path='stats.json',
+        memory_report_path=None,
+        sample_path=None,
+        sample_rate=100
+    )
+
+
+@patch('pypyr.config.config.init')
+def test_main_pass_with_memory_report(mock_config_init):
+    """The --memory-report flag saves a context memory report."""
+    arg_list = ['blah',
+                '--memory-report',
+                'mem.json']
+
+    with patch('pypyr.pipelinerunner.run') as mock_pipeline_run:
+        with patch('pypyr.log.logger.set_root_logger'):
+            pypyr.cli.main(arg_list)
+
+    mock_config_init.assert_called_once()
+
+    mock_pipeline_run.assert_called_once_with(
+        pipeline_name='blah',
+        args_in=[],
+        parse_args=True,
+        py_dir=Path.cwd(),
+        groups=None,
+        success_group=None,
+        failure_group=None,
+        parallel_groups=False,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path='mem.json',
+        sample_path=None,
+        sample_rate=100
+    )
+
+
+@patch('pypyr.config.config.init')
+def test_main_pass_with_sample(mock_config_init):
+    """The --sample-out & --sample-rate flags sample call stacks."""
+    arg_list = ['blah',
+                '--sample-out',
+                'stacks.txt',
+                '--sample-rate',
+                '49.5']
+
+    with patch('pypyr.pipelinerunner.run') as mock_pipeline_run:
+        with patch('pypyr.log.logger.set_root_logger'):
+            pypyr.cli.main(arg_list)
+
+    mock_config_init.assert_called_once()
+
+    mock_pipeline_run.assert_called_once_with(
+        pipeline_name='blah',
+        args_in=[],
+        parse_args=True,
+        py_dir=Path.cwd(),
+        groups=None,
+        success_group=None,
+        failure_group=None,
+        parallel_groups=False,
+        trace_path=None,
+        profile=False,
+        profile_path=None,
+        metrics_path=None,
+        cache_stats_path=None,
+        memory_report_path=None,
+        sample_path='stacks.txt',
+        sample_rate=49.5
     )
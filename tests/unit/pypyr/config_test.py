@@ -25,6 +25,8 @@ def no_envs(monkeypatch):
     monkeypatch.delenv('PYPYR_CONFIG_GLOBAL', raising=False)
     monkeypatch.delenv('PYPYR_CONFIG_LOCAL', raising=False)
     monkeypatch.delenv('PYPYR_NO_CACHE', raising=False)
+    monkeypatch.delenv('PYPYR_PIPELINE_CACHE', raising=False)
+    monkeypatch.delenv('PYPYR_FAST_YAML', raising=False)
 
 # region default initialization
 
@@ -63,6 +65,17 @@ def test_config_defaults(no_envs):
     assert config.default_group == 'steps'
     assert config.default_success_group == 'on_success'
     assert config.default_failure_group == 'on_failure'
+    assert config.default_group_conflict == 'last'
+    assert config.default_needs_max is None
+    assert not config.pipeline_cache
+    assert not config.fast_yaml
+    assert config.file_cache_revalidate_interval is None
+    assert config.cache_limits == {
+        'file_cache': {'max_size': 1024},
+        'loader_cache': {'max_size': 128},
+        'loader_pipelines': {'max_size': 1024},
+        'pystring_namespace_cache': {'max_size': 4096}}
+    assert config.step_cache_max_bytes == 104857600
 
 
 def test_config_with_encoding(monkeypatch, no_envs):
@@ -74,6 +87,20 @@ def test_config_with_encoding(monkeypatch, no_envs):
     assert config.default_cmd_encoding == 'arb2'
 
 
+def test_config_update_cache_limits(no_envs):
+    """Cache limits in config replace the limits of the caches they name."""
+    config = Config()
+    config.update({'cache_limits': {'file_cache': {'ttl': 60},
+                                    'step_cache': {'max_size': 10}}})
+
+    assert config.cache_limits == {
+        'file_cache': {'ttl': 60},
+        'loader_cache': {'max_size': 128},
+        'loader_pipelines': {'max_size': 1024},
+        'pystring_namespace_cache': {'max_size': 4096},
+        'step_cache': {'max_size': 10}}
+
+
 def test_config_with_no_cache(monkeypatch, no_envs):
     """Set no cache via env variable."""
     monkeypatch.setenv('PYPYR_NO_CACHE', '1')
@@ -750,22 +777,40 @@ def test_config_default_str(no_envs):
     config = Config()
     assert str(config) == f"""WRITEABLE PROPERTIES:
 
+cache_limits:
+  file_cache:
+    max_size: 1024
+  loader_cache:
+    max_size: 128
+  loader_pipelines:
+    max_size: 1024
+  pystring_namespace_cache:
+    max_size: 4096
 default_backoff: fixed
 default_cmd_encoding:
 default_encoding:
 default_failure_group: on_failure
 default_group: steps
+default_group_conflict: last
 default_loader: pypyr.loaders.file
+default_needs_max:
 default_success_group: on_success
+fast_yaml: false
+file_cache_revalidate_interval:
+hooks: []
 json_ascii: false
 json_indent: 2
 log_config:
 log_date_format: '%Y-%m-%d %H:%M:%S'
 log_detail_format: '%(asctime)s %(levelname)s:%(name)s:%(funcName)s: %(message)s'
 log_notify_format: '%(message)s'
+loop_progress_interval: 10.0
+metrics_path:
 no_cache: false
+pipeline_cache: false
 pipelines_subdir: pipelines
 shortcuts: {{}}
+step_cache_max_bytes: 104857600
 vars: {{}}
 
 
@@ -842,23 +887,41 @@ def test_config_all_str(mock_get_platform, no_envs):
 
     assert str(config) == f"""WRITEABLE PROPERTIES:
 
+cache_limits:
+  file_cache:
+    max_size: 1024
+  loader_cache:
+    max_size: 128
+  loader_pipelines:
+    max_size: 1024
+  pystring_namespace_cache:
+    max_size: 4096
 default_backoff: fixed
 default_cmd_encoding:
 default_encoding:
 default_failure_group: on_failure
 default_group: steps
+default_group_conflict: last
 default_loader: pypyr.loaders.file
+default_needs_max:
 default_success_group: dsg
+fast_yaml: false
+file_cache_revalidate_interval:
+hooks: []
 json_ascii: false
 json_indent: 2
 log_config:
 log_date_format: '%Y-%m-%d %H:%M:%S'
 log_detail_format: '%(asctime)s %(levelname)s:%(name)s:%(funcName)s: %(message)s'
 log_notify_format: '%(message)s'
+loop_progress_interval: 10.0
+metrics_path:
 no_cache: true
+pipeline_cache: false
 pipelines_subdir: arb5
 shortcuts:
   s1: one
+step_cache_max_bytes: 104857600
 vars:
   a: f
   f4: 4
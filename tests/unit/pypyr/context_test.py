@@ -3,9 +3,11 @@
 from collections.abc import MutableMapping
 import pickle
 import typing
+from unittest.mock import patch
 
 import pytest
 
+from pypyr.cache.codecache import CodeCache, compile_expression
 from pypyr.context import Context, ContextItemInfo
 from pypyr.dsl import PyString, SicString
 from pypyr.errors import (
@@ -585,6 +587,27 @@ def test_get_eval_string_none():
                               'python expression instead.')
 
 
+def test_get_eval_string_syntax_error():
+    """Syntax error reports the original expression."""
+    with pytest.raises(SyntaxError) as err:
+        Context().get_eval_string('key1 ==')
+
+    assert err.value.text == 'key1 =='
+
+
+def test_get_eval_string_compiles_once():
+    """Eval same expression repeatedly only compiles once."""
+    context = Context({'a': 1})
+    with patch('pypyr.cache.codecache.compile_expression',
+               wraps=compile_expression) as mock_compile:
+        with patch('pypyr.context.pystring_code_cache', CodeCache()):
+            assert context.get_eval_string('a + 1') == 2
+            context['a'] = 2
+            assert context.get_eval_string('a + 1') == 3
+
+    mock_compile.assert_called_once_with('a + 1')
+
+
 def test_get_eval_string_with_globals():
     """Eval with globals set."""
     import math
@@ -2328,3 +2351,89 @@ def test_get_root_pipeline_no_scope():
     assert not context.is_in_pipeline_scope
     assert context.get_stack_depth() == 0
 # endregion pipeline_scope
+
+# region get_scoped_copy
+
+
+def test_get_scoped_copy():
+    """Scoped copy has own top-level keys, shares pipeline & py globals."""
+    nested = [1, 2]
+    context = Context({'k1': 'v1', 'k2': nested})
+    context.pystring_globals_update({'arb': 'arbv'})
+    pipe1 = Pipeline('pipe1')
+
+    with context.pipeline_scope(pipe1):
+        scoped = context.get_scoped_copy()
+
+        assert type(scoped) is Context
+        assert scoped == context
+        assert scoped['k2'] is nested
+        assert scoped.current_pipeline is pipe1
+        assert scoped.get_root_pipeline() is pipe1
+        assert scoped.get_eval_string('arb') == 'arbv'
+
+        scoped['k1'] = 'new'
+        scoped['k3'] = 'v3'
+        scoped.pystring_globals_update({'arb2': 'arbv2'})
+
+        with scoped.pipeline_scope(Pipeline('pipe2')):
+            assert scoped.get_stack_depth() == 2
+            assert context.get_stack_depth() == 1
+
+    assert context == {'k1': 'v1', 'k2': nested}
+    assert scoped['k1'] == 'new'
+    assert context._pystring_globals == {'arb': 'arbv'}
+    assert scoped.get_eval_string('arb2') == 'arbv2'
+
+
+def test_get_scoped_copy_run_errors():
+    """Scoped copy gets its own runErrors list."""
+    run_errors = ['e1']
+    context = Context({'runErrors': run_errors})
+    scoped = context.get_scoped_copy()
+    scoped['runErrors'].append('e2')
+
+    assert run_errors == ['e1']
+    assert scoped['runErrors'] == ['e1', 'e2']
+
+
+def test_get_scoped_changes():
+    """Get set, changed & removed keys & new run errors."""
+    same = [1]
+    template = Context({'same': same,
+                        'changed': 'a',
+                        'removed': 'b',
+                        'i': 1,
+                        'runErrors': ['e1']})
+    scoped = template.get_scoped_copy()
+    scoped['changed'] = 'c'
+    scoped['new'] = 'd'
+    scoped['i'] = 2
+    del scoped['removed']
+    scoped['runErrors'].append('e2')
+
+    assert template.get_scoped_changes(scoped) == (
+        {'changed': 'c', 'new': 'd', 'i': 2}, ['removed'], ['e2'])
+
+    assert template.get_scoped_changes(scoped, ignore=('i',)) == (
+        {'changed': 'c', 'new': 'd'}, ['removed'], ['e2'])
+
+    assert template.get_scoped_changes(
+        scoped, keys=['same', 'removed', 'i', 'arb'], ignore=('i',)) == (
+        {'same': same}, ['removed'], ['e2'])
+
+    assert Context().get_scoped_changes(Context()) == ({}, [], [])
+
+
+def test_merge_scoped_changes():
+    """Apply updates, removals & append run errors."""
+    context = Context({'a': 'b', 'c': 'd'})
+    context.merge_scoped_changes(({'a': 'x'}, ['c', 'arb'], ['e1']))
+    assert context == {'a': 'x', 'runErrors': ['e1']}
+
+    run_errors = context['runErrors']
+    context.merge_scoped_changes(({}, [], ['e2']))
+    assert context['runErrors'] is run_errors
+    assert run_errors == ['e1', 'e2']
+
+# endregion get_scoped_copy
@@ -1,27 +1,42 @@
 """dsl.py unit tests."""
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from copy import deepcopy
 from io import StringIO
 import logging
+import os
+import pickle
+import threading
 import pytest
 from unittest.mock import call, patch, MagicMock
+from tests.arbpack.arbhooks import RecordingHooks
 from tests.common.utils import DeepCopyMagicMock, patch_logger
 
 import ruamel.yaml as yamler
 from ruamel.yaml.comments import CommentedMap, CommentedSeq, TaggedScalar
 
 import pypyr.cache.stepcache as stepcache
+import pypyr.dsl as dsl
 from pypyr.context import Context
-from pypyr.dsl import (Jsonify,
+from pypyr.cache.resultcache import StepResultCache
+from pypyr.dsl import (CacheDecorator,
+                       Jsonify,
+                       ParallelDecorator,
                        PyString,
                        SicString,
                        SpecialTagDirective,
                        Step,
                        RetryDecorator,
+                       UpToDateDecorator,
                        WhileDecorator)
 from pypyr.errors import (Call,
                           HandledError,
+                          Jump,
                           LoopMaxExhaustedError,
                           PipelineDefinitionError)
+from pypyr.formatting import CONSTANT_MARKER
+from pypyr.hooks import hooks
+from pypyr.yaml import get_pipeline_yaml
 
 
 def arb_step_mock(context):
@@ -617,10 +632,25 @@ def test_complex_step_init_defaults(mocked_moduleloader):
     assert not step.while_decorator
     assert step.line_col is None
     assert step.line_no is None
+    assert step.id is None
+    assert step.needs is None
 
     mocked_moduleloader.assert_called_once_with('blah')
 
 
+@patch('pypyr.moduleloader.get_module')
+def test_complex_step_init_with_id_needs(mocked_moduleloader):
+    """Complex step initializes with id & needs."""
+    mocked_moduleloader.return_value.run_step = arb_step_mock
+    step = Step({'name': 'blah', 'id': 'b', 'needs': 'a'})
+    assert step.id == 'b'
+    assert step.needs == ['a']
+
+    step = Step({'name': 'blah', 'needs': ['a', 'b']})
+    assert step.id is None
+    assert step.needs == ['a', 'b']
+
+
 def test_complex_step_init_with_missing_name_round_trip():
     """Step can't get step name from the yaml pipeline."""
     with pytest.raises(PipelineDefinitionError) as err_info:
@@ -772,8 +802,99 @@ def test_complex_step_init_with_decorators_roundtrip(mocked_moduleloader):
     mocked_moduleloader.assert_called_once_with('blah')
 
 
+@pytest.mark.parametrize('fast_yaml', [False, True])
+@patch('pypyr.cache.stepcache.step_cache.get_step')
+def test_step_init_unmarks_in_parameters(mocked_moduleloader, fast_yaml):
+    """In values go to context unflagged. Decorators keep their flags."""
+    with patch('pypyr.config.config.fast_yaml', fast_yaml):
+        definition = get_pipeline_yaml(StringIO(
+            "name: blah\n"
+            "foreach:\n"
+            "  - a: b\n"
+            "in:\n"
+            "  cfg:\n"
+            "    k: v\n"))
+
+    assert getattr(definition['in']['cfg'], CONSTANT_MARKER)
+
+    step = Step(definition)
+
+    assert not getattr(step.in_parameters, CONSTANT_MARKER, False)
+    assert not getattr(step.in_parameters['cfg'], CONSTANT_MARKER, False)
+    assert getattr(step.foreach_items, CONSTANT_MARKER)
+
+
 # endregion Step: init
 
+# region Step: get_run_instance
+
+
+@patch('pypyr.cache.stepcache.step_cache.get_step',
+       return_value=arb_step_mock)
+def test_step_get_run_instance(mock_get_step):
+    """Run instance shares parsed inputs but has its own loop counters."""
+    step = Step({'name': 'blah',
+                 'foreach': [0],
+                 'in': {'k1': 'v1'},
+                 'retry': {'max': 5},
+                 'while': {'max': 4}})
+
+    run_instance = step.get_run_instance()
+    mock_get_step.assert_called_once_with('blah')
+
+    assert run_instance is not step
+    assert run_instance.name == 'blah'
+    assert run_instance.run_step_function is arb_step_mock
+    assert run_instance.in_parameters is step.in_parameters
+    assert run_instance.foreach_items is step.foreach_items
+
+    assert run_instance.retry_decorator is not step.retry_decorator
+    assert run_instance.retry_decorator.max == 5
+    assert run_instance.while_decorator is not step.while_decorator
+    assert run_instance.while_decorator.max == 4
+
+    context = Context()
+    run_instance.run_step(context)
+
+    assert run_instance.for_counter == 0
+    assert run_instance.retry_decorator.retry_counter == 1
+    assert run_instance.while_decorator.while_counter == 4
+
+    assert step.for_counter is None
+    assert step.retry_decorator.retry_counter is None
+    assert step.while_decorator.while_counter is None
+
+
+@patch('pypyr.cache.stepcache.step_cache.get_step',
+       return_value=arb_step_mock)
+def test_step_get_run_instance_simple(mock_get_step):
+    """Step without loop decorators has no run state, so is its own."""
+    step = Step('blah')
+    assert step.get_run_instance() is step
+
+    step = Step({'name': 'blah', 'in': {'k1': 'v1'}, 'swallow': True})
+    assert step.get_run_instance() is step
+
+
+@patch('pypyr.cache.stepcache.step_cache.get_step',
+       return_value=arb_step_mock)
+def test_step_get_run_instance_single_loop(mock_get_step):
+    """Run instance with only one loop decorator copies only that."""
+    step = Step({'name': 'blah', 'retry': {'max': 1}})
+    run_instance = step.get_run_instance()
+    assert run_instance is not step
+    assert run_instance.retry_decorator is not step.retry_decorator
+    assert run_instance.while_decorator is None
+
+    step = Step({'name': 'blah', 'while': {'max': 1}})
+    run_instance = step.get_run_instance()
+    assert run_instance is not step
+    assert run_instance.retry_decorator is None
+    assert run_instance.while_decorator is not step.while_decorator
+
+
+# endregion Step: get_run_instance
+
 # region Step: description
 @patch('pypyr.moduleloader.get_module')
 @patch.object(Step, 'invoke_step')
@@ -1225,6 +1346,28 @@ def myfunc():
     assert context['lst'] == ['one', 'two', 'three']
     assert context['i'] == 'three'
 
+
+@patch('pypyr.dsl.get_loop_progress')
+def test_foreach_progress(mock_get_progress):
+    """Foreach tallies each iteration in the loop progress."""
+    context = Context({'lst': []})
+
+    step = Step({'name': 'pypyr.steps.py',
+                 'foreach': ['a', 'b'],
+                 'in': {'py': 'lst.append(i)'}
+                 })
+
+    step.run_step(context)
+
+    assert context['lst'] == ['a', 'b']
+    mock_get_progress.assert_called_once_with('foreach', 'pypyr.steps.py', 2)
+    progress = mock_get_progress.return_value
+    assert progress.mock_calls == [call.begin(),
+                                   call.end('a'),
+                                   call.begin(),
+                                   call.end('b'),
+                                   call.finish()]
+
 # endregion Step: run_step
 
 # region Step: run_step: while
@@ -2817,6 +2960,54 @@ def test_run_step_in_with_clean(mock_invoke_step, mock_get_module):
 
 # endregion Step: run_step: input context
 
+# region Step: run_step: hooks
+
+
+@patch('pypyr.moduleloader.get_module')
+@patch('pypyr.dsl.profiler')
+@patch('pypyr.dsl.tracer')
+def test_run_step_not_observed_no_wrappers(mock_tracer, mock_profiler,
+                                           mock_get_module):
+    """A step that nothing observes runs without tracer or profiler."""
+    mock_profiler.enabled = False
+    stepcache.step_cache.clear()
+    step = Step({'name': 'step1',
+                 'foreach': ['a', 'b'],
+                 'retry': {'max': 1},
+                 'while': {'max': 1}})
+
+    step.run_step(Context())
+
+    assert mock_get_module.return_value.run_step.call_count == 2
+    mock_tracer.span.assert_not_called()
+    mock_profiler.step.assert_not_called()
+    mock_profiler.module.assert_not_called()
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_run_step_observed_runs_hooks(mock_get_module):
+    """A step in a run with hooks runs the step & iteration hooks."""
+    hook = RecordingHooks()
+    step = Step({'name': 'step1',
+                 'foreach': ['a'],
+                 'retry': {'max': 1},
+                 'while': {'max': 1}})
+
+    with hooks.registered(hook), hooks.running():
+        step.run_step(Context())
+
+    assert hook.events == [
+        ('before_step', 'step', 'step1', None, None, None),
+        ('before_iteration', 'while', 'step1', None, 1, None),
+        ('before_iteration', 'foreach', 'step1', None, 'a', None),
+        ('before_iteration', 'retry', 'step1', None, 1, None),
+        ('after_iteration', 'retry', 'step1', None, 1, None),
+        ('after_iteration', 'foreach', 'step1', None, 'a', None),
+        ('after_iteration', 'while', 'step1', None, 1, None),
+        ('after_step', 'step', 'step1', None, None, None)]
+
+# endregion Step: run_step: hooks
+
 # region Step: set_step_input_context
 
 
@@ -4293,5 +4484,1080 @@ def mock_step(context):
         call('while: running step with counter 1'),
         call('while decorator looped 1 times, and {k1} never evaluated to '
              'True.')]
+
+
+@patch('pypyr.dsl.get_loop_progress')
+def test_while_loop_progress(mock_get_progress):
+    """While tallies each iteration in the loop progress."""
+    wd = WhileDecorator({'max': 2})
+
+    wd.while_loop(Context(), MagicMock(), name='arb')
+
+    mock_get_progress.assert_called_once_with('while', 'arb', 2)
+    progress = mock_get_progress.return_value
+    assert progress.mock_calls == [call.begin(),
+                                   call.end(1),
+                                   call.begin(),
+                                   call.end(2),
+                                   call.finish()]
+
+
+@patch('pypyr.dsl.get_loop_progress')
+def test_while_loop_progress_stop_no_total(mock_get_progress):
+    """While with only stop has no total."""
+    wd = WhileDecorator({'stop': True})
+
+    wd.while_loop(Context(), MagicMock())
+
+    mock_get_progress.assert_called_once_with('while', None, None)
 # endregion WhileDecorator: while_loop
 # endregion WhileDecorator
+
+# region ParallelDecorator
+
+# region ParallelDecorator: init
+
+
+def test_parallel_init_defaults():
+    """The ParallelDecorator ctor sets defaults with empty dict."""
+    pd = ParallelDecorator({'arb': 'arbv'})
+    assert pd.max is None
+    assert pd.mode == 'thread'
+    assert pd.ordered is True
+    assert pd.fail_fast is True
+    assert pd.out is None
+
+
+def test_parallel_init_all_attributes():
+    """The ParallelDecorator ctor with all props set."""
+    pd = ParallelDecorator({'max': 3,
+                            'mode': 'process',
+                            'ordered': False,
+                            'failFast': '{k1}',
+                            'out': ['a']})
+    assert pd.max == 3
+    assert pd.mode == 'process'
+    assert pd.ordered is False
+    assert pd.fail_fast == '{k1}'
+    assert pd.out == ['a']
+
+
+def test_parallel_init_scalar():
+    """The ParallelDecorator ctor with scalar short-hand for max."""
+    pd = ParallelDecorator(4)
+    assert pd.max == 4
+    assert pd.mode == 'thread'
+    assert pd.ordered is True
+    assert pd.fail_fast is True
+    assert pd.out is None
+
+    assert ParallelDecorator('{k1}').max == '{k1}'
+    assert ParallelDecorator(True).max is None
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_step_init_parallel(mock_moduleloader):
+    """Step parses parallel decorator."""
+    step = Step({'name': 'step1', 'foreach': ['a'], 'parallel': 2})
+    assert step.parallel_decorator.max == 2
+
+    step = Step({'name': 'step1', 'foreach': ['a'], 'parallel': False})
+    assert step.parallel_decorator is None
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_step_init_parallel_no_foreach(mock_moduleloader):
+    """Step raises PipelineDefinitionError on parallel without foreach."""
+    with pytest.raises(PipelineDefinitionError) as err_info:
+        Step({'name': 'step1', 'parallel': 2})
+
+    assert str(err_info.value) == (
+        "parallel decorator only works with foreach.")
+
+# endregion ParallelDecorator: init
+
+# region ParallelDecorator: parallel_loop
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_parallel_runs_concurrently(mock_moduleloader):
+    """Parallel foreach runs iterations at the same time."""
+    step = Step({'name': 'step1',
+                 'foreach': ['a', 'b', 'c'],
+                 'parallel': '{workers}'})
+
+    context = Context({'workers': 3})
+    barrier = threading.Barrier(3, timeout=5)
+    threads = set()
+
+    def mock_step(context):
+        threads.add(threading.current_thread().name)
+        # only passes if all 3 iterations run at the same time
+        barrier.wait()
+
+    with patch.object(Step, 'invoke_step', side_effect=mock_step):
+        with patch_logger('pypyr.dsl', logging.INFO) as mock_logger_info:
+            step.run_step(context)
+
+    assert len(threads) == 3
+    assert all(name.startswith('pypyr-foreach') for name in threads)
+    assert call('foreach decorator looped 3 times in parallel.') in (
+        mock_logger_info.mock_calls)
+    assert context == {'workers': 3, 'i': 'c'}
+    assert step.for_counter == 'c'
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_parallel_isolates_iterations(mock_moduleloader):
+    """Each iteration gets its own i & in parameters & merges back."""
+    step = Step({'name': 'step1',
+                 'foreach': ['a', 'b', 'c'],
+                 'parallel': {'max': 3},
+                 'in': {'inkey': 'inval'}})
+
+    context = Context({'k1': 'v1', 'k2': 'v2', 'remove_me': 'x'})
+    barrier = threading.Barrier(3, timeout=5)
+    seen = []
+
+    def mock_step(context):
+        i = context['i']
+        context['inkey'] = i
+        context[f'out_{i}'] = i
+        barrier.wait()
+        # other iterations don't see each other's changes
+        seen.append((i, context['inkey'],
+                     sorted(k for k in context if k.startswith('out_'))))
+        if i == 'b':
+            del context['remove_me']
+            context['k1'] = 'b1'
+
+    with patch.object(Step, 'invoke_step', side_effect=mock_step):
+        step.run_step(context)
+
+    assert sorted(seen) == [('a', 'a', ['out_a']),
+                            ('b', 'b', ['out_b']),
+                            ('c', 'c', ['out_c'])]
+    # in parameters removed after step as usual
+    assert context == {'k1': 'b1',
+                       'k2': 'v2',
+                       'i': 'c',
+                       'out_a': 'a',
+                       'out_b': 'b',
+                       'out_c': 'c'}
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_parallel_ordered_merge(mock_moduleloader):
+    """Ordered merges iterations in foreach order, last item wins."""
+    step = Step({'name': 'step1',
+                 'foreach': [0, 1, 2],
+                 'parallel': 3})
+
+    context = Context()
+    events = [threading.Event() for _ in range(3)]
+
+    def mock_step(context):
+        i = context['i']
+        context['out'] = i
+        # finish in reverse order
+        if i < 2:
+            assert events[i + 1].wait(5)
+        events[i].set()
+
+    with patch.object(Step, 'invoke_step', side_effect=mock_step):
+        step.run_step(context)
+
+    assert context['out'] == 2
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_parallel_unordered_merge(mock_moduleloader):
+    """Unordered merges iterations as they complete."""
+    step = Step({'name': 'step1',
+                 'foreach': [0, 1],
+                 'parallel': {'max': 2, 'ordered': False}})
+
+    context = Context()
+    merged = threading.Event()
+
+    def mock_merge(changes):
+        original_merge(context, changes)
+        merged.set()
+
+    def mock_step(context):
+        i = context['i']
+        context['out'] = i
+        if i == 0:
+            # only finish once 1 merged already
+            assert merged.wait(5)
+
+    original_merge = Context.merge_scoped_changes
+    with patch.object(Step, 'invoke_step', side_effect=mock_step):
+        with patch.object(context, 'merge_scoped_changes',
+                          side_effect=mock_merge):
+            step.run_step(context)
+
+    assert context['out'] == 0
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_parallel_fail_fast(mock_moduleloader):
+    """Fail fast stops starting iterations after error & raises it."""
+    step = Step({'name': 'step1',
+                 'foreach': [0, 1, 2, 3],
+                 'parallel': 1})
+
+    context = Context()
+    ran = []
+    arb_error = ValueError('arb error')
+
+    def mock_step(context):
+        ran.append(context['i'])
+        if context['i'] == 1:
+            raise arb_error
+
+    with patch.object(Step, 'invoke_step', side_effect=mock_step):
+        with pytest.raises(ValueError) as err_info:
+            step.run_step(context)
+
+    assert err_info.value is arb_error
+    assert ran == [0, 1]
+    assert context['i'] == 1
+    assert len(context['runErrors']) == 1
+    assert context['runErrors'][0]['exception'] is arb_error
+    assert not context['runErrors'][0]['swallowed']
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_parallel_collect_all(mock_moduleloader):
+    """Collect all runs every iteration & raises first error in order."""
+    step = Step({'name': 'step1',
+                 'foreach': [0, 1, 2, 3],
+                 'parallel': {'max': 2, 'failFast': False}})
+
+    existing_error = {'name': 'arb'}
+    context = Context({'runErrors': [existing_error]})
+    run_errors = context['runErrors']
+    ran = []
+
+    def mock_step(context):
+        ran.append(context['i'])
+        if context['i'] in (1, 3):
+            raise ValueError(f"err {context['i']}")
+
+    with patch.object(Step, 'invoke_step', side_effect=mock_step):
+        with patch_logger('pypyr.dsl', logging.ERROR) as mock_logger_error:
+            with pytest.raises(ValueError) as err_info:
+                step.run_step(context)
+
+    assert str(err_info.value) == 'err 1'
+    assert sorted(ran) == [0, 1, 2, 3]
+    assert context['runErrors'] is run_errors
+    assert len(run_errors) == 3
+    assert run_errors[0] is existing_error
+    assert [e['description'] for e in run_errors[1:]] == ['err 1', 'err 3']
+    assert call('2 foreach iterations failed. Raising the first error.') in (
+        mock_logger_error.mock_calls)
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_parallel_swallow_retry_per_iteration(mock_moduleloader):
+    """Swallow & retry apply to each iteration on its own."""
+    step = Step({'name': 'step1',
+                 'foreach': ['a', 'b', 'c'],
+                 'parallel': 3,
+                 'retry': {'max': 2},
+                 'swallow': '{i_swallow}'})
+
+    context = Context({'i_swallow': False})
+    lock = threading.Lock()
+    calls = []
+
+    def mock_step(context):
+        with lock:
+            calls.append((context['i'], context['retryCounter']))
+        if context['i'] == 'b':
+            context['i_swallow'] = True
+            raise ValueError('arb')
+        if context['i'] == 'c' and context['retryCounter'] == 1:
+            raise ValueError('retry me')
+
+    with patch.object(Step, 'invoke_step', side_effect=mock_step):
+        step.run_step(context)
+
+    assert sorted(calls) == [('a', 1), ('b', 1), ('b', 2), ('c', 1), ('c', 2)]
+    # b's swallow expression merges back
+    assert context['i_swallow'] is True
+    assert len(context['runErrors']) == 1
+    assert context['runErrors'][0]['swallowed']
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_parallel_run_skip_per_iteration(mock_moduleloader):
+    """Run & skip evaluate against each iteration's i."""
+    step = Step({'name': 'step1',
+                 'foreach': ['a', 'b', 'c'],
+                 'parallel': 2,
+                 'run': PyString('i != "a"'),
+                 'skip': PyString('i == "b"')})
+
+    context = Context()
+    ran = []
+
+    with patch.object(Step, 'invoke_step',
+                      side_effect=lambda context: ran.append(context['i'])):
+        step.run_step(context)
+
+    assert ran == ['c']
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_parallel_control_of_flow_stops(mock_moduleloader):
+    """Control-of-flow stops the loop even without fail fast."""
+    step = Step({'name': 'step1',
+                 'foreach': [0, 1, 2],
+                 'parallel': {'max': 1, 'failFast': False}})
+
+    context = Context()
+    ran = []
+
+    def mock_step(context):
+        ran.append(context['i'])
+        raise Jump(['arb'], None, None, ('jump', 'arb'))
+
+    with patch.object(Step, 'invoke_step', side_effect=mock_step):
+        with pytest.raises(Jump):
+            step.run_step(context)
+
+    assert ran == [0]
+
+
+def test_parallel_max_invalid():
+    """Parallel max must be at least 1."""
+    pd = ParallelDecorator({'max': 0})
+
+    with pytest.raises(ValueError) as err_info:
+        pd.parallel_loop(Context(), [1], None)
+
+    assert str(err_info.value) == (
+        "parallel max must be 1 or more if you specify it.")
+
+
+def test_parallel_empty():
+    """Parallel loop over nothing does nothing."""
+    pd = ParallelDecorator({'max': 2})
+    context = Context({'a': 'b'})
+    step = MagicMock()
+
+    pd.parallel_loop(context, [], step)
+
+    assert context == {'a': 'b'}
+    step.get_run_instance.assert_not_called()
+
+
+def test_parallel_call_runs_on_iteration_context():
+    """Call in parallel iteration runs called groups on iteration context."""
+    context = Context({'out': []})
+    pipeline = MagicMock()
+    context.current_pipeline = pipeline
+    pipeline.steps_runner.context = context
+    scoped_runner = pipeline.steps_runner.get_scoped_copy.return_value
+
+    iteration_context = context.get_scoped_copy()
+    step = Step({'name': 'pypyr.steps.call', 'in': {'call': 'arb'}})
+    step.run_step(iteration_context)
+
+    pipeline.steps_runner.get_scoped_copy.assert_called_once_with(
+        iteration_context)
+    scoped_runner.run_step_groups.assert_called_once_with(
+        groups=['arb'], success_group=None, failure_group=None)
+    pipeline.steps_runner.run_step_groups.assert_not_called()
+
+
+def test_parallel_out_keys_only():
+    """Only out keys merge back, even if mutated in place."""
+    step = Step({'name': 'step1',
+                 'foreach': ['a', 'b'],
+                 'parallel': {'max': 2, 'out': ['out_{i}', 'lst']}})
+
+    context = Context({'lst': []})
+
+    def mock_step(context):
+        i = context['i']
+        context[f'out_{i}'] = i
+        context['not_out'] = i
+
+    with patch.object(Step, 'invoke_step', side_effect=mock_step):
+        step.run_step(context)
+
+    assert context == {'lst': [], 'out_a': 'a', 'out_b': 'b', 'i': 'b'}
+
+
+def test_parallel_mode_invalid():
+    """Parallel mode must be thread or process."""
+    pd = ParallelDecorator({'mode': 'arb'})
+
+    with pytest.raises(ValueError) as err_info:
+        pd.parallel_loop(Context(), [1], None)
+
+    assert str(err_info.value) == (
+        "parallel mode must be thread or process, not arb.")
+
+
+def test_parallel_process_mode():
+    """Process mode pickles step & context for each iteration."""
+    step = Step({'name': 'pypyr.steps.py',
+                 'foreach': [1, 2, 3],
+                 'parallel': {'mode': '{mode}', 'out': 'out_{i}'},
+                 'in': {'py': "save(**{f'out_{i}': i * 10, 'x': i})"}})
+
+    context = Context({'mode': 'process'})
+
+    # stand in for the process pool with threads, so it runs in this process
+    pool = ThreadPoolExecutor(max_workers=2)
+    with patch('pypyr.dsl._get_process_pool',
+               return_value=pool) as mock_get_pool:
+        with patch('pypyr.dsl.os.cpu_count', return_value=2):
+            step.run_step(context)
+
+    pool.shutdown()
+    mock_get_pool.assert_called_once_with(2)
+    assert context == {'mode': 'process',
+                       'out_1': 10,
+                       'out_2': 20,
+                       'out_3': 30,
+                       'i': 3}
+
+
+def test_parallel_process_mode_broken_pool():
+    """Broken process pool gets discarded."""
+    pd = ParallelDecorator({'mode': 'process', 'max': 3})
+    step = Step('pypyr.steps.echo')
+    pool = MagicMock()
+    future = Future()
+    future.set_exception(BrokenProcessPool('arb'))
+    pool.submit.return_value = future
+
+    with patch('pypyr.dsl._get_process_pool', return_value=pool):
+        with patch('pypyr.dsl._discard_process_pool') as mock_discard:
+            with pytest.raises(BrokenProcessPool):
+                pd.parallel_loop(Context(), [1], step)
+
+    mock_discard.assert_called_once_with(3)
+
+
+def test_get_process_pool_reuses():
+    """Process pools are warm & shared per max_workers."""
+    with patch('pypyr.dsl.ProcessPoolExecutor') as mock_pool:
+        mock_pool.side_effect = [MagicMock(), MagicMock(), MagicMock()]
+        with patch.dict(dsl._process_pools, clear=True):
+            pool1 = dsl._get_process_pool(2)
+            assert dsl._get_process_pool(2) is pool1
+            pool2 = dsl._get_process_pool(3)
+            assert pool2 is not pool1
+
+            dsl._discard_process_pool(2)
+            pool1.shutdown.assert_called_once_with(wait=False)
+            assert dsl._get_process_pool(2) is not pool1
+
+            # discard when not there does nothing
+            dsl._discard_process_pool(4)
+
+    assert [c.kwargs['max_workers'] for c in mock_pool.call_args_list] == [
+        2, 3, 2]
+
+
+def test_get_process_pool_mp_context():
+    """Process pool workers don't fork from the parent."""
+    with patch('pypyr.dsl.ProcessPoolExecutor') as mock_pool:
+        with patch.dict(dsl._process_pools, clear=True):
+            dsl._get_process_pool(2)
+
+    mp_context = mock_pool.call_args.kwargs['mp_context']
+    assert mp_context.get_start_method() in ('forkserver', 'spawn')
+
+
+@patch('pypyr.dsl.multiprocessing.get_all_start_methods',
+       return_value=['spawn'])
+def test_get_mp_context_spawn(mock_methods):
+    """Without forkserver, workers spawn."""
+    assert dsl._get_mp_context().get_start_method() == 'spawn'
+
+
+@patch('pypyr.dsl.multiprocessing.get_all_start_methods',
+       return_value=['fork', 'spawn', 'forkserver'])
+def test_get_mp_context_forkserver(mock_methods):
+    """Forkserver if there is one."""
+    assert dsl._get_mp_context().get_start_method() == 'forkserver'
+
+
+def test_shutdown_process_pools():
+    """Shutdown waits on all the pools & empties the shared pools."""
+    pool1 = MagicMock()
+    pool2 = MagicMock()
+    with patch.dict(dsl._process_pools, {2: pool1, 3: pool2}, clear=True):
+        dsl.shutdown_process_pools()
+        assert dsl._process_pools == {}
+
+    pool1.shutdown.assert_called_once_with(wait=True)
+    pool2.shutdown.assert_called_once_with(wait=True)
+
+
+def test_run_process_iteration():
+    """Process iteration unpickles & syncs sys.path."""
+    context = Context({'k1': 'v1', 'runErrors': ['existing']})
+    step = Step({'name': 'pypyr.steps.set',
+                 'swallow': True,
+                 'in': {'set': {'k2': '{i}', 'k3': PyString('1/0')}}})
+    context.update(step.in_parameters)
+
+    with patch('pypyr.dsl.sys.path', ['a']) as mock_path:
+        (updates, removed, run_errors), error = dsl._run_process_iteration(
+            ['a', 'b'],
+            pickle.dumps(step),
+            pickle.dumps(context),
+            'x',
+            None)
+        assert mock_path == ['a', 'b']
+
+    assert error is None
+    # set step pops its input & sets k2 before k3 raises
+    assert updates == {'k2': 'x'}
+    assert removed == ['set']
+    assert len(run_errors) == 1
+    assert run_errors[0]['name'] == 'ZeroDivisionError'
+
+# endregion ParallelDecorator: parallel_loop
+
+# endregion ParallelDecorator
+
+# region CacheDecorator
+
+# region CacheDecorator: init
+
+
+def test_cache_init_defaults():
+    """The CacheDecorator ctor sets defaults."""
+    cd = CacheDecorator(True)
+    assert cd.keys is None
+    assert cd.ttl is None
+
+    cd = CacheDecorator({'arb': 'arbv'})
+    assert cd.keys is None
+    assert cd.ttl is None
+
+
+def test_cache_init_all_attributes():
+    """The CacheDecorator ctor with all props set."""
+    cd = CacheDecorator({'keys': ['a', 'b'], 'ttl': 60})
+    assert cd.keys == ['a', 'b']
+    assert cd.ttl == 60
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_step_init_cache(mock_moduleloader):
+    """Step parses cache decorator."""
+    step = Step({'name': 'step1', 'cache': {'ttl': 3}})
+    assert step.cache_decorator.ttl == 3
+    assert Step({'name': 'step1', 'cache': False}).cache_decorator is None
+    assert Step({'name': 'step1'}).cache_decorator is None
+
+# endregion CacheDecorator: init
+
+# region CacheDecorator: cached_run
+
+
+@pytest.fixture
+def result_cache(tmp_path):
+    """Swap the global step result cache for one in a temp dir."""
+    cache = StepResultCache(tmp_path)
+    with patch('pypyr.dsl.step_result_cache', cache):
+        yield cache
+
+
+def get_counting_step(step_definition):
+    """Get a Step whose run_step counts calls & sets out from in_key."""
+    calls = []
+
+    def run_step(context):
+        calls.append(context.get_formatted('in_key'))
+        context['out'] = f"{context.get_formatted('in_key')} done"
+        context['count'] = len(calls)
+        context.pop('remove_me', None)
+
+    with patch('pypyr.cache.stepcache.step_cache.get_step',
+               return_value=run_step):
+        step = Step(step_definition)
+
+    return step, calls
+
+
+def test_cache_miss_then_hit(result_cache):
+    """Step runs once, then restores its changes from cache."""
+    step, calls = get_counting_step({'name': 'arb',
+                                     'cache': True,
+                                     'in': {'in_key': '{k1}'}})
+
+    context = Context({'k1': 'v1', 'remove_me': 1})
+    step.run_step(context)
+    assert calls == ['v1']
+    assert context == {'k1': 'v1', 'out': 'v1 done', 'count': 1}
+
+    context = Context({'k1': 'v1', 'remove_me': 1, 'out': 'x'})
+    with patch_logger('pypyr.dsl', logging.INFO) as mock_info:
+        step.run_step(context)
+
+    assert calls == ['v1']
+    mock_info.assert_called_once_with(
+        "arb using cached result instead of running.")
+    assert context == {'k1': 'v1', 'out': 'v1 done', 'count': 1}
+    assert result_cache.hits == 1
+    assert result_cache.misses == 1
+
+
+def test_cache_formatted_in_changes_key(result_cache):
+    """Different formatted in parameters are a different cache key."""
+    step, calls = get_counting_step({'name': 'arb',
+                                     'cache': True,
+                                     'in': {'in_key': '{k1}'}})
+
+    step.run_step(Context({'k1': 'v1'}))
+    step.run_step(Context({'k1': 'v2'}))
+    step.run_step(Context({'k1': 'v1'}))
+
+    assert calls == ['v1', 'v2']
+
+
+def test_cache_keys_change_key(result_cache):
+    """Different values in the declared context keys miss."""
+    step, calls = get_counting_step({'name': 'arb',
+                                     'cache': {'keys': '{which}'},
+                                     'in': {'in_key': 'x'}})
+
+    step.run_step(Context({'which': 'k2', 'k2': 'a'}))
+    step.run_step(Context({'which': 'k2', 'k2': 'b'}))
+    step.run_step(Context({'which': 'k2'}))
+    step.run_step(Context({'which': 'k2', 'k2': None}))
+    step.run_step(Context({'which': 'k2', 'k2': 'b', 'k3': 'ignored'}))
+
+    assert len(calls) == 4
+
+
+def test_cache_ttl(result_cache):
+    """Expired result runs the step again."""
+    step, calls = get_counting_step({'name': 'arb',
+                                     'cache': {'ttl': '{ttl}'},
+                                     'in': {'in_key': 'x'}})
+
+    with patch('pypyr.cache.resultcache.time.time', return_value=100):
+        step.run_step(Context({'ttl': 10}))
+
+    with patch('pypyr.cache.resultcache.time.time', return_value=105):
+        step.run_step(Context({'ttl': 10}))
+        step.run_step(Context({'ttl': 1}))
+
+    assert len(calls) == 2
+
+
+def test_cache_not_run(result_cache):
+    """Step that doesn't run because of run or skip doesn't cache."""
+    step, calls = get_counting_step({'name': 'arb',
+                                     'cache': True,
+                                     'run': '{run_me}',
+                                     'skip': '{skip_me}',
+                                     'in': {'in_key': 'x'}})
+
+    step.run_step(Context({'run_me': False, 'skip_me': False}))
+    step.run_step(Context({'run_me': True, 'skip_me': True}))
+    assert not calls
+    assert result_cache.get_stats()['size'] == 0
+
+    step.run_step(Context({'run_me': True, 'skip_me': False}))
+    assert len(calls) == 1
+
+
+def test_cache_swallowed_error_not_saved(result_cache):
+    """Step with swallowed error doesn't save its result."""
+    with patch('pypyr.cache.stepcache.step_cache.get_step',
+               side_effect=lambda name: MagicMock(
+                   side_effect=ValueError('arb'))):
+        step = Step({'name': 'arb', 'cache': True, 'swallow': True})
+
+    context = Context()
+    step.run_step(context)
+    step.run_step(context)
+
+    assert len(context['runErrors']) == 2
+    assert result_cache.get_stats()['size'] == 0
+
+
+def test_cache_error_not_saved(result_cache):
+    """Step that raises doesn't save its result."""
+    with patch('pypyr.cache.stepcache.step_cache.get_step',
+               return_value=MagicMock(side_effect=ValueError('arb'))):
+        step = Step({'name': 'arb', 'cache': True})
+
+    with pytest.raises(ValueError):
+        step.run_step(Context())
+
+    assert result_cache.get_stats()['size'] == 0
+
+
+def test_cache_real_step_py_braces(result_cache):
+    """In parameters that don't format, like py code, hash raw."""
+    step = Step({'name': 'pypyr.steps.py',
+                 'cache': True,
+                 'in': {'py': "calls.append(1)\nout = {'a': len(calls)}\n"
+                              "save('out')"}})
+
+    calls = []
+    context = Context({'calls': calls})
+    step.run_step(context)
+    assert context['out'] == {'a': 1}
+
+    context = Context({'calls': calls})
+    step.run_step(context)
+    assert context['out'] == {'a': 1}
+    assert calls == [1]
+
+
+def test_cache_get_cache_key():
+    """Cache key stable for sets & mixed key types."""
+    step = MagicMock(spec=Step)
+    step.name = 'arb'
+    step.in_parameters = {'a': {3, 2, 1}, 'b': '{k1}', 'c': {1: 'x', 'y': 2}}
+    step.foreach_items = None
+
+    cd = CacheDecorator({'keys': ['k1', 'nope']})
+    key = cd.get_cache_key(Context({'k1': 'v1'}), step)
+    assert len(key) == 64
+
+    step.in_parameters = {'a': {1, 2, 3}, 'b': 'v1', 'c': {1: 'x', 'y': 2}}
+    assert cd.get_cache_key(Context({'k1': 'v1'}), step) == key
+
+    assert cd.get_cache_key(Context({'k1': 'v2'}), step) != key
+
+
+def test_cache_get_cache_key_pipeline_name():
+    """Same step & inputs in another pipeline is a different cache key."""
+    step = MagicMock(spec=Step)
+    step.name = 'arb'
+    step.in_parameters = {'a': 'b'}
+    step.foreach_items = None
+
+    cd = CacheDecorator(True)
+    context = Context()
+    no_pipeline = cd.get_cache_key(context, step)
+
+    context.current_pipeline = MagicMock()
+    context.current_pipeline.name = 'pipe1'
+    pipe1 = cd.get_cache_key(context, step)
+    assert cd.get_cache_key(context, step) == pipe1
+
+    context.current_pipeline.name = 'pipe2'
+    assert cd.get_cache_key(context, step) != pipe1
+    assert pipe1 != no_pipeline
+
+
+def test_cache_get_cache_key_py_error_raises():
+    """An error in a py expression isn't a formatting error, so it raises."""
+    step = MagicMock(spec=Step)
+    step.name = 'arb'
+    step.in_parameters = {'a': PyString('1/0')}
+    step.foreach_items = None
+
+    with pytest.raises(ZeroDivisionError):
+        CacheDecorator(True).get_cache_key(Context(), step)
+
+
+def test_cache_run_and_skip_evaluate_once(result_cache):
+    """The step decides whether it runs once, not again in the decorator."""
+    step, calls = get_counting_step({'name': 'arb',
+                                     'description': 'arb description',
+                                     'cache': True,
+                                     'run': PyString('runs.append(1) or True'),
+                                     'skip': PyString('skips.append(1)'),
+                                     'in': {'in_key': 'x'}})
+
+    context = Context({'runs': [], 'skips': []})
+    step.run_step(context)
+
+    assert len(calls) == 1
+    # once for the step, once for the conditional decorators.
+    assert context['runs'] == [1, 1]
+    assert context['skips'] == [1, 1]
+
+# endregion CacheDecorator: cached_run
+
+# endregion CacheDecorator
+
+# region UpToDateDecorator
+
+# region UpToDateDecorator: init
+
+
+def test_up_to_date_init_shorthand():
+    """The UpToDateDecorator ctor takes globs as shorthand for inputs."""
+    ud = UpToDateDecorator('in/*.txt', 'out.txt')
+    assert ud.inputs == 'in/*.txt'
+    assert ud.outputs == 'out.txt'
+    assert ud.hash is False
+
+    ud = UpToDateDecorator(None, ['a', 'b'])
+    assert ud.inputs is None
+    assert ud.outputs == ['a', 'b']
+    assert ud.hash is False
+
+
+def test_up_to_date_init_all_attributes():
+    """The UpToDateDecorator ctor with inputs dict."""
+    ud = UpToDateDecorator({'glob': ['a', 'b'], 'hash': True}, 'out')
+    assert ud.inputs == ['a', 'b']
+    assert ud.outputs == 'out'
+    assert ud.hash is True
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_step_init_up_to_date(mock_moduleloader):
+    """Step parses inputs & outputs decorators."""
+    step = Step({'name': 'step1', 'inputs': 'a', 'outputs': 'b'})
+    assert step.up_to_date_decorator.inputs == 'a'
+    assert step.up_to_date_decorator.outputs == 'b'
+
+    step = Step({'name': 'step1', 'outputs': 'b'})
+    assert step.up_to_date_decorator.inputs is None
+
+    assert Step({'name': 'step1'}).up_to_date_decorator is None
+
+
+@patch('pypyr.moduleloader.get_module')
+def test_step_init_inputs_without_outputs(mock_moduleloader):
+    """Step raises when inputs has no outputs."""
+    with pytest.raises(PipelineDefinitionError) as err:
+        Step({'name': 'step1', 'inputs': 'a'})
+
+    assert str(err.value) == "inputs decorator only works with outputs."
+
+# endregion UpToDateDecorator: init
+
+# region UpToDateDecorator: run_if_changed
+
+
+def get_file_writing_step(step_definition):
+    """Get a Step whose run_step counts calls & writes to out_path."""
+    calls = []
+
+    def run_step(context):
+        calls.append(context['out_path'])
+        with open(context['out_path'], 'w') as file:
+            file.write('done')
+
+    with patch('pypyr.cache.stepcache.step_cache.get_step',
+               return_value=run_step):
+        step = Step(step_definition)
+
+    return step, calls
+
+
+def write_file(path, content, mtime):
+    """Write content to path & set its modified time."""
+    path.write_text(content)
+    os.utime(path, (mtime, mtime))
+
+
+def test_up_to_date_mtime(tmp_path):
+    """Step runs only when an input is newer than the outputs."""
+    write_file(tmp_path.joinpath('a.in'), 'a', 1000)
+    write_file(tmp_path.joinpath('b.in'), 'b', 2000)
+    out_path = tmp_path.joinpath('x.out')
+
+    step, calls = get_file_writing_step({'name': 'arb',
+                                         'inputs': '{dir}/*.in',
+                                         'outputs': ['{out_path}']})
+    context = Context({'dir': str(tmp_path), 'out_path': str(out_path)})
+
+    # no output yet
+    step.run_step(context)
+    assert len(calls) == 1
+
+    os.utime(out_path, (3000, 3000))
+    with patch_logger('pypyr.dsl', logging.NOTIFY) as mock_notify:
+        step.run_step(context)
+
+    assert len(calls) == 1
+    mock_notify.assert_called_once_with(
+        "arb not running because its outputs are newer than its inputs.")
+
+    # input changed after output
+    os.utime(tmp_path.joinpath('a.in'), (4000, 4000))
+    step.run_step(context)
+    assert len(calls) == 2
+
+
+def test_up_to_date_mtime_equal_runs(tmp_path):
+    """Output as old as newest input isn't up to date."""
+    write_file(tmp_path.joinpath('a.in'), 'a', 1000)
+    write_file(tmp_path.joinpath('x.out'), 'x', 1000)
+
+    step, calls = get_file_writing_step({'name': 'arb',
+                                         'inputs': '{dir}/a.in',
+                                         'outputs': '{dir}/x.out'})
+
+    step.run_step(Context({'dir': str(tmp_path),
+                           'out_path': str(tmp_path.joinpath('x.out'))}))
+    assert len(calls) == 1
+
+
+def test_up_to_date_every_output_must_exist(tmp_path):
+    """Step runs if any outputs glob matches nothing."""
+    write_file(tmp_path.joinpath('a.in'), 'a', 1000)
+    write_file(tmp_path.joinpath('x.out'), 'x', 2000)
+
+    step, calls = get_file_writing_step(
+        {'name': 'arb',
+         'inputs': '{dir}/a.in',
+         'outputs': ['{dir}/x.out', '{dir}/y.out']})
+
+    step.run_step(Context({'dir': str(tmp_path),
+                           'out_path': str(tmp_path.joinpath('y.out'))}))
+    assert len(calls) == 1
+
+
+def test_up_to_date_no_inputs(tmp_path):
+    """Existing outputs are up to date when there are no inputs."""
+    write_file(tmp_path.joinpath('x.out'), 'x', 1000)
+
+    step, calls = get_file_writing_step({'name': 'arb',
+                                         'outputs': '{dir}/x.out'})
+
+    step.run_step(Context({'dir': str(tmp_path),
+                           'out_path': str(tmp_path.joinpath('x.out'))}))
+    assert not calls
+
+
+def test_up_to_date_inputs_match_nothing(tmp_path):
+    """Inputs glob that matches nothing isn't up to date."""
+    write_file(tmp_path.joinpath('x.out'), 'x', 1000)
+
+    step, calls = get_file_writing_step({'name': 'arb',
+                                         'inputs': '{dir}/*.nope',
+                                         'outputs': '{dir}/x.out'})
+
+    step.run_step(Context({'dir': str(tmp_path),
+                           'out_path': str(tmp_path.joinpath('x.out'))}))
+    assert len(calls) == 1
+
+
+def test_up_to_date_hash_inputs_match_nothing(tmp_path, result_cache):
+    """Hash mode with inputs that match nothing runs every time."""
+    step, calls = get_file_writing_step(
+        {'name': 'arb',
+         'inputs': {'glob': '{dir}/*.nope', 'hash': True},
+         'outputs': '{dir}/x.out'})
+    context = Context({'dir': str(tmp_path),
+                       'out_path': str(tmp_path.joinpath('x.out'))})
+
+    step.run_step(context)
+    step.run_step(context)
+    assert len(calls) == 2
+
+
+def test_up_to_date_run_evaluates_once(tmp_path):
+    """The decorator doesn't evaluate run & skip again."""
+    step, calls = get_file_writing_step(
+        {'name': 'arb',
+         'run': PyString('runs.append(1) or True'),
+         'inputs': '{dir}/*.in',
+         'outputs': '{out_path}'})
+    context = Context({'dir': str(tmp_path),
+                       'out_path': str(tmp_path.joinpath('x.out')),
+                       'runs': []})
+
+    step.run_step(context)
+    assert len(calls) == 1
+    # once for the step, once for the conditional decorators.
+    assert context['runs'] == [1, 1]
+
+
+def test_up_to_date_skip_doesnt_check(tmp_path):
+    """Step that doesn't run for run/skip doesn't resolve globs."""
+    step, calls = get_file_writing_step({'name': 'arb',
+                                         'skip': True,
+                                         'inputs': '{nope}',
+                                         'outputs': '{nope}'})
+
+    step.run_step(Context())
+    assert not calls
+
+
+def test_up_to_date_hash(tmp_path, result_cache):
+    """Step runs only when input content changed since last run."""
+    write_file(tmp_path.joinpath('a.in'), 'a', 1000)
+    out_path = tmp_path.joinpath('x.out')
+
+    step, calls = get_file_writing_step({'name': 'arb',
+                                         'inputs': {'glob': '{dir}/*.in',
+                                                    'hash': True},
+                                         'outputs': '{out_path}'})
+    context = Context({'dir': str(tmp_path), 'out_path': str(out_path)})
+
+    step.run_step(context)
+    assert len(calls) == 1
+
+    # mtime doesn't matter in hash mode.
+    os.utime(tmp_path.joinpath('a.in'), (5000, 5000))
+    with patch_logger('pypyr.dsl', logging.NOTIFY) as mock_notify:
+        step.run_step(context)
+
+    assert len(calls) == 1
+    mock_notify.assert_called_once_with(
+        "arb not running because its inputs haven't changed since it last "
+        "ran.")
+
+    # content changed
+    tmp_path.joinpath('a.in').write_text('changed')
+    step.run_step(context)
+    assert len(calls) == 2
+
+    # new input file
+    tmp_path.joinpath('b.in').write_text('b')
+    step.run_step(context)
+    assert len(calls) == 3
+
+    step.run_step(context)
+    assert len(calls) == 3
+
+    # output gone
+    out_path.unlink()
+    step.run_step(context)
+    assert len(calls) == 4
+
+
+def test_up_to_date_hash_error_doesnt_save(tmp_path, result_cache):
+    """Step that swallows an error doesn't save its inputs hash."""
+    write_file(tmp_path.joinpath('a.in'), 'a', 1000)
+    write_file(tmp_path.joinpath('x.out'), 'x', 1000)
+    calls = []
+
+    def run_step(context):
+        calls.append(1)
+        raise ValueError('arb')
+
+    with patch('pypyr.cache.stepcache.step_cache.get_step',
+               return_value=run_step):
+        step = Step({'name': 'arb',
+                     'swallow': True,
+                     'inputs': {'glob': '{dir}/a.in', 'hash': True},
+                     'outputs': '{dir}/x.out'})
+
+    context = Context({'dir': str(tmp_path)})
+    step.run_step(context)
+    step.run_step(context)
+
+    assert len(calls) == 2
+    assert len(context['runErrors']) == 2
+    assert result_cache.get_stats()['size'] == 0
+
+# endregion UpToDateDecorator: run_if_changed
+
+# endregion UpToDateDecorator
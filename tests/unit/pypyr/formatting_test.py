@@ -1,7 +1,11 @@
 """formatting.py unit tests."""
+import copy
 from unittest.mock import Mock
 import pytest
-from pypyr.formatting import RecursionSpec, RecursiveFormatter
+from pypyr.formatting import (CONSTANT_MARKER,
+                              RecursionSpec,
+                              RecursiveFormatter,
+                              unmark_constants)
 
 # region recursion_spec
 
@@ -580,6 +584,283 @@ def test_recursive_format_keep_type_recurse_format_spec_max_exceeded():
 
 # endregion format_spec nesting
 
+# region template cache
+
+
+def test_recursive_formatter_template_parses_once():
+    """Format same string repeatedly only parses it once."""
+    formatter = RecursiveFormatter()
+    formatter.parse = Mock(wraps=formatter.parse)
+
+    assert formatter.vformat('{a}/{b}.json', None,
+                             {'a': 'dir', 'b': 'x'}) == 'dir/x.json'
+    assert formatter.vformat('{a}/{b}.json', None,
+                             {'a': 'dir2', 'b': 'y'}) == 'dir2/y.json'
+
+    formatter.parse.assert_called_once_with('{a}/{b}.json')
+    cache_info = formatter._get_template.cache_info()
+    assert cache_info.hits == 1
+    assert cache_info.misses == 1
+    assert cache_info.maxsize == 4096
+
+
+def test_recursive_formatter_template_segments():
+    """Template segments hold literals, fields & recursion specs."""
+    template = RecursiveFormatter()._get_template('a{b!r:rf>3}c{d:{e}}')
+
+    assert len(template) == 4
+    assert template[0] == ('a', None, None, None, None)
+
+    literal, field_name, format_spec, conversion, recursion_spec = template[1]
+    assert literal is None
+    assert field_name == 'b'
+    assert format_spec == 'rf>3'
+    assert conversion == 'r'
+    assert recursion_spec.is_recursive
+    assert recursion_spec.format_spec == '>3'
+
+    assert template[2] == ('c', None, None, None, None)
+    # nested expression in format spec means can't parse recursion spec yet
+    assert template[3] == (None, 'd', '{e}', None, None)
+
+
+def test_recursive_formatter_template_literal():
+    """Literal string without escapes formats to itself."""
+    formatter = RecursiveFormatter()
+    assert formatter._get_template('arb literal') == ()
+    assert formatter._get_template('') == ()
+
+    literal = ''.join(['arb ', 'literal'])
+    assert formatter.vformat(literal, None, {}) is literal
+
+
+def test_recursive_formatter_template_escaped_braces():
+    """Escaped braces are literal text, but not the same as input."""
+    formatter = RecursiveFormatter()
+    assert formatter._get_template('{{a}}') == (('{', None, None, None, None),
+                                                ('a}', None, None, None, None))
+    assert formatter.vformat('{{a}}', None, {}) == '{a}'
+    assert formatter.vformat('{{a}}', None, {}) == '{a}'
+
+
+def test_recursive_formatter_template_recursion_spec_shared():
+    """Cached recursion spec doesn't carry state between format calls."""
+    formatter = RecursiveFormatter()
+    d = {'k1': '{k2}', 'k2': 'x', 'k3': 'y'}
+
+    assert formatter.vformat('{k1:rf}', None, d) == 'x'
+    recursion_spec = formatter._get_template('{k1:rf}')[0][4]
+    assert not recursion_spec.has_recursed
+
+    assert formatter.vformat('{k1:rf}', None, d) == 'x'
+    d['k1'] = '{k3}'
+    assert formatter.vformat('{k1:rf}', None, d) == 'y'
+    assert formatter.vformat('{k1:ff}', None, d) == '{k3}'
+
+
+def test_recursive_formatter_template_nested_format_spec_expands():
+    """Nested format spec expands every time even when template cached."""
+    formatter = RecursiveFormatter()
+    d = {'k1': 'x', 'k2': 123}
+    assert formatter.vformat('{k2:{k1}}', None, d) == '7b'
+    d['k1'] = 'o'
+    assert formatter.vformat('{k2:{k1}}', None, d) == '173'
+
+
+def test_recursive_formatter_template_parse_error_not_cached():
+    """Parse error raises each time."""
+    formatter = RecursiveFormatter()
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            formatter.vformat('{a', None, {'a': 1})
+
+    assert formatter._get_template.cache_info().currsize == 0
+
+# endregion template cache
+
+# region constant containers
+
+
+class Special():
+    """Arbitrary special type for formatting tests."""
+
+    def get_value(self, kwargs):
+        """Return value from kwargs."""
+        return kwargs['k1']
+
+
+class Dict(dict):
+    """dict that accepts attributes."""
+
+
+class List(list):
+    """list that accepts attributes."""
+
+
+def is_marked(obj):
+    """Return True if obj flagged as constant."""
+    return getattr(obj, CONSTANT_MARKER, False)
+
+
+def test_mark_constants_scalars():
+    """Scalars without expressions are constant."""
+    formatter = RecursiveFormatter(special_types=Special)
+    assert formatter.mark_constants('arb')
+    assert formatter.mark_constants(b'{arb}')
+    assert formatter.mark_constants(123)
+    assert formatter.mark_constants(None)
+    assert not formatter.mark_constants('{arb}')
+    assert not formatter.mark_constants('arb }}')
+    assert not formatter.mark_constants(Special())
+
+
+def test_mark_constants_nested():
+    """Flag only containers without anything to format."""
+    formatter = RecursiveFormatter(special_types=Special)
+    const_list = List([1, 'two', b'{3}'])
+    const_dict = Dict({'a': 'b', 'c': const_list})
+    key_expr = Dict({'{k1}': 'b'})
+    special = List([1, Special()])
+    expr = List(['a', '{k1}'])
+    root = Dict({'const': const_dict,
+                 'key_expr': key_expr,
+                 'special': special,
+                 'expr': expr})
+
+    assert not formatter.mark_constants(root)
+
+    assert is_marked(const_list)
+    assert is_marked(const_dict)
+    assert not is_marked(key_expr)
+    assert not is_marked(special)
+    assert not is_marked(expr)
+    assert not is_marked(root)
+
+
+def test_mark_constants_builtins_unmarked():
+    """Built-in containers that don't take attributes are still constant."""
+    formatter = RecursiveFormatter()
+    inner = {'a': [1, 2], 'b': ('c', 'd')}
+    outer = Dict({'inner': inner})
+    assert formatter.mark_constants(outer)
+    assert is_marked(outer)
+    assert not is_marked(inner)
+
+    out = formatter.vformat(outer, None, {})
+    assert out == outer
+    assert type(out) is Dict
+    assert out is not outer
+    assert out['inner'] is not inner
+    assert out['inner']['a'] is not inner['a']
+
+
+def test_mark_constants_passthrough():
+    """Passthrough types are constant & do not copy."""
+    formatter = RecursiveFormatter(passthrough_types=dict)
+    passthrough = {'a': '{k1}'}
+    outer = List([passthrough])
+    assert formatter.mark_constants(outer)
+    out = formatter.vformat(outer, None, {})
+    assert out[0] is passthrough
+
+
+def test_mark_constants_recursive_reference():
+    """Container referencing itself is not constant."""
+    formatter = RecursiveFormatter()
+    obj = List([1])
+    obj.append(obj)
+    assert not formatter.mark_constants(obj)
+    assert not is_marked(obj)
+
+
+def test_format_constant_copies():
+    """Formatting constant container copies it without formatting."""
+    formatter = RecursiveFormatter(special_types=Special)
+    shared = List(['x', 'y'])
+    const = Dict({'a': shared, 'b': shared, 'c': Dict({'d': 1})})
+    root = List([const, '{k1}'])
+    assert not formatter.mark_constants(root)
+    assert is_marked(const)
+
+    out = formatter.vformat(root, None, {'k1': 'v1'})
+    assert out == [{'a': ['x', 'y'], 'b': ['x', 'y'], 'c': {'d': 1}}, 'v1']
+    new_const = out[0]
+    assert type(new_const) is Dict
+    assert new_const is not const
+    assert new_const['a'] is not shared
+    assert new_const['a'] is new_const['b']
+    assert new_const['c'] is not const['c']
+    # copies don't carry the flag
+    assert not is_marked(new_const)
+
+    # mutating the output doesn't touch the source
+    new_const['a'].append('z')
+    assert shared == ['x', 'y']
+
+
+def test_format_constant_skips_format():
+    """Constant containers don't format their strings."""
+    formatter = RecursiveFormatter()
+    const = List(['a', 'b'])
+    assert formatter.mark_constants(const)
+
+    # expression added after marking does not format
+    const.append('{k1}')
+    assert formatter.vformat(const, None, {'k1': 'v1'}) == ['a', 'b', '{k1}']
+    assert formatter._get_template.cache_info().currsize == 0
+
+
+def test_unmark_constants():
+    """Unmark removes flags all the way down, so mutations format."""
+    formatter = RecursiveFormatter()
+    inner = List(['a'])
+    const = Dict({'inner': inner, 'b': Dict({'c': 1})})
+    root = List([const, '{k1}'])
+    # same object twice & a non-constant parent with constant children.
+    root.append(inner)
+    assert not formatter.mark_constants(root)
+    assert is_marked(const)
+    assert is_marked(inner)
+
+    unmark_constants(root)
+
+    assert not is_marked(const)
+    assert not is_marked(inner)
+    assert not is_marked(const['b'])
+
+    inner.append('{k1}')
+    assert formatter.vformat(const, None, {'k1': 'v1'}) == {
+        'inner': ['a', 'v1'], 'b': {'c': 1}}
+
+
+def test_unmark_constants_copy():
+    """A copy of an unmarked container has no flag either."""
+    formatter = RecursiveFormatter()
+    const = Dict({'a': 'b'})
+    assert formatter.mark_constants(const)
+    # copy.copy copies the flag along with the rest of the attributes.
+    assert is_marked(copy.copy(const))
+
+    unmark_constants(const)
+    duplicate = copy.copy(const)
+    duplicate['c'] = '{k1}'
+    out = formatter.vformat(duplicate, None, {'k1': 'v1'})
+    assert out == {'a': 'b', 'c': 'v1'}
+
+
+def test_unmark_constants_scalars_and_recursion():
+    """Unmark leaves scalars alone & handles recursive references."""
+    unmark_constants('arb')
+    unmark_constants(123)
+    unmark_constants(None)
+
+    obj = List([1])
+    obj.append(obj)
+    unmark_constants(obj)
+    assert not is_marked(obj)
+
+# endregion constant containers
+
 # region RecursiveFormatter.check_used_arguments
 
 
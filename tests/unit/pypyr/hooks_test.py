@@ -0,0 +1,396 @@
+"""hooks.py unit tests."""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+
+from pypyr.context import Context
+from pypyr.errors import ConfigError
+from pypyr.hooks import get_run_hooks, HookEvent, Hooks
+from tests.arbpack.arbhooks import AfterStepOnly, RecordingHooks
+from tests.common.utils import patch_logger
+
+
+def get_step(name='arb', line_no=3):
+    """Get a stand-in for pypyr.dsl.Step."""
+    step = Mock()
+    step.name = name
+    step.line_no = line_no
+    return step
+
+
+# region resolve
+
+
+def test_hooks_disabled_does_nothing():
+    """Scopes are a shared no-op when there are no hooks."""
+    hooks = Hooks()
+    run_hooks = hooks.resolve()
+    assert not run_hooks.enabled
+    assert not run_hooks.observed
+
+    pipeline = Mock()
+    pipeline.name = 'arb'
+    scope = run_hooks.pipeline(pipeline, Context())
+    assert scope is run_hooks.step_group('arb', Context())
+    assert scope is run_hooks.step(get_step(), Context())
+    assert scope is run_hooks.iteration('foreach', 'a', Context())
+
+    with scope:
+        pass
+
+    run_hooks.error(get_step(), Context(), ValueError('arb'), False)
+
+
+def test_hooks_register_applies_on_resolve():
+    """Registered hooks only apply to runs resolved after."""
+    hooks = Hooks()
+    hook = RecordingHooks()
+    before = hooks.resolve()
+    hooks.register(hook)
+    assert not before.enabled
+
+    run_hooks = hooks.resolve()
+    assert run_hooks.enabled
+    assert run_hooks.observed
+
+    hooks.unregister(hook)
+    assert run_hooks.enabled
+
+    assert not hooks.resolve().enabled
+
+
+def test_hooks_resolve_only_methods_that_exist():
+    """Resolve only binds the hook methods the hook has."""
+    hooks = Hooks()
+    hook = AfterStepOnly()
+    hooks.register(hook)
+
+    assert hooks.resolve()._methods == {'after_step': (hook.after_step,)}
+
+
+def test_hooks_resolve_no_methods_disabled():
+    """A hook without any hook methods doesn't enable hooks."""
+    hooks = Hooks()
+    hooks.register(object())
+
+    assert not hooks.resolve().enabled
+
+
+@pytest.mark.parametrize('observer', ['pypyr.hooks.tracer.enabled',
+                                      'pypyr.hooks.profiler.enabled'])
+def test_hooks_resolve_observed_without_hooks(observer):
+    """Tracer or profiler on makes the run observed without hooks."""
+    hooks = Hooks()
+    with patch(observer, True):
+        run_hooks = hooks.resolve()
+
+    assert not run_hooks.enabled
+    assert run_hooks.observed
+
+
+def test_hooks_clear():
+    """Clear removes all hooks."""
+    hooks = Hooks()
+    hooks.register(RecordingHooks())
+    assert hooks.resolve().enabled
+
+    hooks.clear()
+    assert hooks._registered == []
+    assert not hooks.resolve().enabled
+
+
+def test_hooks_registered_only_in_block():
+    """Hooks registered for a block only apply to runs on this thread."""
+    hooks = Hooks()
+    hook = AfterStepOnly()
+
+    with hooks.registered(hook) as registered:
+        assert registered is hook
+        assert hooks.resolve()._methods == {'after_step': (hook.after_step,)}
+
+        with ThreadPoolExecutor() as pool:
+            assert not pool.submit(hooks.resolve).result().enabled
+
+    assert not hooks.resolve().enabled
+
+
+def test_hooks_running_sets_run_hooks():
+    """Running makes the resolved hooks the current run's in the block."""
+    hooks = Hooks()
+    hooks.register(RecordingHooks())
+    outside = get_run_hooks()
+    assert not outside.observed
+
+    with hooks.running() as run_hooks:
+        assert run_hooks.enabled
+        assert get_run_hooks() is run_hooks
+
+        with hooks.running() as inner:
+            assert inner is not run_hooks
+            assert get_run_hooks() is inner
+
+        assert get_run_hooks() is run_hooks
+
+    assert get_run_hooks() is outside
+
+
+def test_hooks_running_runs_at_same_time():
+    """Runs on other threads at the same time keep their own hooks."""
+    hooks = Hooks()
+    hook = RecordingHooks()
+    started = threading.Barrier(2)
+
+    def run(register):
+        if register:
+            with hooks.registered(hook):
+                with hooks.running() as run_hooks:
+                    started.wait()
+                    return get_run_hooks() is run_hooks, run_hooks.enabled
+
+        started.wait()
+        with hooks.running() as run_hooks:
+            return get_run_hooks() is run_hooks, run_hooks.enabled
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        with_hooks = pool.submit(run, True)
+        without_hooks = pool.submit(run, False)
+
+    assert with_hooks.result() == (True, True)
+    assert without_hooks.result() == (True, False)
+
+# endregion resolve
+
+# region config
+
+
+@patch('pypyr.hooks.config.hooks', ['tests.arbpack.arbhooks.RecordingHooks'])
+def test_hooks_resolve_config_class():
+    """Config hook that is a class instantiates once."""
+    hooks = Hooks()
+    assert hooks.resolve().enabled
+
+    hook = hooks._loaded['tests.arbpack.arbhooks.RecordingHooks']
+    assert isinstance(hook, RecordingHooks)
+
+    run_hooks = hooks.resolve()
+    assert hooks._loaded['tests.arbpack.arbhooks.RecordingHooks'] is hook
+    assert run_hooks._methods['after_step'] == (hook.after_step,)
+
+
+def test_hooks_config_hook_instance():
+    """Config hook that is not a class loads as is."""
+    hooks = Hooks()
+    hook = hooks.get_config_hook('tests.arbpack.arbhooks.__doc__')
+    assert hook == "Arbitrary lifecycle hooks for testing."
+
+
+def test_hooks_config_hook_no_dot():
+    """Config hook name without a module raises."""
+    hooks = Hooks()
+    with pytest.raises(ConfigError) as err:
+        hooks.get_config_hook('arb')
+
+    assert str(err.value) == ("hook 'arb' should be in format "
+                              "'package.module.attribute'.")
+
+
+def test_hooks_config_hook_no_attr():
+    """Config hook name that doesn't exist in module raises."""
+    hooks = Hooks()
+    with pytest.raises(ConfigError) as err:
+        hooks.get_config_hook('tests.arbpack.arbhooks.Arb')
+
+    assert str(err.value) == (
+        "hook 'tests.arbpack.arbhooks.Arb' not found: module "
+        "'tests.arbpack.arbhooks' has no attribute 'Arb'.")
+
+# endregion config
+
+# region scopes
+
+
+def get_hooks():
+    """Get resolved RunHooks with a RecordingHooks."""
+    hooks = Hooks()
+    hook = RecordingHooks()
+    hooks.register(hook)
+    return hooks.resolve(), hook
+
+
+def test_hooks_pipeline_scope():
+    """Pipeline scope runs before & after."""
+    hooks, hook = get_hooks()
+    pipeline = Mock()
+    pipeline.name = 'pipe'
+
+    with hooks.pipeline(pipeline, Context()):
+        pass
+
+    assert hook.events == [
+        ('before_pipeline', 'pipeline', 'pipe', None, None, None),
+        ('after_pipeline', 'pipeline', 'pipe', None, None, None)]
+
+
+def test_hooks_step_group_scope():
+    """Step-group scope runs before & after."""
+    hooks, hook = get_hooks()
+
+    with hooks.step_group('sg', Context()):
+        pass
+
+    assert hook.events == [
+        ('before_step_group', 'step-group', 'sg', None, None, None),
+        ('after_step_group', 'step-group', 'sg', None, None, None)]
+
+
+def test_hooks_step_scope_duration():
+    """Step scope runs before & after with the duration."""
+    registry = Hooks()
+    before = Mock()
+    after = Mock()
+    hook = Mock(spec=['before_step', 'after_step'],
+                before_step=before, after_step=after)
+    registry.register(hook)
+    hooks = registry.resolve()
+
+    context = Context()
+    with patch('pypyr.hooks.time.perf_counter', side_effect=[1.0, 3.5]):
+        with hooks.step(get_step('s', 5), context):
+            pass
+
+    event = before.call_args.args[0]
+    assert after.call_args.args[0] is event
+    assert isinstance(event, HookEvent)
+    assert event.kind == 'step'
+    assert event.name == 's'
+    assert event.line_no == 5
+    assert event.context is context
+    assert event.duration == 2.5
+    assert event.exception is None
+    assert event.swallowed is None
+
+
+def test_hooks_step_scope_exception():
+    """Step scope runs after with the exception & does not swallow it."""
+    hooks, hook = get_hooks()
+
+    with pytest.raises(ValueError):
+        with hooks.step(get_step('s', 5), Context()):
+            raise ValueError('arb')
+
+    assert hook.events == [
+        ('before_step', 'step', 's', 5, None, None),
+        ('after_step', 'step', 's', 5, None, 'ValueError')]
+    assert hooks.get_stack() == []
+
+
+def test_hooks_iteration_uses_running_step():
+    """Iteration without a step gets the innermost running step."""
+    hooks, hook = get_hooks()
+
+    with hooks.step(get_step('outer', 1), Context()):
+        with hooks.step(get_step('inner', 2), Context()):
+            with hooks.iteration('while', 1, Context()):
+                pass
+
+    assert hook.events[2:4] == [
+        ('before_iteration', 'while', 'inner', 2, 1, None),
+        ('after_iteration', 'while', 'inner', 2, 1, None)]
+
+
+def test_hooks_iteration_explicit_step():
+    """Iteration with a step uses that step."""
+    hooks, hook = get_hooks()
+
+    with hooks.iteration('foreach', 'a', Context(), get_step('s', 4)):
+        pass
+
+    assert hook.events == [
+        ('before_iteration', 'foreach', 's', 4, 'a', None),
+        ('after_iteration', 'foreach', 's', 4, 'a', None)]
+
+
+def test_hooks_iteration_no_running_step():
+    """Iteration outside a step has no name."""
+    hooks, hook = get_hooks()
+
+    with hooks.iteration('retry', 1, Context()):
+        pass
+
+    assert hook.events == [
+        ('before_iteration', 'retry', None, None, 1, None),
+        ('after_iteration', 'retry', None, None, 1, None)]
+
+
+def test_hooks_error():
+    """Error runs on_error with the exception & swallowed."""
+    hooks, hook = get_hooks()
+    hooks.error(get_step('s', 6), Context(), KeyError('arb'), True)
+
+    assert hook.events == [('on_error', 'step', 's', 6, None, 'KeyError')]
+
+
+def test_hooks_subprocess():
+    """Subprocess runs on_subprocess with the returncode."""
+    registry = Hooks()
+    on_subprocess = Mock()
+    registry.register(Mock(spec=['on_subprocess'],
+                           on_subprocess=on_subprocess))
+    hooks = registry.resolve()
+
+    hooks.subprocess('arb cmd', 3)
+
+    event = on_subprocess.call_args.args[0]
+    assert event.kind == 'subprocess'
+    assert event.name == 'arb cmd'
+    assert event.returncode == 3
+
+
+def test_hooks_reload():
+    """Reload runs on_reload with the path & reason."""
+    registry = Hooks()
+    on_reload = Mock()
+    registry.register(Mock(spec=['on_reload'], on_reload=on_reload))
+    hooks = registry.resolve()
+
+    hooks.reload('/arb/pipe.yaml', 'changed')
+
+    event = on_reload.call_args.args[0]
+    assert event.kind == 'reload'
+    assert event.name == '/arb/pipe.yaml'
+    assert event.reason == 'changed'
+
+
+def test_hooks_reload_disabled():
+    """Reload does nothing without hooks."""
+    hooks = Hooks().resolve()
+    with patch.object(hooks, 'call') as mock_call:
+        hooks.reload('/arb/pipe.yaml', 'changed')
+
+    mock_call.assert_not_called()
+
+
+def test_hooks_error_in_hook_logs_and_continues():
+    """A hook that raises logs an error & the other hooks still run."""
+    registry = Hooks()
+    bad = Mock(spec=['before_step'])
+    bad.before_step.side_effect = ValueError('boom')
+    bad.before_step.__qualname__ = 'Bad.before_step'
+    hook = RecordingHooks()
+    registry.register(bad)
+    registry.register(hook)
+    hooks = registry.resolve()
+
+    with patch_logger('pypyr.hooks', logging.ERROR) as mock_error:
+        with hooks.step(get_step('s', 1), Context()):
+            pass
+
+    mock_error.assert_called_once_with(
+        "hook Bad.before_step failed on step s: boom")
+    assert hook.events == [('before_step', 'step', 's', 1, None, None),
+                           ('after_step', 'step', 's', 1, None, None)]
+
+# endregion scopes
@@ -1,4 +1,5 @@
 """fileloader.py unit tests."""
+import os
 from pathlib import Path
 from unittest.mock import call, mock_open, patch, PropertyMock
 
@@ -6,6 +7,8 @@
 
 import pypyr.cache.admin
 from pypyr.errors import PipelineNotFoundError
+from pypyr.cache.pipelinecache import PipelineCache
+from pypyr.dsl import PyString, SicString
 import pypyr.loaders.file as fileloader
 from pypyr.pipedef import PipelineDefinition, PipelineFileInfo
 
@@ -321,4 +324,59 @@ def test_get_pipeline_definition_file_not_found(mocked_get_path,
     mocked_add_sys_path.assert_not_called()
 
     fileloader.file_cache.clear()
+
+
+def test_load_pipeline_from_file_pipeline_cache(tmp_path):
+    """Pipeline cache loads an unchanged file without parsing it again."""
+    path = tmp_path.joinpath('pipe.yaml')
+    path.write_text("steps:\n"
+                    "  - name: pypyr.steps.set\n"
+                    "    in:\n"
+                    "      set:\n"
+                    "        a: !py 1 + 1\n"
+                    "        b: !sic '{x}'\n")
+    past = path.stat().st_mtime - 60
+    os.utime(path, (past, past))
+
+    cache = PipelineCache(tmp_path.joinpath('cache'))
+    with patch('pypyr.loaders.file.pipeline_cache', cache):
+        with patch('pypyr.config.config.pipeline_cache', True):
+            with patch('pypyr.config.config.no_cache', False):
+                first = fileloader.load_pipeline_from_file(path)
+                with patch('pypyr.yaml.get_pipeline_yaml') as mock_yaml:
+                    second = fileloader.load_pipeline_from_file(path)
+
+    mock_yaml.assert_not_called()
+    assert cache.hits == 1
+    assert second is not first
+    assert second == first
+
+    step = second.pipeline['steps'][0]
+    assert step.lc.line == 1
+    assert step['in']['set']['a'] == PyString('1 + 1')
+    assert step['in']['set']['b'] == SicString('{x}')
+
+
+def test_is_pipeline_current():
+    """Is current asks the file cache about the pipeline's path."""
+    pipeline_definition = PipelineDefinition(
+        pipeline={},
+        info=PipelineFileInfo(pipeline_name='arb',
+                              loader='pypyr.loaders.file',
+                              parent=Path('/arb'),
+                              path=Path('/arb/arb.yaml')))
+
+    with patch('pypyr.loaders.file.file_cache.is_current',
+               return_value=False) as mock_is_current:
+        assert fileloader.is_pipeline_current(pipeline_definition)
+        mock_is_current.assert_not_called()
+
+        with patch('pypyr.config.config.file_cache_revalidate_interval', 1):
+            assert not fileloader.is_pipeline_current(pipeline_definition)
+
+            pipeline_definition.info = None
+            assert fileloader.is_pipeline_current(pipeline_definition)
+
+    mock_is_current.assert_called_once_with(str(Path('/arb/arb.yaml')),
+                                            pipeline_definition)
 # endregion get_pipeline_definition
@@ -0,0 +1,212 @@
+"""memoryreport.py unit tests."""
+import json
+import logging
+from unittest.mock import Mock, patch
+
+import pytest
+
+from pypyr.context import Context
+from pypyr.hooks import _scoped_hooks, HookEvent
+from pypyr.memoryreport import (format_step_label,
+                                get_key_sizes,
+                                MemoryReport,
+                                reporting)
+from tests.common.utils import patch_logger
+
+
+def get_context(pipeline_name='pipe', *args, **kwargs):
+    """Get a context with a current pipeline."""
+    context = Context(*args, **kwargs)
+    context.current_pipeline = Mock()
+    context.current_pipeline.name = pipeline_name
+    return context
+
+
+def get_size(value):
+    """Stand-in for get_deep_size: the len of value."""
+    return len(value)
+
+
+def run_step(memory_report, context, name='s', line_no=3):
+    """Run the after_step hook for step name on context."""
+    memory_report.after_step(HookEvent('step', name, line_no, context))
+
+# region get_key_sizes
+
+
+def test_get_key_sizes_largest_first():
+    """Key sizes are largest first."""
+    context = {'a': 'x', 'b': 'xxx', 'c': 'xx'}
+    with patch('pypyr.memoryreport.get_deep_size', side_effect=get_size):
+        sizes = get_key_sizes(context)
+
+    assert list(sizes.items()) == [('b', 3), ('c', 2), ('a', 1)]
+
+
+def test_get_key_sizes_only_keys():
+    """Key sizes only of the keys asked for."""
+    context = {'a': 'x', 'b': 'xxx', 'c': 'xx'}
+    with patch('pypyr.memoryreport.get_deep_size', side_effect=get_size):
+        sizes = get_key_sizes(context, ['a', 'c'])
+
+    assert sizes == {'c': 2, 'a': 1}
+
+
+def test_get_key_sizes_real():
+    """Key sizes measure deep size."""
+    sizes = get_key_sizes({'small': [1], 'big': list(range(1000))})
+    assert list(sizes) == ['big', 'small']
+    assert sizes['big'] > 1000 * 8
+
+
+def test_format_step_label():
+    """Step label is pipeline/step:line."""
+    assert format_step_label(('pipe', 'arb', 3)) == 'pipe/arb:3'
+
+# endregion get_key_sizes
+
+# region MemoryReport
+
+
+@patch('pypyr.memoryreport.get_deep_size', side_effect=get_size)
+def test_memory_report_steps(mock_size):
+    """Each step records how the keys changed since the previous step."""
+    memory_report = MemoryReport()
+    context = get_context(k1='x')
+    memory_report.before_pipeline(HookEvent('pipeline', 'pipe',
+                                            context=context))
+
+    context['k2'] = 'xxxx'
+    run_step(memory_report, context, 'grow', 1)
+
+    context['k1'] = 'xx'
+    del context['k2']
+    run_step(memory_report, context, 'shrink', 2)
+
+    context['k2'] = 'xx'
+    run_step(memory_report, context, 'grow', 1)
+
+    memory_report.after_pipeline(HookEvent('pipeline', 'pipe',
+                                           context=context))
+    assert memory_report._last == {}
+    assert memory_report._users == {}
+
+    assert memory_report.get_report() == {
+        'keys': [{'key': 'k2',
+                  'peak_bytes': 4,
+                  'peak_step': 'pipe/grow:1',
+                  'last_bytes': 2},
+                 {'key': 'k1',
+                  'peak_bytes': 2,
+                  'peak_step': 'pipe/shrink:2',
+                  'last_bytes': 2}],
+        'steps': [{'pipeline': 'pipe',
+                   'step': 'grow',
+                   'line': 1,
+                   'runs': 2,
+                   'growth_bytes': 6,
+                   'keys': {'k2': 6}},
+                  {'pipeline': 'pipe',
+                   'step': 'shrink',
+                   'line': 2,
+                   'runs': 1,
+                   'growth_bytes': -3,
+                   'keys': {'k1': 1, 'k2': -4}}]}
+
+
+@patch('pypyr.memoryreport.get_deep_size', side_effect=get_size)
+def test_memory_report_shared_context(mock_size):
+    """A child pipeline on the same context keeps the parent's baseline."""
+    memory_report = MemoryReport()
+    context = get_context(k1='x')
+    parent = HookEvent('pipeline', 'pipe', context=context)
+    child = HookEvent('pipeline', 'child', context=context)
+
+    memory_report.before_pipeline(parent)
+    memory_report.before_pipeline(child)
+    context['k1'] = 'xxx'
+    memory_report.after_pipeline(child)
+
+    assert memory_report._last == {id(context): {'k1': 1}}
+
+    run_step(memory_report, context)
+    memory_report.after_pipeline(parent)
+
+    assert memory_report.get_report()['steps'][0]['keys'] == {'k1': 2}
+    assert memory_report._last == {}
+
+
+@patch('pypyr.memoryreport.get_deep_size', side_effect=get_size)
+def test_memory_report_log_summary(mock_size):
+    """Summary logs the top keys & the steps that grew."""
+    memory_report = MemoryReport(top=1)
+    context = get_context()
+    context['k1'] = 'x'
+    run_step(memory_report, context, 'a', 1)
+    context['k2'] = 'xx'
+    run_step(memory_report, context, 'b', 2)
+    context['k2'] = ''
+    run_step(memory_report, context, 'c', 3)
+
+    with patch_logger('pypyr.memoryreport', logging.NOTIFY) as mock_notify:
+        memory_report.log_summary(memory_report.get_report())
+
+    mock_notify.assert_called_once_with(
+        'largest context keys:\n'
+        '  k2: peak 2 bytes after pipe/b:2, 0 bytes at end.\n'
+        'steps that grew the context most:\n'
+        '  pipe/b:2: +2 bytes over 1 runs (k2 +2).')
+
+
+def test_memory_report_no_context():
+    """Events without context do nothing."""
+    memory_report = MemoryReport()
+    memory_report.before_pipeline(HookEvent('pipeline', 'pipe'))
+    memory_report.after_step(HookEvent('step', 's'))
+    memory_report.after_pipeline(HookEvent('pipeline', 'pipe'))
+
+    assert memory_report.get_report() == {'keys': [], 'steps': []}
+
+
+def test_memory_report_save(tmp_path):
+    """Save writes the report as json & creates parent dirs."""
+    memory_report = MemoryReport()
+    run_step(memory_report, get_context(k1='x'))
+
+    path = tmp_path.joinpath('sub', 'mem.json')
+    report = memory_report.save(path)
+
+    assert json.loads(path.read_text()) == report
+    assert report['keys'][0]['key'] == 'k1'
+    assert list(path.parent.iterdir()) == [path]
+
+
+def test_memory_report_save_err_no_temp(tmp_path):
+    """Save that fails removes its temp file."""
+    memory_report = MemoryReport()
+    path = tmp_path.joinpath('mem.json')
+
+    with patch('pypyr.memoryreport.os.replace', side_effect=OSError('arb')):
+        with pytest.raises(OSError):
+            memory_report.save(path)
+
+    assert list(tmp_path.iterdir()) == []
+
+# endregion MemoryReport
+
+# region reporting
+
+
+def test_reporting_registers_and_saves(tmp_path):
+    """Reporting registers the hook for runs in the block & saves on exit."""
+    path = tmp_path.joinpath('mem.json')
+
+    with pytest.raises(ValueError):
+        with reporting(path) as memory_report:
+            assert memory_report in _scoped_hooks.get()
+            raise ValueError('arb')
+
+    assert memory_report not in _scoped_hooks.get()
+    assert json.loads(path.read_text()) == {'keys': [], 'steps': []}
+
+# endregion reporting
@@ -0,0 +1,185 @@
+"""metrics.py unit tests."""
+import logging
+import os
+from unittest.mock import Mock, patch
+
+import pytest
+
+from pypyr.context import Context
+from pypyr.hooks import _scoped_hooks, HookEvent
+from pypyr.metrics import (collecting,
+                           escape_label_value,
+                           format_labels,
+                           Metrics)
+from tests.common.utils import patch_logger
+
+
+def get_context(pipeline_name='pipe'):
+    """Get a context with a current pipeline."""
+    context = Context()
+    context.current_pipeline = Mock()
+    context.current_pipeline.name = pipeline_name
+    return context
+
+
+def get_step_event(kind='step', duration=None, iteration=None,
+                   swallowed=None):
+    """Get a hook event for step s on line 3 of pipe."""
+    event = HookEvent(kind, 's', 3, get_context(), iteration=iteration,
+                      swallowed=swallowed)
+    event.duration = duration
+    return event
+
+# region labels
+
+
+def test_format_labels():
+    """Labels format as name="value" pairs, with None as empty."""
+    assert format_labels(()) == ''
+    assert format_labels((('a', 'b'),)) == '{a="b"}'
+    assert format_labels((('a', 1), ('b', None))) == '{a="1",b=""}'
+
+
+def test_escape_label_value():
+    """Backslash, double-quote & line feed escape."""
+    assert escape_label_value('a\\b"c\nd') == 'a\\\\b\\"c\\nd'
+
+# endregion labels
+
+# region collect
+
+
+def test_metrics_pipeline_histogram():
+    """Pipeline durations observe into cumulative buckets."""
+    metrics = Metrics(buckets=(1.0, 5.0))
+    for duration in (0.5, 2, 10):
+        event = HookEvent('pipeline', 'pipe')
+        event.duration = duration
+        metrics.after_pipeline(event)
+
+    assert metrics.get_text() == (
+        '# HELP pypyr_pipeline_duration_seconds Wall-clock seconds each '
+        'pipeline took.\n'
+        '# TYPE pypyr_pipeline_duration_seconds histogram\n'
+        'pypyr_pipeline_duration_seconds_bucket{pipeline="pipe",le="1.0"} 1\n'
+        'pypyr_pipeline_duration_seconds_bucket{pipeline="pipe",le="5.0"} 2\n'
+        'pypyr_pipeline_duration_seconds_bucket{pipeline="pipe",le="+Inf"} '
+        '3\n'
+        'pypyr_pipeline_duration_seconds_sum{pipeline="pipe"} 12.5\n'
+        'pypyr_pipeline_duration_seconds_count{pipeline="pipe"} 3\n')
+
+
+def test_metrics_step_counters():
+    """Steps observe durations & count iterations, retries & swallows."""
+    metrics = Metrics(buckets=(1.0,))
+    metrics.after_step(get_step_event(duration=0.25))
+    metrics.after_iteration(get_step_event('foreach', iteration='a'))
+    metrics.after_iteration(get_step_event('foreach', iteration='b'))
+    metrics.after_iteration(get_step_event('while', iteration=1))
+    metrics.after_iteration(get_step_event('retry', iteration=1))
+    metrics.after_iteration(get_step_event('retry', iteration=2))
+    metrics.after_iteration(get_step_event('retry', iteration=3))
+    metrics.on_error(get_step_event(swallowed=False))
+    metrics.on_error(get_step_event(swallowed=True))
+
+    labels = 'pipeline="pipe",step="s",line="3"'
+    assert metrics.get_text() == (
+        '# HELP pypyr_step_duration_seconds Wall-clock seconds each step '
+        'took.\n'
+        '# TYPE pypyr_step_duration_seconds histogram\n'
+        f'pypyr_step_duration_seconds_bucket{{{labels},le="1.0"}} 1\n'
+        f'pypyr_step_duration_seconds_bucket{{{labels},le="+Inf"}} 1\n'
+        f'pypyr_step_duration_seconds_sum{{{labels}}} 0.25\n'
+        f'pypyr_step_duration_seconds_count{{{labels}}} 1\n'
+        '# HELP pypyr_step_iterations_total Foreach & while iterations of '
+        'each step.\n'
+        '# TYPE pypyr_step_iterations_total counter\n'
+        f'pypyr_step_iterations_total{{{labels},kind="foreach"}} 2\n'
+        f'pypyr_step_iterations_total{{{labels},kind="while"}} 1\n'
+        '# HELP pypyr_step_retries_total Retry decorator re-runs of each '
+        'step.\n'
+        '# TYPE pypyr_step_retries_total counter\n'
+        f'pypyr_step_retries_total{{{labels}}} 2\n'
+        '# HELP pypyr_step_swallowed_errors_total Errors the swallow '
+        'decorator ignored in each step.\n'
+        '# TYPE pypyr_step_swallowed_errors_total counter\n'
+        f'pypyr_step_swallowed_errors_total{{{labels}}} 1\n')
+
+
+def test_metrics_step_no_pipeline():
+    """Step without a current pipeline has an empty pipeline label."""
+    metrics = Metrics()
+    metrics.after_iteration(HookEvent('while', 's', 3, Context(),
+                                      iteration=1))
+
+    assert ('pypyr_step_iterations_total{pipeline="",step="s",line="3",'
+            'kind="while"} 1\n') in metrics.get_text()
+
+
+def test_metrics_subprocess():
+    """Subprocesses count by exit code."""
+    metrics = Metrics()
+    metrics.on_subprocess(HookEvent('subprocess', 'a', returncode=0))
+    metrics.on_subprocess(HookEvent('subprocess', 'b', returncode=0))
+    metrics.on_subprocess(HookEvent('subprocess', 'c', returncode=2))
+
+    assert metrics.get_text() == (
+        '# HELP pypyr_subprocesses_total Subprocesses that finished, by exit '
+        'code.\n'
+        '# TYPE pypyr_subprocesses_total counter\n'
+        'pypyr_subprocesses_total{exit_code="0"} 2\n'
+        'pypyr_subprocesses_total{exit_code="2"} 1\n')
+
+
+def test_metrics_empty():
+    """Nothing collected is empty text."""
+    assert Metrics().get_text() == ''
+
+# endregion collect
+
+# region save
+
+
+def test_metrics_save(tmp_path):
+    """Save writes the text to path & readable by others."""
+    metrics = Metrics()
+    metrics.on_subprocess(HookEvent('subprocess', 'a', returncode=0))
+    path = tmp_path.joinpath('sub', 'out.prom')
+
+    metrics.save(path)
+
+    assert path.read_text() == metrics.get_text()
+    assert list(path.parent.iterdir()) == [path]
+    if os.name == 'posix':
+        assert path.stat().st_mode & 0o777 == 0o644
+
+
+def test_metrics_save_error_removes_temp(tmp_path):
+    """Save that fails leaves no temp file & doesn't touch path."""
+    path = tmp_path.joinpath('out.prom')
+    path.write_text('old')
+
+    with patch('pypyr.metrics.os.replace', side_effect=OSError('arb')):
+        with pytest.raises(OSError):
+            Metrics().save(path)
+
+    assert path.read_text() == 'old'
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_collecting(tmp_path):
+    """Collecting registers the hooks for runs in the block & saves on exit."""
+    path = tmp_path.joinpath('out.prom')
+    with patch_logger('pypyr.metrics', logging.NOTIFY) as mock_notify:
+        with pytest.raises(ValueError):
+            with collecting(path) as metrics:
+                assert metrics in _scoped_hooks.get()
+                metrics.on_subprocess(HookEvent('subprocess', 'a',
+                                                returncode=1))
+                raise ValueError('arb')
+
+    assert metrics not in _scoped_hooks.get()
+    assert 'pypyr_subprocesses_total{exit_code="1"} 1\n' in path.read_text()
+    mock_notify.assert_called_once_with(f"saved metrics to {path}")
+
+# endregion save
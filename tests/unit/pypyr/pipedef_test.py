@@ -12,6 +12,13 @@ def test_pipelinedefinition_eq():
             != PipelineDefinition(pipeline='pipe2', info='info2'))
     assert PipelineDefinition(pipeline='pipe', info='info') != 1
 
+
+def test_pipelinedefinition_eq_ignores_compiled_step_groups():
+    """Compiled step-group cache doesn't affect equality."""
+    pipe_def = PipelineDefinition(pipeline='pipe', info='info')
+    pipe_def.compiled_step_groups['steps'] = 'arb'
+    assert pipe_def == PipelineDefinition(pipeline='pipe', info='info')
+
 # endregion PipelineDefinition
 
 # region PipelineInfo
@@ -338,12 +338,14 @@ def test_load_and_run_pipeline_pass_minimal(
 
     mock_steps_runner.assert_called_once_with(
         pipeline_body={'arb': 'pipe'},
-        context=context_instance)
+        context=context_instance,
+        compiled_step_groups={})
     # No called steps
     sr = mock_steps_runner.return_value
     sr.run_step_groups.assert_called_once_with(groups=['steps'],
                                                success_group='on_success',
-                                               failure_group='on_failure')
+                                               failure_group='on_failure',
+                                               parallel=False)
     sr.run_failure_step_group.assert_not_called()
 
 
@@ -376,12 +378,14 @@ def test_load_and_run_pipeline_pass_skip_parse_context(
 
     mock_steps_runner.assert_called_once_with(
         pipeline_body={'arb': 'pipe'},
-        context=context)
+        context=context,
+        compiled_step_groups={})
     # No called steps, just on_failure since err on parse context already
     sr = mock_steps_runner.return_value
     sr.run_step_groups.assert_called_once_with(groups=['steps'],
                                                success_group='on_success',
-                                               failure_group='on_failure')
+                                               failure_group='on_failure',
+                                               parallel=False)
     sr.run_failure_step_group.assert_not_called()
 
 
@@ -420,7 +424,8 @@ def test_load_and_run_pipeline_parse_context_error(
 
     mock_steps_runner.assert_called_once_with(
         pipeline_body=pipe_def.pipeline,
-        context=context)
+        context=context,
+        compiled_step_groups={})
     # No called steps, just on_failure since err on parse context already
     sr = mock_steps_runner.return_value
     sr.run_step_groups.assert_not_called()
@@ -468,11 +473,13 @@ def test_load_and_run_pipeline_steps_error_raises(
     mock_steps_runner.return_value.run_step_groups.assert_called_once_with(
         groups=['steps'],
         success_group='on_success',
-        failure_group='on_failure'
+        failure_group='on_failure',
+        parallel=False
     )
     mock_steps_runner.assert_called_once_with(
         pipeline_body=pipe_def.pipeline,
-        context=context)
+        context=context,
+        compiled_step_groups={})
 
 
 @patch('pypyr.pipeline.StepsRunner', autospec=True)
@@ -509,13 +516,15 @@ def test_load_and_run_pipeline_with_existing_context_pass(
     mock_steps_runner.return_value.run_step_groups.assert_called_once_with(
         groups=['steps'],
         success_group='on_success',
-        failure_group='on_failure'
+        failure_group='on_failure',
+        parallel=False
     )
     mock_steps_runner.assert_called_once_with(
         pipeline_body={'context_parser': 'arb parser'},
         context={'1': 'context 1',
                  '2': 'context2',
-                 '3': 'new'})
+                 '3': 'new'},
+        compiled_step_groups={})
 
 
 @patch('pypyr.pipeline.StepsRunner', autospec=True)
@@ -554,12 +563,14 @@ def test_load_and_run_pipeline_with_dir_specified(
     mock_steps_runner.return_value.run_step_groups.assert_called_once_with(
         groups=['steps'],
         success_group='on_success',
-        failure_group='on_failure'
+        failure_group='on_failure',
+        parallel=False
     )
     mock_steps_runner.assert_called_once_with(pipeline_body=pipe_yaml,
                                               context={'1': 'context 1',
                                                        '2': 'context2',
-                                                       '3': 'new'})
+                                                       '3': 'new'},
+                                              compiled_step_groups={})
 
 
 @patch('pypyr.pipeline.StepsRunner', autospec=True)
@@ -599,11 +610,36 @@ def test_load_and_run_pipeline_with_group_specified(
     mock_steps_runner.return_value.run_step_groups.assert_called_once_with(
         groups=['arb1', 'arb2'],
         success_group=None,
-        failure_group=None
+        failure_group=None,
+        parallel=False
     )
     mock_steps_runner.assert_called_once_with(pipeline_body=pipe_yaml,
                                               context={'2': 'original',
-                                                       '3': 'new'})
+                                                       '3': 'new'},
+                                              compiled_step_groups={})
+
+
+@patch('pypyr.pipeline.StepsRunner', autospec=True)
+@patch('pypyr.cache.loadercache.Loader.get_pipeline')
+def test_load_and_run_pipeline_with_parallel_groups(mock_get_pipe,
+                                                    mock_steps_runner):
+    """Run pipeline with parallel groups."""
+    pipe_yaml = {'arb': 'pipe'}
+    mock_get_pipe.return_value = get_pipe_def(pipe_yaml)
+
+    pipeline = Pipeline('arb pipe',
+                        groups=['arb1', 'arb2'],
+                        parallel_groups=True)
+
+    assert pipeline.parallel_groups
+    pipeline.load_and_run_pipeline(Context())
+
+    mock_steps_runner.return_value.run_step_groups.assert_called_once_with(
+        groups=['arb1', 'arb2'],
+        success_group=None,
+        failure_group=None,
+        parallel=True
+    )
 
 
 @patch('pypyr.pipeline.StepsRunner', autospec=True)
@@ -641,11 +677,13 @@ def test_load_and_run_pipeline_with_parent_specified(
     mock_steps_runner.return_value.run_step_groups.assert_called_once_with(
         groups=['steps'],
         success_group='on_success',
-        failure_group='on_failure'
+        failure_group='on_failure',
+        parallel=False
     )
     mock_steps_runner.assert_called_once_with(pipeline_body=pipe_yaml,
                                               context={'2': 'original',
-                                                       '3': 'new'})
+                                                       '3': 'new'},
+                                              compiled_step_groups={})
 
 
 @patch('pypyr.pipeline.StepsRunner', autospec=True)
@@ -686,12 +724,14 @@ def test_load_and_run_pipeline_with_success_group_specified(
     mock_steps_runner.return_value.run_step_groups.assert_called_once_with(
         groups=['steps'],
         success_group='arb1',
-        failure_group=None
+        failure_group=None,
+        parallel=False
     )
     mock_steps_runner.assert_called_once_with(pipeline_body=pipe_yaml,
                                               context={'1': 'context 1',
                                                        '2': 'context2',
-                                                       '3': 'new'})
+                                                       '3': 'new'},
+                                              compiled_step_groups={})
 
 
 @patch('pypyr.pipeline.StepsRunner', autospec=True)
@@ -732,12 +772,14 @@ def test_load_and_run_pipeline_with_failure_group_specified(
     mock_steps_runner.return_value.run_step_groups.assert_called_once_with(
         groups=['steps'],
         success_group=None,
-        failure_group='arb1'
+        failure_group='arb1',
+        parallel=False
     )
     mock_steps_runner.assert_called_once_with(pipeline_body=pipe_yaml,
                                               context={'1': 'context 1',
                                                        '2': 'context2',
-                                                       '3': 'new'})
+                                                       '3': 'new'},
+                                              compiled_step_groups={})
 
 
 @patch('pypyr.pipeline.StepsRunner', autospec=True)
@@ -779,12 +821,14 @@ def test_load_and_run_pipeline_with_group_and_failure_group_specified(
     mock_steps_runner.return_value.run_step_groups.assert_called_once_with(
         groups=['arb1'],
         success_group=None,
-        failure_group='arb2'
+        failure_group='arb2',
+        parallel=False
     )
     mock_steps_runner.assert_called_once_with(pipeline_body=pipe_yaml,
                                               context={'1': 'context 1',
                                                        '2': 'context2',
-                                                       '3': 'new'})
+                                                       '3': 'new'},
+                                              compiled_step_groups={})
 
 
 @patch('pypyr.pipeline.StepsRunner', autospec=True)
@@ -826,7 +870,8 @@ def test_run_pipeline_parse_context_error_failure(
 
     mock_steps_runner.assert_called_once_with(pipeline_body=pipe_yaml,
                                               context={'2': 'original',
-                                                       '3': 'new'})
+                                                       '3': 'new'},
+                                              compiled_step_groups={})
     # No called steps, just on_failure since err on parse context already
     sr = mock_steps_runner.return_value
     sr.run_step_groups.assert_not_called()
@@ -869,7 +914,8 @@ def test_run_pipeline_parse_context_error_failure_stop(
     parser.assert_called_once_with('arb context input')
 
     mock_steps_runner.assert_called_once_with(pipeline_body=pipe_yaml,
-                                              context={})
+                                              context={},
+                                              compiled_step_groups={})
 
     # No called steps, just on_failure since err on parse context already
     sr.run_step_groups.assert_not_called()
@@ -914,7 +960,8 @@ def test_run_pipeline_parse_context_error_failure_stopstepgroup(
     parser.assert_called_once_with('arb context input')
 
     mock_steps_runner.assert_called_once_with(pipeline_body=pipe_yaml,
-                                              context={})
+                                              context={},
+                                              compiled_step_groups={})
 
     # No called steps, just on_failure since err on parse context already
     sr.run_step_groups.assert_not_called()
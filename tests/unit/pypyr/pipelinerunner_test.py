@@ -1,6 +1,6 @@
 """pipelinerunner.py unit tests."""
 from pathlib import Path
-from unittest.mock import Mock
+from unittest.mock import call, Mock, patch
 
 import pytest
 
@@ -72,7 +72,8 @@ def test_run_all(mock_pipe):
         success_group='sg',
         failure_group='fg',
         loader='arb loader',
-        py_dir='arb/dir'
+        py_dir='arb/dir',
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with(out)
@@ -94,7 +95,8 @@ def test_run_minimal(mock_pipe):
         success_group=None,
         failure_group=None,
         loader=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with(out)
@@ -116,7 +118,8 @@ def test_run_no_parse_when_dict_and_no_args_in(mock_pipe):
         success_group=None,
         failure_group=None,
         loader=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with({'a': 'b'})
@@ -138,7 +141,8 @@ def test_run_parse_when_dict_and_args_in(mock_pipe):
         success_group=None,
         failure_group=None,
         loader=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with({'a': 'b'})
@@ -160,7 +164,8 @@ def test_run_parse_when_no_dict_and_args_in(mock_pipe):
         success_group=None,
         failure_group=None,
         loader=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with({})
@@ -182,7 +187,8 @@ def test_run_parse_when_no_dict_and_no_args_in(mock_pipe):
         success_group=None,
         failure_group=None,
         loader=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with({})
@@ -204,7 +210,8 @@ def test_run_parse_when_parse_args_true(mock_pipe):
         success_group=None,
         failure_group=None,
         loader=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with({'a': 'b'})
@@ -226,7 +233,8 @@ def test_no_parse_when_parse_args_false(mock_pipe):
         success_group=None,
         failure_group=None,
         loader=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with({})
@@ -251,11 +259,34 @@ def test_run_raises(mock_pipe):
         success_group=None,
         failure_group=None,
         loader=None,
-        py_dir='arb/dir'
+        py_dir='arb/dir',
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with({})
 
+
+def test_run_trace(mock_pipe):
+    """Run with trace_path traces the pipeline run."""
+    with patch('pypyr.trace.tracing') as mock_tracing:
+        out = run('arb pipe', trace_path='arb/trace.json')
+
+    mock_tracing.assert_called_once_with('arb/trace.json')
+    mock_tracing.return_value.__enter__.assert_called_once()
+    mock_pipe.return_value.run.assert_called_once_with(out)
+
+
+def test_run_profile(mock_pipe):
+    """Run with profile or profile_path profiles the pipeline run."""
+    with patch('pypyr.profiler.profiling') as mock_profiling:
+        run('arb pipe', profile=True)
+        run('arb pipe', profile_path='arb/out.pstats')
+
+    assert mock_profiling.call_args_list == [call(None),
+                                             call('arb/out.pstats')]
+    assert mock_profiling.return_value.__enter__.call_count == 2
+    assert mock_pipe.return_value.run.call_count == 2
+
 # endregion run
 
 # region shortcuts
@@ -289,7 +320,8 @@ def test_run_shortcut_not_found(mock_pipe, monkeypatch):
         success_group='sg',
         failure_group='fg',
         loader='arb loader',
-        py_dir='arb/dir'
+        py_dir='arb/dir',
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with(out)
@@ -310,7 +342,8 @@ def test_run_shortcut_all(mock_pipe, monkeypatch):
         'success': 'sc sg',
         'failure': 'sc fg',
         'loader': 'sc loader',
-        'py_dir': 'sc/dir'
+        'py_dir': 'sc/dir',
+        'parallel': True
     }}
 
     monkeypatch.setattr('pypyr.config.config.shortcuts', shortcuts)
@@ -328,7 +361,8 @@ def test_run_shortcut_all(mock_pipe, monkeypatch):
         success_group='sc sg',
         failure_group='sc fg',
         loader='sc loader',
-        py_dir=Path('sc/dir')
+        py_dir=Path('sc/dir'),
+        parallel_groups=True
     )
 
     mock_pipe.return_value.run.assert_called_once_with(out)
@@ -343,7 +377,8 @@ def test_run_shortcut_all(mock_pipe, monkeypatch):
         'success': 'sc sg',
         'failure': 'sc fg',
         'loader': 'sc loader',
-        'py_dir': 'sc/dir'
+        'py_dir': 'sc/dir',
+        'parallel': True
     }}
 
 
@@ -384,7 +419,8 @@ def test_run_shortcut_all_ignore_func_args(mock_pipe, monkeypatch):
         success_group='sc sg',
         failure_group='sc fg',
         loader='sc loader',
-        py_dir=Path('sc/dir')
+        py_dir=Path('sc/dir'),
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with(out)
@@ -432,7 +468,8 @@ def test_run_shortcut_minimal_fallback_func_args(mock_pipe, monkeypatch):
         success_group='sg',
         failure_group='fg',
         loader='arb loader',
-        py_dir='arb/dir'
+        py_dir='arb/dir',
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with(out)
@@ -463,7 +500,8 @@ def test_run_shortcut_minimal(mock_pipe, monkeypatch):
         success_group=None,
         failure_group=None,
         loader=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with(out)
@@ -496,7 +534,8 @@ def test_run_shortcut_parse_args(mock_pipe, monkeypatch):
         success_group=None,
         failure_group=None,
         loader=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with(out)
@@ -529,7 +568,8 @@ def test_run_shortcut_skip_parse(mock_pipe, monkeypatch):
         success_group=None,
         failure_group=None,
         loader=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with(out)
@@ -563,7 +603,8 @@ def test_run_shortcut_groups_str(mock_pipe, monkeypatch):
         success_group=None,
         failure_group=None,
         loader=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mock_pipe.return_value.run.assert_called_once_with(out)
@@ -0,0 +1,218 @@
+"""profiler.py unit tests."""
+import logging
+import pstats
+from unittest.mock import Mock, patch
+
+from pypyr.context import Context
+from pypyr.profiler import profiling, StepProfiler, StepStats
+import pypyr.profiler
+from tests.common.utils import patch_logger
+
+
+def get_step(name, line_no=None):
+    """Get a stand-in for a Step."""
+    step = Mock()
+    step.name = name
+    step.line_no = line_no
+    return step
+
+
+def get_context(pipeline_name=None):
+    """Get context in the scope of pipeline_name."""
+    context = Context()
+    if pipeline_name:
+        context.current_pipeline = Mock()
+        context.current_pipeline.name = pipeline_name
+
+    return context
+
+# region StepStats
+
+
+def test_step_stats_location():
+    """Location shows as much as is known about where the step is."""
+    assert StepStats(None, None, 'arb').location == 'arb'
+    assert StepStats('pipe', None, 'arb').location == 'pipe arb'
+    assert StepStats('pipe', 3, 'arb').location == 'pipe:3 arb'
+
+# endregion StepStats
+
+# region StepProfiler
+
+
+def test_profiler_disabled_does_nothing():
+    """Step & module are a shared no-op when profiler is off."""
+    profiler = StepProfiler()
+    scope = profiler.step(get_step('arb'), get_context())
+    assert scope is profiler.module()
+
+    with scope:
+        pass
+
+    assert profiler.get_stats() == []
+
+
+def test_profiler_step_self_and_module():
+    """Nested steps subtract from self time & module time."""
+    profiler = StepProfiler()
+    profiler.start()
+    context = get_context('pipe')
+
+    # outer:  0 -> 10, module 1 -> 9
+    # inner:  3 -> 7,  module 4 -> 5
+    times = [0, 1, 3, 4, 5, 7, 9, 10]
+    with patch('pypyr.profiler.time.thread_time', side_effect=times):
+        with profiler.step(get_step('outer', 1), context):
+            with profiler.module():
+                with profiler.step(get_step('inner', 5), context):
+                    with profiler.module():
+                        pass
+
+    profiler.stop()
+    outer, inner = sorted(profiler.get_stats(), key=lambda s: s.name,
+                          reverse=True)
+
+    assert outer.location == 'pipe:1 outer'
+    assert outer.calls == 1
+    assert outer.cumulative == 10
+    assert outer.self_time == 6
+    assert outer.module == 4
+
+    assert inner.location == 'pipe:5 inner'
+    assert inner.calls == 1
+    assert inner.cumulative == 4
+    assert inner.self_time == 4
+    assert inner.module == 1
+
+    assert profiler.get_stack() == []
+
+
+def test_profiler_accumulates_calls():
+    """Same step adds up over runs, even when it raises."""
+    profiler = StepProfiler()
+    profiler.start()
+    step = get_step('arb', 2)
+
+    with patch('pypyr.profiler.time.thread_time',
+               side_effect=[0, 1, 10, 13]):
+        with profiler.step(step, get_context()):
+            pass
+
+        try:
+            with profiler.step(step, get_context()):
+                raise ValueError('arb')
+        except ValueError:
+            pass
+
+    [stats] = profiler.get_stats()
+    assert stats.location == 'arb'
+    assert stats.calls == 2
+    assert stats.cumulative == 4
+    assert stats.self_time == 4
+    assert stats.module == 0
+
+
+def test_profiler_module_outside_step():
+    """Module without a running step on this thread tallies nothing."""
+    profiler = StepProfiler()
+    profiler.start()
+    with profiler.module():
+        pass
+
+    assert profiler.get_stats() == []
+
+
+def test_profiler_report():
+    """Report tables sort by cumulative & self time."""
+    profiler = StepProfiler()
+    profiler.start()
+    profiler.add(('pipe', 1, 'a'), 5, 1, 0.5)
+    profiler.add(('pipe', 2, 'b'), 3, 3, 2)
+    profiler.add(('pipe', 3, 'c'), 1, 0.5, 0.25)
+
+    assert profiler.get_report(top=2) == (
+        "profile: top 2 steps by cumulative cpu time\n"
+        " cumulative       self     module   calls  step\n"
+        "     5.000s     1.000s     0.500s       1  pipe:1 a\n"
+        "     3.000s     3.000s     2.000s       1  pipe:2 b\n"
+        "\n"
+        "profile: top 2 steps by self cpu time\n"
+        " cumulative       self     module   calls  step\n"
+        "     3.000s     3.000s     2.000s       1  pipe:2 b\n"
+        "     5.000s     1.000s     0.500s       1  pipe:1 a")
+
+
+def test_profiler_report_empty():
+    """Report says when nothing ran."""
+    assert StepProfiler().get_report() == "profile: no steps ran."
+
+
+def test_profiler_start_discards_previous():
+    """Start begins a fresh tally."""
+    profiler = StepProfiler()
+    profiler.add(('pipe', 1, 'a'), 5, 1, 0.5)
+    profiler.start()
+    assert profiler.get_stats() == []
+
+# endregion StepProfiler
+
+# region profiling
+
+
+def test_profiling_reports(tmp_path):
+    """Profiling logs the report & saves raw stats."""
+    profiler = StepProfiler()
+    stats_path = tmp_path.joinpath('out.pstats')
+
+    with patch('pypyr.profiler.profiler', profiler):
+        with patch_logger('pypyr.profiler', logging.NOTIFY) as mock_notify:
+            with profiling(stats_path, top=5):
+                assert profiler.enabled
+                with profiler.step(get_step('arb', 1), get_context('pipe')):
+                    sum(range(1000))
+
+    assert not profiler.enabled
+    assert mock_notify.call_count == 2
+    report = mock_notify.call_args_list[0].args[0]
+    assert report.startswith("profile: top 1 steps by cumulative cpu time\n")
+    assert report.endswith("       1  pipe:1 arb")
+    mock_notify.assert_called_with(f"saved profile stats to {stats_path}")
+
+    stats = pstats.Stats(str(stats_path))
+    assert stats.total_calls > 0
+
+
+@patch('pypyr.profiler.cProfile.Profile')
+def test_profiling_no_stats_path(mock_profile):
+    """Profiling without stats path only logs the report, sans cProfile."""
+    profiler = StepProfiler()
+
+    with patch('pypyr.profiler.profiler', profiler):
+        with patch_logger('pypyr.profiler', logging.NOTIFY) as mock_notify:
+            with profiling():
+                pass
+
+    mock_notify.assert_called_once_with("profile: no steps ran.")
+    mock_profile.assert_not_called()
+
+
+def test_profiling_nested():
+    """Nested profiling leaves the outer profile to report."""
+    profiler = StepProfiler()
+
+    with patch('pypyr.profiler.profiler', profiler):
+        with patch_logger('pypyr.profiler', logging.NOTIFY) as mock_notify:
+            with profiling():
+                with profiling():
+                    assert profiler.enabled
+
+                assert profiler.enabled
+
+    mock_notify.assert_called_once_with("profile: no steps ran.")
+
+
+def test_global_profiler_off_by_default():
+    """The global profiler is disabled until something starts it."""
+    assert not pypyr.profiler.profiler.enabled
+
+# endregion profiling
@@ -0,0 +1,137 @@
+"""progress.py unit tests."""
+import logging
+from unittest.mock import patch
+
+from pypyr.progress import (format_duration,
+                            get_loop_progress,
+                            get_total,
+                            LoopProgress)
+from tests.common.utils import patch_logger
+
+
+def get_progress(total, times, interval=10):
+    """Get LoopProgress where perf_counter returns times in order."""
+    with patch('pypyr.progress.time.perf_counter', side_effect=times[:1]):
+        return LoopProgress('foreach', 'arb', total, interval)
+
+# region get_loop_progress
+
+
+@patch('pypyr.progress.config.loop_progress_interval', 5)
+def test_get_loop_progress():
+    """Interval from config makes a LoopProgress."""
+    progress = get_loop_progress('while', 'arb', 3)
+
+    assert isinstance(progress, LoopProgress)
+    assert progress.kind == 'while'
+    assert progress.name == 'arb'
+    assert progress.total == 3
+    assert progress.interval == 5
+
+
+@patch('pypyr.progress.config.loop_progress_interval', None)
+def test_get_loop_progress_off():
+    """No interval is a shared do-nothing progress."""
+    progress = get_loop_progress('foreach', 'arb')
+    assert progress is get_loop_progress('while', 'arb2', 3)
+    assert not isinstance(progress, LoopProgress)
+
+    progress.begin()
+    progress.end('a')
+    progress.finish()
+
+
+def test_get_total():
+    """Total is the length, if there is one."""
+    assert get_total([1, 2, 3]) == 3
+    assert get_total('ab') == 2
+    assert get_total(i for i in range(3)) is None
+
+# endregion get_loop_progress
+
+# region LoopProgress
+
+
+def test_loop_progress_quiet_inside_interval():
+    """Loop that finishes inside the interval doesn't report."""
+    with patch('pypyr.progress.time.perf_counter',
+               side_effect=[0, 1, 2, 3, 5, 6]):
+        progress = LoopProgress('foreach', 'arb', 2, 10)
+        with patch_logger('pypyr.progress', logging.NOTIFY) as mock_notify:
+            progress.begin()
+            progress.end('a')
+            progress.begin()
+            progress.end('b')
+            progress.finish()
+
+    mock_notify.assert_not_called()
+    assert progress.count == 2
+    assert progress.slowest == 2
+    assert progress.slowest_item == 'b'
+    assert not progress.reported
+
+
+def test_loop_progress_reports_at_interval():
+    """Report rate, eta & slowest at the interval, then summary at end."""
+    with patch('pypyr.progress.time.perf_counter',
+               side_effect=[0, 0, 4, 4, 10, 10, 11, 12, 20, 25]):
+        progress = LoopProgress('foreach', 'arb', 10, 10)
+        with patch_logger('pypyr.progress', logging.NOTIFY) as mock_notify:
+            # 0-4: no report, 4-10 reports, 10-11 no report.
+            progress.begin()
+            progress.end('a')
+            progress.begin()
+            progress.end('b')
+            progress.begin()
+            progress.end('c')
+            # 12-20: at 20 next report.
+            progress.begin()
+            progress.end('d')
+            progress.finish()
+
+    assert [c.args[0] for c in mock_notify.mock_calls] == [
+        "foreach arb: at 2/10 (20.0%) iterations in 10.00s, 0.2/s, "
+        "eta 40.00s, slowest 'b' took 6.00s.",
+        "foreach arb: at 4/10 (40.0%) iterations in 20.00s, 0.2/s, "
+        "eta 30.00s, slowest 'd' took 8.00s.",
+        "foreach arb: done 4/10 (40.0%) iterations in 25.00s, 0.2/s, "
+        "slowest 'd' took 8.00s."]
+    assert progress.reported
+
+
+def test_loop_progress_no_total():
+    """Without a total there's no percent & no eta."""
+    progress = get_progress(None, [0])
+    progress.count = 30
+    progress.slowest = 0.5
+    progress.slowest_item = 7
+
+    assert progress.get_report(60) == (
+        "foreach arb: at 30 iterations in 1m0s, 0.5/s, slowest 7 took "
+        "0.50s.")
+
+
+def test_loop_progress_zero_total():
+    """A total of 0 is 100% & doesn't divide by 0."""
+    progress = get_progress(0, [0])
+
+    assert progress.get_report(0) == (
+        "foreach arb: at 0/0 (100.0%) iterations in 0.00s, 0.0/s, slowest "
+        "None took 0.00s.")
+
+# endregion LoopProgress
+
+# region format_duration
+
+
+def test_format_duration():
+    """Durations format by size."""
+    assert format_duration(0) == '0.00s'
+    assert format_duration(6.789) == '6.79s'
+    assert format_duration(59.994) == '59.99s'
+    assert format_duration(60) == '1m0s'
+    assert format_duration(245.9) == '4m5s'
+    assert format_duration(3723) == '1h2m3s'
+    assert format_duration(90000) == '25h0m0s'
+
+# endregion format_duration
@@ -0,0 +1,205 @@
+"""sampler.py unit tests."""
+import logging
+import sys
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+
+from pypyr.context import Context
+from pypyr.hooks import _scoped_hooks, HookEvent
+from pypyr.sampler import (escape,
+                           get_frame_labels,
+                           get_step_labels,
+                           sampling,
+                           SamplingProfiler)
+from tests.common.utils import patch_logger
+
+
+def get_context(*pipeline_names):
+    """Get a context with pipeline_names on its pipeline stack."""
+    context = Context()
+    for name in pipeline_names:
+        pipeline = Mock()
+        pipeline.name = name
+        context._stack.append(pipeline)
+
+    return context
+
+# region labels
+
+
+def test_escape():
+    """Escape replaces the separator & line breaks."""
+    assert escape('a;b\nc\rd') == 'a:b c d'
+    assert escape(None) == 'None'
+
+
+def test_get_step_labels_shared_context():
+    """Child pipeline on its parent's context adds only new pipelines."""
+    running = [(('root',), 'pypyr.steps.pype'),
+               (('root', 'child'), 'pypyr.steps.call'),
+               (('root', 'child'), 'my;step')]
+
+    assert get_step_labels(running) == ['pipeline:root',
+                                        'step:pypyr.steps.pype',
+                                        'pipeline:child',
+                                        'step:pypyr.steps.call',
+                                        'step:my:step']
+
+
+def test_get_step_labels_own_context():
+    """Child pipeline with its own context adds its own pipeline."""
+    running = [(('root',), 'pypyr.steps.pype'),
+               (('child',), 'arb')]
+
+    assert get_step_labels(running) == ['pipeline:root',
+                                        'step:pypyr.steps.pype',
+                                        'pipeline:child',
+                                        'step:arb']
+
+
+def test_get_step_labels_no_pipeline():
+    """Step without a pipeline only has the step."""
+    assert get_step_labels([((), 'arb')]) == ['step:arb']
+
+
+def test_get_frame_labels():
+    """Frame labels are outermost first, with the function's first line."""
+    def inner():
+        return get_frame_labels(sys._getframe())
+
+    labels = inner()
+    code = inner.__code__
+    assert labels[-1] == (f'inner ({code.co_filename}:'
+                          f'{code.co_firstlineno})')
+    assert labels[-2].startswith('test_get_frame_labels (')
+    assert labels[0] != labels[-1]
+
+# endregion labels
+
+# region SamplingProfiler
+
+
+def test_sampler_step_hooks_track_running():
+    """Before & after step track the running steps per thread."""
+    sampler = SamplingProfiler()
+    context = get_context('root', 'child')
+    event = HookEvent('step', 's1', 1, context)
+
+    sampler.before_step(event)
+    sampler.before_step(HookEvent('step', 's2', 2, Context()))
+
+    thread_id = threading.get_ident()
+    assert sampler._running == {thread_id: [(('root', 'child'), 's1'),
+                                            ((), 's2')]}
+
+    sampler.after_step(event)
+    sampler.after_step(event)
+    assert sampler._running == {thread_id: []}
+
+    # after without a before does nothing.
+    sampler.after_step(event)
+    assert sampler._running == {thread_id: []}
+
+
+def test_sampler_sample_only_running_steps():
+    """Sample tallies the stacks of threads that run a step."""
+    sampler = SamplingProfiler()
+    thread_id = threading.get_ident()
+    sampler._running[thread_id] = [(('pipe',), 'arb')]
+    # a thread that isn't running a step, or has no frame, doesn't count.
+    sampler._running[-1] = [(('pipe',), 'gone')]
+    sampler._running[-2] = []
+
+    with patch('pypyr.sampler.get_frame_labels',
+               return_value=['a (a.py:1)', 'b (b.py:2)']):
+        sampler.sample()
+        sampler.sample()
+
+    assert sampler.samples == 2
+    assert sampler.get_text() == ('pipeline:pipe;step:arb;a (a.py:1);'
+                                  'b (b.py:2) 2\n')
+
+
+def test_sampler_sample_real_frames():
+    """Sample walks the real frames of the thread."""
+    sampler = SamplingProfiler()
+    sampler._running[threading.get_ident()] = [(('pipe',), 'arb')]
+    sampler.sample()
+
+    (line,) = sampler.get_text().splitlines()
+    stack, count = line.rsplit(' ', 1)
+    assert count == '1'
+    assert stack.startswith('pipeline:pipe;step:arb;')
+    assert ';test_sampler_sample_real_frames (' in stack
+    assert stack.endswith(f'sample ({sys.modules["pypyr.sampler"].__file__}'
+                          f':{SamplingProfiler.sample.__code__.co_firstlineno}'
+                          ')')
+
+
+def test_sampler_start_stop():
+    """The sampler thread samples until stopped."""
+    sampler = SamplingProfiler(rate=1000)
+    sampled = threading.Event()
+
+    def sample():
+        sampled.set()
+
+    sampler.sample = sample
+    sampler.start()
+    assert sampler._thread.daemon
+    assert sampler._thread.name == 'pypyr-sampler'
+    assert sampled.wait(5)
+    sampler.stop()
+
+    assert sampler._thread is None
+    # stop again does nothing.
+    sampler.stop()
+
+
+def test_sampler_save(tmp_path):
+    """Save writes the collapsed stacks & creates parent dirs."""
+    sampler = SamplingProfiler()
+    sampler._stacks = {'b;c': 2, 'a': 1}
+
+    path = tmp_path.joinpath('sub', 'stacks.txt')
+    sampler.save(path)
+
+    assert path.read_text() == 'a 1\nb;c 2\n'
+    assert list(path.parent.iterdir()) == [path]
+
+
+def test_sampler_save_err_no_temp(tmp_path):
+    """Save that fails removes its temp file."""
+    sampler = SamplingProfiler()
+    with patch('pypyr.sampler.os.replace', side_effect=OSError('arb')):
+        with pytest.raises(OSError):
+            sampler.save(tmp_path.joinpath('stacks.txt'))
+
+    assert list(tmp_path.iterdir()) == []
+
+# endregion SamplingProfiler
+
+# region sampling
+
+
+def test_sampling_registers_and_saves(tmp_path):
+    """Sampling runs the sampler for the block & saves on exit."""
+    path = tmp_path.joinpath('stacks.txt')
+
+    with patch_logger('pypyr.sampler', logging.NOTIFY) as mock_notify:
+        with pytest.raises(ValueError):
+            with sampling(path, rate=50) as sampler:
+                assert sampler.rate == 50
+                assert sampler in _scoped_hooks.get()
+                assert sampler._thread.is_alive()
+                raise ValueError('arb')
+
+    assert sampler not in _scoped_hooks.get()
+    assert sampler._thread is None
+    assert path.read_text() == ''
+    mock_notify.assert_called_once_with(
+        f'saved {sampler.samples} samples to {path}')
+
+# endregion sampling
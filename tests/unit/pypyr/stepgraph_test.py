@@ -0,0 +1,156 @@
+"""stepgraph.py unit tests."""
+import pytest
+
+from pypyr.errors import PipelineDefinitionError
+from pypyr.stepgraph import get_step_graph, StepGraph, validate_pipeline
+
+# region get_step_graph
+
+
+def test_get_step_graph_no_needs():
+    """No graph when no step has needs."""
+    assert get_step_graph([]) is None
+    assert get_step_graph(['arb.step',
+                           {'name': 'arb.step', 'id': 'a'}]) is None
+
+
+def test_get_step_graph():
+    """Needs resolve to step indexes, in any order."""
+    graph = get_step_graph([
+        {'name': 'step.a', 'id': 'a'},
+        {'name': 'step.c', 'needs': ['a', 'b', 'a']},
+        'step.simple',
+        {'name': 'step.b', 'id': 'b', 'needs': 'a'}])
+
+    assert isinstance(graph, StepGraph)
+    assert graph.labels == ['a', 'step.c', 'step.simple', 'b']
+    assert graph.needs == [(), (0, 3), (1,), (0,)]
+    assert graph.dependents == [[1, 3], [2], [], [1]]
+
+
+def test_get_step_graph_in_order():
+    """A step without needs needs the step before it. [] needs nothing."""
+    graph = get_step_graph([
+        'step.first',
+        {'name': 'step.a', 'id': 'a', 'needs': []},
+        {'name': 'step.b', 'needs': 'a'},
+        {'name': 'step.c'},
+        {'name': 'step.d', 'needs': []}])
+
+    assert graph.needs == [(), (), (1,), (2,), ()]
+
+
+def test_get_step_graph_in_order_cycle():
+    """A loop through a step without needs says why."""
+    with pytest.raises(PipelineDefinitionError) as err:
+        get_step_graph([{'name': 'step.a', 'id': 'a', 'needs': 'b'},
+                        {'name': 'step.b', 'id': 'b'}],
+                       'arb')
+
+    assert str(err.value) == (
+        "step-group arb: needs is circular: a -> b -> a. A step without "
+        "needs needs the step before it. Set its needs to [] to run it "
+        "straight away instead.")
+
+
+def test_get_step_graph_duplicate_id():
+    """Step ids must be unique."""
+    with pytest.raises(PipelineDefinitionError) as err:
+        get_step_graph([{'name': 'step.a', 'id': 'a'},
+                        {'name': 'step.b', 'id': 'a', 'needs': 'a'}],
+                       'arb')
+
+    assert str(err.value) == ("step-group arb: more than 1 step has id a. "
+                              "Step ids must be unique in a step-group.")
+
+
+def test_get_step_graph_unknown_id():
+    """Needs must refer to an existing step id."""
+    with pytest.raises(PipelineDefinitionError) as err:
+        get_step_graph([{'name': 'step.a', 'id': 'a'},
+                        {'name': 'step.b', 'needs': ['a', 'x']}])
+
+    assert str(err.value) == ("step-group: step step.b needs x, but there is "
+                              "no step with that id.")
+
+
+def test_get_step_graph_bad_type():
+    """Needs must be a str or a list."""
+    with pytest.raises(PipelineDefinitionError) as err:
+        get_step_graph([{'name': 'step.a', 'id': 'a', 'needs': {'a': 'b'}}],
+                       'arb')
+
+    assert str(err.value) == ("step-group arb: needs on step a must be a "
+                              "step id or a list of step ids.")
+
+
+def test_get_step_graph_needs_self():
+    """A step can't need itself."""
+    with pytest.raises(PipelineDefinitionError) as err:
+        get_step_graph([{'name': 'step.a', 'id': 'a', 'needs': 'a'}], 'arb')
+
+    assert str(err.value) == "step-group arb: needs is circular: a -> a."
+
+
+def test_get_step_graph_cycle():
+    """Detect loops through several steps."""
+    with pytest.raises(PipelineDefinitionError) as err:
+        get_step_graph([{'name': 'step.x', 'id': 'x'},
+                        {'name': 'step.a', 'id': 'a', 'needs': ['x', 'c']},
+                        {'name': 'step.b', 'id': 'b', 'needs': 'a'},
+                        {'name': 'step.c', 'id': 'c', 'needs': 'b'}],
+                       'arb')
+
+    assert str(err.value) == ("step-group arb: needs is circular: "
+                              "a -> b -> c -> a.")
+
+# endregion get_step_graph
+
+# region validate_pipeline
+
+
+def test_validate_pipeline():
+    """Validate all the step-groups in a pipeline."""
+    validate_pipeline({
+        'context_parser': 'arb.parser',
+        'steps': [{'name': 'step.a', 'id': 'a'},
+                  {'name': 'step.b', 'needs': 'a'}],
+        'sg1': ['arb.step'],
+        'sg2': None})
+
+    with pytest.raises(PipelineDefinitionError) as err:
+        validate_pipeline({
+            'steps': ['arb.step'],
+            'sg1': [{'name': 'step.b', 'needs': 'a'}]})
+
+    assert str(err.value) == ("step-group sg1: step step.b needs a, but there "
+                              "is no step with that id.")
+
+# endregion validate_pipeline
+
+# region get_critical_path
+
+
+def test_get_critical_path():
+    """Critical path is the longest chain of dependent steps."""
+    # a -> b -> d, a -> c -> d, e stands alone.
+    graph = StepGraph(['a', 'b', 'c', 'd', 'e'],
+                      [(), (0,), (0,), (1, 2), ()])
+
+    total, path = graph.get_critical_path([1, 5, 2, 1, 6])
+    assert total == 7
+    assert path == [0, 1, 3]
+
+    total, path = graph.get_critical_path([1, 1, 2, 1, 6])
+    assert total == 6
+    assert path == [4]
+
+
+def test_get_critical_path_not_run():
+    """Steps that didn't run don't count."""
+    graph = StepGraph(['a', 'b', 'c'], [(), (0,), (1,)])
+
+    assert graph.get_critical_path([None, None, None]) == (0, [])
+    assert graph.get_critical_path([1, 2, None]) == (3, [0, 1])
+
+# endregion get_critical_path
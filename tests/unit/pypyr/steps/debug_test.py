@@ -235,3 +235,33 @@ def test_pformat_not_called_when_logging_is_disabled(mock_pformat):
         debug.logger.setLevel(logging_level)
 
     mock_pformat.assert_not_called()
+
+
+def test_memory():
+    """Memory dumps key sizes largest first, with the total."""
+    context = Context({'k1': 'v1',
+                       'k2': list(range(100)),
+                       'debug': {'keys': ['k1', 'k2'], 'memory': True}})
+
+    with patch('pypyr.memoryreport.get_deep_size',
+               side_effect=lambda value: len(value)):
+        with patch_logger('pypyr.steps.debug',
+                          logging.INFO) as mock_logger_info:
+            debug.run_step(context)
+
+    assert mock_logger_info.mock_calls == [
+        call("\n{'k2': 100, 'k1': 2, '(total)': 102}")]
+
+
+def test_memory_all_keys():
+    """Memory without keys dumps the size of every key."""
+    context = Context({'k1': 'v1', 'debug': {'memory': True}})
+
+    with patch('pypyr.memoryreport.get_deep_size',
+               side_effect=lambda value: len(value)):
+        with patch_logger('pypyr.steps.debug',
+                          logging.INFO) as mock_logger_info:
+            debug.run_step(context)
+
+    assert mock_logger_info.mock_calls == [
+        call("\n{'k1': 2, 'debug': 1, '(total)': 3}")]
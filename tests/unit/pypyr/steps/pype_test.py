@@ -753,7 +753,8 @@ def test_pype_use_parent_context(mock_pipe):
         groups=None,
         success_group=None,
         failure_group=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mocked_runner = mock_pipe.return_value.load_and_run_pipeline
@@ -806,7 +807,8 @@ def test_pype_use_parent_context_with_args(mock_pipe):
         groups=None,
         success_group=None,
         failure_group=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mocked_runner = mock_pipe.return_value.load_and_run_pipeline
@@ -842,7 +844,8 @@ def test_pype_no_parent_context(mock_pipe):
         groups=None,
         success_group=None,
         failure_group=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mocked_runner = mock_pipe.return_value.load_and_run_pipeline
@@ -875,7 +878,8 @@ def test_pype_args(mock_pipe):
         groups=None,
         success_group=None,
         failure_group=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     assert mock_logger_info.mock_calls == [
@@ -926,7 +930,8 @@ def l_and_r(context, parent):
         groups=None,
         success_group=None,
         failure_group=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     assert mock_logger_info.mock_calls == [
@@ -976,7 +981,8 @@ def test_pype_args_with_out(mock_pipe):
         groups=None,
         success_group=None,
         failure_group=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mocked_runner = mock_pipe.return_value.load_and_run_pipeline
@@ -1021,7 +1027,8 @@ def test_pype_args_with_mapping_out(mock_pipe):
         groups=None,
         success_group=None,
         failure_group=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mocked_runner = mock_pipe.return_value.load_and_run_pipeline
@@ -1068,7 +1075,8 @@ def test_pype_no_skip_parse(mock_pipe):
         groups=None,
         success_group=None,
         failure_group=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mocked_runner = mock_pipe.return_value.load_and_run_pipeline
@@ -1103,7 +1111,8 @@ def test_pype_no_pipe_arg(mock_pipe):
         groups=None,
         success_group=None,
         failure_group=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mocked_runner = mock_pipe.return_value.load_and_run_pipeline
@@ -1152,7 +1161,8 @@ def test_pype_use_parent_context_no_swallow(mock_pipe):
         groups=None,
         success_group=None,
         failure_group=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mocked_runner.assert_called_once_with({
@@ -1197,7 +1207,8 @@ def test_pype_use_parent_context_with_swallow(mock_pipe):
         groups=None,
         success_group=None,
         failure_group=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mocked_runner.assert_called_once_with(context, None)
@@ -1243,7 +1254,8 @@ def test_pype_use_parent_context_swallow_stop_error(mock_pipe):
         groups=None,
         success_group=None,
         failure_group=None,
-        py_dir=None
+        py_dir=None,
+        parallel_groups=False
     )
 
     mocked_runner.assert_called_once_with(context, None)
@@ -1280,7 +1292,8 @@ def test_pype_set_groups(mock_pipe):
         groups=['testgroup'],
         success_group='successgroup',
         failure_group='failuregroup',
-        py_dir='test dir'
+        py_dir='test dir',
+        parallel_groups=False
     )
 
     mocked_runner = mock_pipe.return_value.load_and_run_pipeline
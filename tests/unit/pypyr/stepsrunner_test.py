@@ -1,4 +1,5 @@
 """stepsrunner.py unit tests."""
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import pytest
 from unittest.mock import call, patch
@@ -11,7 +12,7 @@
                           StopPipeline,
                           StopStepGroup)
 from pypyr.pipeline import Pipeline
-from pypyr.stepsrunner import StepsRunner
+from pypyr.stepsrunner import CompiledStepGroup, StepsRunner
 from tests.common.utils import DeepCopyMagicMock, patch_logger
 
 
@@ -96,6 +97,17 @@ def test_stepsrunner_init():
     assert s.pipeline_body == 3
     assert s.context == 4
 
+
+def test_stepsrunner_get_scoped_copy():
+    """The StepsRunner copy runs against new context, shares compiled."""
+    compiled = {}
+    s = StepsRunner(pipeline_body=3, context=4, compiled_step_groups=compiled)
+    scoped = s.get_scoped_copy(5)
+    assert scoped is not s
+    assert scoped.pipeline_body == 3
+    assert scoped.context == 5
+    assert scoped.compiled_step_groups is compiled
+
 # endregion init
 
 # region get_pipeline_steps
@@ -648,14 +660,17 @@ def test_run_step_group_pass(mock_run_steps):
     StepsRunner(get_valid_test_pipeline(), Context()).run_step_group(
         step_group_name='sg1')
 
-    mock_run_steps.assert_called_once_with(steps=[
+    mock_run_steps.assert_called_once()
+    compiled_steps = mock_run_steps.call_args.kwargs['steps']
+    assert isinstance(compiled_steps, CompiledStepGroup)
+    assert compiled_steps.steps == [
         'step1',
         'step2',
         {'name': 'step3key1',
          'in':
             {'in3k1_1': 'v3k1', 'in3k1_2': 'v3k2'}},
         'step4'
-    ])
+    ]
 
 
 @patch.object(StepsRunner, 'run_pipeline_steps')
@@ -666,14 +681,17 @@ def test_run_step_group_no_raise(mock_run_steps):
                 Context()).run_step_group(step_group_name='sg1',
                                           raise_stop=False)
 
-    mock_run_steps.assert_called_once_with(steps=[
+    mock_run_steps.assert_called_once()
+    compiled_steps = mock_run_steps.call_args.kwargs['steps']
+    assert isinstance(compiled_steps, CompiledStepGroup)
+    assert compiled_steps.steps == [
         'step1',
         'step2',
         {'name': 'step3key1',
          'in':
             {'in3k1_1': 'v3k1', 'in3k1_2': 'v3k2'}},
         'step4'
-    ])
+    ]
 
 
 @patch.object(StepsRunner, 'run_pipeline_steps')
@@ -685,17 +703,223 @@ def test_run_step_group_raise(mock_run_steps):
                     Context()).run_step_group(step_group_name='sg1',
                                               raise_stop=True)
 
-    mock_run_steps.assert_called_once_with(steps=[
+    mock_run_steps.assert_called_once()
+    compiled_steps = mock_run_steps.call_args.kwargs['steps']
+    assert isinstance(compiled_steps, CompiledStepGroup)
+    assert compiled_steps.steps == [
         'step1',
         'step2',
         {'name': 'step3key1',
          'in':
             {'in3k1_1': 'v3k1', 'in3k1_2': 'v3k2'}},
         'step4'
-    ])
+    ]
+
+
+@patch('pypyr.cache.stepcache.step_cache.get_step')
+def test_run_step_group_compiles_once(mock_get_step):
+    """Run same step-group repeatedly only parses its steps once."""
+    mock_get_step.return_value = arb_step_mock
+    compiled_step_groups = {}
+    runner = StepsRunner(get_valid_test_pipeline(),
+                         Context(),
+                         compiled_step_groups=compiled_step_groups)
+
+    with patch.object(Step, 'run_step') as mock_run_step:
+        runner.run_step_group('sg1')
+        runner.run_step_group('sg1')
+
+    assert mock_get_step.mock_calls == [call('step1'),
+                                        call('step2'),
+                                        call('step3key1'),
+                                        call('step4')]
+    assert mock_run_step.call_count == 8
+    assert list(compiled_step_groups) == ['sg1']
+
+    # shared cache means a new runner re-uses the compiled steps
+    with patch.object(Step, 'run_step') as mock_run_step:
+        StepsRunner(get_valid_test_pipeline(),
+                    Context(),
+                    compiled_step_groups=compiled_step_groups).run_step_group(
+            'sg1')
+
+    assert mock_run_step.call_count == 4
+    assert mock_get_step.call_count == 4
+
+
+@patch('pypyr.cache.stepcache.step_cache.get_step')
+def test_run_step_group_no_cache(mock_get_step):
+    """Run same step-group repeatedly with no_cache parses each time."""
+    mock_get_step.return_value = arb_step_mock
+    runner = StepsRunner(get_valid_test_pipeline(), Context())
+
+    with patch('pypyr.stepsrunner.config.no_cache', True):
+        with patch.object(Step, 'run_step'):
+            runner.run_step_group('sg1')
+            runner.run_step_group('sg1')
+
+    assert mock_get_step.call_count == 8
+    assert not runner.compiled_step_groups
+
+
+def test_compiled_step_group_lazy():
+    """Compiled step-group only parses a step when the step runs."""
+    ran = []
+
+    def run_step(context):
+        ran.append(context['i'])
+
+    with patch('pypyr.cache.stepcache.step_cache.get_step') as mock_get_step:
+        mock_get_step.side_effect = [run_step, ValueError('arb')]
+        compiled = CompiledStepGroup([{'name': 'step1', 'foreach': [1, 2]},
+                                      'step2'])
+
+        assert len(compiled) == 2
+        steps = iter(compiled)
+        step1 = next(steps)
+        step1.run_step(Context())
+        assert ran == [1, 2]
+
+        with pytest.raises(ValueError) as err:
+            next(steps)
+
+    assert str(err.value) == 'arb'
+
+    # template untouched by the run, each run instance has own counters
+    template = compiled._templates[0]
+    assert template.for_counter is None
+    assert step1.for_counter == 2
+    assert step1 is not template
+    assert next(iter(compiled)).for_counter is None
+
+
+def test_compiled_step_group_graph():
+    """Compiled step-group has a graph only when a step uses needs."""
+    assert CompiledStepGroup(['step1', 'step2'], 'sg1').graph is None
+
+    compiled = CompiledStepGroup([{'name': 'step1', 'id': 'a'},
+                                  {'name': 'step2', 'needs': 'a'}],
+                                 'sg1')
+    assert compiled.name == 'sg1'
+    assert compiled.graph.needs == [(), (0,)]
 
 # endregion run_step_group
 
+# region run_step_graph
+
+
+def set_step(step_id=None, needs=None, **kwargs):
+    """Get a pypyr.steps.set step definition with id & needs."""
+    step = {'name': 'pypyr.steps.set', 'in': {'set': kwargs}}
+    if step_id:
+        step['id'] = step_id
+
+    if needs is not None:
+        step['needs'] = needs
+
+    return step
+
+
+def get_needs_pipeline():
+    """Pipeline definition where steps need each other."""
+    return {
+        'sg1': [
+            set_step('c', needs=['a', 'b'], c='{b}c'),
+            set_step('b', needs='a', b='{a}b'),
+            set_step('a', needs=[], a='a'),
+            set_step(needs=[], standalone=True)],
+        'err': [
+            {'name': 'pypyr.steps.py',
+             'id': 'a',
+             'in': {'py': 'raise ValueError(\'err from a\')'}},
+            set_step('b', needs='a', b='b'),
+            set_step('c', needs=[], c='c')],
+        'in_order': [
+            set_step('a', needs=[], a='a'),
+            set_step('b', b='{a}b'),
+            set_step('c', needs='b', c='{b}c'),
+            set_step(d='{c}d')],
+    }
+
+
+def test_run_step_graph():
+    """Steps run once the steps they need are done."""
+    context = Context({'a': 'before'})
+    runner = StepsRunner(get_needs_pipeline(), context)
+    with patch_logger('pypyr.stepsrunner', logging.INFO) as mock_info:
+        runner.run_step_group('sg1')
+
+    assert context == {'a': 'a',
+                       'b': 'ab',
+                       'c': 'abc',
+                       'standalone': True}
+
+    assert len(mock_info.mock_calls) == 1
+    msg = mock_info.mock_calls[0].args[0]
+    assert msg.startswith('step-group sg1 ran 4 steps in ')
+    assert 'critical path' in msg
+    assert msg.endswith('s)')
+    assert ': a (' in msg
+    assert ') -> b (' in msg
+    assert ') -> c (' in msg
+
+
+@patch('pypyr.config.config.default_needs_max', new=1)
+def test_run_step_graph_max():
+    """Steps run on at most default_needs_max threads."""
+    context = Context()
+    with patch('pypyr.stepsrunner.ThreadPoolExecutor',
+               wraps=ThreadPoolExecutor) as mock_pool:
+        StepsRunner(get_needs_pipeline(), context).run_step_group('sg1')
+
+    mock_pool.assert_called_once_with(max_workers=1,
+                                      thread_name_prefix='pypyr-step')
+    assert context['c'] == 'abc'
+
+
+def test_run_step_graph_error():
+    """An error stops new steps, running steps finish, then raise."""
+    context = Context()
+    with pytest.raises(ValueError) as err:
+        StepsRunner(get_needs_pipeline(), context).run_step_group('err')
+
+    assert str(err.value) == 'err from a'
+    # c was ready at the same time as a, so it ran. b needs a, so didn't.
+    assert context['c'] == 'c'
+    assert 'b' not in context
+    assert len(context['runErrors']) == 1
+    assert context['runErrors'][0]['description'] == 'err from a'
+
+
+def test_run_step_graph_in_order():
+    """Steps without needs run after the step before them."""
+    context = Context()
+    runner = StepsRunner(get_needs_pipeline(), context)
+    runner.run_step_group('in_order')
+
+    assert context == {'a': 'a', 'b': 'ab', 'c': 'abc', 'd': 'abcd'}
+
+
+def test_run_step_graph_stop_step_group():
+    """Control of flow instructions stop the step-group."""
+    context = Context()
+    pipeline = {'sg1': [{'name': 'pypyr.steps.stopstepgroup', 'id': 'a'},
+                        set_step('b', needs='a', b='b')]}
+
+    StepsRunner(pipeline, context).run_step_group('sg1')
+    assert 'b' not in context
+
+
+def test_run_pipeline_steps_graph_list():
+    """Uncompiled steps with needs run on the step graph too."""
+    context = Context()
+    steps = get_needs_pipeline()['sg1']
+    StepsRunner({}, context).run_pipeline_steps(steps)
+
+    assert context['c'] == 'abc'
+
+# endregion run_step_graph
+
 # region run_step_groups
 
 
@@ -885,8 +1109,184 @@ def test_run_step_groups_none_groups():
 
     assert str(err.value) == (
         'you must specify which step-groups you want to run. groups is None.')
+
+
+@patch.object(StepsRunner, 'run_parallel_step_groups')
+@patch.object(StepsRunner, 'run_step_group')
+def test_run_step_groups_parallel(mock_run_step_group, mock_run_parallel):
+    """Parallel groups run together, then success handler."""
+    StepsRunner(get_valid_test_pipeline(), Context()).run_step_groups(
+        groups=['sg1', 'sg2'],
+        success_group='arb success',
+        failure_group='arb fail',
+        parallel=True)
+
+    mock_run_parallel.assert_called_once_with(['sg1', 'sg2'])
+    assert mock_run_step_group.mock_calls == [call('arb success')]
+
+
+@patch.object(StepsRunner, 'run_parallel_step_groups')
+@patch.object(StepsRunner, 'run_step_group')
+def test_run_step_groups_parallel_single(mock_run_step_group,
+                                         mock_run_parallel):
+    """Parallel with only 1 group runs in sequence."""
+    StepsRunner(get_valid_test_pipeline(), Context()).run_step_groups(
+        groups=['sg1'],
+        success_group=None,
+        failure_group=None,
+        parallel=True)
+
+    mock_run_parallel.assert_not_called()
+    assert mock_run_step_group.mock_calls == [call('sg1')]
+
+
+@patch.object(StepsRunner, 'run_parallel_step_groups',
+              side_effect=ValueError('arb'))
+@patch.object(StepsRunner, 'run_step_group')
+def test_run_step_groups_parallel_with_fail(mock_run_step_group,
+                                            mock_run_parallel):
+    """Parallel groups fail, then failure handler."""
+    with pytest.raises(ValueError) as err:
+        StepsRunner(get_valid_test_pipeline(), Context()).run_step_groups(
+            groups=['sg1', 'sg2'],
+            success_group='arb success',
+            failure_group='arb fail',
+            parallel=True)
+
+    assert str(err.value) == 'arb'
+    mock_run_parallel.assert_called_once_with(['sg1', 'sg2'])
+    assert mock_run_step_group.mock_calls == [
+        call('arb fail', raise_stop=True)]
+
 # endregion run_step_groups
 
+# region run_parallel_step_groups
+
+
+def get_parallel_pipeline():
+    """Pipeline definition where groups set context keys."""
+    def set_step(**kwargs):
+        return {'name': 'pypyr.steps.set', 'in': {'set': kwargs}}
+
+    return {
+        'sg1': [set_step(a='sg1', same='x', shared='sg1')],
+        'sg2': [set_step(b='sg2', same='x', shared='sg2')],
+        'sg3': [set_step(c='sg3', shared='sg3')],
+        'err': [{'name': 'pypyr.steps.py',
+                 'in': {'py': 'raise ValueError(\'err from group\')'}}],
+        'swallow': [{'name': 'pypyr.steps.py',
+                     'swallow': True,
+                     'in': {'py': 'raise ValueError(\'swallowed\')'}}],
+        'remove': [{'name': 'pypyr.steps.contextclear',
+                    'in': {'contextClear': ['shared']}}],
+    }
+
+
+def test_run_parallel_step_groups_last():
+    """Groups merge in groups order, later group wins by default."""
+    context = Context({'shared': 'start'})
+    with patch_logger('pypyr.stepsrunner', logging.DEBUG) as mock_debug:
+        StepsRunner(get_parallel_pipeline(), context).run_parallel_step_groups(
+            ['sg3', 'sg1', 'sg2'])
+
+    assert context == {'a': 'sg1',
+                       'b': 'sg2',
+                       'c': 'sg3',
+                       'same': 'x',
+                       'shared': 'sg2'}
+
+    mock_debug.assert_any_call(
+        "parallel step-groups changed the same keys: shared in sg3 & sg1, "
+        "shared in sg3 & sg2. last wins.")
+
+
+@patch('pypyr.config.config.default_group_conflict', new='first')
+def test_run_parallel_step_groups_first():
+    """Earlier group wins when conflict policy is first."""
+    context = Context({'shared': 'start'})
+    StepsRunner(get_parallel_pipeline(), context).run_parallel_step_groups(
+        ['sg3', 'sg1', 'sg2'])
+
+    assert context == {'a': 'sg1',
+                       'b': 'sg2',
+                       'c': 'sg3',
+                       'same': 'x',
+                       'shared': 'sg3'}
+
+
+@patch('pypyr.config.config.default_group_conflict', new='first')
+def test_run_parallel_step_groups_first_removed():
+    """Removing a key conflicts with setting it."""
+    context = Context({'shared': 'start'})
+    StepsRunner(get_parallel_pipeline(), context).run_parallel_step_groups(
+        ['remove', 'sg1'])
+
+    assert context == {'a': 'sg1', 'same': 'x'}
+
+
+@patch('pypyr.config.config.default_group_conflict', new='error')
+def test_run_parallel_step_groups_error():
+    """Raise ContextError when groups set the same key differently."""
+    context = Context({'shared': 'start'})
+    with pytest.raises(ContextError) as err:
+        StepsRunner(get_parallel_pipeline(),
+                    context).run_parallel_step_groups(['sg1', 'sg2'])
+
+    assert str(err.value) == (
+        "parallel step-groups set the same context keys to different "
+        "values: shared in sg1 & sg2. default_group_conflict is error.")
+
+    # same value in both groups is not a conflict.
+    assert context == {'a': 'sg1',
+                       'b': 'sg2',
+                       'same': 'x',
+                       'shared': 'sg1'}
+
+
+@patch('pypyr.config.config.default_group_conflict', new='arb')
+def test_run_parallel_step_groups_bad_conflict():
+    """Raise ValueError on unknown conflict policy."""
+    with pytest.raises(ValueError) as err:
+        StepsRunner(get_parallel_pipeline(),
+                    Context()).run_parallel_step_groups(['sg1', 'sg2'])
+
+    assert str(err.value) == (
+        "default_group_conflict must be last, first or error, not arb.")
+
+
+def test_run_parallel_step_groups_raises_first_error():
+    """Merge successful groups, then raise error."""
+    context = Context()
+    with patch_logger('pypyr.stepsrunner', logging.ERROR) as mock_error:
+        with pytest.raises(ValueError) as err:
+            StepsRunner(get_parallel_pipeline(),
+                        context).run_parallel_step_groups(
+                ['sg1', 'err', 'sg2', 'err'])
+
+    assert str(err.value) == 'err from group'
+    mock_error.assert_called_once_with(
+        "2 parallel step-groups failed. Raising the first error.")
+
+    assert context['a'] == 'sg1'
+    assert context['b'] == 'sg2'
+    assert [e['description'] for e in context['runErrors']] == [
+        'err from group', 'err from group']
+
+
+def test_run_parallel_step_groups_run_errors():
+    """Swallowed runErrors from groups append to context."""
+    context = Context({'runErrors': [{'description': 'before'}]})
+    StepsRunner(get_parallel_pipeline(), context).run_parallel_step_groups(
+        ['swallow', 'sg1', 'swallow'])
+
+    assert context['a'] == 'sg1'
+    run_errors = context['runErrors']
+    assert [e['description'] for e in run_errors] == [
+        'before', 'swallowed', 'swallowed']
+    assert run_errors[1]['swallowed']
+
+# endregion run_parallel_step_groups
+
 # region Jump
 
 
@@ -0,0 +1,216 @@
+"""trace.py unit tests."""
+import asyncio
+import json
+import logging
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from pypyr.trace import Tracer, tracing
+import pypyr.trace
+from tests.common.utils import patch_logger
+
+
+def get_spans(tracer):
+    """Get (phase, category, name) of each recorded event, sans metadata."""
+    return [(event['ph'], event['cat'], event['name'])
+            for event in tracer.get_trace()['traceEvents']
+            if event['ph'] != 'M']
+
+# region span
+
+
+def test_span_disabled_does_nothing():
+    """Span is a shared no-op when tracing is off."""
+    tracer = Tracer()
+    assert not tracer.enabled
+
+    span = tracer.span('arb', 'step', a='b')
+    assert span is tracer.span('arb2', 'step')
+    assert span is tracer.async_span('arb3', 'subprocess')
+
+    with span:
+        pass
+
+    assert get_spans(tracer) == []
+
+
+def test_span_records_complete_event():
+    """Span records name, category, duration & args."""
+    tracer = Tracer()
+    tracer.start()
+
+    with patch('pypyr.trace.time.perf_counter_ns',
+               side_effect=[1000, 3000]):
+        tracer._epoch = 0
+        with tracer.span('arb', 'step', a='b'):
+            pass
+
+    tracer.stop()
+    events = tracer.get_trace()['traceEvents']
+
+    assert events[0] == {'name': 'process_name', 'ph': 'M',
+                         'pid': os.getpid(), 'tid': 0,
+                         'args': {'name': 'pypyr'}}
+
+    thread = threading.current_thread()
+    assert events[1] == {'name': 'thread_name', 'ph': 'M',
+                         'pid': os.getpid(), 'tid': thread.ident,
+                         'args': {'name': thread.name}}
+
+    assert events[2] == {'name': 'arb', 'cat': 'step', 'ph': 'X',
+                         'ts': 1, 'dur': 2, 'args': {'a': 'b'},
+                         'pid': os.getpid(), 'tid': thread.ident}
+
+
+def test_span_nested_and_error():
+    """Inner span saves first & spans mark the error they raise."""
+    tracer = Tracer()
+    tracer.start()
+
+    with pytest.raises(ValueError):
+        with tracer.span('outer', 'step-group'):
+            with tracer.span('inner', 'step'):
+                raise ValueError('arb')
+
+    events = [event for event in tracer.get_trace()['traceEvents']
+              if event['ph'] == 'X']
+
+    assert [event['name'] for event in events] == ['inner', 'outer']
+    assert events[0]['args'] == {'error': 'ValueError'}
+    assert events[1]['ts'] <= events[0]['ts']
+    assert (events[1]['ts'] + events[1]['dur']
+            >= events[0]['ts'] + events[0]['dur'])
+
+
+def test_span_per_thread():
+    """Spans from other threads record their own tid & thread name."""
+    tracer = Tracer()
+    tracer.start()
+
+    def work():
+        with tracer.span('arb', 'step'):
+            pass
+
+    thread = threading.Thread(target=work, name='arb-thread')
+    thread.start()
+    thread.join()
+
+    events = tracer.get_trace()['traceEvents']
+    assert {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(),
+            'tid': thread.ident,
+            'args': {'name': 'arb-thread'}} in events
+    assert events[-1]['tid'] == thread.ident
+
+
+def test_async_span():
+    """Async spans pair begin & end events by id."""
+    tracer = Tracer()
+    tracer.start()
+
+    async def work(name):
+        with tracer.async_span(name, 'subprocess', cwd=None):
+            await asyncio.sleep(0)
+
+    async def run_all():
+        await asyncio.gather(work('a'), work('b'))
+
+    asyncio.run(run_all())
+
+    events = [event for event in tracer.get_trace()['traceEvents']
+              if event['ph'] != 'M']
+
+    assert [(e['ph'], e['name'], e['id']) for e in events] == [
+        ('b', 'a', 1), ('b', 'b', 2), ('e', 'a', 1), ('e', 'b', 2)]
+    assert events[0]['args'] == {'cwd': None}
+    assert 'args' not in events[2]
+
+
+def test_start_discards_previous():
+    """Start begins a fresh trace."""
+    tracer = Tracer()
+    tracer.start()
+    with tracer.span('arb', 'step'):
+        pass
+
+    tracer.start()
+    assert get_spans(tracer) == []
+
+# endregion span
+
+# region tracing
+
+
+def test_tracing_saves(tmp_path):
+    """Tracing enables the global tracer & saves to path on exit."""
+    path = tmp_path.joinpath('sub', 'trace.json')
+    tracer = Tracer()
+
+    with patch('pypyr.trace.tracer', tracer):
+        with patch_logger('pypyr.trace', logging.NOTIFY) as mock_notify:
+            with tracing(path):
+                assert tracer.enabled
+                with tracer.span('arb', 'step', obj=object()):
+                    pass
+
+    assert not tracer.enabled
+    mock_notify.assert_called_once_with(f"saved trace to {path}")
+
+    with open(path) as file:
+        trace = json.load(file)
+
+    assert trace['displayTimeUnit'] == 'ms'
+    assert trace['traceEvents'][-1]['name'] == 'arb'
+    # not json serializable saves as str
+    assert trace['traceEvents'][-1]['args']['obj'].startswith('<object')
+
+
+def test_tracing_saves_on_error(tmp_path):
+    """Tracing saves what it has when the run raises."""
+    path = tmp_path.joinpath('trace.json')
+    tracer = Tracer()
+
+    with patch('pypyr.trace.tracer', tracer):
+        with pytest.raises(ValueError):
+            with tracing(path):
+                with tracer.span('arb', 'step'):
+                    raise ValueError('arb')
+
+    assert not tracer.enabled
+    assert path.exists()
+
+
+def test_tracing_nested(tmp_path):
+    """Nested tracing keeps the outer trace going."""
+    tracer = Tracer()
+
+    with patch('pypyr.trace.tracer', tracer):
+        with tracing(tmp_path.joinpath('outer.json')):
+            with tracer.span('first', 'step'):
+                pass
+
+            with tracing(tmp_path.joinpath('inner.json')):
+                with tracer.span('second', 'step'):
+                    pass
+
+            assert tracer.enabled
+
+    with open(tmp_path.joinpath('inner.json')) as file:
+        inner = json.load(file)
+
+    with open(tmp_path.joinpath('outer.json')) as file:
+        outer = json.load(file)
+
+    assert [e['name'] for e in inner['traceEvents'] if e['ph'] == 'X'] == [
+        'first', 'second']
+    assert [e['name'] for e in outer['traceEvents'] if e['ph'] == 'X'] == [
+        'first', 'second']
+
+
+def test_global_tracer_off_by_default():
+    """The global tracer is disabled until something starts it."""
+    assert not pypyr.trace.tracer.enabled
+
+# endregion tracing
@@ -0,0 +1,102 @@
+"""memory.py unit tests."""
+from sys import getsizeof
+from unittest.mock import Mock
+
+from pypyr.utils.memory import get_deep_size
+
+
+class ArbSlots():
+    """Arbitrary class with slots."""
+
+    __slots__ = ['a', 'b']
+
+    def __init__(self, a):
+        """Set only a."""
+        self.a = a
+
+
+class ArbDict():
+    """Arbitrary class with a __dict__."""
+
+    def __init__(self, a):
+        """Set a."""
+        self.a = a
+
+
+def test_get_deep_size_scalar():
+    """Scalars are their own size."""
+    assert get_deep_size(1) == getsizeof(1)
+    assert get_deep_size('abc') == getsizeof('abc')
+    assert get_deep_size(None) == getsizeof(None)
+
+
+def test_get_deep_size_containers():
+    """Containers include their contents."""
+    value = 'x' * 1000
+    assert get_deep_size([value]) == getsizeof([value]) + getsizeof(value)
+    assert get_deep_size({'k': value}) == (getsizeof({'k': value})
+                                           + getsizeof('k')
+                                           + getsizeof(value))
+    assert get_deep_size((value,)) == getsizeof((value,)) + getsizeof(value)
+    assert get_deep_size({value}) == getsizeof({value}) + getsizeof(value)
+
+
+def test_get_deep_size_counts_shared_once():
+    """The same object referenced twice only counts once."""
+    value = 'x' * 1000
+    assert get_deep_size([value, value]) == (getsizeof([value, value])
+                                             + getsizeof(value))
+
+
+def test_get_deep_size_cycle():
+    """Self-referencing containers don't loop forever."""
+    lst = []
+    lst.append(lst)
+    assert get_deep_size(lst) == getsizeof(lst)
+
+
+def test_get_deep_size_instances():
+    """Instances include their __dict__ & set __slots__."""
+    value = 'x' * 1000
+    slots = ArbSlots(value)
+    assert get_deep_size(slots) == getsizeof(slots) + getsizeof(value)
+
+    obj = ArbDict(value)
+    assert get_deep_size(obj) == (getsizeof(obj)
+                                  + getsizeof(obj.__dict__)
+                                  + getsizeof('a')
+                                  + getsizeof(value))
+
+
+def test_get_deep_size_shallow_types():
+    """Functions, classes & modules don't count what they reference."""
+    def arb():
+        pass
+
+    assert get_deep_size(arb) == getsizeof(arb)
+    assert get_deep_size(ArbDict) == getsizeof(ArbDict)
+    assert get_deep_size(getsizeof) == getsizeof(getsizeof)
+
+
+def test_get_deep_size_seen():
+    """Objects already in seen don't count."""
+    value = 'x' * 1000
+    seen = set()
+    first = get_deep_size(value, seen)
+    assert first == getsizeof(value)
+    assert get_deep_size([value], seen) == getsizeof([value])
+
+
+def test_get_deep_size_max_objects():
+    """Walk stops after max_objects."""
+    values = [str(i) * 100 for i in range(10)]
+    full = get_deep_size(values)
+    assert get_deep_size(values, max_objects=1) == getsizeof(values)
+    assert get_deep_size(values, max_objects=100) == full
+
+
+def test_get_deep_size_mock_terminates():
+    """Mock's __getattr__ doesn't make the walk go on forever."""
+    mock = Mock()
+    mock.a.b.c = 'arb'
+    assert get_deep_size(mock) > 0
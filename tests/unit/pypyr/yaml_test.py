@@ -1,8 +1,13 @@
 """yaml.py unit tests."""
 import io
+import pickle
+from unittest.mock import patch
+
 import pytest
 import ruamel.yaml as yamler
 from pypyr.context import Context
+from pypyr.dsl import Jsonify, PyString, SicString, Step
+from pypyr.formatting import CONSTANT_MARKER
 import pypyr.yaml as pypyr_yaml
 
 
@@ -38,8 +43,161 @@ def test_get_pipeline_yaml_custom_types():
             '!py string expression is empty. It must be a valid python '
             'expression instead.')
 
+
+def test_get_pipeline_yaml_marks_constants():
+    """Pipeline yaml flags containers without anything to format."""
+    file = io.StringIO("""\
+steps:
+  - name: step1
+    in:
+      const:
+        a: b
+        c: [1, 2]
+      expr:
+        a: '{b}'
+      special:
+        a: !py b
+""")
+    pipeline = pypyr_yaml.get_pipeline_yaml(file)
+    step_in = pipeline['steps'][0]['in']
+
+    def is_const(obj):
+        return getattr(obj, CONSTANT_MARKER, False)
+
+    assert is_const(step_in['const'])
+    assert is_const(step_in['const']['c'])
+    assert not is_const(step_in['expr'])
+    assert not is_const(step_in['special'])
+    assert not is_const(step_in)
+    assert not is_const(pipeline)
+
+    context = Context({'b': 'x', 'const': step_in['const']})
+    out = context.get_formatted('const')
+    assert out == {'a': 'b', 'c': [1, 2]}
+    assert out is not step_in['const']
+    assert out['c'] is not step_in['const']['c']
+
 # endregion get_pipeline_yaml
 
+# region fast
+
+
+@pytest.fixture
+def fast_yaml():
+    """Switch the fast yaml parser on for the test."""
+    with patch('pypyr.config.config.fast_yaml', True):
+        yield
+
+
+def test_get_pipeline_yaml_fast_containers(fast_yaml):
+    """Fast parser makes PipelineMap & PipelineSeq with their positions."""
+    file = io.StringIO("""\
+steps:
+  - name: pypyr.steps.set
+    in:
+      a: [1, 2]
+  - pypyr.steps.echo
+""")
+    pipeline = pypyr_yaml.get_pipeline_yaml(file)
+
+    assert pipeline == {'steps': [{'name': 'pypyr.steps.set',
+                                   'in': {'a': [1, 2]}},
+                                  'pypyr.steps.echo']}
+    assert type(pipeline) is pypyr_yaml.PipelineMap
+    assert type(pipeline['steps']) is pypyr_yaml.PipelineSeq
+
+    step = pipeline['steps'][0]
+    assert type(step) is pypyr_yaml.PipelineMap
+    assert (step.lc.line, step.lc.col) == (1, 4)
+
+    seq = step['in']['a']
+    assert type(seq) is pypyr_yaml.PipelineSeq
+    assert (seq.lc.line, seq.lc.col) == (3, 9)
+
+    # the step reads the line from .lc.
+    step_obj = Step(step)
+    assert (step_obj.line_no, step_obj.line_col) == (2, 5)
+
+
+def test_get_pipeline_yaml_fast_custom_types(fast_yaml):
+    """Fast parser loads the custom tags."""
+    file = io.StringIO("""\
+a: !sic '{12}'
+b: !py abs(-23)
+c: !jsonify
+  k: [1, '{x}']
+d: !jsonify [1, 2]
+e: !jsonify 3
+f: !jsonify '3'
+g: !sic
+""")
+    pipeline = pypyr_yaml.get_pipeline_yaml(file)
+    context = Context({'x': 'y'})
+
+    assert pipeline['a'] == SicString('{12}')
+    assert pipeline['b'] == PyString('abs(-23)')
+    assert pipeline['b'].get_value(context) == 23
+    assert pipeline['c'] == Jsonify({'k': [1, '{x}']})
+    assert pipeline['c'].get_value(context) == '{"k": [1, "y"]}'
+    assert pipeline['d'].get_value(context) == '[1, 2]'
+    assert pipeline['e'].value == 3
+    assert pipeline['f'].value == '3'
+    assert pipeline['g'] == SicString('')
+
+
+def test_get_pipeline_yaml_fast_marks_constants(fast_yaml):
+    """Fast parser containers take the constant flag."""
+    file = io.StringIO("""\
+const:
+  a: b
+  c: [1, 2]
+expr:
+  a: '{b}'
+""")
+    pipeline = pypyr_yaml.get_pipeline_yaml(file)
+
+    assert getattr(pipeline['const'], CONSTANT_MARKER, False)
+    assert getattr(pipeline['const']['c'], CONSTANT_MARKER, False)
+    assert not getattr(pipeline['expr'], CONSTANT_MARKER, False)
+
+    context = Context({'b': 'x', **pipeline})
+    assert context.get_formatted('expr') == {'a': 'x'}
+    assert context.get_formatted('const') == {'a': 'b', 'c': [1, 2]}
+
+
+def test_get_pipeline_yaml_fast_merge_keys(fast_yaml):
+    """Fast parser merges anchors."""
+    file = io.StringIO("""\
+base: &base
+  a: 1
+child:
+  <<: *base
+  b: 2
+""")
+    pipeline = pypyr_yaml.get_pipeline_yaml(file)
+    assert pipeline['child'] == {'a': 1, 'b': 2}
+
+
+def test_get_pipeline_yaml_fast_pickles(fast_yaml):
+    """Fast parser containers pickle with their positions & flags."""
+    pipeline = pypyr_yaml.get_pipeline_yaml(io.StringIO('a:\n  b: [1]\n'))
+    out = pickle.loads(pickle.dumps(pipeline))
+
+    assert out == pipeline
+    assert out['a'].lc.line == 1
+    assert getattr(out['a'], CONSTANT_MARKER)
+
+
+def test_fast_containers_write_as_yaml(fast_yaml):
+    """Fast parser containers write with the round-trip writer."""
+    pipeline = pypyr_yaml.get_pipeline_yaml(io.StringIO('a:\n  b: [1]\n'))
+
+    out = io.StringIO()
+    pypyr_yaml.get_yaml_parser_roundtrip().dump(pipeline, out)
+    assert out.getvalue() == 'a:\n  b:\n    - 1\n'
+
+# endregion fast
+
 # region get_yaml_parser
 
 
@@ -50,6 +208,14 @@ def test_get_yaml_parser_safe():
     assert obj.pure
 
 
+def test_get_yaml_parser_fast():
+    """Create yaml parser fast."""
+    obj = pypyr_yaml.get_yaml_parser_fast()
+    assert obj.typ == ['safe']
+    assert not obj.pure
+    assert obj.Constructor is pypyr_yaml.FastConstructor
+
+
 def test_get_yaml_parser_roundtrip():
     """Create yaml parser roundtrip."""
     obj = pypyr_yaml.get_yaml_parser_roundtrip()